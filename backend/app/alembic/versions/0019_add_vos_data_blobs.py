@@ -0,0 +1,47 @@
+"""add content-addressed blob store for vos_data_cache
+
+Revision ID: 0019_vos_data_blobs
+Revises: 0018_account_detail_reports_view
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import func
+
+# revision identifiers, used by Alembic.
+revision = '0019_vos_data_blobs'
+down_revision = '0018_account_detail_reports_view'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 创建内容寻址存储表（大响应压缩后只存一份）
+    op.create_table(
+        'vos_data_blobs',
+        sa.Column('content_hash', sa.String(length=64), nullable=False, comment='SHA-256(规范化JSON)'),
+        sa.Column('compression', sa.String(length=16), nullable=False, server_default='zlib', comment='压缩算法'),
+        sa.Column('data', sa.LargeBinary(), nullable=False, comment='压缩后的响应数据'),
+        sa.Column('size_bytes', sa.Integer(), nullable=False, comment='原始JSON字节数'),
+        sa.Column('compressed_size', sa.Integer(), nullable=False, comment='压缩后字节数'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('content_hash')
+    )
+
+    # vos_data_cache: 增加内容哈希，大响应不再内联存储
+    op.add_column('vos_data_cache', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_vos_data_cache_content_hash', 'vos_data_cache', ['content_hash'], unique=False)
+    op.alter_column('vos_data_cache', 'response_data',
+                    existing_type=postgresql.JSONB(astext_type=sa.Text()), nullable=True)
+
+
+def downgrade():
+    # 将外置的响应数据无法在SQL中解压，降级前清除引用外置数据的缓存行
+    op.execute("DELETE FROM vos_data_cache WHERE response_data IS NULL")
+    op.alter_column('vos_data_cache', 'response_data',
+                    existing_type=postgresql.JSONB(astext_type=sa.Text()), nullable=False)
+    op.drop_index('ix_vos_data_cache_content_hash', table_name='vos_data_cache')
+    op.drop_column('vos_data_cache', 'content_hash')
+    op.drop_table('vos_data_blobs')
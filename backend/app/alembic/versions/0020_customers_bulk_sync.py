@@ -0,0 +1,37 @@
+"""unique (vos_instance_id, account) and content hash for bulk customer sync
+
+Revision ID: 0020_customers_bulk_sync
+Revises: 0019_vos_data_blobs
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0020_customers_bulk_sync'
+down_revision = '0019_vos_data_blobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 原始数据的内容哈希，同步时据此跳过未变化的客户
+    op.add_column('customers', sa.Column('content_hash', sa.String(length=32), nullable=True))
+
+    # 清理重复账号（保留最新的一条），再创建唯一索引供 INSERT ... ON CONFLICT 使用
+    op.execute("""
+        DELETE FROM customers c
+        USING customers d
+        WHERE c.vos_instance_id = d.vos_instance_id
+          AND c.account = d.account
+          AND c.id < d.id
+    """)
+    op.drop_index('idx_vos_account', table_name='customers')
+    op.create_index('uq_customers_vos_account', 'customers', ['vos_instance_id', 'account'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_customers_vos_account', table_name='customers')
+    op.create_index('idx_vos_account', 'customers', ['vos_instance_id', 'account'], unique=False)
+    op.drop_column('customers', 'content_hash')
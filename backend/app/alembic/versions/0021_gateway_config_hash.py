@@ -0,0 +1,31 @@
+"""gateway config hash, raw_data stores config only
+
+Revision ID: 0021_gateway_config_hash
+Revises: 0020_customers_bulk_sync
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0021_gateway_config_hash'
+down_revision = '0020_customers_bulk_sync'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 网关配置的内容哈希，同步时据此跳过未变化的网关
+    op.add_column('gateways', sa.Column('config_hash', sa.String(length=32), nullable=True))
+
+    # raw_data 只保存配置：去掉旧版本重复嵌入的 _data_sources（配置 + 在线信息各一份）
+    op.execute("""
+        UPDATE gateways
+        SET raw_data = raw_data->'_data_sources'->'config'
+        WHERE raw_data ? '_data_sources'
+    """)
+
+
+def downgrade():
+    op.drop_column('gateways', 'config_hash')
@@ -0,0 +1,32 @@
+"""health check latency history, percentiles and backoff
+
+Revision ID: 0022_health_latency_backoff
+Revises: 0021_gateway_config_hash
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '0022_health_latency_backoff'
+down_revision = '0021_gateway_config_hash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 滚动延迟样本及百分位
+    op.add_column('vos_health_checks', sa.Column('latency_history', postgresql.JSONB(), nullable=True))
+    op.add_column('vos_health_checks', sa.Column('p50_ms', sa.Float(), nullable=True))
+    op.add_column('vos_health_checks', sa.Column('p95_ms', sa.Float(), nullable=True))
+    # 下次探测时间（失败节点指数退避）
+    op.add_column('vos_health_checks', sa.Column('next_check_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.drop_column('vos_health_checks', 'next_check_at')
+    op.drop_column('vos_health_checks', 'p95_ms')
+    op.drop_column('vos_health_checks', 'p50_ms')
+    op.drop_column('vos_health_checks', 'latency_history')
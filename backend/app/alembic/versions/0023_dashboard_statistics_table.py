@@ -0,0 +1,119 @@
+"""replace mv_dashboard_statistics with an incrementally maintained table
+
+Revision ID: 0023_dashboard_statistics_table
+Revises: 0022_health_latency_backoff
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0023_dashboard_statistics_table'
+down_revision = '0022_health_latency_backoff'
+branch_labels = None
+depends_on = None
+
+
+# 全量校准：按实例重新计算客户数和健康状态，只更新有差异的行
+RECONCILE_FUNCTION = """
+    CREATE OR REPLACE FUNCTION refresh_dashboard_statistics()
+    RETURNS void AS $$
+    BEGIN
+        INSERT INTO dashboard_statistics (
+            instance_id, total_customers, debt_customers,
+            health_status, health_last_check, health_response_time, updated_at
+        )
+        SELECT
+            vi.id,
+            COALESCE(cs.total_customers, 0),
+            COALESCE(cs.debt_customers, 0),
+            COALESCE(vhc.status, 'unknown'),
+            vhc.last_check_at,
+            vhc.response_time_ms,
+            now()
+        FROM vos_instances vi
+        LEFT JOIN (
+            SELECT vos_instance_id,
+                   COUNT(*) AS total_customers,
+                   COUNT(*) FILTER (WHERE is_in_debt) AS debt_customers
+            FROM customers
+            GROUP BY vos_instance_id
+        ) cs ON cs.vos_instance_id = vi.id
+        LEFT JOIN vos_health_checks vhc ON vhc.vos_instance_id = vi.id
+        ON CONFLICT (instance_id) DO UPDATE SET
+            total_customers = EXCLUDED.total_customers,
+            debt_customers = EXCLUDED.debt_customers,
+            health_status = EXCLUDED.health_status,
+            health_last_check = EXCLUDED.health_last_check,
+            health_response_time = EXCLUDED.health_response_time,
+            updated_at = now()
+        WHERE (dashboard_statistics.total_customers, dashboard_statistics.debt_customers,
+               dashboard_statistics.health_status, dashboard_statistics.health_last_check)
+              IS DISTINCT FROM
+              (EXCLUDED.total_customers, EXCLUDED.debt_customers,
+               EXCLUDED.health_status, EXCLUDED.health_last_check);
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade():
+    op.create_table(
+        'dashboard_statistics',
+        sa.Column('instance_id', sa.Integer(), sa.ForeignKey('vos_instances.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('total_customers', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('debt_customers', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('customers_synced_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('health_status', sa.String(length=20), nullable=False, server_default='unknown'),
+        sa.Column('health_last_check', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('health_response_time', sa.Float(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+    )
+
+    # 物化视图不再使用：统计数据由同步任务增量写入汇总表
+    op.execute("DROP FUNCTION IF EXISTS refresh_dashboard_statistics() CASCADE;")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_dashboard_statistics CASCADE;")
+    op.execute(RECONCILE_FUNCTION)
+
+    # 初始化汇总数据
+    op.execute("SELECT refresh_dashboard_statistics();")
+
+
+def downgrade():
+    op.execute("DROP FUNCTION IF EXISTS refresh_dashboard_statistics() CASCADE;")
+    op.drop_table('dashboard_statistics')
+
+    op.execute("""
+        CREATE MATERIALIZED VIEW mv_dashboard_statistics AS
+        SELECT 
+            vi.id AS instance_id,
+            vi.name AS instance_name,
+            vi.vos_uuid,
+            vi.enabled,
+            COALESCE(vcs.total_customers, 0) AS total_customers,
+            COALESCE(vcs.debt_customers, 0) AS debt_customers,
+            COALESCE(vhs.health_status, 'unknown') AS health_status,
+            vhs.health_last_check,
+            vhs.health_response_time
+        FROM vos_instances vi
+        LEFT JOIN vw_customer_statistics vcs ON vcs.instance_id = vi.id
+        LEFT JOIN vw_instance_health_summary vhs ON vhs.instance_id = vi.id
+        WHERE vi.enabled = TRUE;
+    """)
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_dashboard_statistics_instance_id 
+        ON mv_dashboard_statistics (instance_id);
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_mv_dashboard_statistics_enabled 
+        ON mv_dashboard_statistics (enabled);
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION refresh_dashboard_statistics()
+        RETURNS void AS $$
+        BEGIN
+            REFRESH MATERIALIZED VIEW CONCURRENTLY mv_dashboard_statistics;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
@@ -0,0 +1,199 @@
+"""per-instance customer money counters, partial debt index, non-null debt flag and keyset listing indexes
+
+Revision ID: 0024_customer_counters
+Revises: 0023_dashboard_statistics_table
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0024_customer_counters'
+down_revision = '0023_dashboard_statistics_table'
+branch_labels = None
+depends_on = None
+
+
+# 全量校准（增加余额合计与欠费金额合计），只更新有差异的行
+RECONCILE_FUNCTION = """
+    CREATE OR REPLACE FUNCTION refresh_dashboard_statistics()
+    RETURNS void AS $$
+    BEGIN
+        INSERT INTO dashboard_statistics (
+            instance_id, total_customers, debt_customers, money_total, debt_money_total,
+            health_status, health_last_check, health_response_time, updated_at
+        )
+        SELECT
+            vi.id,
+            COALESCE(cs.total_customers, 0),
+            COALESCE(cs.debt_customers, 0),
+            COALESCE(cs.money_total, 0),
+            COALESCE(cs.debt_money_total, 0),
+            COALESCE(vhc.status, 'unknown'),
+            vhc.last_check_at,
+            vhc.response_time_ms,
+            now()
+        FROM vos_instances vi
+        LEFT JOIN (
+            SELECT vos_instance_id,
+                   COUNT(*) AS total_customers,
+                   COUNT(*) FILTER (WHERE is_in_debt) AS debt_customers,
+                   SUM(COALESCE(money, 0)) AS money_total,
+                   SUM(COALESCE(money, 0)) FILTER (WHERE is_in_debt) AS debt_money_total
+            FROM customers
+            GROUP BY vos_instance_id
+        ) cs ON cs.vos_instance_id = vi.id
+        LEFT JOIN vos_health_checks vhc ON vhc.vos_instance_id = vi.id
+        ON CONFLICT (instance_id) DO UPDATE SET
+            total_customers = EXCLUDED.total_customers,
+            debt_customers = EXCLUDED.debt_customers,
+            money_total = EXCLUDED.money_total,
+            debt_money_total = EXCLUDED.debt_money_total,
+            health_status = EXCLUDED.health_status,
+            health_last_check = EXCLUDED.health_last_check,
+            health_response_time = EXCLUDED.health_response_time,
+            updated_at = now()
+        WHERE (dashboard_statistics.total_customers, dashboard_statistics.debt_customers,
+               dashboard_statistics.money_total, dashboard_statistics.debt_money_total,
+               dashboard_statistics.health_status, dashboard_statistics.health_last_check)
+              IS DISTINCT FROM
+              (EXCLUDED.total_customers, EXCLUDED.debt_customers,
+               EXCLUDED.money_total, EXCLUDED.debt_money_total,
+               EXCLUDED.health_status, EXCLUDED.health_last_check);
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+PREVIOUS_RECONCILE_FUNCTION = """
+    CREATE OR REPLACE FUNCTION refresh_dashboard_statistics()
+    RETURNS void AS $$
+    BEGIN
+        INSERT INTO dashboard_statistics (
+            instance_id, total_customers, debt_customers,
+            health_status, health_last_check, health_response_time, updated_at
+        )
+        SELECT
+            vi.id,
+            COALESCE(cs.total_customers, 0),
+            COALESCE(cs.debt_customers, 0),
+            COALESCE(vhc.status, 'unknown'),
+            vhc.last_check_at,
+            vhc.response_time_ms,
+            now()
+        FROM vos_instances vi
+        LEFT JOIN (
+            SELECT vos_instance_id,
+                   COUNT(*) AS total_customers,
+                   COUNT(*) FILTER (WHERE is_in_debt) AS debt_customers
+            FROM customers
+            GROUP BY vos_instance_id
+        ) cs ON cs.vos_instance_id = vi.id
+        LEFT JOIN vos_health_checks vhc ON vhc.vos_instance_id = vi.id
+        ON CONFLICT (instance_id) DO UPDATE SET
+            total_customers = EXCLUDED.total_customers,
+            debt_customers = EXCLUDED.debt_customers,
+            health_status = EXCLUDED.health_status,
+            health_last_check = EXCLUDED.health_last_check,
+            health_response_time = EXCLUDED.health_response_time,
+            updated_at = now()
+        WHERE (dashboard_statistics.total_customers, dashboard_statistics.debt_customers,
+               dashboard_statistics.health_status, dashboard_statistics.health_last_check)
+              IS DISTINCT FROM
+              (EXCLUDED.total_customers, EXCLUDED.debt_customers,
+               EXCLUDED.health_status, EXCLUDED.health_last_check);
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade():
+    # 余额合计与欠费金额合计（与客户数一起由客户同步写入）
+    op.add_column('dashboard_statistics',
+                  sa.Column('money_total', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('dashboard_statistics',
+                  sa.Column('debt_money_total', sa.Float(), nullable=False, server_default='0'))
+
+    # 余额、欠费标记改为非空（同步始终写入两列），列表 status=normal 的过滤与汇总表 total - debt 一致
+    op.execute("UPDATE customers SET money = 0 WHERE money IS NULL")
+    op.execute("UPDATE customers SET is_in_debt = (money < 0) WHERE is_in_debt IS NULL")
+    op.alter_column('customers', 'money', nullable=False, server_default='0')
+    op.alter_column('customers', 'is_in_debt', nullable=False, server_default=sa.false())
+
+    # 客户列表键集分页（以 id 结尾）：按欠费状态过滤 + 余额排序（替代 (vos_instance_id, is_in_debt) 索引）、
+    # 按余额排序；按账号排序使用 uq_customers_vos_account；账号前缀过滤（text_pattern_ops 支持 LIKE 'prefix%'）
+    op.drop_index('idx_vos_debt', table_name='customers')
+    # 欠费客户的部分索引（只包含欠费客户，欠费列表按余额键集分页）
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_customers_debt_money
+        ON customers (vos_instance_id, money, id)
+        WHERE is_in_debt
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_customers_vos_debt_money
+        ON customers (vos_instance_id, is_in_debt, money, id)
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_customers_vos_money
+        ON customers (vos_instance_id, money, id)
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_customers_vos_account_prefix
+        ON customers (vos_instance_id, account text_pattern_ops)
+    """)
+
+    op.execute(RECONCILE_FUNCTION)
+
+    # 客户统计视图改为读取汇总表，不再扫描 customers
+    op.execute("""
+        CREATE OR REPLACE VIEW vw_customer_statistics AS
+        SELECT
+            vi.id AS instance_id,
+            vi.name AS instance_name,
+            vi.vos_uuid,
+            vi.enabled AS instance_enabled,
+            COALESCE(ds.total_customers, 0)::bigint AS total_customers,
+            COALESCE(ds.debt_customers, 0)::bigint AS debt_customers,
+            COALESCE(ds.debt_customers, 0)::bigint AS debt_count,
+            COALESCE(ds.money_total, 0) AS money_total,
+            COALESCE(ds.debt_money_total, 0) AS debt_money_total
+        FROM vos_instances vi
+        LEFT JOIN dashboard_statistics ds ON ds.instance_id = vi.id
+        WHERE vi.enabled = TRUE;
+    """)
+
+    # 初始化余额合计
+    op.execute("SELECT refresh_dashboard_statistics();")
+
+
+def downgrade():
+    # 视图列与原定义不同，需要先删除再重建
+    op.execute("DROP VIEW IF EXISTS vw_customer_statistics;")
+    op.execute("""
+        CREATE VIEW vw_customer_statistics AS
+        SELECT
+            vi.id AS instance_id,
+            vi.name AS instance_name,
+            vi.vos_uuid,
+            vi.enabled AS instance_enabled,
+            COUNT(c.id) AS total_customers,
+            COUNT(CASE WHEN c.is_in_debt = TRUE THEN 1 END) AS debt_customers,
+            COALESCE(SUM(CASE WHEN c.is_in_debt = TRUE THEN 1 ELSE 0 END), 0) AS debt_count
+        FROM vos_instances vi
+        LEFT JOIN customers c ON c.vos_instance_id = vi.id
+        WHERE vi.enabled = TRUE
+        GROUP BY vi.id, vi.name, vi.vos_uuid, vi.enabled;
+    """)
+
+    op.execute(PREVIOUS_RECONCILE_FUNCTION)
+
+    op.execute("DROP INDEX IF EXISTS idx_customers_vos_account_prefix")
+    op.execute("DROP INDEX IF EXISTS idx_customers_vos_money")
+    op.execute("DROP INDEX IF EXISTS idx_customers_vos_debt_money")
+    op.execute("DROP INDEX IF EXISTS idx_customers_debt_money")
+    op.create_index('idx_vos_debt', 'customers', ['vos_instance_id', 'is_in_debt'], unique=False)
+    op.alter_column('customers', 'is_in_debt', nullable=True, server_default=None)
+    op.alter_column('customers', 'money', nullable=True, server_default=None)
+
+    op.drop_column('dashboard_statistics', 'debt_money_total')
+    op.drop_column('dashboard_statistics', 'money_total')
@@ -0,0 +1,44 @@
+"""pg_trgm GiST and lower() prefix indexes for customer / gateway / phone search
+
+Revision ID: 0025_search_trgm_indexes
+Revises: 0024_customer_counters
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0025_search_trgm_indexes'
+down_revision = '0024_customer_counters'
+branch_labels = None
+depends_on = None
+
+
+# (三元组索引名, 前缀索引名, 表, 列)
+SEARCH_INDEXES = (
+    ('idx_customers_account_trgm', 'idx_customers_account_lower', 'customers', 'account'),
+    ('idx_gateways_name_trgm', 'idx_gateways_name_lower', 'gateways', 'gateway_name'),
+    ('idx_phones_enhanced_e164_trgm', 'idx_phones_enhanced_e164_lower', 'phones_enhanced', 'e164'),
+)
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    for trgm_name, prefix_name, table, column in SEARCH_INDEXES:
+        # GiST 三元组索引：ILIKE '%关键字%' 过滤 + 按 <-> 距离有序返回（KNN），LIMIT 取到前K条即停止
+        op.execute(f"""
+            CREATE INDEX IF NOT EXISTS {trgm_name}
+            ON {table} USING gist ({column} gist_trgm_ops)
+        """)
+        # 短关键字按前缀匹配：lower(列) LIKE '前缀%'，跨实例、不区分大小写，按索引顺序取前K条
+        op.execute(f"""
+            CREATE INDEX IF NOT EXISTS {prefix_name}
+            ON {table} (lower({column}) text_pattern_ops)
+        """)
+
+
+def downgrade():
+    # 扩展可能被其他对象使用，不删除
+    for trgm_name, prefix_name, _, _ in SEARCH_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {prefix_name}")
+        op.execute(f"DROP INDEX IF EXISTS {trgm_name}")
@@ -0,0 +1,215 @@
+"""
+账户明细报表同步
+账户按批次并发调用 GetReportCustomerFee（并发数受限，批次大小根据响应耗时自适应），
+一次调用覆盖整个日期范围（period=1 按天返回），每个批次的结果用一条 INSERT ... ON CONFLICT 写入，
+并双写到 ClickHouse 供长时间范围的聚合分析
+"""
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.vos_client import VOSClient
+from app.models.vos_instance import VOSInstance
+from app.models.account_detail_report import AccountDetailReport
+from app.models.clickhouse_account_report import ClickHouseAccountReport
+
+logger = logging.getLogger(__name__)
+
+REPORT_API = '/external/server/GetReportCustomerFee'
+# 单次请求超时（秒）
+REQUEST_TIMEOUT = 60
+# 同一节点同时进行的批次请求数（避免压垮VOS）
+MAX_CONCURRENCY = 3
+# 批次大小（账户数）：初始值按天数折算，之后根据耗时在上下限之间调整
+INITIAL_BATCH_SIZE = 50
+MIN_BATCH_SIZE = 10
+MAX_BATCH_SIZE = 200
+# 目标单批耗时（秒）：低于一半时批次加倍，超过时减半
+TARGET_BATCH_SECONDS = 10
+# 单次调用覆盖的最大天数，超过时按窗口拆分
+MAX_DAYS_PER_CALL = 31
+
+# 数值字段（VOS字段名 -> 列名）
+FEE_FIELDS = {
+    'totalFee': 'total_fee',
+    'totalSuiteFee': 'total_suite_fee',
+    'netFee': 'net_fee',
+    'localFee': 'local_fee',
+    'domesticFee': 'domestic_fee',
+    'internationalFee': 'international_fee',
+}
+COUNT_FIELDS = {
+    'cdrCount': 'cdr_count',
+    'totalTime': 'total_time',
+    'totalSuiteFeeTime': 'total_suite_fee_time',
+    'netTime': 'net_time',
+    'netCount': 'net_count',
+    'localTime': 'local_time',
+    'localCount': 'local_count',
+    'domesticTime': 'domestic_time',
+    'domesticCount': 'domestic_count',
+    'internationalTime': 'international_time',
+    'internationalCount': 'international_count',
+}
+
+
+class AccountReportSync:
+    """单个VOS实例的账户明细报表同步"""
+
+    def __init__(self, db: Session, instance: VOSInstance):
+        self.db = db
+        self.instance = instance
+        self.client = VOSClient(instance.base_url, timeout=REQUEST_TIMEOUT)
+        self.batch_size = INITIAL_BATCH_SIZE
+
+    # ==================== 批次大小 ====================
+
+    def _adapt(self, ok: bool, latency: float):
+        """根据上一批的结果调整批次大小：失败或过慢减半，明显快于目标则加倍"""
+        if not ok or latency > TARGET_BATCH_SECONDS:
+            self.batch_size = max(MIN_BATCH_SIZE, self.batch_size // 2)
+        elif latency < TARGET_BATCH_SECONDS / 2:
+            self.batch_size = min(MAX_BATCH_SIZE, self.batch_size * 2)
+
+    # ==================== 获取 ====================
+
+    def _fetch_batch(self, accounts: List[str], begin: date, end: date) -> Tuple[Dict[str, Any], float]:
+        """调用VOS获取一批账户在日期范围内的按天报表（在工作线程中执行）"""
+        payload = {
+            'accounts': accounts,
+            'period': 1,  # 1=天
+            'beginTime': begin.strftime('%Y%m%d'),
+            'endTime': end.strftime('%Y%m%d'),
+        }
+        start = time.perf_counter()
+        result = self.client.post(REPORT_API, payload)
+        return result, time.perf_counter() - start
+
+    # ==================== 写入 ====================
+
+    def _build_row(self, report: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        account = report.get('account')
+        if not account:
+            return None
+        row = {
+            'vos_instance_id': self.instance.id,
+            'vos_uuid': self.instance.vos_uuid,
+            'account': account,
+            'account_name': report.get('accountName', ''),
+            'begin_time': report.get('beginTime', 0),
+            'end_time': report.get('endTime', 0),
+        }
+        for field, column in FEE_FIELDS.items():
+            row[column] = Decimal(str(report.get(field) or 0))
+        for field, column in COUNT_FIELDS.items():
+            row[column] = report.get(field) or 0
+        return row
+
+    def _upsert(self, reports: List[Dict[str, Any]]) -> int:
+        """一条 INSERT ... ON CONFLICT DO UPDATE 写入一批报表，返回写入行数"""
+        rows: Dict[tuple, Dict[str, Any]] = {}
+        for report in reports:
+            row = self._build_row(report)
+            if row:
+                # 同一条语句中冲突键不能重复
+                rows[(row['account'], row['begin_time'], row['end_time'])] = row
+        if not rows:
+            return 0
+        stmt = pg_insert(AccountDetailReport.__table__).values(list(rows.values()))
+        update_columns = ['account_name', *FEE_FIELDS.values(), *COUNT_FIELDS.values()]
+        stmt = stmt.on_conflict_do_update(
+            constraint='uq_account_detail_report',
+            set_={
+                **{column: stmt.excluded[column] for column in update_columns},
+                'updated_at': func.now(),
+            }
+        )
+        self.db.execute(stmt)
+        self.db.commit()
+        
+        # 双写ClickHouse（PostgreSQL为准，失败只记录日志，可通过回填任务补齐）
+        try:
+            ClickHouseAccountReport.insert_reports(list(rows.values()))
+        except Exception as e:
+            logger.warning(f"账户明细报表写入ClickHouse失败: {self.instance.name}, {e}")
+        return len(rows)
+
+    # ==================== 同步 ====================
+
+    def sync(self, accounts: List[str], begin: date, end: date) -> Dict[str, Any]:
+        """
+        同步日期范围 [begin, end] 内所有账户的报表
+
+        Returns:
+            {saved_count, batch_count, failed_batches, failed_accounts, duration_ms}
+        """
+        start = time.perf_counter()
+        stats = {'saved_count': 0, 'batch_count': 0, 'failed_batches': 0, 'failed_accounts': 0}
+
+        window = begin
+        while window <= end:
+            window_end = min(end, window + timedelta(days=MAX_DAYS_PER_CALL - 1))
+            days = (window_end - window).days + 1
+            # 每个账户每天一行，天数越多初始批次越小
+            self.batch_size = max(MIN_BATCH_SIZE, INITIAL_BATCH_SIZE // days)
+            self._sync_window(accounts, window, window_end, stats)
+            window = window_end + timedelta(days=1)
+
+        stats['duration_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return stats
+
+    def _sync_window(self, accounts: List[str], begin: date, end: date, stats: Dict[str, Any]):
+        """并发获取一个日期窗口；失败的批次拆小后重试一次，节点熔断时放弃剩余批次"""
+        pending = deque(accounts)
+        retried = set()
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+            while pending or in_flight:
+                while pending and len(in_flight) < MAX_CONCURRENCY:
+                    batch = [pending.popleft() for _ in range(min(self.batch_size, len(pending)))]
+                    in_flight[executor.submit(self._fetch_batch, batch, begin, end)] = batch
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = in_flight.pop(future)
+                    stats['batch_count'] += 1
+                    try:
+                        result, latency = future.result()
+                    except Exception as e:
+                        result, latency = {'retCode': -99, 'exception': str(e)}, 0.0
+                    ok = self.client.is_success(result)
+                    self._adapt(ok, latency)
+
+                    if ok:
+                        reports = result.get('infoReportCustomerFees', []) or []
+                        stats['saved_count'] += self._upsert(reports)
+                        logger.info(
+                            f"   {self.instance.name}: {len(batch)} 个账户获取到 {len(reports)} 条报表 "
+                            f"({latency:.1f}s，下一批 {self.batch_size} 个账户)"
+                        )
+                        continue
+
+                    error_msg = self.client.get_error_message(result)
+                    if self.client.is_circuit_open(result):
+                        logger.error(f"VOS实例 {self.instance.name} 已熔断，放弃剩余批次: {error_msg}")
+                        stats['failed_accounts'] += len(batch) + len(pending)
+                        stats['failed_batches'] += 1
+                        pending.clear()
+                        continue
+                    if self.client.is_transport_failure(result) and not retried.intersection(batch):
+                        # 超时等传输层失败：批次大小已减半，放回队首拆成更小的批次重试
+                        retried.update(batch)
+                        pending.extendleft(reversed(batch))
+                        logger.warning(f"VOS API调用失败，缩小批次后重试: {self.instance.name}, {error_msg}")
+                        continue
+                    stats['failed_batches'] += 1
+                    stats['failed_accounts'] += len(batch)
+                    logger.error(f"VOS API调用失败: {self.instance.name}, {len(batch)} 个账户, {error_msg}")
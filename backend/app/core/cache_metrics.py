@@ -0,0 +1,366 @@
+"""
+缓存指标采集
+进程内计数器（无锁竞争的热路径），由每个进程的后台线程定期批量刷新到Redis汇总所有进程，
+采集本身不做任何网络I/O（可在事件循环和连接池回调中调用），通过 /metrics 以 Prometheus 文本格式导出
+"""
+import os
+import re
+import time
+import threading
+import logging
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Redis中汇总所有进程指标的键
+METRICS_REDIS_KEY = 'cache_metrics:counters'
+HOT_KEYS_REDIS_KEY = 'cache_metrics:hot_keys'
+
+# 进程内计数器刷新到Redis的间隔（秒）
+FLUSH_INTERVAL = 10.0
+# Redis中保留的热点键数量上限
+HOT_KEYS_KEEP = 1000
+
+# 延迟直方图分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 响应体大小直方图分桶（字节）
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# 指标定义：名称 -> (类型, 说明)
+METRIC_DEFINITIONS = {
+    'vos_cache_requests_total': ('counter', 'VOS缓存查询次数（按命中层级：redis/database/vos_api/error）'),
+    'vos_cache_miss_latency_seconds': ('histogram', 'Redis未命中时的查询耗时'),
+    'vos_api_fetch_latency_seconds': ('histogram', 'VOS API调用耗时'),
+    'vos_api_payload_bytes': ('histogram', 'VOS API响应体大小'),
+    'redis_cache_operations_total': ('counter', 'RedisCache操作次数（按操作和结果）'),
+    'redis_cache_latency_seconds': ('histogram', 'RedisCache操作耗时'),
+    'db_pool_wait_seconds': ('histogram', '从数据库连接池获取连接的等待时间（按连接池：sync/async）'),
+    'http_conditional_responses_total': ('counter', '带ETag的GET响应次数（按来源 cache/middleware 和结果 not_modified/full）'),
+}
+
+_FIELD_RE = re.compile(r'^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)\{(?P<labels>.*)\}$')
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _field(name: str, labels: Dict[str, Any]) -> str:
+    """生成指标字段（直接使用Prometheus样本格式，导出时无需再转换）"""
+    label_str = ','.join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+    return f'{name}{{{label_str}}}'
+
+
+def _parse_field(field: str) -> Tuple[str, Dict[str, str]]:
+    match = _FIELD_RE.match(field)
+    if not match:
+        return field, {}
+    labels = {k: v.replace('\\"', '"').replace('\\\\', '\\') for k, v in _LABEL_RE.findall(match.group('labels'))}
+    return match.group('name'), labels
+
+
+def _sample_sort_key(field: str) -> Tuple[str, List[Tuple[str, str]], float]:
+    """
+    样本排序：同一序列的直方图分桶按 le 数值升序、+Inf 最后（按字符串排序 le="10" 会排在 le="2.5" 之前，
+    不符合 Prometheus 文本格式，histogram_quantile 会算错）
+    """
+    name, labels = _parse_field(field)
+    le = labels.pop('le', None)
+    bound = float('inf') if le in (None, '+Inf') else float(le)
+    return name, sorted(labels.items()), bound
+
+
+def _family(name: str) -> str:
+    """样本名称 -> 指标族名称（去掉直方图的 _bucket/_sum/_count 后缀）"""
+    for suffix in ('_bucket', '_sum', '_count'):
+        base = name[:-len(suffix)]
+        if name.endswith(suffix) and METRIC_DEFINITIONS.get(base, ('',))[0] == 'histogram':
+            return base
+    return name
+
+
+class CacheMetrics:
+    """缓存指标采集工具类"""
+
+    _lock = threading.Lock()
+    _counters: Dict[str, float] = defaultdict(float)
+    _hot_keys: Dict[str, int] = defaultdict(int)
+    # 后台刷新线程所属进程（fork 出的 Celery 子进程需要各自启动）
+    _flusher_pid: Optional[int] = None
+
+    # ==================== 采集 ====================
+
+    @classmethod
+    def _inc(cls, name: str, labels: Dict[str, Any], value: float = 1.0):
+        cls._counters[_field(name, labels)] += value
+
+    @classmethod
+    def _observe(cls, name: str, labels: Dict[str, Any], value: float, buckets: Tuple[float, ...]):
+        """直方图观测：按Prometheus约定累计写入各分桶"""
+        for bound in buckets:
+            if value <= bound:
+                cls._inc(f'{name}_bucket', {**labels, 'le': bound})
+        cls._inc(f'{name}_bucket', {**labels, 'le': '+Inf'})
+        cls._inc(f'{name}_sum', labels, value)
+        cls._inc(f'{name}_count', labels)
+
+    @classmethod
+    def record_lookup(cls, vos_instance_id: int, api_name: str, tier: str, latency: float):
+        """
+        记录一次缓存查询
+
+        Args:
+            tier: 数据来源 redis/database/vos_api/stale/error
+            latency: 查询总耗时（秒）
+        """
+        labels = {'api': api_name, 'instance': vos_instance_id}
+        with cls._lock:
+            cls._inc('vos_cache_requests_total', {**labels, 'tier': tier})
+            if tier != 'redis':
+                cls._observe('vos_cache_miss_latency_seconds', labels, latency, LATENCY_BUCKETS)
+        cls._ensure_flusher()
+
+    @classmethod
+    def record_vos_fetch(cls, vos_instance_id: int, api_name: str, latency: float, success: bool,
+                         payload_bytes: Optional[int] = None):
+        """记录一次VOS API调用的耗时与响应体大小"""
+        labels = {'api': api_name, 'instance': vos_instance_id}
+        with cls._lock:
+            cls._observe('vos_api_fetch_latency_seconds',
+                         {**labels, 'result': 'success' if success else 'error'}, latency, LATENCY_BUCKETS)
+            if payload_bytes is not None:
+                cls._observe('vos_api_payload_bytes', labels, payload_bytes, SIZE_BUCKETS)
+        cls._ensure_flusher()
+
+    @classmethod
+    def record_db_pool_wait(cls, pool: str, latency: float):
+        """记录一次数据库连接池取连接的等待时间"""
+        with cls._lock:
+            cls._observe('db_pool_wait_seconds', {'pool': pool}, latency, LATENCY_BUCKETS)
+        cls._ensure_flusher()
+
+    @classmethod
+    def record_conditional(cls, source: str, result: str):
+        """
+        记录一次带ETag的GET响应
+
+        Args:
+            source: cache（缓存集成直接返回）/ middleware（中间件对响应体计算）
+            result: not_modified（304）/ full（返回完整响应体）
+        """
+        with cls._lock:
+            cls._inc('http_conditional_responses_total', {'source': source, 'result': result})
+        cls._ensure_flusher()
+
+    @classmethod
+    def record_redis_op(cls, op: str, result: str, latency: float, key: Optional[str] = None):
+        """
+        记录一次RedisCache操作
+
+        Args:
+            op: get/set/delete
+            result: hit/miss/ok/error
+            key: 缓存键（读操作计入热点键统计）
+        """
+        with cls._lock:
+            cls._inc('redis_cache_operations_total', {'op': op, 'result': result})
+            cls._observe('redis_cache_latency_seconds', {'op': op}, latency, LATENCY_BUCKETS)
+            if key is not None:
+                cls._hot_keys[key] += 1
+        cls._ensure_flusher()
+
+    # ==================== 刷新到Redis ====================
+
+    @classmethod
+    def _ensure_flusher(cls):
+        """首次采集时启动本进程的后台刷新线程"""
+        pid = os.getpid()
+        if cls._flusher_pid == pid:
+            return
+        with cls._lock:
+            if cls._flusher_pid == pid:
+                return
+            cls._flusher_pid = pid
+        threading.Thread(target=cls._flush_loop, name='cache-metrics-flush', daemon=True).start()
+
+    @classmethod
+    def _flush_loop(cls):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                cls.flush()
+            except Exception as e:
+                logger.debug(f"后台刷新缓存指标失败: {e}")
+
+    @classmethod
+    def _reset_after_fork(cls):
+        """fork 后子进程的锁可能处于持有状态，重新创建"""
+        cls._lock = threading.Lock()
+
+    @classmethod
+    def flush(cls) -> bool:
+        """将进程内计数器批量累加到Redis（HINCRBYFLOAT / ZINCRBY），失败时保留本地数据"""
+        with cls._lock:
+            counters, cls._counters = cls._counters, defaultdict(float)
+            hot_keys, cls._hot_keys = cls._hot_keys, defaultdict(int)
+
+        if not counters and not hot_keys:
+            return True
+
+        from app.core.redis_cache import get_redis_client
+        try:
+            client = get_redis_client()
+            if client is None:
+                raise RuntimeError('Redis不可用')
+            pipe = client.pipeline(transaction=False)
+            for field, value in counters.items():
+                pipe.hincrbyfloat(METRICS_REDIS_KEY, field, value)
+            for key, count in hot_keys.items():
+                pipe.zincrby(HOT_KEYS_REDIS_KEY, count, key)
+            if hot_keys:
+                pipe.zremrangebyrank(HOT_KEYS_REDIS_KEY, 0, -(HOT_KEYS_KEEP + 1))
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.debug(f"刷新缓存指标到Redis失败，保留到下次刷新: {e}")
+            with cls._lock:
+                for field, value in counters.items():
+                    cls._counters[field] += value
+                for key, count in hot_keys.items():
+                    cls._hot_keys[key] += count
+            return False
+
+    # ==================== 读取与导出 ====================
+
+    @classmethod
+    def _load(cls, top_n: int) -> Tuple[Dict[str, float], List[Tuple[str, float]]]:
+        """读取Redis中汇总的指标（先刷新本进程的计数器）；top_n 为0时不读取热点键"""
+        cls.flush()
+        from app.core.redis_cache import get_redis_client
+        client = get_redis_client()
+        if client is None:
+            return {}, []
+        counters = {field: float(value) for field, value in client.hgetall(METRICS_REDIS_KEY).items()}
+        hot_keys = client.zrevrange(HOT_KEYS_REDIS_KEY, 0, top_n - 1, withscores=True) if top_n > 0 else []
+        return counters, hot_keys
+
+    @classmethod
+    def render_prometheus(cls) -> str:
+        """
+        以 Prometheus 文本格式（0.0.4）导出所有指标
+        热点键名包含客户账号等业务数据，不在未鉴权的 /metrics 中导出（通过需要登录的 /vos-api/cache/metrics 查看）
+        """
+        counters, _ = cls._load(0)
+        return cls.format_prometheus(counters)
+
+    @staticmethod
+    def format_prometheus(counters: Dict[str, float]) -> str:
+        families: Dict[str, List[str]] = defaultdict(list)
+        for field in sorted(counters, key=_sample_sort_key):
+            name, _ = _parse_field(field)
+            families[_family(name)].append(f'{field} {counters[field]:g}')
+
+        lines = []
+        for family in sorted(families):
+            metric_type, help_text = METRIC_DEFINITIONS.get(family, ('untyped', family))
+            lines.append(f'# HELP {family} {help_text}')
+            lines.append(f'# TYPE {family} {metric_type}')
+            lines.extend(families[family])
+        return '\n'.join(lines) + '\n'
+
+    @classmethod
+    def snapshot(cls, vos_instance_id: Optional[int] = None, top_n: int = 20) -> Dict[str, Any]:
+        """
+        按接口汇总的指标（用于前端缓存面板）
+
+        Returns:
+            {
+                'by_api': [{api, instance, hits: {tier: n}, hit_rate, miss_latency_avg_ms,
+                            fetch_count, fetch_latency_avg_ms, fetch_latency_p95_ms, payload_avg_bytes}],
+                'redis': {'get_hit': n, 'get_miss': n, ...},
+                'hot_keys': [{key, hits}]
+            }
+        """
+        counters, hot_keys = cls._load(top_n)
+
+        stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        fetch_buckets: Dict[Tuple[str, str], Dict[float, float]] = defaultdict(lambda: defaultdict(float))
+        redis_ops: Dict[str, float] = defaultdict(float)
+
+        for field, value in counters.items():
+            name, labels = _parse_field(field)
+            if name == 'redis_cache_operations_total':
+                redis_ops[f"{labels.get('op')}_{labels.get('result')}"] += value
+                continue
+            if 'api' not in labels:
+                continue
+            if vos_instance_id is not None and labels.get('instance') != str(vos_instance_id):
+                continue
+
+            key = (labels['api'], labels['instance'])
+            entry = stats.setdefault(key, {
+                'api': labels['api'],
+                'instance': int(labels['instance']),
+                'hits': defaultdict(float),
+                'miss_latency_sum': 0.0, 'miss_count': 0.0,
+                'fetch_latency_sum': 0.0, 'fetch_count': 0.0,
+                'payload_sum': 0.0, 'payload_count': 0.0,
+            })
+            if name == 'vos_cache_requests_total':
+                entry['hits'][labels.get('tier', 'unknown')] += value
+            elif name == 'vos_cache_miss_latency_seconds_sum':
+                entry['miss_latency_sum'] += value
+            elif name == 'vos_cache_miss_latency_seconds_count':
+                entry['miss_count'] += value
+            elif name == 'vos_api_fetch_latency_seconds_sum':
+                entry['fetch_latency_sum'] += value
+            elif name == 'vos_api_fetch_latency_seconds_count':
+                entry['fetch_count'] += value
+            elif name == 'vos_api_fetch_latency_seconds_bucket' and labels.get('le') != '+Inf':
+                fetch_buckets[key][float(labels['le'])] += value
+            elif name == 'vos_api_payload_bytes_sum':
+                entry['payload_sum'] += value
+            elif name == 'vos_api_payload_bytes_count':
+                entry['payload_count'] += value
+
+        by_api = []
+        for key, entry in stats.items():
+            hits = {tier: int(count) for tier, count in entry['hits'].items()}
+            total = sum(hits.values())
+            cached = hits.get('redis', 0) + hits.get('database', 0)
+            by_api.append({
+                'api': entry['api'],
+                'instance': entry['instance'],
+                'hits': hits,
+                'total': int(total),
+                'hit_rate': round(cached / total * 100, 1) if total else 0.0,
+                'miss_latency_avg_ms': round(entry['miss_latency_sum'] / entry['miss_count'] * 1000, 1) if entry['miss_count'] else None,
+                'fetch_count': int(entry['fetch_count']),
+                'fetch_latency_avg_ms': round(entry['fetch_latency_sum'] / entry['fetch_count'] * 1000, 1) if entry['fetch_count'] else None,
+                'fetch_latency_p95_ms': cls._bucket_quantile(fetch_buckets.get(key), entry['fetch_count'], 0.95),
+                'payload_avg_bytes': int(entry['payload_sum'] / entry['payload_count']) if entry['payload_count'] else None,
+            })
+        by_api.sort(key=lambda x: x['total'], reverse=True)
+
+        return {
+            'by_api': by_api,
+            'redis': {op: int(count) for op, count in redis_ops.items()},
+            'hot_keys': [{'key': key, 'hits': int(score)} for key, score in hot_keys],
+        }
+
+    @staticmethod
+    def _bucket_quantile(buckets: Optional[Dict[float, float]], count: float, q: float) -> Optional[float]:
+        """根据累计分桶估算分位数（取分桶上界，毫秒）"""
+        if not buckets or not count:
+            return None
+        target = count * q
+        for bound in sorted(buckets):
+            if buckets[bound] >= target:
+                return round(bound * 1000, 1)
+        return None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=CacheMetrics._reset_after_fork)
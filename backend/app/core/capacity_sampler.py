@@ -0,0 +1,148 @@
+"""
+容量采样
+每轮对所有可用实例采集一次并发呼叫数（GetCurrentCall，实例总数 + 按对接/落地网关计数）
+和性能指标（GetPerformance 的数值字段），写入ClickHouse容量时序（app.models.clickhouse_capacity_metrics）
+
+实时推送正在轮询 GetCurrentCall 时直接使用差异引擎中足够新的快照，不重复调用VOS
+"""
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.vos_client import VOSClient
+from app.core.vos_health_checker import is_instance_available
+from app.core.snapshot_diff import DeltaLog, extract_items, DIFF_APIS
+from app.models.vos_instance import VOSInstance
+from app.models.clickhouse_capacity_metrics import (
+    ClickHouseCapacityMetrics, METRIC_CURRENT_CALLS, METRIC_CALLER_GATEWAY_CALLS, METRIC_CALLEE_GATEWAY_CALLS
+)
+
+logger = logging.getLogger(__name__)
+
+CURRENT_CALL_API = '/external/server/GetCurrentCall'
+PERFORMANCE_API = '/external/server/GetPerformance'
+
+# 采样超时（秒），采样失败只丢一个点
+SAMPLE_TIMEOUT = 5
+# 并发采样的实例数
+MAX_WORKERS = 8
+# 差异引擎快照在该时间（秒）内视为当前值
+SNAPSHOT_MAX_AGE = 30
+
+# 当前呼叫中的网关字段（按顺序取第一个非空值）
+CALLER_GATEWAY_FIELDS = ('callerGateway', 'callerGatewayName', 'callerGatewayId')
+CALLEE_GATEWAY_FIELDS = ('calleeGateway', 'calleeGatewayName', 'calleeGatewayId')
+
+# 性能指标名称前缀
+PERFORMANCE_PREFIX = 'perf.'
+# 性能响应中不作为指标的字段
+PERFORMANCE_SKIP_FIELDS = {'retCode', 'exception'}
+
+
+def _first_value(item: Dict[str, Any], fields: Iterable[str]) -> Optional[str]:
+    for field in fields:
+        value = item.get(field)
+        if value not in (None, ''):
+            return str(value)
+    return None
+
+
+def call_metrics(calls: List[Dict[str, Any]]) -> List[tuple]:
+    """
+    当前呼叫 -> [(指标, 网关, 值)]
+    实例总并发计入 gateway=''；有通话的网关各计一个点（没有通话的网关不写入，查询时按实例总并发的采样网格补0）
+    """
+    rows = [(METRIC_CURRENT_CALLS, '', float(len(calls)))]
+    caller = Counter(_first_value(call, CALLER_GATEWAY_FIELDS) for call in calls if isinstance(call, dict))
+    callee = Counter(_first_value(call, CALLEE_GATEWAY_FIELDS) for call in calls if isinstance(call, dict))
+    rows.extend((METRIC_CALLER_GATEWAY_CALLS, gateway, float(count)) for gateway, count in caller.items() if gateway)
+    rows.extend((METRIC_CALLEE_GATEWAY_CALLS, gateway, float(count)) for gateway, count in callee.items() if gateway)
+    return rows
+
+
+def performance_metrics(result: Dict[str, Any], prefix: str = PERFORMANCE_PREFIX) -> List[tuple]:
+    """GetPerformance 响应 -> [(指标, '', 值)]：展开所有数值字段（嵌套对象用 . 连接字段名）"""
+    rows = []
+    for key, value in (result or {}).items():
+        if key in PERFORMANCE_SKIP_FIELDS:
+            continue
+        if isinstance(value, (int, float)):
+            rows.append((f'{prefix}{key}', '', float(value)))
+        elif isinstance(value, str):
+            try:
+                rows.append((f'{prefix}{key}', '', float(value.rstrip('%'))))
+            except ValueError:
+                pass
+        elif isinstance(value, dict):
+            rows.extend(performance_metrics(value, f'{prefix}{key}.'))
+    return rows
+
+
+def _current_calls(instance: VOSInstance, client: VOSClient) -> Optional[List[Dict[str, Any]]]:
+    """当前呼叫列表：优先使用差异引擎中的新快照，否则调用VOS（结果同时记录到差异引擎）"""
+    log = DeltaLog(instance.id, CURRENT_CALL_API)
+    snapshot = log.snapshot()
+    if snapshot and time.time() - snapshot.get('ts', 0) <= SNAPSHOT_MAX_AGE:
+        return list(snapshot['items'].values())
+    result = client.post(CURRENT_CALL_API, payload={})
+    if not client.is_success(result):
+        logger.warning(f'采样当前呼叫失败 (instance={instance.id}): {client.get_error_message(result)}')
+        return None
+    log.record(result)
+    return extract_items(result, DIFF_APIS[CURRENT_CALL_API]['list_keys'])
+
+
+def sample_instance(instance: VOSInstance) -> List[Dict[str, Any]]:
+    """采集单个实例的一组样本（两个接口互不影响，失败的接口本轮不写入）"""
+    client = VOSClient(instance.base_url, timeout=SAMPLE_TIMEOUT)
+    ts = datetime.utcnow().replace(microsecond=0)
+    rows: List[tuple] = []
+    try:
+        calls = _current_calls(instance, client)
+        if calls is not None:
+            rows.extend(call_metrics(calls))
+    except Exception as e:
+        logger.warning(f'采样当前呼叫异常 (instance={instance.id}): {e}')
+    try:
+        result = client.post(PERFORMANCE_API, payload={})
+        if client.is_success(result):
+            rows.extend(performance_metrics(result))
+        else:
+            logger.warning(f'采样性能指标失败 (instance={instance.id}): {client.get_error_message(result)}')
+    except Exception as e:
+        logger.warning(f'采样性能指标异常 (instance={instance.id}): {e}')
+    return [
+        {'vos_id': instance.id, 'metric': metric, 'gateway': gateway, 'ts': ts, 'value': value}
+        for metric, gateway, value in rows
+    ]
+
+
+class CapacitySampler:
+    """容量采样器"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def run(self) -> Dict[str, Any]:
+        """并发采样所有启用且可用的实例，一次批量写入ClickHouse"""
+        instances = self.db.query(VOSInstance).filter(VOSInstance.enabled == True).all()
+        # 熔断中的节点本轮跳过（采样缺口比等待超时更可接受）
+        available = [inst for inst in instances if is_instance_available(inst.base_url)]
+        if not available:
+            return {'instances_count': len(instances), 'sampled_count': 0, 'samples': 0}
+
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(available))) as executor:
+            batches = list(executor.map(sample_instance, available))
+        samples = [sample for batch in batches for sample in batch]
+        written = ClickHouseCapacityMetrics.insert_samples(samples)
+        return {
+            'instances_count': len(instances),
+            'sampled_count': sum(1 for batch in batches if batch),
+            'skipped_count': len(instances) - len(available),
+            'samples': written,
+        }
@@ -5,12 +5,17 @@ from clickhouse_driver import Client
 from typing import Optional, List, Dict, Any, Tuple
 import logging
 import os
+import threading
 
 logger = logging.getLogger(__name__)
 
 
 class ClickHouseDB:
-    """ClickHouse 数据库连接管理"""
+    """
+    ClickHouse 数据库连接管理
+    clickhouse_driver.Client 不是线程安全的（同一连接上并发查询会报 Simultaneous queries），
+    每个线程使用自己的 Client（API 的线程池、采样任务的线程池中并发查询互不影响）
+    """
     
     def __init__(self):
         self.host = os.getenv('CLICKHOUSE_HOST', 'clickhouse')
@@ -18,8 +23,24 @@ class ClickHouseDB:
         self.user = os.getenv('CLICKHOUSE_USER', 'vos_user')
         self.password = os.getenv('CLICKHOUSE_PASSWORD', 'vos_password')
         self.database = os.getenv('CLICKHOUSE_DATABASE', 'vos_cdrs')
-        self.client: Optional[Client] = None
-        self._connected = False
+        self._local = threading.local()
+    
+    @property
+    def client(self) -> Optional[Client]:
+        """当前线程的连接"""
+        return getattr(self._local, 'client', None)
+    
+    @client.setter
+    def client(self, value: Optional[Client]):
+        self._local.client = value
+    
+    @property
+    def _connected(self) -> bool:
+        return getattr(self._local, 'connected', False)
+    
+    @_connected.setter
+    def _connected(self, value: bool):
+        self._local.connected = value
     
     def connect(self) -> Client:
         """创建连接"""
@@ -101,7 +122,7 @@ class ClickHouseDB:
             raise
     
     def close(self):
-        """关闭连接"""
+        """关闭当前线程的连接"""
         if self.client:
             try:
                 self.client.disconnect()
@@ -0,0 +1,124 @@
+"""
+响应压缩（Brotli / GZip）
+只压缩超过 COMPRESS_MIN_SIZE 的非流式文本响应（有 Content-Length），客户端支持 br 时优先使用Brotli；
+SSE 等流式响应不缓冲、不压缩。压缩后的响应把强ETag改为弱ETag（内容编码不同，语义相同）
+
+brotli 为可选依赖，未安装时只使用GZip
+"""
+import gzip
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 可压缩的内容类型前缀
+COMPRESSIBLE_TYPES = (
+    b'application/json',
+    b'text/plain',
+    b'text/csv',
+    b'text/html',
+    b'application/javascript',
+    b'application/x-ndjson',
+)
+# 超过该大小（字节）的响应体在线程池中压缩，不阻塞事件循环
+THREADPOOL_THRESHOLD = 256 * 1024
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """按 Accept-Encoding 选择编码（q=0 视为不接受）"""
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=settings.BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """按大小阈值压缩响应体（ASGI中间件）"""
+
+    def __init__(self, app, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESS_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = None
+        for name, value in scope['headers']:
+            if name == b'accept-encoding':
+                encoding = choose_encoding(value.decode('latin-1'))
+                break
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {'start': None, 'body': [], 'compress': False}
+
+        async def wrapped_send(message):
+            if message['type'] == 'http.response.start':
+                headers = {name.lower(): value for name, value in message.get('headers', [])}
+                length = headers.get(b'content-length')
+                state['compress'] = (
+                    length is not None
+                    and int(length) >= self.minimum_size
+                    and b'content-encoding' not in headers
+                    and headers.get(b'content-type', b'').startswith(COMPRESSIBLE_TYPES)
+                )
+                if state['compress']:
+                    state['start'] = message
+                else:
+                    await send(message)
+                return
+
+            if not state['compress'] or message['type'] != 'http.response.body':
+                await send(message)
+                return
+
+            state['body'].append(message.get('body', b''))
+            if message.get('more_body', False):
+                return
+            body = b''.join(state['body'])
+            if len(body) >= THREADPOOL_THRESHOLD:
+                body = await run_in_threadpool(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+
+            headers = []
+            vary = None
+            for name, value in state['start'].get('headers', []):
+                lower = name.lower()
+                if lower == b'content-length':
+                    continue
+                if lower == b'etag' and not value.startswith(b'W/'):
+                    value = b'W/' + value
+                if lower == b'vary':
+                    vary = value
+                    continue
+                headers.append((name, value))
+            headers.append((b'content-encoding', encoding.encode()))
+            headers.append((b'content-length', str(len(body)).encode()))
+            headers.append((b'vary', vary + b', Accept-Encoding' if vary else b'Accept-Encoding'))
+            await send({**state['start'], 'headers': headers})
+            await send({'type': 'http.response.body', 'body': body})
+
+        await self.app(scope, receive, wrapped_send)
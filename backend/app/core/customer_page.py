@@ -0,0 +1,77 @@
+"""
+客户分页列表（按实例）：过滤条件、汇总表总数、键集分页游标
+键集分页按 (排序列, id) 定位下一页，每页只从索引读取 page_size 行，与翻到第几页无关：
+- 按余额排序：欠费客户走部分索引 idx_customers_debt_money (vos_instance_id, money, id) WHERE is_in_debt，
+  正常客户走 idx_customers_vos_debt_money (vos_instance_id, is_in_debt, money, id)，
+  全部客户走 idx_customers_vos_money (vos_instance_id, money, id)
+- 按账号排序：uq_customers_vos_account (vos_instance_id, account)，账号在实例内唯一，不需要 id
+"""
+import base64
+import json
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+
+from app.core.search import escape_like
+from app.models.customer import Customer
+
+# 各排序方式的键集列（最后一列必须唯一）
+CUSTOMER_KEYSET_COLUMNS = {
+    'account': (Customer.account,),
+    'money': (Customer.money, Customer.id),
+}
+
+
+def customer_page_conditions(instance_id: int, status: str = 'all', account_prefix: Optional[str] = None,
+                             min_money: Optional[float] = None, max_money: Optional[float] = None) -> List[Any]:
+    """列表过滤条件（is_in_debt 非空，normal 与汇总表的 total - debt 一致）"""
+    conditions = [Customer.vos_instance_id == instance_id]
+    if status == 'debt':
+        conditions.append(Customer.is_in_debt == True)
+    elif status == 'normal':
+        conditions.append(Customer.is_in_debt == False)
+    if account_prefix:
+        conditions.append(Customer.account.like(escape_like(account_prefix) + '%', escape='\\'))
+    if min_money is not None:
+        conditions.append(Customer.money >= min_money)
+    if max_money is not None:
+        conditions.append(Customer.money <= max_money)
+    return conditions
+
+
+def counter_total(status: str, total_customers: int, debt_customers: int) -> int:
+    """无前缀、余额过滤时，直接由汇总表得到匹配总数"""
+    if status == 'debt':
+        return debt_customers
+    if status == 'normal':
+        return total_customers - debt_customers
+    return total_customers
+
+
+def customer_page_ordering(sort: str, order: str) -> List[Any]:
+    columns = CUSTOMER_KEYSET_COLUMNS[sort]
+    return [c.desc() for c in columns] if order == 'desc' else [c.asc() for c in columns]
+
+
+def customer_page_after(sort: str, order: str, cursor_values: Tuple) -> Any:
+    """游标之后的行：(排序列, id) 行值比较"""
+    key = tuple_(*CUSTOMER_KEYSET_COLUMNS[sort])
+    values = tuple_(*cursor_values)
+    return key < values if order == 'desc' else key > values
+
+
+def encode_cursor(sort: str, row: Any) -> str:
+    values = [getattr(row, column.key) for column in CUSTOMER_KEYSET_COLUMNS[sort]]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(sort: str, cursor: str) -> Tuple:
+    """解析游标，格式不对或与排序方式不匹配时抛出 ValueError"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('无效的分页游标')
+    columns = CUSTOMER_KEYSET_COLUMNS[sort]
+    if not isinstance(values, list) or len(values) != len(columns) or any(v is None for v in values):
+        raise ValueError('无效的分页游标')
+    return tuple(values)
@@ -0,0 +1,162 @@
+"""
+客户数据批量同步
+一次查询加载实例现有客户集合，按内容哈希与VOS返回的数据比对，
+只对新增/变化的客户分批执行 INSERT ... ON CONFLICT，删除VOS中已不存在的客户，
+并同步写入仪表盘汇总表中该实例的客户数
+"""
+import json
+import hashlib
+import logging
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models.customer import Customer
+from app.models.vos_instance import VOSInstance
+from app.core.dashboard_stats import set_customer_counts
+
+logger = logging.getLogger(__name__)
+
+# 每批写入的行数
+CHUNK_SIZE = 1000
+
+
+class CustomerBulkSync:
+    """客户数据批量同步引擎"""
+
+    def __init__(self, db: Session, instance: VOSInstance):
+        self.db = db
+        self.instance = instance
+
+    @staticmethod
+    def content_hash(cust_data: Dict[str, Any]) -> str:
+        """客户原始数据的内容哈希（键排序后的JSON），用于判断是否有变化"""
+        raw = json.dumps(cust_data, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _to_float(value: Any) -> float:
+        try:
+            return float(value or 0.0)
+        except (ValueError, TypeError):
+            return 0.0
+
+    def _build_row(self, cust_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """将VOS客户数据转换为 customers 表的一行"""
+        account = cust_data.get('account') or cust_data.get('Account')
+        if not account:
+            return None
+        money = self._to_float(cust_data.get('money', cust_data.get('Money')))
+        limit_money = self._to_float(cust_data.get('limitMoney', cust_data.get('LimitMoney')))
+        return {
+            'vos_instance_id': self.instance.id,
+            'vos_uuid': self.instance.vos_uuid,
+            'account': account,
+            'money': money,
+            'limit_money': limit_money,
+            'is_in_debt': money < 0,
+            # 完整的VOS客户数据保存为JSON字符串
+            'raw_data': json.dumps(cust_data, ensure_ascii=False),
+            'content_hash': self.content_hash(cust_data),
+        }
+
+    def sync(self, customers: List[Dict[str, Any]], delete_missing: bool = True) -> Dict[str, int]:
+        """
+        同步客户数据（调用方负责提交事务）
+
+        Args:
+            customers: VOS GetAllCustomers 返回的 infoCustomerBriefs
+            delete_missing: 是否删除VOS中已不存在的客户
+
+        Returns:
+            变化统计 {total, new, updated, unchanged, deleted}
+        """
+        # 以账号去重（同一账号出现多次时以最后一次为准）
+        incoming: Dict[str, Dict[str, Any]] = {}
+        for cust_data in customers:
+            row = self._build_row(cust_data)
+            if row:
+                incoming[row['account']] = row
+
+        # 一次查询加载现有客户集合（内容哈希 + 欠费状态 + 余额）
+        current: Dict[str, str] = {}
+        debt_by_account: Dict[str, bool] = {}
+        money_by_account: Dict[str, float] = {}
+        for account, content_hash, is_in_debt, money in self.db.query(
+            Customer.account, Customer.content_hash, Customer.is_in_debt, Customer.money
+        ).filter(Customer.vos_instance_id == self.instance.id).all():
+            current[account] = content_hash
+            debt_by_account[account] = bool(is_in_debt)
+            money_by_account[account] = money or 0.0
+
+        new_rows = [row for account, row in incoming.items() if account not in current]
+        changed_rows = [
+            row for account, row in incoming.items()
+            if account in current and current[account] != row['content_hash']
+        ]
+        vanished = [account for account in current if account not in incoming]
+
+        # VOS返回空列表时不删除（更可能是接口异常而不是客户全部被删除）
+        if not incoming:
+            vanished = []
+
+        upserts = new_rows + changed_rows
+        for i in range(0, len(upserts), CHUNK_SIZE):
+            stmt = pg_insert(Customer.__table__).values(upserts[i:i + CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['vos_instance_id', 'account'],
+                set_={
+                    'vos_uuid': stmt.excluded.vos_uuid,
+                    'money': stmt.excluded.money,
+                    'limit_money': stmt.excluded.limit_money,
+                    'is_in_debt': stmt.excluded.is_in_debt,
+                    'raw_data': stmt.excluded.raw_data,
+                    'content_hash': stmt.excluded.content_hash,
+                    'synced_at': func.now(),
+                    'updated_at': func.now(),
+                }
+            )
+            self.db.execute(stmt)
+
+        deleted = 0
+        if delete_missing and vanished:
+            for i in range(0, len(vanished), CHUNK_SIZE):
+                deleted += self.db.query(Customer).filter(
+                    Customer.vos_instance_id == self.instance.id,
+                    Customer.account.in_(vanished[i:i + CHUNK_SIZE])
+                ).delete(synchronize_session=False)
+
+        # 未变化的客户不逐行刷新 synced_at：本次同步时间由汇总表的 customers_synced_at 按实例记录一次。
+        # 同步后的客户集合已知，直接写入仪表盘汇总表，无需重新聚合整张表。
+        # 写入的是同步后的绝对值而不是增量：并发或重试的同步不会把变化重复累加
+        for account, row in incoming.items():
+            debt_by_account[account] = row['is_in_debt']
+            money_by_account[account] = row['money']
+        if deleted:
+            for account in vanished:
+                debt_by_account.pop(account, None)
+                money_by_account.pop(account, None)
+        set_customer_counts(
+            self.db, self.instance.id,
+            total=len(debt_by_account),
+            debt=sum(1 for is_in_debt in debt_by_account.values() if is_in_debt),
+            money_total=sum(money_by_account.values()),
+            debt_money_total=sum(
+                money_by_account[account] for account, is_in_debt in debt_by_account.items() if is_in_debt
+            ),
+        )
+        
+        stats = {
+            'total': len(incoming),
+            'new': len(new_rows),
+            'updated': len(changed_rows),
+            'unchanged': len(incoming) - len(upserts),
+            'deleted': deleted,
+        }
+        logger.info(
+            f"VOS {self.instance.name} 客户批量同步: 共 {stats['total']} 个 "
+            f"(新增: {stats['new']}, 更新: {stats['updated']}, 未变化: {stats['unchanged']}, 删除: {stats['deleted']})"
+        )
+        return stats
@@ -0,0 +1,76 @@
+"""
+仪表盘统计汇总表的增量维护
+客户批量同步写入该实例的客户数，健康检查写入健康状态，
+不再每次同步后全量刷新物化视图（refresh_dashboard_statistics() 仅用于定期校准）
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models.dashboard_statistics import DashboardStatistics
+
+logger = logging.getLogger(__name__)
+
+
+def set_customer_counts(db: Session, instance_id: int, total: int, debt: int,
+                        money_total: float = 0.0, debt_money_total: float = 0.0):
+    """写入实例的客户数与余额合计（调用方负责提交事务，与客户数据的变化在同一事务中生效）"""
+    table = DashboardStatistics.__table__
+    stmt = pg_insert(table).values(
+        instance_id=instance_id,
+        total_customers=total,
+        debt_customers=debt,
+        money_total=money_total,
+        debt_money_total=debt_money_total,
+        customers_synced_at=func.now(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['instance_id'],
+        set_={
+            'total_customers': stmt.excluded.total_customers,
+            'debt_customers': stmt.excluded.debt_customers,
+            'money_total': stmt.excluded.money_total,
+            'debt_money_total': stmt.excluded.debt_money_total,
+            'customers_synced_at': stmt.excluded.customers_synced_at,
+            'updated_at': func.now(),
+        }
+    )
+    db.execute(stmt)
+
+
+def set_health(db: Session, rows: List[Dict[str, Any]]):
+    """
+    批量写入实例健康状态（调用方负责提交事务）
+
+    Args:
+        rows: [{'instance_id', 'health_status', 'health_last_check', 'health_response_time'}, ...]
+    """
+    if not rows:
+        return
+    table = DashboardStatistics.__table__
+    stmt = pg_insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['instance_id'],
+        set_={
+            'health_status': stmt.excluded.health_status,
+            'health_last_check': stmt.excluded.health_last_check,
+            'health_response_time': stmt.excluded.health_response_time,
+            'updated_at': func.now(),
+        }
+    )
+    db.execute(stmt)
+
+
+def health_row(instance_id: int, status: str, last_check_at: Optional[datetime],
+               response_time_ms: Optional[float]) -> Dict[str, Any]:
+    """构造 set_health 的一行"""
+    return {
+        'instance_id': instance_id,
+        'health_status': status or 'unknown',
+        'health_last_check': last_check_at,
+        'health_response_time': response_time_ms,
+    }
@@ -1,10 +1,67 @@
+import time
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from app.core.config import settings
+from app.core.cache_metrics import CacheMetrics
+
+
+class _TimedPoolMixin:
+    """记录从连接池获取连接的等待时间（含池未满时新建连接的耗时）"""
+    pool_label = 'sync'
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            CacheMetrics.record_db_pool_wait(self.pool_label, time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pool_label = 'sync'
+
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pool_label = 'async'
+
+
+def async_database_url(url: str) -> str:
+    """同步连接串 -> asyncpg 连接串"""
+    scheme, _, rest = url.partition('://')
+    return f'postgresql+asyncpg://{rest}' if scheme.startswith('postgres') else url
+
+
+# 同步引擎：Celery任务及尚未迁移的路由
+engine = create_engine(
+    settings.DATABASE_URL,
+    poolclass=TimedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=True
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎（asyncpg）：高频只读路由，查询期间不阻塞事件循环
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    poolclass=TimedAsyncQueuePool,
+    pool_size=settings.DB_ASYNC_POOL_SIZE,
+    max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+    # asyncpg 预编译语句缓存（经 PgBouncer 事务模式连接时需设为0）
+    connect_args={'prepared_statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE}
+)
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 def get_db():
     """Database dependency"""
     db = SessionLocal()
@@ -13,3 +70,8 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    """Async database dependency"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,40 @@
+"""
+JSON 编解码（orjson）
+- dumps / loads：Redis缓存、ETag缓存和响应共用，datetime/date/UUID 由orjson原生处理，
+  Decimal 转为 float（统计表、话单费用列），其他无法编码的对象按 str() 输出
+- FastJSONResponse：应用默认响应类；大响应的接口直接返回它，跳过 FastAPI 的 jsonable_encoder
+"""
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from starlette.responses import JSONResponse
+
+# 非字符串键（如按实例ID索引的字典）按 json.dumps 的行为转为字符串
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8', errors='replace')
+    return str(obj)
+
+
+def dumps(data: Any) -> bytes:
+    """编码为UTF-8 JSON（不转义中文）"""
+    return orjson.dumps(data, default=_default, option=OPTIONS)
+
+
+def loads(raw) -> Any:
+    return orjson.loads(raw)
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson 编码的JSON响应"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
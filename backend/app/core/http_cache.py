@@ -0,0 +1,173 @@
+"""
+HTTP 条件请求（ETag / If-None-Match）
+
+- 缓存集成：接口把响应写入Redis时同时保存内容哈希（RedisCache.set_raw 的 etag），
+  再次请求时先只读ETag，与 If-None-Match 相同则直接返回304，不访问数据库、不读取和编码JSON；
+  ETag不同时原样返回缓存中的JSON字符串（不解码再编码）。内容不变时重新计算出的ETag也不变，
+  缓存失效重建后客户端仍然得到304
+- 中间件：其余GET接口的JSON响应（有 Content-Length、不超过 MAX_BODY_BYTES）按响应体计算ETag，
+  匹配时改为304，节省带宽；已经带ETag的响应（缓存集成返回的）只做匹配，不再计算
+"""
+import hashlib
+from typing import Any, Iterable, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.cache_metrics import CacheMetrics
+from app.core.redis_cache import RedisCache
+from app.core.fast_json import dumps
+
+# 中间件计算ETag的响应体上限（字节），更大的响应不缓冲
+MAX_BODY_BYTES = 4 * 1024 * 1024
+# 带ETag的响应每次都向服务端验证（轮询客户端靠304节省带宽，不会读到过期数据）
+CACHE_CONTROL = 'private, no-cache'
+
+
+def compute_etag(body) -> str:
+    """内容哈希（强ETag）"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return '"' + hashlib.md5(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """If-None-Match 是否匹配（弱比较：忽略 W/ 前缀，压缩中间件会把强ETag改为弱ETag）"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    target = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': CACHE_CONTROL})
+
+
+def json_response(raw, etag: str) -> Response:
+    """返回已编码的JSON"""
+    return Response(content=raw, media_type='application/json',
+                    headers={'ETag': etag, 'Cache-Control': CACHE_CONTROL})
+
+
+def cached_response(request: Request, cache_key: str) -> Optional[Response]:
+    """
+    从Redis缓存返回响应：If-None-Match 匹配时返回304（只读ETag键），否则返回缓存的JSON；
+    未命中返回None，由接口查询后调用 cache_response 写入
+    """
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        etag = RedisCache.get_etag(cache_key)
+        if etag_matches(if_none_match, etag):
+            CacheMetrics.record_conditional('cache', 'not_modified')
+            return not_modified(etag)
+    raw, etag = RedisCache.get_raw(cache_key)
+    if raw is None:
+        return None
+    # 升级前写入（或由 RedisCache.set 写入）的缓存没有ETag，按内容现算
+    etag = etag or compute_etag(raw)
+    if etag_matches(if_none_match, etag):
+        CacheMetrics.record_conditional('cache', 'not_modified')
+        return not_modified(etag)
+    CacheMetrics.record_conditional('cache', 'full')
+    return json_response(raw, etag)
+
+
+def cache_response(request: Request, cache_key: str, data: Any, ttl: int = 300,
+                   tags: Optional[Iterable[str]] = None) -> Response:
+    """编码一次响应数据，连同ETag写入Redis缓存，并返回同一份JSON（客户端ETag相同时返回304）"""
+    raw = dumps(data)
+    etag = compute_etag(raw)
+    RedisCache.set_raw(cache_key, raw, ttl=ttl, tags=tags, etag=etag)
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        CacheMetrics.record_conditional('cache', 'not_modified')
+        return not_modified(etag)
+    CacheMetrics.record_conditional('cache', 'full')
+    return json_response(raw, etag)
+
+
+class ConditionalGetMiddleware:
+    """GET/HEAD 响应的ETag与304（ASGI中间件，流式响应和非JSON响应原样透传）"""
+
+    def __init__(self, app, max_body_bytes: int = MAX_BODY_BYTES):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD'):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = None
+        for name, value in scope['headers']:
+            if name == b'if-none-match':
+                if_none_match = value.decode('latin-1')
+                break
+
+        state = {'start': None, 'mode': 'pass', 'body': []}
+
+        async def send_not_modified(etag: str):
+            headers = [(b'etag', etag.encode('latin-1')), (b'cache-control', CACHE_CONTROL.encode())]
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        async def wrapped_send(message):
+            if message['type'] == 'http.response.start':
+                headers = {name.lower(): value for name, value in message.get('headers', [])}
+                content_type = headers.get(b'content-type', b'')
+                etag = headers.get(b'etag')
+                if message['status'] != 200:
+                    state['mode'] = 'pass'
+                elif etag is not None:
+                    state['mode'] = 'matched' if etag_matches(if_none_match, etag.decode('latin-1')) else 'pass'
+                elif (scope['method'] == 'GET'
+                      and content_type.startswith(b'application/json')
+                      and b'no-store' not in headers.get(b'cache-control', b'')
+                      and int(headers.get(b'content-length', self.max_body_bytes + 1)) <= self.max_body_bytes):
+                    state['mode'] = 'buffer'
+                if state['mode'] == 'matched':
+                    CacheMetrics.record_conditional('middleware', 'not_modified')
+                    await send_not_modified(etag.decode('latin-1'))
+                elif state['mode'] == 'buffer':
+                    state['start'] = message
+                else:
+                    await send(message)
+                return
+
+            if message['type'] != 'http.response.body':
+                await send(message)
+                return
+            if state['mode'] == 'matched':
+                # 304 已发送，丢弃原响应体
+                return
+            if state['mode'] == 'pass':
+                await send(message)
+                return
+
+            state['body'].append(message.get('body', b''))
+            if message.get('more_body', False):
+                return
+            body = b''.join(state['body'])
+            etag = compute_etag(body)
+            if etag_matches(if_none_match, etag):
+                CacheMetrics.record_conditional('middleware', 'not_modified')
+                await send_not_modified(etag)
+                return
+            CacheMetrics.record_conditional('middleware', 'full')
+            start = state['start']
+            headers = list(start.get('headers', []))
+            headers.append((b'etag', etag.encode('latin-1')))
+            if not any(name.lower() == b'cache-control' for name, _ in headers):
+                headers.append((b'cache-control', CACHE_CONTROL.encode()))
+            start['headers'] = headers
+            await send(start)
+            await send({'type': 'http.response.body', 'body': body})
+
+        await self.app(scope, receive, wrapped_send)
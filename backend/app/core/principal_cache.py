@@ -0,0 +1,81 @@
+"""
+认证主体缓存
+每个认证请求都要解码JWT并按用户名查询 users 表，仪表盘一次加载就有十几个请求。
+这里缓存两级：
+- 进程内：token -> 用户信息（同时省去JWT解码），有效期 LOCAL_TTL 秒且不超过token过期时间
+- Redis：按 (sub, iat) 缓存用户信息，所有API进程共享，有效期 PRINCIPAL_TTL 秒
+修改密码、停用用户时调用 invalidate_principal 清除该用户的缓存（其他进程的进程内缓存最多延迟 LOCAL_TTL 秒失效）
+"""
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+from app.core.redis_cache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+# Redis中的用户信息缓存（秒）
+PRINCIPAL_TTL = 60
+# 进程内缓存（秒）
+LOCAL_TTL = 5
+# 进程内最多缓存的token数
+LOCAL_MAX_SIZE = 4096
+
+PRINCIPAL_KEY = 'auth_principal:{sub}:{iat}'
+PRINCIPAL_TAG = 'auth_user:{sub}'
+
+# {token: (principal, expires_at)}
+_local: Dict[str, Tuple[Dict[str, Any], float]] = {}
+_lock = threading.Lock()
+
+
+def get_local(token: str) -> Optional[Dict[str, Any]]:
+    """按token读取进程内缓存（过期返回None）"""
+    entry = _local.get(token)
+    if entry is None:
+        return None
+    principal, expires_at = entry
+    if time.time() >= expires_at:
+        _local.pop(token, None)
+        return None
+    return principal
+
+
+def set_local(token: str, principal: Dict[str, Any], token_exp: Optional[float]):
+    """写入进程内缓存，有效期不超过token本身的过期时间"""
+    expires_at = time.time() + LOCAL_TTL
+    if token_exp:
+        expires_at = min(expires_at, float(token_exp))
+    with _lock:
+        if len(_local) >= LOCAL_MAX_SIZE:
+            now = time.time()
+            for key in [k for k, (_, exp) in _local.items() if exp <= now]:
+                _local.pop(key, None)
+            if len(_local) >= LOCAL_MAX_SIZE:
+                _local.clear()
+        _local[token] = (principal, expires_at)
+
+
+def get_principal(sub: str, iat: Any) -> Optional[Dict[str, Any]]:
+    """读取Redis中缓存的用户信息"""
+    return RedisCache.get(PRINCIPAL_KEY.format(sub=sub, iat=iat or 0))
+
+
+def set_principal(sub: str, iat: Any, principal: Dict[str, Any]):
+    """缓存用户信息到Redis（按用户打标签，便于失效）"""
+    RedisCache.set(
+        PRINCIPAL_KEY.format(sub=sub, iat=iat or 0),
+        principal,
+        ttl=PRINCIPAL_TTL,
+        tags=[PRINCIPAL_TAG.format(sub=sub)]
+    )
+
+
+def invalidate_principal(sub: str):
+    """清除用户的认证缓存（修改密码、停用用户后调用）"""
+    with _lock:
+        for key in [k for k, (p, _) in _local.items() if p.get('username') == sub]:
+            _local.pop(key, None)
+    count = RedisCache.invalidate_tags([PRINCIPAL_TAG.format(sub=sub)])
+    logger.info(f'已清除用户 {sub} 的认证缓存 ({count} 个)')
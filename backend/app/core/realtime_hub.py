@@ -0,0 +1,239 @@
+"""
+实时数据推送
+每个 (实例, 实时接口) 在所有API进程中只有一个轮询者（Redis锁选主），轮询结果交给差异引擎
+（app.core.snapshot_diff.DeltaLog）生成新版本并发布差异；各API进程订阅频道后分发给本进程的
+SSE / WebSocket 连接。VOS的调用量只与实例和接口数有关，与打开的页面数无关；没有订阅者时停止轮询。
+
+轮询者锁：realtime:{instance_id}:{feed}:leader
+"""
+import json
+import time
+import uuid
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Set, Tuple, AsyncIterator
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.redis_cache import get_redis_client
+from app.core.vos_client import VOSClient
+from app.core.snapshot_diff import DeltaLog
+
+logger = logging.getLogger(__name__)
+
+# 推送源：名称 -> VOS接口、轮询间隔（秒）；实体ID字段见 snapshot_diff.DIFF_APIS
+REALTIME_FEEDS: Dict[str, Dict[str, Any]] = {
+    'phones_online': {'api': '/external/server/GetAllPhoneOnline', 'interval': 10},
+    'current_calls': {'api': '/external/server/GetCurrentCall', 'interval': 5},
+    'gateway_mapping_online': {'api': '/external/server/GetGatewayMappingOnline', 'interval': 15},
+    'gateway_routing_online': {'api': '/external/server/GetGatewayRoutingOnline', 'interval': 15},
+}
+
+LEADER_KEY = 'realtime:{instance_id}:{feed}:leader'
+# 无消息时的心跳间隔（秒）
+KEEPALIVE_INTERVAL = 15
+# 每个连接的消息队列长度（慢客户端溢出时丢弃差异，按版本号缺口重新发送快照）
+QUEUE_SIZE = 100
+
+
+def delta_log(instance_id: int, feed: str) -> DeltaLog:
+    return DeltaLog(instance_id, REALTIME_FEEDS[feed]['api'])
+
+
+def load_snapshot(instance_id: int, feed: str) -> Optional[Dict[str, Any]]:
+    """读取最新快照"""
+    return delta_log(instance_id, feed).snapshot()
+
+
+def poll_once(instance_id: int, base_url: str, feed: str) -> Optional[Dict[str, Any]]:
+    """
+    调用一次VOS接口并记录到差异引擎（有变化时由差异引擎发布），在线程池中执行
+
+    Returns:
+        新版本的差异或错误消息；没有变化时返回None
+    """
+    log = delta_log(instance_id, feed)
+    vos = VOSClient(base_url)
+    result = vos.post(REALTIME_FEEDS[feed]['api'], payload={})
+    if not vos.is_success(result):
+        message = {
+            'type': 'error',
+            'instance_id': instance_id,
+            'ts': time.time(),
+            'error': vos.get_error_message(result),
+            'circuit_open': vos.is_circuit_open(result),
+        }
+        client = get_redis_client()
+        if client is not None:
+            client.publish(log.channel, json.dumps(message, ensure_ascii=False))
+        return message
+    return log.record(result)
+
+
+def snapshot_message(instance_id: int, feed: str, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """完整快照消息（新连接、版本号出现缺口或快照重建时发送）"""
+    return {
+        'type': 'snapshot',
+        'instance_id': instance_id,
+        'feed': feed,
+        'version': snapshot['version'],
+        'ts': snapshot['ts'],
+        'count': len(snapshot['items']),
+        'items': snapshot['items'],
+    }
+
+
+class _Feed:
+    """本进程内一个 (实例, 接口) 的订阅：一个频道监听任务 + 一个轮询任务（仅在持有锁时调用VOS）"""
+
+    def __init__(self, hub: 'RealtimeHub', instance_id: int, base_url: str, feed: str):
+        self.hub = hub
+        self.instance_id = instance_id
+        self.base_url = base_url
+        self.feed = feed
+        self.channel = delta_log(instance_id, feed).channel
+        self.leader_key = LEADER_KEY.format(instance_id=instance_id, feed=feed)
+        self.interval = REALTIME_FEEDS[feed]['interval']
+        self.token = uuid.uuid4().hex
+        self.queues: Set[asyncio.Queue] = set()
+        self.tasks = []
+
+    def start(self):
+        self.tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._poll()),
+        ]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        client = await self.hub.client()
+        try:
+            if await client.get(self.leader_key) == self.token:
+                await client.delete(self.leader_key)
+        except Exception as e:
+            logger.warning(f'释放实时轮询锁失败: {e}')
+
+    def dispatch(self, message: Dict[str, Any]):
+        for queue in list(self.queues):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # 慢客户端：丢弃本条差异，订阅方会发现版本号缺口并重新获取快照
+                pass
+
+    async def _listen(self):
+        client = await self.hub.client()
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(self.channel)
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message and message.get('type') == 'message':
+                    self.dispatch(json.loads(message['data']))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f'实时频道订阅失败 {self.channel}: {e}')
+        finally:
+            try:
+                await pubsub.unsubscribe(self.channel)
+                await pubsub.close()
+            except Exception:
+                pass
+
+    async def _is_leader(self, client) -> bool:
+        """抢占或续期轮询者锁（锁过期时间为3个轮询周期，持有进程退出后由其他进程接管）"""
+        ttl = self.interval * 3
+        if await client.set(self.leader_key, self.token, nx=True, ex=ttl):
+            return True
+        if await client.get(self.leader_key) == self.token:
+            await client.expire(self.leader_key, ttl)
+            return True
+        return False
+
+    async def _poll(self):
+        client = await self.hub.client()
+        while True:
+            try:
+                if await self._is_leader(client):
+                    await run_in_threadpool(poll_once, self.instance_id, self.base_url, self.feed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'实时轮询失败 (instance={self.instance_id}, feed={self.feed}): {e}')
+            await asyncio.sleep(self.interval)
+
+
+class RealtimeHub:
+    """本进程的实时推送中心"""
+
+    def __init__(self):
+        self._feeds: Dict[Tuple[int, str], _Feed] = {}
+        self._client = None
+
+    async def client(self):
+        if self._client is None:
+            import redis.asyncio as aioredis
+            self._client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        return self._client
+
+    async def subscribe(self, instance_id: int, base_url: str, feed: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        订阅实时数据：先发送完整快照，之后只发送差异；
+        无消息时每 KEEPALIVE_INTERVAL 秒产生一条 keepalive 消息
+        """
+        key = (instance_id, feed)
+        entry = self._feeds.get(key)
+        if entry is None:
+            entry = _Feed(self, instance_id, base_url, feed)
+            self._feeds[key] = entry
+            entry.start()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        entry.queues.add(queue)
+        try:
+            # 先加入分发再读快照，快照版本之前的差异直接丢弃
+            version = 0
+            snapshot = await run_in_threadpool(load_snapshot, instance_id, feed)
+            if snapshot:
+                version = snapshot['version']
+                yield snapshot_message(instance_id, feed, snapshot)
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield {'type': 'keepalive', 'ts': time.time()}
+                    continue
+                if message.get('type') == 'diff':
+                    if message['version'] <= version:
+                        continue
+                    if message.get('reset') or (version and message['version'] != version + 1):
+                        snapshot = await run_in_threadpool(load_snapshot, instance_id, feed)
+                        if snapshot:
+                            version = snapshot['version']
+                            yield snapshot_message(instance_id, feed, snapshot)
+                            continue
+                    version = message['version']
+                    message = {**message, 'feed': feed}
+                    message.pop('reset', None)
+                yield message
+        finally:
+            entry.queues.discard(queue)
+            if not entry.queues and self._feeds.get(key) is entry:
+                del self._feeds[key]
+                await entry.stop()
+
+
+hub = RealtimeHub()
+
+
+async def sse_stream(request, instance_id: int, base_url: str, feed: str):
+    """把订阅消息编码为SSE（keepalive 编码为注释行）"""
+    async for message in hub.subscribe(instance_id, base_url, feed):
+        if await request.is_disconnected():
+            break
+        if message['type'] == 'keepalive':
+            yield ': keep-alive\n\n'
+        else:
+            yield f"event: {message['type']}\ndata: {json.dumps(message, ensure_ascii=False)}\n\n"
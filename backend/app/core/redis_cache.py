@@ -2,11 +2,13 @@
 Redis缓存工具
 提供快速的内存缓存，用于存储频繁访问的数据
 """
-import json
+import time
 import logging
-from typing import Optional, Any
+from typing import Optional, Any, Iterable, List, Tuple, Union
 import redis
 from app.core.config import settings
+from app.core.cache_metrics import CacheMetrics
+from app.core.fast_json import dumps, loads
 
 logger = logging.getLogger(__name__)
 
@@ -28,37 +30,180 @@ def get_redis_client() -> Optional[redis.Redis]:
     return _redis_client
 
 
+# 缓存内容哈希（ETag）键后缀：{key}:etag，与缓存同TTL、同标签，按前缀删除时一并删除
+ETAG_SUFFIX = ':etag'
+
+# 标签集合键前缀：cache_tag:{tag} -> 带有该标签的缓存键集合
+TAG_KEY_PREFIX = 'cache_tag:'
+# 标签集合的最短保留时间（秒），避免长TTL缓存的标签先于缓存本身过期
+TAG_SET_MIN_TTL = 86400
+# SCAN MATCH 模式中的通配字符（按前缀删除时转义，前缀只按字面匹配）
+_GLOB_CHARS = ('\\', '*', '?', '[', ']')
+
+
+def escape_glob(value: str) -> str:
+    """转义Redis MATCH模式中的通配字符"""
+    for char in _GLOB_CHARS:
+        value = value.replace(char, '\\' + char)
+    return value
+
+
+class CacheTags:
+    """
+    缓存标签命名
+    
+    标签之间是并集关系：按标签失效时，所有带该标签的缓存都会被清除。
+    需要"某实例的某类数据"时使用组合标签（如 instance:3:entity:customer）。
+    """
+    
+    # 业务实体
+    CUSTOMER = 'customer'
+    GATEWAY = 'gateway'
+    PHONE = 'phone'
+    FEE_RATE = 'fee_rate'
+    SUITE = 'suite'
+    STATISTICS = 'statistics'
+    HEALTH = 'health'
+    ACCOUNT_REPORT = 'account_report'
+    
+    @staticmethod
+    def instance(instance_id: int) -> str:
+        return f'instance:{instance_id}'
+    
+    @staticmethod
+    def api(api_name: str) -> str:
+        return f'api:{api_name}'
+    
+    @staticmethod
+    def entity(entity: str) -> str:
+        return f'entity:{entity}'
+    
+    @staticmethod
+    def instance_api(instance_id: int, api_name: str) -> str:
+        return f'instance:{instance_id}:api:{api_name}'
+    
+    @staticmethod
+    def instance_entity(instance_id: int, entity: str) -> str:
+        return f'instance:{instance_id}:entity:{entity}'
+    
+    @staticmethod
+    def summary(entity: str) -> str:
+        """跨实例的汇总缓存（如仪表盘统计），任一实例的该类数据变化都应使其失效"""
+        return f'summary:{entity}'
+
+
 class RedisCache:
     """Redis缓存工具类"""
     
     @staticmethod
     def get(key: str) -> Optional[Any]:
         """从Redis获取数据"""
+        start = time.perf_counter()
         try:
             client = get_redis_client()
             if client is None:
                 return None
             data = client.get(key)
+            CacheMetrics.record_redis_op('get', 'hit' if data else 'miss', time.perf_counter() - start, key=key)
             if data:
-                return json.loads(data)
+                return loads(data)
             return None
         except Exception as e:
+            CacheMetrics.record_redis_op('get', 'error', time.perf_counter() - start)
             logger.error(f"Redis获取数据失败 {key}: {e}")
             return None
     
     @staticmethod
-    def set(key: str, value: Any, ttl: int = 300) -> bool:
-        """设置Redis缓存（默认5分钟）"""
+    def mget(keys: List[str]) -> List[Optional[Any]]:
+        """批量获取Redis缓存（一次MGET），返回与 keys 顺序一致的列表，未命中为None"""
+        if not keys:
+            return []
+        start = time.perf_counter()
+        try:
+            client = get_redis_client()
+            if client is None:
+                return [None] * len(keys)
+            values = client.mget(keys)
+            latency = time.perf_counter() - start
+            results = []
+            for key, value in zip(keys, values):
+                CacheMetrics.record_redis_op('get', 'hit' if value else 'miss', latency / len(keys), key=key)
+                results.append(loads(value) if value else None)
+            return results
+        except Exception as e:
+            CacheMetrics.record_redis_op('get', 'error', time.perf_counter() - start)
+            logger.error(f"Redis批量获取数据失败 ({len(keys)} keys): {e}")
+            return [None] * len(keys)
+    
+    @staticmethod
+    def set(key: str, value: Any, ttl: int = 300, tags: Optional[Iterable[str]] = None) -> bool:
+        """
+        设置Redis缓存（默认5分钟）
+        
+        Args:
+            tags: 缓存标签，可通过 invalidate_tags 按标签批量失效
+        """
+        return RedisCache.set_raw(key, dumps(value), ttl=ttl, tags=tags)
+    
+    @staticmethod
+    def set_raw(key: str, raw: Union[str, bytes], ttl: int = 300, tags: Optional[Iterable[str]] = None,
+                etag: Optional[str] = None) -> bool:
+        """
+        写入已编码的JSON
+        
+        Args:
+            etag: 内容哈希，与缓存同TTL、同标签写入 {key}:etag（条件请求只读这个小键）
+        """
+        start = time.perf_counter()
         try:
             client = get_redis_client()
             if client is None:
                 return False
-            client.setex(key, ttl, json.dumps(value, ensure_ascii=False))
+            keys = [key] if etag is None else [key, f'{key}{ETAG_SUFFIX}']
+            pipe = client.pipeline(transaction=False)
+            pipe.setex(key, ttl, raw)
+            if etag is not None:
+                pipe.setex(keys[1], ttl, etag)
+            for tag in tags or ():
+                tag_key = f'{TAG_KEY_PREFIX}{tag}'
+                pipe.sadd(tag_key, *keys)
+                pipe.expire(tag_key, max(ttl, TAG_SET_MIN_TTL))
+            pipe.execute()
+            CacheMetrics.record_redis_op('set', 'ok', time.perf_counter() - start)
             return True
         except Exception as e:
+            CacheMetrics.record_redis_op('set', 'error', time.perf_counter() - start)
             logger.error(f"Redis设置数据失败 {key}: {e}")
             return False
     
+    @staticmethod
+    def get_raw(key: str) -> Tuple[Optional[str], Optional[str]]:
+        """读取未解码的JSON字符串及其ETag（一次MGET），返回 (内容, ETag)，未命中为 (None, None)"""
+        start = time.perf_counter()
+        try:
+            client = get_redis_client()
+            if client is None:
+                return None, None
+            raw, etag = client.mget([key, f'{key}{ETAG_SUFFIX}'])
+            CacheMetrics.record_redis_op('get', 'hit' if raw else 'miss', time.perf_counter() - start, key=key)
+            return (raw, etag) if raw else (None, None)
+        except Exception as e:
+            CacheMetrics.record_redis_op('get', 'error', time.perf_counter() - start)
+            logger.error(f"Redis获取数据失败 {key}: {e}")
+            return None, None
+    
+    @staticmethod
+    def get_etag(key: str) -> Optional[str]:
+        """只读取缓存的ETag（条件请求命中时不读取内容）"""
+        try:
+            client = get_redis_client()
+            if client is None:
+                return None
+            return client.get(f'{key}{ETAG_SUFFIX}')
+        except Exception as e:
+            logger.error(f"Redis获取ETag失败 {key}: {e}")
+            return None
+    
     @staticmethod
     def delete(key: str) -> bool:
         """删除Redis缓存"""
@@ -66,7 +211,7 @@ class RedisCache:
             client = get_redis_client()
             if client is None:
                 return False
-            client.delete(key)
+            client.delete(key, f'{key}{ETAG_SUFFIX}')
             return True
         except Exception as e:
             logger.error(f"Redis删除数据失败 {key}: {e}")
@@ -84,3 +229,89 @@ class RedisCache:
             logger.error(f"Redis检查key失败 {key}: {e}")
             return False
 
+
+    @staticmethod
+    def invalidate_tags(tags: Iterable[str]) -> int:
+        """
+        按标签失效缓存：删除所有带有任一标签的缓存键
+        
+        Returns:
+            删除的缓存键数量
+        """
+        try:
+            client = get_redis_client()
+            if client is None:
+                return 0
+            tags = list(tags)
+            tag_keys = [f'{TAG_KEY_PREFIX}{tag}' for tag in tags]
+            if not tag_keys:
+                return 0
+            pipe = client.pipeline(transaction=False)
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            keys = set()
+            for members in pipe.execute():
+                keys.update(members)
+            count = client.delete(*keys) if keys else 0
+            client.delete(*tag_keys)
+            return count
+        except Exception as e:
+            logger.error(f"Redis按标签失效缓存失败 {tags}: {e}")
+            return 0
+    
+    @staticmethod
+    def prune_tag_sets(batch_size: int = 500) -> int:
+        """
+        清理标签集合中已过期（或已删除）的缓存键：缓存键按TTL过期后不会自动从标签集合移除，
+        经常写入的标签集合会一直续期，需要定期清理
+
+        Returns:
+            移除的成员数量
+        """
+        try:
+            client = get_redis_client()
+            if client is None:
+                return 0
+            removed = 0
+            for tag_key in client.scan_iter(match=f'{escape_glob(TAG_KEY_PREFIX)}*', count=batch_size):
+                batch = []
+                for member in client.sscan_iter(tag_key, count=batch_size):
+                    batch.append(member)
+                    if len(batch) >= batch_size:
+                        removed += RedisCache._prune_members(client, tag_key, batch)
+                        batch = []
+                if batch:
+                    removed += RedisCache._prune_members(client, tag_key, batch)
+            return removed
+        except Exception as e:
+            logger.error(f"Redis清理标签集合失败: {e}")
+            return 0
+
+    @staticmethod
+    def _prune_members(client, tag_key: str, members: List[str]) -> int:
+        pipe = client.pipeline(transaction=False)
+        for member in members:
+            pipe.exists(member)
+        missing = [member for member, exists in zip(members, pipe.execute()) if not exists]
+        return client.srem(tag_key, *missing) if missing else 0
+
+    @staticmethod
+    def delete_prefix(prefix: str, batch_size: int = 500) -> int:
+        """删除所有以 prefix 开头的缓存键（使用SCAN，不阻塞Redis）"""
+        try:
+            client = get_redis_client()
+            if client is None:
+                return 0
+            count = 0
+            batch = []
+            for key in client.scan_iter(match=f'{escape_glob(prefix)}*', count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    count += client.delete(*batch)
+                    batch = []
+            if batch:
+                count += client.delete(*batch)
+            return count
+        except Exception as e:
+            logger.error(f"Redis按前缀删除缓存失败 {prefix}: {e}")
+            return 0
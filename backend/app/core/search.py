@@ -0,0 +1,175 @@
+"""
+客户 / 网关 / 话机的跨实例搜索
+基于 0025 迁移的两类索引，保证每次查询只从索引中按顺序取前 limit 条，不对全部命中行排序：
+- 关键字不少于3个字符：ILIKE '%关键字%' 过滤，按三元组距离（<->）排序，走 GiST 索引的 KNN 扫描
+  （GIN 无法按顺序返回，ORDER BY 相似度 + LIMIT 会先取出并排序所有命中行，'138' 这类关键字命中数十万行）
+- 更短的关键字：只按前缀匹配，lower(列) 落在 [前缀, 前缀的后继) 区间内，走 lower(列) text_pattern_ops 索引
+取回的前 limit 条再按 完全匹配 → 前缀匹配 → 距离 → 长度 排序
+三类搜索用各自的会话并发执行，共享一个时间预算，超时的类型返回空结果并在 incomplete 中列出
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, literal, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.customer import Customer
+from app.models.gateway import Gateway
+from app.models.phone_enhanced import PhoneEnhanced
+from app.models.vos_instance import VOSInstance
+
+logger = logging.getLogger(__name__)
+
+# 子串匹配所需的最短关键字长度（pg_trgm 按三元组索引）
+MIN_SUBSTRING_LENGTH = 3
+SEARCH_TYPES = ('customer', 'gateway', 'phone')
+# 一次搜索（所有类型并发）的时间预算
+SEARCH_TIME_BUDGET_MS = 100
+
+
+def escape_like(value: str) -> str:
+    """转义 LIKE 模式中的通配符（与 escape='\\' 一起使用）"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def prefix_upper_bound(prefix: str) -> str:
+    """
+    前缀区间的上界（不含）：最后一个字符的码位加一
+    text_pattern_ops 按字节比较，UTF-8 字节序与码位序一致，
+    [prefix, 上界) 恰好是所有以 prefix 开头的字符串
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def rank_key(value: str, keyword: str, distance: float = 0.0) -> Tuple[int, float, int, str]:
+    """结果排序键：完全匹配 → 前缀匹配 → 三元组距离 → 长度 → 值"""
+    lowered = value.lower()
+    kw = keyword.lower()
+    if lowered == kw:
+        match = 0
+    elif lowered.startswith(kw):
+        match = 1
+    else:
+        match = 2
+    return match, distance, len(value), value
+
+
+def build_search_stmt(column, extra_columns, keyword: str, instance_id: Optional[int], limit: int):
+    """构造单类搜索语句（按关键字长度选择 KNN 子串匹配或前缀区间匹配）"""
+    model = column.class_
+    if len(keyword) >= MIN_SUBSTRING_LENGTH:
+        distance = column.op('<->')(literal(keyword))
+        stmt = (
+            select(column.label('value'), *extra_columns, distance.label('distance'),
+                   VOSInstance.id.label('instance_id'), VOSInstance.name.label('instance_name'))
+            .where(column.ilike('%' + escape_like(keyword) + '%', escape='\\'))
+            .order_by(distance)
+        )
+    else:
+        prefix = keyword.lower()
+        lowered = func.lower(column)
+        stmt = (
+            select(column.label('value'), *extra_columns, literal(0.0).label('distance'),
+                   VOSInstance.id.label('instance_id'), VOSInstance.name.label('instance_name'))
+            .where(lowered.op('~>=~')(prefix), lowered.op('~<~')(prefix_upper_bound(prefix)))
+            .order_by(lowered)
+        )
+    stmt = stmt.join(VOSInstance, VOSInstance.id == model.vos_instance_id).limit(limit)
+    if instance_id is not None:
+        stmt = stmt.where(model.vos_instance_id == instance_id)
+    return stmt
+
+
+def rank_rows(rows: Iterable[Dict[str, Any]], keyword: str) -> List[Dict[str, Any]]:
+    """按 rank_key 排序，去掉内部的 distance 列"""
+    ranked = sorted(rows, key=lambda r: rank_key(r['value'], keyword, float(r['distance'] or 0.0)))
+    for row in ranked:
+        row.pop('distance', None)
+    return ranked
+
+
+async def _search(db: AsyncSession, column, extra_columns, keyword: str,
+                  instance_id: Optional[int], limit: int) -> List[Dict[str, Any]]:
+    stmt = build_search_stmt(column, extra_columns, keyword, instance_id, limit)
+    rows = [dict(row._mapping) for row in (await db.execute(stmt)).all()]
+    return rank_rows(rows, keyword)
+
+
+async def search_customers(db: AsyncSession, keyword: str, instance_id: Optional[int] = None,
+                           limit: int = 20) -> List[Dict[str, Any]]:
+    return await _search(
+        db, Customer.account,
+        [Customer.money, Customer.limit_money.label('limitMoney'), Customer.is_in_debt],
+        keyword, instance_id, limit
+    )
+
+
+async def search_gateways(db: AsyncSession, keyword: str, instance_id: Optional[int] = None,
+                          limit: int = 20) -> List[Dict[str, Any]]:
+    return await _search(
+        db, Gateway.gateway_name,
+        [Gateway.gateway_type, Gateway.is_online, Gateway.account],
+        keyword, instance_id, limit
+    )
+
+
+async def search_phones(db: AsyncSession, keyword: str, instance_id: Optional[int] = None,
+                        limit: int = 20) -> List[Dict[str, Any]]:
+    return await _search(
+        db, PhoneEnhanced.e164,
+        [PhoneEnhanced.account, PhoneEnhanced.is_online],
+        keyword, instance_id, limit
+    )
+
+
+SEARCHERS = {
+    'customer': ('customers', search_customers),
+    'gateway': ('gateways', search_gateways),
+    'phone': ('phones', search_phones),
+}
+
+
+async def _run_search(session_factory: Callable[[], AsyncSession], search_type: str, keyword: str,
+                      instance_id: Optional[int], limit: int, budget_ms: int) -> List[Dict[str, Any]]:
+    """单类搜索使用独立会话（同一会话不能并发执行），数据库侧也按预算设置语句超时"""
+    _, searcher = SEARCHERS[search_type]
+    async with session_factory() as db:
+        await db.execute(text(f'SET LOCAL statement_timeout = {int(budget_ms)}'))
+        return await searcher(db, keyword, instance_id=instance_id, limit=limit)
+
+
+async def search_all(session_factory: Callable[[], AsyncSession], keyword: str, types: Iterable[str],
+                     instance_id: Optional[int] = None, limit: int = 20,
+                     budget_ms: int = SEARCH_TIME_BUDGET_MS) -> Dict[str, Any]:
+    """
+    并发搜索多个类型，共享 budget_ms 的时间预算
+    返回 {'customers': [...], 'gateways': [...], 'phones': [...], 'incomplete': [超时或失败的类型]}
+    """
+    tasks = {
+        search_type: asyncio.ensure_future(
+            _run_search(session_factory, search_type, keyword, instance_id, limit, budget_ms)
+        )
+        for search_type in SEARCH_TYPES if search_type in types
+    }
+    result: Dict[str, Any] = {}
+    incomplete: List[str] = []
+    if tasks:
+        _, pending = await asyncio.wait(tasks.values(), timeout=budget_ms / 1000)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    for search_type, task in tasks.items():
+        key, _ = SEARCHERS[search_type]
+        if task.cancelled():
+            result[key] = []
+            incomplete.append(search_type)
+        elif task.exception() is not None:
+            logger.warning(f'搜索 "{keyword}" 的 {search_type} 查询失败: {task.exception()}')
+            result[key] = []
+            incomplete.append(search_type)
+        else:
+            result[key] = task.result()
+    result['incomplete'] = incomplete
+    return result
@@ -0,0 +1,244 @@
+"""
+快照差异计算
+把VOS列表类接口的响应按实体ID建索引，与上一次快照比较得到 新增/删除/变化 三部分，
+实时推送和 ?since=<version> 查询只返回差异而不是整份列表
+
+每个 (实例, 接口) 在Redis中保存最新快照、版本号和最近 RING_SIZE 个差异（环形缓冲）：
+- vos_delta:{instance_id}:{api_name}:snapshot  {version, ts, items: {实体ID: 实体}}
+- vos_delta:{instance_id}:{api_name}:version   当前版本号（快照过期后继续递增）
+- vos_delta:{instance_id}:{api_name}:log       差异列表（LPUSH，最新在前，LTRIM 到 RING_SIZE）
+- vos_delta:{instance_id}:{api_name}:channel   新差异的 pub/sub 频道
+"""
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Any, List, Iterable, Optional
+
+from app.core.redis_cache import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# 支持差异的接口：API路径 -> (响应列表字段, 实体ID字段)
+DIFF_APIS: Dict[str, Dict[str, tuple]] = {
+    '/external/server/GetAllPhoneOnline': {
+        'list_keys': ('infoPhoneOnlines', 'phones'),
+        'id_fields': ('e164', 'E164'),
+    },
+    '/external/server/GetCurrentCall': {
+        'list_keys': ('infoCurrentCalls', 'currentCalls'),
+        'id_fields': ('callId', 'id', 'sessionId'),
+    },
+    '/external/server/GetGatewayMappingOnline': {
+        'list_keys': ('infoGatewayMappingsOnline',),
+        'id_fields': ('name',),
+    },
+    '/external/server/GetGatewayRoutingOnline': {
+        'list_keys': ('infoGatewayRoutingsOnline',),
+        'id_fields': ('name',),
+    },
+}
+
+# 保留的差异个数
+RING_SIZE = 120
+# 快照与差异的保留时间（秒）
+DELTA_TTL = 3600
+
+
+def extract_items(result: Dict[str, Any], list_keys: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """从VOS响应中取出实体列表（优先使用已知字段，否则取第一个列表字段）"""
+    if not isinstance(result, dict):
+        return []
+    for key in list_keys:
+        items = result.get(key)
+        if isinstance(items, list):
+            return items
+    for value in result.values():
+        if isinstance(value, list):
+            return value
+    return []
+
+
+def entity_id(item: Dict[str, Any], id_fields: Iterable[str]) -> str:
+    """实体ID：第一个非空的ID字段；没有ID字段时使用内容哈希（内容变化表现为删除+新增）"""
+    for field in id_fields:
+        value = item.get(field)
+        if value not in (None, ''):
+            return str(value)
+    raw = json.dumps(item, sort_keys=True, ensure_ascii=False, default=str)
+    return 'h:' + hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def index_items(items: List[Dict[str, Any]], id_fields: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """按实体ID建索引（ID重复时保留最后一个）"""
+    id_fields = tuple(id_fields)
+    return {entity_id(item, id_fields): item for item in items if isinstance(item, dict)}
+
+
+def diff_snapshots(previous: Optional[Dict[str, Dict[str, Any]]],
+                   current: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    比较两个按实体ID索引的快照
+
+    Returns:
+        {'added': {id: item}, 'removed': [id], 'changed': {id: item}}
+    """
+    previous = previous or {}
+    added = {key: item for key, item in current.items() if key not in previous}
+    removed = [key for key in previous if key not in current]
+    changed = {
+        key: item for key, item in current.items()
+        if key in previous and previous[key] != item
+    }
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+def is_empty(diff: Dict[str, Any]) -> bool:
+    """差异是否为空"""
+    return not (diff['added'] or diff['removed'] or diff['changed'])
+
+
+def is_unfiltered(params: Optional[Dict[str, Any]]) -> bool:
+    """是否为不带过滤条件的全量查询（只有全量查询的结果参与版本化）"""
+    return not params or all(not value for value in params.values())
+
+
+def compose(deltas: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """按版本顺序合并多个差异为一个（相对于第一个差异之前的快照）"""
+    added: Dict[str, Any] = {}
+    changed: Dict[str, Any] = {}
+    removed: set = set()
+    for delta in deltas:
+        for key in delta['removed']:
+            if key in added:
+                del added[key]
+            else:
+                changed.pop(key, None)
+                removed.add(key)
+        for key, item in delta['added'].items():
+            if key in removed:
+                removed.discard(key)
+                changed[key] = item
+            else:
+                added[key] = item
+        for key, item in delta['changed'].items():
+            if key in added:
+                added[key] = item
+            else:
+                changed[key] = item
+    return {'added': added, 'removed': sorted(removed), 'changed': changed}
+
+
+class DeltaLog:
+    """单个 (实例, 接口) 的版本化快照与差异环形缓冲"""
+
+    def __init__(self, vos_instance_id: int, api_path: str):
+        self.vos_instance_id = vos_instance_id
+        self.api_path = api_path
+        self.config = DIFF_APIS[api_path]
+        prefix = f"vos_delta:{vos_instance_id}:{api_path.strip('/').split('/')[-1]}"
+        self.snapshot_key = f'{prefix}:snapshot'
+        self.version_key = f'{prefix}:version'
+        self.log_key = f'{prefix}:log'
+        self.channel = f'{prefix}:channel'
+
+    @staticmethod
+    def supports(api_path: str, params: Optional[Dict[str, Any]] = None) -> bool:
+        return api_path in DIFF_APIS and is_unfiltered(params)
+
+    def record(self, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        记录一次全量结果：与当前快照比较，有变化时生成新版本（WATCH快照键，并发写入时重试），
+        并把差异发布到频道
+
+        Returns:
+            新版本的差异消息 {version, ts, count, added, removed, changed}；没有变化时返回None
+        """
+        client = get_redis_client()
+        if client is None:
+            return None
+        current = index_items(extract_items(result, self.config['list_keys']), self.config['id_fields'])
+
+        def apply(pipe):
+            raw = pipe.get(self.snapshot_key)
+            previous = json.loads(raw) if raw else None
+            diff = diff_snapshots(previous['items'] if previous else None, current)
+            if previous is not None and is_empty(diff):
+                pipe.multi()
+                pipe.expire(self.snapshot_key, DELTA_TTL)
+                pipe.expire(self.log_key, DELTA_TTL)
+                return None
+            version = int(pipe.get(self.version_key) or 0) + 1
+            now = time.time()
+            delta = {'version': version, 'ts': now, 'count': len(current), **diff}
+            pipe.multi()
+            if previous is None:
+                # 没有基准快照（首次或已过期）：旧差异无法衔接，清空后从完整快照重新开始
+                pipe.delete(self.log_key)
+            pipe.set(self.version_key, version)
+            pipe.setex(self.snapshot_key, DELTA_TTL,
+                       json.dumps({'version': version, 'ts': now, 'items': current}, ensure_ascii=False))
+            if previous is not None:
+                pipe.lpush(self.log_key, json.dumps(delta, ensure_ascii=False))
+                pipe.ltrim(self.log_key, 0, RING_SIZE - 1)
+                pipe.expire(self.log_key, DELTA_TTL)
+            # reset：订阅方无法在旧版本上应用该差异，需要重新获取完整快照
+            pipe.publish(self.channel, json.dumps(
+                {'type': 'diff', 'instance_id': self.vos_instance_id, 'reset': previous is None, **delta},
+                ensure_ascii=False
+            ))
+            return delta
+
+        try:
+            return client.transaction(apply, self.snapshot_key, value_from_callable=True)
+        except Exception as e:
+            logger.warning(f'记录快照差异失败: {self.snapshot_key}, {e}')
+            return None
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """当前快照 {version, ts, items}"""
+        client = get_redis_client()
+        if client is None:
+            return None
+        try:
+            raw = client.get(self.snapshot_key)
+        except Exception as e:
+            logger.warning(f'读取快照失败: {self.snapshot_key}, {e}')
+            return None
+        return json.loads(raw) if raw else None
+
+    def since(self, version: int) -> Optional[Dict[str, Any]]:
+        """
+        从 version 到当前版本的合并差异
+
+        Returns:
+            {version, since, count, added, removed, changed}；
+            version 早于环形缓冲中最旧的差异（或快照不存在）时返回None，调用方应返回完整快照
+        """
+        client = get_redis_client()
+        if client is None:
+            return None
+        try:
+            pipe = client.pipeline()
+            pipe.get(self.snapshot_key)
+            pipe.lrange(self.log_key, 0, -1)
+            raw_snapshot, raw_log = pipe.execute()
+        except Exception as e:
+            logger.warning(f'读取快照差异失败: {self.log_key}, {e}')
+            return None
+        if not raw_snapshot:
+            return None
+        snapshot = json.loads(raw_snapshot)
+        current = snapshot['version']
+        if version > current or version <= 0:
+            return None
+        deltas = [json.loads(item) for item in reversed(raw_log)]
+        pending = [delta for delta in deltas if delta['version'] > version]
+        if len(pending) != current - version:
+            return None
+        return {
+            'version': current,
+            'since': version,
+            'count': len(snapshot['items']),
+            **compose(pending),
+        }
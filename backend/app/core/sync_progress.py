@@ -0,0 +1,279 @@
+"""
+话单同步进度
+每个同步任务写自己的Redis哈希（HSET/HINCRBY，无读-改-写，并行任务互不覆盖），
+本轮同步的元信息和已完成任务数写在运行哈希中，读取时汇总所有任务并计算吞吐量和预计剩余时间
+
+Redis结构：
+- cdr_sync:run            status, total_tasks, completed_tasks, instances_count, days, start_time, message
+- cdr_sync:tasks          本轮所有任务ID（集合）
+- cdr_sync:task:{task_id} instance, instance_id, sync_date, status, total_customers, customer_index,
+                          current_customer, synced_customers, synced_cdrs, started_at, updated_at
+"""
+import json
+import time
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+from app.core.redis_cache import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+RUN_KEY = 'cdr_sync:run'
+TASKS_KEY = 'cdr_sync:tasks'
+TASK_KEY = 'cdr_sync:task:{task_id}'
+# 进度保留时间（秒），多天同步可能持续较长时间
+PROGRESS_TTL = 3600 * 2
+
+# SSE推送间隔与心跳（秒）
+STREAM_INTERVAL = 1.0
+STREAM_HEARTBEAT = 15.0
+
+
+def _current_task_id() -> str:
+    """当前Celery任务ID（非任务上下文时生成一个）"""
+    from celery import current_task
+    request = getattr(current_task, 'request', None)
+    return getattr(request, 'id', None) or uuid.uuid4().hex
+
+
+def start_run(total_tasks: int, instances_count: int = 1, days: int = 1, message: Optional[str] = None):
+    """开始新一轮同步：清除上一轮的进度并写入总任务数"""
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        old_tasks = client.smembers(TASKS_KEY)
+        pipe = client.pipeline()
+        if old_tasks:
+            pipe.delete(*[TASK_KEY.format(task_id=task_id) for task_id in old_tasks])
+        pipe.delete(RUN_KEY, TASKS_KEY)
+        pipe.hset(RUN_KEY, mapping={
+            'status': 'task_created',
+            'total_tasks': total_tasks,
+            'completed_tasks': 0,
+            'instances_count': instances_count,
+            'days': days,
+            'start_time': datetime.now().isoformat(),
+            'started_ts': time.time(),
+            'message': message or f'已创建{total_tasks}个同步任务，正在按计划执行...',
+        })
+        pipe.expire(RUN_KEY, PROGRESS_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f'初始化同步进度失败: {e}')
+
+
+def clear_run():
+    """清除同步进度（创建任务失败时）"""
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        old_tasks = client.smembers(TASKS_KEY)
+        keys = [TASK_KEY.format(task_id=task_id) for task_id in old_tasks]
+        client.delete(RUN_KEY, TASKS_KEY, *keys)
+    except Exception as e:
+        logger.warning(f'清除同步进度失败: {e}')
+
+
+class TaskProgress:
+    """单个同步任务（一个实例的一天）的进度"""
+
+    def __init__(self, instance_id: int, instance_name: str, sync_date: str,
+                 total_customers: int, task_id: Optional[str] = None):
+        self.task_id = task_id or _current_task_id()
+        self.key = TASK_KEY.format(task_id=self.task_id)
+        self.client = get_redis_client()
+        now = time.time()
+        self._write(lambda pipe: (
+            pipe.sadd(TASKS_KEY, self.task_id),
+            pipe.expire(TASKS_KEY, PROGRESS_TTL),
+            pipe.hset(self.key, mapping={
+                'instance': instance_name,
+                'instance_id': instance_id,
+                'sync_date': sync_date,
+                'status': 'syncing',
+                'total_customers': total_customers,
+                'customer_index': 0,
+                'synced_customers': 0,
+                'synced_cdrs': 0,
+                'started_at': now,
+                'updated_at': now,
+            }),
+            pipe.expire(self.key, PROGRESS_TTL),
+            # 第一个开始执行的任务把本轮状态切换为同步中
+            pipe.hset(RUN_KEY, 'status', 'syncing'),
+            pipe.expire(RUN_KEY, PROGRESS_TTL),
+        ))
+
+    def _write(self, callback):
+        if self.client is None:
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            callback(pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f'更新同步进度失败: {e}')
+
+    def customer_started(self, index: int, account: str):
+        """开始处理第 index 个客户"""
+        self._write(lambda pipe: pipe.hset(self.key, mapping={
+            'customer_index': index,
+            'current_customer': account,
+            'updated_at': time.time(),
+        }))
+
+    def customer_done(self, cdr_count: int = 0):
+        """一个客户处理完成（计数原子递增）"""
+        self._write(lambda pipe: (
+            pipe.hincrby(self.key, 'synced_customers', 1),
+            pipe.hincrby(self.key, 'synced_cdrs', cdr_count),
+            pipe.hset(self.key, 'updated_at', time.time()),
+        ))
+
+    def finish(self, status: str = 'completed'):
+        """任务结束（成功或失败都计入已完成任务数）"""
+        if self.client is None:
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hset(self.key, mapping={'status': status, 'updated_at': time.time()})
+            pipe.hincrby(RUN_KEY, 'completed_tasks', 1)
+            pipe.hget(RUN_KEY, 'total_tasks')
+            _, _, completed, total = pipe.execute()
+            # 没有通过 start_run 登记总任务数的单个任务，结束即完成
+            if not total or completed >= int(total):
+                self.client.hset(RUN_KEY, mapping={
+                    'status': 'completed',
+                    'message': f'所有同步任务已完成（共{total or completed}个任务）',
+                    'finished_ts': time.time(),
+                })
+        except Exception as e:
+            logger.warning(f'更新同步进度失败: {e}')
+
+
+def snapshot() -> Optional[Dict[str, Any]]:
+    """
+    汇总本轮同步进度（没有进行中的同步时返回None）
+
+    吞吐量按本轮开始以来已处理的客户数/话单数计算；
+    预计剩余时间 = 剩余客户数 / 客户吞吐量（未开始的任务按已开始任务的平均客户数估算）
+    """
+    client = get_redis_client()
+    if client is None:
+        raise RuntimeError('Redis不可用')
+    run = client.hgetall(RUN_KEY)
+    if not run:
+        return None
+    task_ids = sorted(client.smembers(TASKS_KEY))
+    pipe = client.pipeline(transaction=False)
+    for task_id in task_ids:
+        pipe.hgetall(TASK_KEY.format(task_id=task_id))
+    tasks = [t for t in pipe.execute() if t] if task_ids else []
+
+    total_tasks = int(run.get('total_tasks') or 0)
+    completed_tasks = int(run.get('completed_tasks') or 0)
+    status = run.get('status', 'unknown')
+
+    synced_customers = sum(int(t.get('synced_customers') or 0) for t in tasks)
+    synced_cdrs = sum(int(t.get('synced_cdrs') or 0) for t in tasks)
+    started_customers = sum(int(t.get('total_customers') or 0) for t in tasks)
+    running: List[Dict[str, Any]] = [t for t in tasks if t.get('status') == 'syncing']
+
+    # 吞吐量：从第一个任务开始执行算起（countdown等待时间不计入）
+    first_start = min((float(t['started_at']) for t in tasks if t.get('started_at')), default=None)
+    end_ts = float(run['finished_ts']) if run.get('finished_ts') else time.time()
+    elapsed = max(end_ts - first_start, 0.001) if first_start else 0
+    customers_per_second = round(synced_customers / elapsed, 3) if elapsed else 0
+    cdrs_per_second = round(synced_cdrs / elapsed, 1) if elapsed else 0
+
+    # 剩余客户数：已开始任务的剩余 + 未开始任务按平均客户数估算
+    not_started = max(total_tasks - len(tasks), 0)
+    avg_customers = started_customers / len(tasks) if tasks else 0
+    remaining_customers = max(started_customers - synced_customers, 0) + not_started * avg_customers
+    eta_seconds = None
+    if status == 'completed':
+        eta_seconds = 0
+    elif customers_per_second > 0:
+        eta_seconds = round(remaining_customers / customers_per_second)
+
+    # 进度百分比：已完成任务 + 进行中任务的客户进度
+    if status == 'completed':
+        progress_percent = 100
+    elif total_tasks > 0:
+        partial = sum(
+            int(t.get('synced_customers') or 0) / max(int(t.get('total_customers') or 1), 1)
+            for t in running
+        )
+        progress_percent = min(round((completed_tasks + partial) / total_tasks * 100, 1), 100)
+    else:
+        progress_percent = 0
+
+    current = max(running, key=lambda t: float(t.get('updated_at') or 0)) if running else {}
+    return {
+        'status': status,
+        'is_syncing': status != 'completed',
+        'current_instance': current.get('instance'),
+        'current_instance_id': int(current['instance_id']) if current.get('instance_id') else None,
+        'current_customer': current.get('current_customer'),
+        'current_customer_index': int(current['customer_index']) if current.get('customer_index') else None,
+        'total_customers': int(current['total_customers']) if current.get('total_customers') else None,
+        'sync_date': current.get('sync_date'),
+        'synced_count': synced_cdrs,
+        'synced_customers': synced_customers,
+        'start_time': run.get('start_time'),
+        'progress_percent': progress_percent,
+        'total_tasks': total_tasks,
+        'completed_tasks': completed_tasks,
+        'running_tasks': len(running),
+        'instances_count': int(run.get('instances_count') or 0),
+        'days': int(run.get('days') or 0),
+        'customers_per_second': customers_per_second,
+        'cdrs_per_second': cdrs_per_second,
+        'eta_seconds': eta_seconds,
+        'message': run.get('message'),
+    }
+
+
+def progress_response() -> Dict[str, Any]:
+    """进度接口的响应体"""
+    progress = snapshot()
+    if progress is None:
+        return {
+            'success': True,
+            'is_syncing': False,
+            'message': '当前没有正在进行的同步任务'
+        }
+    return {'success': True, **progress}
+
+
+async def event_stream(request):
+    """
+    SSE 推送同步进度：进度变化时推送一次，空闲时定期发送心跳注释；
+    同步结束（或没有进行中的同步）时推送最后一次后关闭
+    """
+    from starlette.concurrency import run_in_threadpool
+
+    last_payload = None
+    last_sent = 0.0
+    while not await request.is_disconnected():
+        try:
+            data = await run_in_threadpool(progress_response)
+        except Exception as e:
+            logger.warning(f'读取同步进度失败: {e}')
+            data = {'success': False, 'error': str(e), 'is_syncing': False}
+        payload = json.dumps(data, ensure_ascii=False)
+        now = time.monotonic()
+        if payload != last_payload:
+            yield f'event: progress\ndata: {payload}\n\n'
+            last_payload, last_sent = payload, now
+        elif now - last_sent >= STREAM_HEARTBEAT:
+            yield ': keep-alive\n\n'
+            last_sent = now
+        if not data.get('is_syncing'):
+            break
+        await asyncio.sleep(STREAM_INTERVAL)
@@ -0,0 +1,183 @@
+"""
+Celery 任务状态登记表
+Worker 通过信号（task_received / task_prerun / task_postrun / task_failure / task_revoked）
+和心跳线程把任务与Worker状态写入Redis哈希，API直接读取，不再使用 inspect() 广播（每次都要等待超时）
+
+Redis结构：
+- celery_registry:workers    hostname -> {pid, last_seen, task_types}
+- celery_registry:active     task_id  -> {name, worker, started_at}
+- celery_registry:reserved   task_id  -> {name, worker, received_at}（已接收未执行）
+- celery_registry:scheduled  task_id  -> {name, worker, eta}（带ETA/countdown的任务）
+- celery_registry:stats      succeeded / failed 计数
+- celery_registry:failures   任务名 -> 最近一次失败 {task_id, error, at}
+"""
+import json
+import time
+import logging
+from typing import Dict, Any, List, Optional
+
+from app.core.redis_cache import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+WORKERS_KEY = 'celery_registry:workers'
+ACTIVE_KEY = 'celery_registry:active'
+RESERVED_KEY = 'celery_registry:reserved'
+SCHEDULED_KEY = 'celery_registry:scheduled'
+STATS_KEY = 'celery_registry:stats'
+FAILURES_KEY = 'celery_registry:failures'
+
+# Worker心跳间隔（秒），超过 WORKER_TIMEOUT 未心跳视为离线
+HEARTBEAT_INTERVAL = 15
+WORKER_TIMEOUT = 60
+
+
+def _short_name(name: Optional[str]) -> str:
+    return (name or '').split('.')[-1]
+
+
+def _write(callback):
+    """执行一组Redis写操作（登记表只用于展示，失败不影响任务执行）"""
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        callback(pipe)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f'更新任务登记表失败: {e}')
+
+
+# ==================== 写入（Worker进程） ====================
+
+def record_worker(hostname: str, pid: int, task_types: Optional[List[str]] = None):
+    """Worker上线/心跳"""
+    entry = {'pid': pid, 'last_seen': time.time()}
+    if task_types is not None:
+        entry['task_types'] = task_types
+    else:
+        client = get_redis_client()
+        try:
+            previous = client.hget(WORKERS_KEY, hostname) if client else None
+            if previous:
+                entry['task_types'] = json.loads(previous).get('task_types', [])
+        except Exception:
+            pass
+    _write(lambda pipe: pipe.hset(WORKERS_KEY, hostname, json.dumps(entry)))
+
+
+def reset_worker(hostname: str):
+    """Worker启动时清除该Worker遗留的任务记录（上次异常退出时未清理）"""
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        for key in (ACTIVE_KEY, RESERVED_KEY, SCHEDULED_KEY):
+            stale = [task_id for task_id, value in client.hgetall(key).items()
+                     if json.loads(value).get('worker') == hostname]
+            if stale:
+                client.hdel(key, *stale)
+    except Exception as e:
+        logger.warning(f'清理Worker遗留任务记录失败: {e}')
+
+
+def remove_worker(hostname: str):
+    """Worker正常退出"""
+    reset_worker(hostname)
+    _write(lambda pipe: pipe.hdel(WORKERS_KEY, hostname))
+
+
+def record_received(task_id: str, name: str, hostname: str, eta: Optional[str] = None):
+    """任务已被Worker接收（等待执行；带ETA的计入计划任务）"""
+    if eta:
+        entry = {'name': name, 'worker': hostname, 'eta': eta}
+        _write(lambda pipe: pipe.hset(SCHEDULED_KEY, task_id, json.dumps(entry)))
+    else:
+        entry = {'name': name, 'worker': hostname, 'received_at': time.time()}
+        _write(lambda pipe: pipe.hset(RESERVED_KEY, task_id, json.dumps(entry)))
+
+
+def record_started(task_id: str, name: str, hostname: str):
+    """任务开始执行"""
+    entry = {'name': name, 'worker': hostname, 'started_at': time.time()}
+
+    def ops(pipe):
+        pipe.hdel(RESERVED_KEY, task_id)
+        pipe.hdel(SCHEDULED_KEY, task_id)
+        pipe.hset(ACTIVE_KEY, task_id, json.dumps(entry))
+    _write(ops)
+
+
+def record_finished(task_id: str, state: Optional[str]):
+    """任务结束（成功/失败/重试）"""
+    def ops(pipe):
+        pipe.hdel(ACTIVE_KEY, task_id)
+        if state == 'SUCCESS':
+            pipe.hincrby(STATS_KEY, 'succeeded', 1)
+    _write(ops)
+
+
+def record_failure(task_id: str, name: str, error: str):
+    """任务失败"""
+    entry = {'task_id': task_id, 'error': error[:500], 'at': time.time()}
+
+    def ops(pipe):
+        pipe.hincrby(STATS_KEY, 'failed', 1)
+        pipe.hset(FAILURES_KEY, _short_name(name), json.dumps(entry))
+    _write(ops)
+
+
+def record_revoked(task_id: str):
+    """任务被撤销/过期"""
+    _write(lambda pipe: pipe.hdel(ACTIVE_KEY, task_id).hdel(RESERVED_KEY, task_id).hdel(SCHEDULED_KEY, task_id))
+
+
+# ==================== 读取（API） ====================
+
+def snapshot() -> Dict[str, Any]:
+    """
+    读取登记表快照（一次管道读取，不广播）
+    离线Worker（超过 WORKER_TIMEOUT 未心跳）上的任务不计入
+    """
+    client = get_redis_client()
+    if client is None:
+        raise RuntimeError('Redis不可用')
+    pipe = client.pipeline(transaction=False)
+    pipe.hgetall(WORKERS_KEY)
+    pipe.hgetall(ACTIVE_KEY)
+    pipe.hgetall(RESERVED_KEY)
+    pipe.hgetall(SCHEDULED_KEY)
+    pipe.hgetall(STATS_KEY)
+    pipe.hgetall(FAILURES_KEY)
+    workers, active, reserved, scheduled, stats, failures = pipe.execute()
+
+    now = time.time()
+    online = {}
+    for hostname, value in workers.items():
+        entry = json.loads(value)
+        if now - entry.get('last_seen', 0) <= WORKER_TIMEOUT:
+            online[hostname] = entry
+
+    def alive(entries: Dict[str, str]) -> List[Dict[str, Any]]:
+        items = []
+        for task_id, value in entries.items():
+            entry = json.loads(value)
+            if entry.get('worker') in online:
+                items.append({'id': task_id, **entry})
+        return items
+
+    return {
+        'workers': online,
+        'active': sorted(alive(active), key=lambda t: t.get('started_at', 0)),
+        'reserved': alive(reserved),
+        'scheduled': alive(scheduled),
+        'succeeded': int(stats.get('succeeded') or 0),
+        'failed': int(stats.get('failed') or 0),
+        'failures': {name: json.loads(value) for name, value in failures.items()},
+    }
+
+
+def is_task_running(*names: str) -> bool:
+    """是否有指定名称（短名称）的任务正在执行"""
+    return any(_short_name(task['name']) in names for task in snapshot()['active'])
@@ -3,20 +3,31 @@ VOS 缓存服务层
 实现三级缓存机制：Redis → PostgreSQL → VOS API
 """
 import json
+import time
+import zlib
 import hashlib
 import logging
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Tuple, List, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy import and_, exists, or_, func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.models.vos_data_cache import VosDataCache
+from app.models.vos_data_blob import VosDataBlob
 from app.models.vos_instance import VOSInstance
 from app.core.vos_client import VOSClient
-from app.core.redis_cache import RedisCache
+from app.core.vos_health_checker import is_instance_available
+from app.core.redis_cache import RedisCache, CacheTags
+from app.core.cache_metrics import CacheMetrics
+from app.core.snapshot_diff import DeltaLog
 
 logger = logging.getLogger(__name__)
 
+# 响应体超过该大小（字节）时存入 vos_data_blobs，而不是内联在 vos_data_cache 中
+BLOB_THRESHOLD_BYTES = 16 * 1024
+
 
 class VosCacheService:
     """VOS数据缓存服务"""
@@ -38,6 +49,16 @@ class VosCacheService:
         cache_key = hashlib.md5(key_string.encode('utf-8')).hexdigest()
         return cache_key
     
+    @staticmethod
+    def serialize_payload(data: Dict[str, Any]) -> bytes:
+        """将响应数据序列化为规范化JSON（键排序、无多余空白），保证相同内容得到相同字节"""
+        return json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    
+    @staticmethod
+    def compute_content_hash(payload: bytes) -> str:
+        """计算响应内容哈希（SHA-256）"""
+        return hashlib.sha256(payload).hexdigest()
+    
     @staticmethod
     def extract_api_name(api_path: str) -> str:
         """从API路径提取接口名称"""
@@ -45,6 +66,28 @@ class VosCacheService:
         parts = api_path.strip('/').split('/')
         return parts[-1] if parts else api_path
     
+    @staticmethod
+    def redis_key(vos_instance_id: int, api_path: str, cache_key: str) -> str:
+        """Redis缓存键"""
+        return f"vos_cache:{vos_instance_id}:{api_path}:{cache_key}"
+    
+    @classmethod
+    def build_tags(cls, vos_instance_id: int, api_path: str) -> List[str]:
+        """
+        生成缓存标签：实例、接口、业务实体，以及实例级的组合标签
+        """
+        api_name = cls.extract_api_name(api_path)
+        tags = [
+            CacheTags.instance(vos_instance_id),
+            CacheTags.api(api_name),
+            CacheTags.instance_api(vos_instance_id, api_name),
+        ]
+        entity = VosDataCache.get_cache_entity(api_path)
+        if entity:
+            tags.append(CacheTags.entity(entity))
+            tags.append(CacheTags.instance_entity(vos_instance_id, entity))
+        return tags
+    
     def get_cached_data(
         self,
         vos_instance_id: int,
@@ -64,10 +107,26 @@ class VosCacheService:
         Returns:
             (data, source) 元组
             - data: 响应数据，如果没有则返回None
-            - source: 数据来源 ('redis', 'database', 'vos_api', 'error')
+            - source: 数据来源 ('redis', 'database', 'vos_api', 'stale', 'error')
+              'stale' 表示VOS节点不可用（熔断/不健康），返回的是已过期的缓存
         """
+        start = time.perf_counter()
+        data, source = self._get_cached_data(vos_instance_id, api_path, params, force_refresh)
+        CacheMetrics.record_lookup(
+            vos_instance_id, self.extract_api_name(api_path), source, time.perf_counter() - start
+        )
+        return data, source
+    
+    def _get_cached_data(
+        self,
+        vos_instance_id: int,
+        api_path: str,
+        params: Dict[str, Any],
+        force_refresh: bool
+    ) -> Tuple[Optional[Dict[str, Any]], str]:
+        """三级查询的具体实现（get_cached_data 负责记录指标）"""
         cache_key = self.generate_cache_key(api_path, params)
-        redis_key = f"vos_cache:{vos_instance_id}:{api_path}:{cache_key}"
+        redis_key = self.redis_key(vos_instance_id, api_path, cache_key)
         
         # 如果强制刷新，直接从VOS获取
         if force_refresh:
@@ -99,12 +158,15 @@ class VosCacheService:
                 f"从数据库缓存读取: {api_path} "
                 f"(key={cache_key[:8]}, age={int((datetime.now(timezone.utc) - cached.synced_at).total_seconds())}s)"
             )
-            # 写入Redis缓存（TTL=5分钟，短于数据库缓存）
-            RedisCache.set(redis_key, cached.response_data, ttl=300)
-            return cached.response_data, 'database'
+            response_data = self._load_response_data(cached)
+            if response_data is not None:
+                # 写入Redis缓存（TTL=5分钟，短于数据库缓存）
+                RedisCache.set(redis_key, response_data, ttl=300,
+                               tags=self.build_tags(vos_instance_id, api_path))
+                return response_data, 'database'
         
         # 如果缓存过期，记录日志
-        if cached:
+        if cached and cached.is_expired():
             logger.info(
                 f"缓存已过期: {api_path} "
                 f"(key={cache_key[:8]}, expired={int((datetime.now(timezone.utc) - cached.expires_at).total_seconds())}s ago)"
@@ -113,6 +175,131 @@ class VosCacheService:
         # 3️⃣ 第三级：从VOS API获取最新数据
         return self._fetch_from_vos(vos_instance_id, api_path, params, cache_key)
     
+    # ==================== 批量查询 ====================
+    
+    def resolve_batch(
+        self,
+        items: List[Tuple[int, str, Dict[str, Any]]],
+        force_refresh: bool = False
+    ) -> Tuple[Dict[int, Dict[str, Any]], List[int]]:
+        """
+        批量解析缓存：一次Redis MGET + 一次PostgreSQL查询（外置数据再一次批量读取）
+        
+        Args:
+            items: [(vos_instance_id, api_path, params), ...]
+            
+        Returns:
+            (已命中的结果 {下标: {'data', 'source', 'synced_at'}}, 需要从VOS获取的下标列表)
+        """
+        if force_refresh:
+            return {}, list(range(len(items)))
+        
+        start = time.perf_counter()
+        cache_keys = [self.generate_cache_key(api_path, params) for _, api_path, params in items]
+        
+        redis_keys = [
+            self.redis_key(instance_id, api_path, cache_key)
+            for (instance_id, api_path, _), cache_key in zip(items, cache_keys)
+        ]
+        redis_values = RedisCache.mget(redis_keys)
+        
+        # 同一次查询取出所有缓存行（Redis命中的也需要 synced_at）
+        pairs = list({(instance_id, cache_key) for (instance_id, _, _), cache_key in zip(items, cache_keys)})
+        rows = self.db.query(VosDataCache).filter(
+            tuple_(VosDataCache.vos_instance_id, VosDataCache.cache_key).in_(pairs)
+        ).all() if pairs else []
+        rows_by_key = {(row.vos_instance_id, row.cache_key): row for row in rows}
+        
+        # 需要从数据库读取的外置数据一次性加载
+        blob_hashes = {
+            row.content_hash for row in rows
+            if row.response_data is None and row.content_hash and row.is_valid and not row.is_expired()
+        }
+        blobs = self._load_blobs(blob_hashes) if blob_hashes else {}
+        
+        resolved: Dict[int, Dict[str, Any]] = {}
+        misses: List[int] = []
+        for index, ((instance_id, api_path, _), cache_key) in enumerate(zip(items, cache_keys)):
+            row = rows_by_key.get((instance_id, cache_key))
+            synced_at = row.synced_at.isoformat() if row is not None and row.synced_at else None
+            
+            if redis_values[index] is not None:
+                resolved[index] = {'data': redis_values[index], 'source': 'redis', 'synced_at': synced_at}
+                continue
+            
+            if row is not None and row.is_valid and not row.is_expired():
+                data = row.response_data if row.response_data is not None else blobs.get(row.content_hash)
+                if data is not None:
+                    RedisCache.set(redis_keys[index], data, ttl=300, tags=self.build_tags(instance_id, api_path))
+                    resolved[index] = {'data': data, 'source': 'database', 'synced_at': synced_at}
+                    continue
+            
+            misses.append(index)
+        
+        latency = time.perf_counter() - start
+        for index, result in resolved.items():
+            CacheMetrics.record_lookup(
+                items[index][0], self.extract_api_name(items[index][1]), result['source'], latency
+            )
+        return resolved, misses
+    
+    @classmethod
+    def fetch_batch_misses(
+        cls,
+        items: List[Tuple[int, str, Dict[str, Any]]],
+        indices: List[int],
+        max_workers: int = 8
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        并发从VOS获取未命中的数据，按完成顺序逐个产出 (下标, 结果)
+        
+        每个请求使用独立的数据库会话（Session 不能跨线程共享），相同的缓存键只请求一次
+        """
+        groups: Dict[Tuple[int, str], List[int]] = {}
+        for index in indices:
+            instance_id, api_path, params = items[index]
+            groups.setdefault((instance_id, cls.generate_cache_key(api_path, params)), []).append(index)
+        if not groups:
+            return
+        
+        def fetch(index: int) -> Dict[str, Any]:
+            from app.core.db import SessionLocal
+            instance_id, api_path, params = items[index]
+            start = time.perf_counter()
+            db = SessionLocal()
+            try:
+                service = cls(db)
+                data, source = service._fetch_from_vos(
+                    instance_id, api_path, params, cls.generate_cache_key(api_path, params)
+                )
+            except Exception as e:
+                logger.exception(f"批量查询从VOS获取数据失败: {api_path} (instance={instance_id}, error={e})")
+                data, source = None, 'error'
+            finally:
+                db.close()
+            CacheMetrics.record_lookup(instance_id, cls.extract_api_name(api_path), source,
+                                       time.perf_counter() - start)
+            synced_at = datetime.now(timezone.utc).isoformat() if source == 'vos_api' else None
+            return {'data': data, 'source': source, 'synced_at': synced_at}
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as executor:
+            futures = {executor.submit(fetch, group[0]): group for group in groups.values()}
+            for future in as_completed(futures):
+                result = future.result()
+                for index in futures[future]:
+                    yield index, result
+    
+    def get_cached_batch(
+        self,
+        items: List[Tuple[int, str, Dict[str, Any]]],
+        force_refresh: bool = False
+    ) -> List[Dict[str, Any]]:
+        """批量获取缓存数据，结果顺序与 items 一致"""
+        resolved, misses = self.resolve_batch(items, force_refresh)
+        for index, result in self.fetch_batch_misses(items, misses):
+            resolved[index] = result
+        return [resolved[index] for index in range(len(items))]
+    
     def _fetch_from_vos(
         self,
         vos_instance_id: int,
@@ -132,18 +319,37 @@ class VosCacheService:
             logger.error(f"VOS实例不存在: {vos_instance_id}")
             return None, 'error'
         
+        # 熔断中的节点不发起请求，返回旧缓存
+        if not is_instance_available(instance.base_url):
+            logger.warning(f"VOS实例熔断中，跳过API调用: {api_path} (instance={instance.name})")
+            return self._serve_stale(vos_instance_id, api_path, cache_key)
+        
         # 调用VOS API
         logger.info(f"从VOS API获取数据: {api_path} (instance={instance.name})")
         client = VOSClient(instance.base_url)
         
         try:
+            fetch_start = time.perf_counter()
             result = client.call_api(api_path, params)
+            fetch_latency = time.perf_counter() - fetch_start
             
             # 检查API调用是否成功
             is_success = client.is_success(result)
             ret_code = result.get('retCode', -999)
             error_message = client.get_error_message(result) if not is_success else None
             
+            # 节点不可达或已熔断：不覆盖已有缓存，返回旧缓存
+            if client.is_transport_failure(result):
+                if not client.is_circuit_open(result):
+                    CacheMetrics.record_vos_fetch(
+                        vos_instance_id, self.extract_api_name(api_path), fetch_latency, False
+                    )
+                logger.warning(
+                    f"VOS API不可用: {api_path} "
+                    f"(instance={instance.name}, retCode={ret_code}, error={error_message})"
+                )
+                return self._serve_stale(vos_instance_id, api_path, cache_key)
+            
             if not is_success:
                 logger.warning(
                     f"VOS API调用失败: {api_path} "
@@ -151,7 +357,7 @@ class VosCacheService:
                 )
             
             # 保存到数据库缓存
-            self._save_to_cache(
+            payload_bytes = self._save_to_cache(
                 vos_instance_id=vos_instance_id,
                 api_path=api_path,
                 cache_key=cache_key,
@@ -161,11 +367,17 @@ class VosCacheService:
                 ret_code=ret_code,
                 error_message=error_message
             )
+            CacheMetrics.record_vos_fetch(
+                vos_instance_id, self.extract_api_name(api_path), fetch_latency, is_success, payload_bytes
+            )
             
             if is_success:
                 # 写入Redis缓存（TTL=5分钟）
-                redis_key = f"vos_cache:{vos_instance_id}:{api_path}:{cache_key}"
-                RedisCache.set(redis_key, result, ttl=300)
+                RedisCache.set(self.redis_key(vos_instance_id, api_path, cache_key), result, ttl=300,
+                               tags=self.build_tags(vos_instance_id, api_path))
+                # 实时类接口的全量结果记录到差异引擎（供 ?since=<version> 和实时推送使用）
+                if DeltaLog.supports(api_path, params):
+                    DeltaLog(vos_instance_id, api_path).record(result)
                 return result, 'vos_api'
             else:
                 return None, 'error'
@@ -174,6 +386,37 @@ class VosCacheService:
             logger.exception(f"从VOS获取数据失败: {api_path} (instance={instance.name}, error={e})")
             return None, 'error'
     
+    def _serve_stale(
+        self,
+        vos_instance_id: int,
+        api_path: str,
+        cache_key: str
+    ) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        VOS节点不可用时返回数据库中最近一次成功的缓存（即使已过期）
+        
+        Returns:
+            (data, 'stale')，没有可用缓存时返回 (None, 'error')
+        """
+        cached = self.db.query(VosDataCache).filter(
+            and_(
+                VosDataCache.vos_instance_id == vos_instance_id,
+                VosDataCache.api_path == api_path,
+                VosDataCache.cache_key == cache_key,
+                VosDataCache.is_valid == True
+            )
+        ).first()
+        if not cached:
+            return None, 'error'
+        response_data = self._load_response_data(cached)
+        if response_data is None:
+            return None, 'error'
+        logger.info(
+            f"VOS不可用，返回旧缓存: {api_path} "
+            f"(key={cache_key[:8]}, age={int((datetime.now(timezone.utc) - cached.synced_at).total_seconds())}s)"
+        )
+        return response_data, 'stale'
+    
     def _save_to_cache(
         self,
         vos_instance_id: int,
@@ -184,18 +427,31 @@ class VosCacheService:
         is_valid: bool,
         ret_code: int,
         error_message: Optional[str]
-    ):
+    ) -> int:
         """
-        保存数据到缓存
+        保存数据到缓存，返回响应体（规范化JSON）字节数
+        
+        响应内容按哈希去重：
+        - 内容未变化：只更新 synced_at / expires_at，不重写响应数据
+        - 内容变化且体积较大：压缩后存入 vos_data_blobs，缓存行只保存哈希引用
+        - 内容变化且体积较小：直接内联存储在 response_data 中
         """
         api_name = self.extract_api_name(api_path)
         
         # 计算过期时间
         ttl = VosDataCache.get_cache_ttl(api_path)
-        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl)
+        
+        payload = self.serialize_payload(response_data)
+        content_hash = self.compute_content_hash(payload)
         
-        # 查找现有缓存
-        existing = self.db.query(VosDataCache).filter(
+        # 查找现有缓存（只取判断所需的列，避免加载大字段）
+        existing = self.db.query(
+            VosDataCache.id,
+            VosDataCache.content_hash,
+            VosDataCache.is_valid
+        ).filter(
             and_(
                 VosDataCache.vos_instance_id == vos_instance_id,
                 VosDataCache.api_path == api_path,
@@ -203,41 +459,117 @@ class VosCacheService:
             )
         ).first()
         
-        if existing:
-            # 更新现有缓存
-            existing.query_params = params
-            existing.response_data = response_data
-            existing.is_valid = is_valid
-            existing.ret_code = ret_code
-            existing.error_message = error_message
-            existing.synced_at = datetime.utcnow()
-            existing.expires_at = expires_at
-            existing.updated_at = datetime.utcnow()
-            
-            logger.debug(f"更新缓存: {api_name} (key={cache_key[:8]}, ttl={ttl}s)")
-        else:
-            # 创建新缓存
-            new_cache = VosDataCache(
-                vos_instance_id=vos_instance_id,
-                api_path=api_path,
-                api_name=api_name,
-                cache_key=cache_key,
-                query_params=params,
-                response_data=response_data,
-                is_valid=is_valid,
-                ret_code=ret_code,
-                error_message=error_message,
-                expires_at=expires_at
-            )
-            self.db.add(new_cache)
-            
-            logger.debug(f"创建缓存: {api_name} (key={cache_key[:8]}, ttl={ttl}s)")
-        
         try:
+            if existing and existing.content_hash == content_hash:
+                # 内容未变化：仅刷新同步时间和返回码，不重写响应数据
+                self.db.query(VosDataCache).filter(VosDataCache.id == existing.id).update({
+                    'synced_at': now,
+                    'expires_at': expires_at,
+                    'is_valid': is_valid,
+                    'ret_code': ret_code,
+                    'error_message': error_message,
+                }, synchronize_session=False)
+                logger.debug(f"缓存内容未变化: {api_name} (key={cache_key[:8]}, ttl={ttl}s)")
+            else:
+                inline_data = response_data
+                if len(payload) > BLOB_THRESHOLD_BYTES:
+                    self._save_blob(content_hash, payload)
+                    inline_data = None
+                
+                if existing:
+                    # 更新现有缓存
+                    self.db.query(VosDataCache).filter(VosDataCache.id == existing.id).update({
+                        'query_params': params,
+                        'response_data': inline_data,
+                        'content_hash': content_hash,
+                        'is_valid': is_valid,
+                        'ret_code': ret_code,
+                        'error_message': error_message,
+                        'synced_at': now,
+                        'expires_at': expires_at,
+                        'updated_at': now,
+                    }, synchronize_session=False)
+                    
+                    logger.debug(f"更新缓存: {api_name} (key={cache_key[:8]}, ttl={ttl}s, size={len(payload)}B)")
+                else:
+                    # 创建新缓存
+                    new_cache = VosDataCache(
+                        vos_instance_id=vos_instance_id,
+                        api_path=api_path,
+                        api_name=api_name,
+                        cache_key=cache_key,
+                        query_params=params,
+                        response_data=inline_data,
+                        content_hash=content_hash,
+                        is_valid=is_valid,
+                        ret_code=ret_code,
+                        error_message=error_message,
+                        expires_at=expires_at
+                    )
+                    self.db.add(new_cache)
+                    
+                    logger.debug(f"创建缓存: {api_name} (key={cache_key[:8]}, ttl={ttl}s, size={len(payload)}B)")
+            
             self.db.commit()
         except Exception as e:
             logger.error(f"保存缓存失败: {e}")
             self.db.rollback()
+        
+        return len(payload)
+    
+    def _save_blob(self, content_hash: str, payload: bytes):
+        """
+        压缩并保存响应内容（已存在相同哈希时不重写）
+        写入后对该行加 FOR KEY SHARE 锁直到事务提交：清理任务跳过被锁定的内容，
+        不会删除当前事务即将引用的内容；若内容恰好在加锁前被清理删除，则重新写入
+        """
+        compressed = zlib.compress(payload, 6)
+        stmt = pg_insert(VosDataBlob.__table__).values(
+            content_hash=content_hash,
+            compression='zlib',
+            data=compressed,
+            size_bytes=len(payload),
+            compressed_size=len(compressed)
+        ).on_conflict_do_nothing(index_elements=['content_hash'])
+        for _ in range(3):
+            self.db.execute(stmt)
+            locked = self.db.query(VosDataBlob.content_hash).filter(
+                VosDataBlob.content_hash == content_hash
+            ).with_for_update(read=True, key_share=True).first()
+            if locked:
+                return
+        raise RuntimeError(f"保存缓存内容失败 (hash={content_hash[:8]})：内容被并发清理")
+    
+    def _load_response_data(self, cached: VosDataCache) -> Optional[Dict[str, Any]]:
+        """读取缓存行的响应数据（内联数据或 vos_data_blobs 中的外置数据）"""
+        if cached.response_data is not None:
+            return cached.response_data
+        if not cached.content_hash:
+            return None
+        
+        blob = self.db.query(VosDataBlob).filter(
+            VosDataBlob.content_hash == cached.content_hash
+        ).first()
+        if not blob:
+            logger.warning(f"缓存引用的内容不存在: {cached.api_name} (hash={cached.content_hash[:8]})")
+            return None
+        
+        try:
+            return json.loads(zlib.decompress(blob.data).decode('utf-8'))
+        except Exception as e:
+            logger.error(f"解压缓存内容失败 (hash={cached.content_hash[:8]}): {e}")
+            return None
+    
+    def _load_blobs(self, content_hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """批量读取并解压外置的响应数据"""
+        result = {}
+        blobs = self.db.query(VosDataBlob).filter(VosDataBlob.content_hash.in_(list(content_hashes))).all()
+        for blob in blobs:
+            try:
+                result[blob.content_hash] = json.loads(zlib.decompress(blob.data).decode('utf-8'))
+            except Exception as e:
+                logger.error(f"解压缓存内容失败 (hash={blob.content_hash[:8]}): {e}")
+        return result
     
     def invalidate_cache(
         self,
@@ -246,7 +578,7 @@ class VosCacheService:
         cache_key: Optional[str] = None
     ):
         """
-        使缓存失效
+        使缓存失效（Redis + PostgreSQL）
         
         Args:
             vos_instance_id: VOS实例ID
@@ -267,8 +599,69 @@ class VosCacheService:
         count = query.update({'is_valid': False})
         self.db.commit()
         
+        # 清除对应的Redis缓存
+        if api_path and cache_key:
+            RedisCache.delete(self.redis_key(vos_instance_id, api_path, cache_key))
+        elif api_path:
+            RedisCache.delete_prefix(f"vos_cache:{vos_instance_id}:{api_path}:")
+        else:
+            RedisCache.delete_prefix(f"vos_cache:{vos_instance_id}:")
+        
         logger.info(f"使缓存失效: {count} 条记录 (instance={vos_instance_id}, api={api_path})")
     
+    def invalidate_tags(self, tags: Iterable[str]) -> Dict[str, int]:
+        """
+        按标签使缓存失效（Redis + PostgreSQL，一次调用完成）
+        
+        Redis中所有带有任一标签的缓存键被删除（包括仪表盘等接口级缓存）；
+        PostgreSQL中与标签对应的 vos_data_cache 记录被标记为无效。
+        
+        Args:
+            tags: CacheTags 生成的标签列表
+            
+        Returns:
+            {'redis': 删除的Redis键数量, 'database': 失效的数据库记录数量}
+        """
+        tags = list(tags)
+        redis_count = RedisCache.invalidate_tags(tags)
+        
+        conditions = [c for c in (self._tag_condition(tag) for tag in tags) if c is not None]
+        db_count = 0
+        if conditions:
+            db_count = self.db.query(VosDataCache).filter(
+                VosDataCache.is_valid == True,
+                or_(*conditions)
+            ).update({'is_valid': False}, synchronize_session=False)
+            self.db.commit()
+        
+        logger.info(f"按标签使缓存失效: Redis {redis_count} 个键, 数据库 {db_count} 条记录 (tags={tags})")
+        return {'redis': redis_count, 'database': db_count}
+    
+    @staticmethod
+    def _tag_condition(tag: str):
+        """将缓存标签转换为 vos_data_cache 的过滤条件；与该表无关的标签返回None"""
+        parts = tag.split(':')
+        instance_id = None
+        if parts[0] == 'instance' and len(parts) >= 2 and parts[1].isdigit():
+            instance_id = int(parts[1])
+            parts = parts[2:]
+        
+        conditions = []
+        if instance_id is not None:
+            conditions.append(VosDataCache.vos_instance_id == instance_id)
+        
+        if len(parts) == 2 and parts[0] == 'api':
+            conditions.append(VosDataCache.api_name == parts[1])
+        elif len(parts) == 2 and parts[0] == 'entity':
+            api_paths = VosDataCache.ENTITY_API_PATHS.get(parts[1])
+            if not api_paths:
+                return None
+            conditions.append(VosDataCache.api_path.in_(api_paths))
+        elif parts:
+            return None
+        
+        return and_(*conditions) if conditions else None
+    
     def cleanup_expired_cache(self, days: int = 7):
         """
         清理过期的缓存数据
@@ -288,46 +681,61 @@ class VosCacheService:
         
         self.db.commit()
         
-        logger.info(f"清理过期缓存: 删除了 {count} 条记录")
+        blob_count = self._cleanup_unreferenced_blobs()
+        
+        logger.info(f"清理过期缓存: 删除了 {count} 条记录, {blob_count} 个未引用的内容")
         return count
     
+    def _cleanup_unreferenced_blobs(self, batch_size: int = 1000) -> int:
+        """
+        删除不再被任何缓存行引用的外置内容（分批，每批一个事务）
+        先对候选内容加 FOR UPDATE SKIP LOCKED 锁（跳过写入方正在引用的内容），
+        加锁后再用新的快照确认仍无引用才删除，避免删除并发写入方刚引用的内容
+        """
+        unreferenced = ~exists().where(VosDataCache.content_hash == VosDataBlob.content_hash)
+        deleted = 0
+        while True:
+            candidates = [
+                row.content_hash for row in self.db.query(VosDataBlob.content_hash).filter(
+                    unreferenced
+                ).limit(batch_size).with_for_update(skip_locked=True).all()
+            ]
+            if not candidates:
+                break
+            count = self.db.query(VosDataBlob).filter(
+                VosDataBlob.content_hash.in_(candidates),
+                unreferenced
+            ).delete(synchronize_session=False)
+            self.db.commit()
+            deleted += count
+            if len(candidates) < batch_size or count == 0:
+                break
+        return deleted
+    
     def get_cache_stats(self, vos_instance_id: int) -> Dict[str, Any]:
         """
-        获取缓存统计信息
+        获取缓存统计信息（一次分组查询完成全部计数）
         """
-        total = self.db.query(VosDataCache).filter(
-            VosDataCache.vos_instance_id == vos_instance_id
-        ).count()
-        
-        valid = self.db.query(VosDataCache).filter(
-            and_(
-                VosDataCache.vos_instance_id == vos_instance_id,
-                VosDataCache.is_valid == True
-            )
-        ).count()
-        
-        expired = self.db.query(VosDataCache).filter(
-            and_(
-                VosDataCache.vos_instance_id == vos_instance_id,
-                VosDataCache.expires_at < datetime.utcnow()
-            )
-        ).count()
-        
-        # 按API分组统计
-        api_stats = self.db.query(
+        now = datetime.utcnow()
+        rows = self.db.query(
             VosDataCache.api_name,
-            func.count(VosDataCache.id).label('count')
+            func.count(VosDataCache.id).label('count'),
+            func.count(VosDataCache.id).filter(VosDataCache.is_valid == True).label('valid'),
+            func.count(VosDataCache.id).filter(VosDataCache.expires_at < now).label('expired')
         ).filter(
             VosDataCache.vos_instance_id == vos_instance_id
         ).group_by(
             VosDataCache.api_name
         ).all()
         
+        total = sum(row.count for row in rows)
+        valid = sum(row.valid for row in rows)
+        expired = sum(row.expired for row in rows)
+        
         return {
             'total': total,
             'valid': valid,
             'expired': expired,
             'invalid': total - valid,
-            'by_api': [{'api': name, 'count': count} for name, count in api_stats]
+            'by_api': [{'api': row.api_name, 'count': row.count} for row in rows]
         }
-
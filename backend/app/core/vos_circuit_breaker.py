@@ -0,0 +1,176 @@
+"""
+VOS 节点熔断器
+按 base_url 维护熔断状态（保存在Redis，所有进程/Worker共享）：
+- closed：正常调用，时间窗口内传输层失败（超时/网络错误/5xx）达到阈值后熔断
+- open：直接失败（不发起请求），到期后进入半开
+- half_open：只放行一个探测请求，成功则恢复，失败则重新熔断（熔断时长指数增长）
+Redis不可用时熔断器不生效（始终放行）
+"""
+import time
+import uuid
+import logging
+from typing import Dict, Any, Optional
+
+from app.core.redis_cache import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# 时间窗口（秒）内的失败次数达到阈值即熔断
+FAILURE_WINDOW = 30
+FAILURE_THRESHOLD = 5
+# 熔断时长：OPEN_BASE * 2^(连续熔断次数-1)，最长 OPEN_MAX（秒）
+OPEN_BASE = 15
+OPEN_MAX = 300
+# 半开探测令牌的有效期（秒），应大于请求超时，避免探测请求还未返回就放行下一个
+PROBE_LOCK_TTL = 20
+# 进程内状态缓存（秒），closed状态下避免每次请求都访问Redis
+LOCAL_STATE_TTL = 1.0
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+CIRCUIT_KEY = 'vos_circuit:{base_url}'
+FAILURES_KEY = 'vos_circuit:{base_url}:failures'
+PROBE_KEY = 'vos_circuit:{base_url}:probe'
+
+# 进程内状态缓存 {base_url: (state, open_until, cached_at)}
+_local_state: Dict[str, tuple] = {}
+
+
+class CircuitBreaker:
+    """单个VOS节点的熔断器"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+        self.circuit_key = CIRCUIT_KEY.format(base_url=self.base_url)
+        self.failures_key = FAILURES_KEY.format(base_url=self.base_url)
+        self.probe_key = PROBE_KEY.format(base_url=self.base_url)
+        # 本实例持有的半开探测令牌
+        self._probe_token: Optional[str] = None
+
+    def _load_state(self, client) -> tuple:
+        """读取熔断状态 (state, open_until)，closed状态在进程内缓存 LOCAL_STATE_TTL 秒"""
+        now = time.time()
+        cached = _local_state.get(self.base_url)
+        if cached and cached[0] == STATE_CLOSED and now - cached[2] < LOCAL_STATE_TTL:
+            return cached[0], cached[1]
+        data = client.hgetall(self.circuit_key)
+        state = data.get('state', STATE_CLOSED)
+        open_until = float(data.get('open_until') or 0)
+        _local_state[self.base_url] = (state, open_until, now)
+        return state, open_until
+
+    def allow_request(self) -> bool:
+        """是否允许发起请求（open期间拒绝；到期后只放行一个半开探测请求）"""
+        client = get_redis_client()
+        if client is None:
+            return True
+        try:
+            state, open_until = self._load_state(client)
+            if state == STATE_CLOSED:
+                return True
+            if time.time() < open_until:
+                return False
+            # 熔断到期：抢占半开探测令牌，只有一个请求能通过
+            token = uuid.uuid4().hex
+            if client.set(self.probe_key, token, nx=True, ex=PROBE_LOCK_TTL):
+                self._probe_token = token
+                client.hset(self.circuit_key, 'state', STATE_HALF_OPEN)
+                logger.info(f'VOS熔断器半开，放行探测请求: {self.base_url}')
+                return True
+            return False
+        except Exception as e:
+            logger.warning(f'读取熔断状态失败，放行请求: {e}')
+            return True
+
+    def record_success(self):
+        """记录成功：本实例持有半开探测令牌时恢复为closed"""
+        if self._probe_token is None:
+            return
+        self._probe_token = None
+        self.close()
+
+    def record_failure(self):
+        """记录传输层失败：半开探测失败立即重新熔断，closed状态下累计到阈值后熔断"""
+        client = get_redis_client()
+        if client is None:
+            return
+        try:
+            if self._probe_token is not None:
+                self._probe_token = None
+                self._open(client)
+                return
+            failures = client.incr(self.failures_key)
+            if failures == 1:
+                # 窗口从第一次失败开始计时
+                client.expire(self.failures_key, FAILURE_WINDOW)
+            if failures >= FAILURE_THRESHOLD:
+                state, _ = self._load_state(client)
+                if state == STATE_CLOSED:
+                    self._open(client)
+        except Exception as e:
+            logger.warning(f'记录熔断失败次数失败: {e}')
+
+    def _open(self, client):
+        """进入open状态，连续熔断次数越多熔断时间越长"""
+        open_count = client.hincrby(self.circuit_key, 'open_count', 1)
+        duration = min(OPEN_BASE * 2 ** (open_count - 1), OPEN_MAX)
+        now = time.time()
+        pipe = client.pipeline()
+        pipe.hset(self.circuit_key, mapping={
+            'state': STATE_OPEN,
+            'opened_at': now,
+            'open_until': now + duration,
+        })
+        pipe.expire(self.circuit_key, OPEN_MAX * 4)
+        pipe.delete(self.failures_key, self.probe_key)
+        pipe.execute()
+        _local_state.pop(self.base_url, None)
+        logger.warning(f'VOS熔断器打开: {self.base_url} (第 {open_count} 次，{duration}秒后半开探测)')
+
+    def close(self):
+        """恢复为closed状态（清除失败计数和熔断次数）"""
+        client = get_redis_client()
+        if client is None:
+            return
+        try:
+            removed = client.delete(self.circuit_key, self.failures_key, self.probe_key)
+            _local_state.pop(self.base_url, None)
+            if removed:
+                logger.info(f'VOS熔断器恢复: {self.base_url}')
+        except Exception as e:
+            logger.warning(f'恢复熔断状态失败: {e}')
+
+    def record_probe(self, ok: bool):
+        """健康检查的探测结果（探测本身绕过熔断器）：成功则恢复，失败则累计失败次数"""
+        if ok:
+            state = self.snapshot().get('state')
+            if state != STATE_CLOSED:
+                self.close()
+        else:
+            self.record_failure()
+
+    def is_open(self) -> bool:
+        """当前是否处于熔断期（不抢占探测令牌）"""
+        snapshot = self.snapshot()
+        return snapshot['state'] != STATE_CLOSED and time.time() < (snapshot.get('open_until') or 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """熔断器状态（用于展示）"""
+        client = get_redis_client()
+        if client is None:
+            return {'state': STATE_CLOSED}
+        try:
+            data = client.hgetall(self.circuit_key)
+            failures = client.get(self.failures_key)
+        except Exception as e:
+            logger.warning(f'读取熔断状态失败: {e}')
+            return {'state': STATE_CLOSED}
+        return {
+            'state': data.get('state', STATE_CLOSED),
+            'open_count': int(data.get('open_count') or 0),
+            'opened_at': float(data['opened_at']) if data.get('opened_at') else None,
+            'open_until': float(data['open_until']) if data.get('open_until') else None,
+            'recent_failures': int(failures or 0),
+        }
@@ -2,8 +2,16 @@ import httpx
 import json
 import logging
 
+from app.core.vos_circuit_breaker import CircuitBreaker
+
 logger = logging.getLogger(__name__)
 
+# 熔断器打开时直接返回的错误码（未发起请求）
+CIRCUIT_OPEN_RET_CODE = -5
+# 传输层失败的错误码（超时/网络错误/HTTP错误），VOS节点可能不可用
+TRANSPORT_FAILURE_RET_CODES = (-1, -2, -3, CIRCUIT_OPEN_RET_CODE)
+
+
 class VOSClient:
     """
     VOS3000 API 客户端
@@ -16,16 +24,18 @@ class VOSClient:
     - HTML 头部信息 Content-Type 设置为 text/html;charset-UTF-8
     """
     
-    def __init__(self, base_url: str, timeout: int = 10):
+    def __init__(self, base_url: str, timeout: int = 10, use_circuit_breaker: bool = True):
         """
         初始化VOS客户端
         
         Args:
             base_url: VOS服务器基础URL
             timeout: 请求超时时间（秒），默认10秒，避免长时间等待
+            use_circuit_breaker: 是否经过节点熔断器（健康检查探测时关闭）
         """
         self.base_url = base_url.rstrip('/')
         self.client = httpx.Client(timeout=timeout)
+        self.breaker = CircuitBreaker(self.base_url) if use_circuit_breaker else None
         logger.debug(f"VOS Client initialized for {self.base_url} (timeout={timeout}s)")
     
     def path_url(self, path: str) -> str:
@@ -57,6 +67,14 @@ class VOSClient:
         # 确保 payload 不为空
         payload = payload or {}
         
+        # 节点熔断中：直接失败，不等待超时
+        if self.breaker and not self.breaker.allow_request():
+            logger.warning(f"VOS Circuit Open: {path}, {self.base_url}")
+            return {
+                "retCode": CIRCUIT_OPEN_RET_CODE,
+                "exception": f"Circuit open: VOS节点 {self.base_url} 暂不可用"
+            }
+        
         try:
             # 将 payload 转换为 JSON，确保 UTF-8 编码
             json_data = json.dumps(payload, ensure_ascii=False)
@@ -76,6 +94,10 @@ class VOSClient:
             # 解析响应
             result = response.json()
             
+            # 节点有响应（无论业务retCode），熔断器记为成功
+            if self.breaker:
+                self.breaker.record_success()
+            
             # 检查返回码
             ret_code = result.get('retCode', -999)
             if ret_code != 0:
@@ -93,6 +115,8 @@ class VOSClient:
             # HTTP 错误（4xx, 5xx）
             error_msg = f"HTTP {e.response.status_code}: {e.response.text}"
             logger.error(f"VOS HTTP Error: {path}, {error_msg}")
+            if self.breaker and e.response.status_code >= 500:
+                self.breaker.record_failure()
             return {
                 "retCode": -1,
                 "exception": error_msg
@@ -102,6 +126,8 @@ class VOSClient:
             # 超时错误
             error_msg = f"Request timeout: {str(e)}"
             logger.error(f"VOS Timeout: {path}, {error_msg}")
+            if self.breaker:
+                self.breaker.record_failure()
             return {
                 "retCode": -2,
                 "exception": error_msg
@@ -111,6 +137,8 @@ class VOSClient:
             # 网络错误
             error_msg = f"Network error: {str(e)}"
             logger.error(f"VOS Network Error: {path}, {error_msg}")
+            if self.breaker:
+                self.breaker.record_failure()
             return {
                 "retCode": -3,
                 "exception": error_msg
@@ -146,6 +174,14 @@ class VOSClient:
         """
         return result.get('retCode', -999) == 0
     
+    def is_transport_failure(self, result: dict) -> bool:
+        """是否为传输层失败（节点不可达/熔断），而不是VOS返回的业务错误"""
+        return result.get('retCode', -999) in TRANSPORT_FAILURE_RET_CODES
+    
+    def is_circuit_open(self, result: dict) -> bool:
+        """是否因熔断而未发起请求"""
+        return result.get('retCode', -999) == CIRCUIT_OPEN_RET_CODE
+    
     def get_error_message(self, result: dict) -> str:
         """
         获取错误信息
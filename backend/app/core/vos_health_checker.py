@@ -0,0 +1,213 @@
+"""
+VOS 实例健康检查
+并发探测所有节点（短超时 + 轻量接口），记录滚动延迟历史（p50/p95），
+失败节点按指数退避降低探测频率（最长两分钟），并将健康状态发布到Redis用于展示；
+探测结果同时反馈给节点熔断器（探测成功可提前关闭熔断），调用方是否跳过节点只看熔断器
+"""
+import math
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.vos_client import VOSClient
+from app.core.vos_circuit_breaker import CircuitBreaker
+from app.core.redis_cache import RedisCache
+from app.core.dashboard_stats import set_health, health_row
+from app.models.vos_instance import VOSInstance
+from app.models.vos_health import VOSHealthCheck
+
+logger = logging.getLogger(__name__)
+
+# 探测接口（轻量，不返回业务数据）
+PROBE_API = '/external/server/GetPerformance'
+# 探测超时（秒），远短于业务调用的10秒
+PROBE_TIMEOUT = 3
+# 并发探测数
+MAX_WORKERS = 16
+# 保留的延迟样本数
+HISTORY_SIZE = 60
+# 健康节点的探测间隔（秒）
+CHECK_INTERVAL = 60
+# 失败节点的退避：BACKOFF_BASE * 2^(连续失败次数-1)，最长 BACKOFF_MAX（秒）
+# 上限保持在两分钟左右，恢复的节点最多两分钟内被重新探测到
+BACKOFF_BASE = 60
+BACKOFF_MAX = 120
+
+# Redis中发布的健康状态
+HEALTH_STATE_KEY = 'vos_health:{instance_id}'
+HEALTH_STATE_TTL = 86400
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """最近秩法百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return round(ordered[index], 1)
+
+
+def backoff_seconds(consecutive_failures: int) -> int:
+    """连续失败后的下次探测间隔"""
+    if consecutive_failures <= 0:
+        return CHECK_INTERVAL
+    return min(BACKOFF_BASE * 2 ** (consecutive_failures - 1), BACKOFF_MAX)
+
+
+def get_instance_health(instance_id: int) -> Optional[Dict[str, Any]]:
+    """读取Redis中发布的实例健康状态（没有记录时返回None）"""
+    return RedisCache.get(HEALTH_STATE_KEY.format(instance_id=instance_id))
+
+
+def is_instance_available(base_url: str) -> bool:
+    """
+    节点当前是否可调用：以节点熔断器为准（健康检查的探测结果也反馈给熔断器）。
+    熔断期内视为不可用，调用方应直接跳过（或使用缓存数据），而不是等待超时；
+    熔断到期（可半开探测）即视为可用，由 VOSClient 的熔断器只放行一个探测请求，节点恢复后立即可用
+    """
+    return not CircuitBreaker(base_url).is_open()
+
+
+class VosHealthChecker:
+    """VOS实例健康检查器"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def probe(base_url: str) -> Tuple[bool, float, Optional[str]]:
+        """
+        探测单个节点
+
+        Returns:
+            (是否成功, 响应时间毫秒, 错误信息)
+        """
+        # 探测请求绕过熔断器，结果再反馈给熔断器
+        client = VOSClient(base_url, timeout=PROBE_TIMEOUT, use_circuit_breaker=False)
+        start = time.perf_counter()
+        try:
+            result = client.post(PROBE_API, payload={})
+            latency = (time.perf_counter() - start) * 1000
+            ok = client.is_success(result)
+            error = None if ok else (client.get_error_message(result) or 'API返回错误')
+        except Exception as e:
+            latency, ok, error = (time.perf_counter() - start) * 1000, False, str(e)
+        CircuitBreaker(base_url).record_probe(ok)
+        return ok, latency, error
+
+    @staticmethod
+    def _apply(health_check: VOSHealthCheck, ok: bool, latency: float, error: Optional[str], now: datetime):
+        """将探测结果写入健康检查记录（延迟历史、百分位、退避）"""
+        health_check.last_check_at = now
+        health_check.response_time_ms = latency
+        health_check.api_success = ok
+        if ok:
+            history = list(health_check.latency_history or [])
+            history.append(round(latency, 1))
+            history = history[-HISTORY_SIZE:]
+            health_check.latency_history = history
+            health_check.p50_ms = percentile(history, 50)
+            health_check.p95_ms = percentile(history, 95)
+            health_check.status = 'healthy'
+            health_check.error_message = None
+            health_check.consecutive_failures = 0
+        else:
+            health_check.status = 'unhealthy'
+            health_check.error_message = (error or '未知错误')[:500]
+            # 安全地增加失败次数
+            health_check.consecutive_failures = (health_check.consecutive_failures or 0) + 1
+        health_check.next_check_at = now + timedelta(seconds=backoff_seconds(health_check.consecutive_failures))
+
+    @staticmethod
+    def publish(health_check: VOSHealthCheck, base_url: str):
+        """发布健康状态到Redis，供其他VOS调用方快速判断"""
+        RedisCache.set(HEALTH_STATE_KEY.format(instance_id=health_check.vos_instance_id), {
+            'instance_id': health_check.vos_instance_id,
+            'base_url': base_url,
+            'status': health_check.status,
+            'consecutive_failures': health_check.consecutive_failures,
+            'response_time_ms': health_check.response_time_ms,
+            'p50_ms': health_check.p50_ms,
+            'p95_ms': health_check.p95_ms,
+            'last_check_at': health_check.last_check_at.isoformat() if health_check.last_check_at else None,
+            'next_check_at': health_check.next_check_at.isoformat() if health_check.next_check_at else None,
+        }, ttl=HEALTH_STATE_TTL)
+
+    def run(self, force: bool = False) -> Dict[str, Any]:
+        """
+        执行一轮健康检查：只探测到期的节点（健康节点按固定间隔，失败节点按退避间隔）
+
+        Args:
+            force: 忽略退避，立即探测所有节点（手动触发时使用）
+        """
+        instances = self.db.query(VOSInstance).filter(VOSInstance.enabled == True).all()
+        if not instances:
+            return {'instances_count': 0, 'checked_count': 0, 'results': []}
+
+        checks = {
+            hc.vos_instance_id: hc for hc in self.db.query(VOSHealthCheck).filter(
+                VOSHealthCheck.vos_instance_id.in_([inst.id for inst in instances])
+            ).all()
+        }
+
+        now = datetime.now(timezone.utc)
+        due = []
+        for inst in instances:
+            health_check = checks.get(inst.id)
+            if not health_check:
+                health_check = VOSHealthCheck(vos_instance_id=inst.id, vos_uuid=inst.vos_uuid)
+                self.db.add(health_check)
+                checks[inst.id] = health_check
+            else:
+                # 更新现有记录的UUID
+                health_check.vos_uuid = inst.vos_uuid
+            if force or health_check.next_check_at is None or health_check.next_check_at <= now:
+                due.append(inst)
+
+        if due:
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(due))) as executor:
+                outcomes = list(executor.map(lambda inst: self.probe(inst.base_url), due))
+            now = datetime.now(timezone.utc)
+            for inst, (ok, latency, error) in zip(due, outcomes):
+                health_check = checks[inst.id]
+                self._apply(health_check, ok, latency, error, now)
+                if ok:
+                    logger.info(f'✓ VOS实例 {inst.name} 健康 (响应时间: {latency:.0f}ms, p95: {health_check.p95_ms}ms)')
+                else:
+                    logger.warning(
+                        f'✗ VOS实例 {inst.name} 不健康: {error} '
+                        f'(连续失败 {health_check.consecutive_failures} 次，'
+                        f'{backoff_seconds(health_check.consecutive_failures)}秒后重试)'
+                    )
+
+            # 健康状态同步写入仪表盘汇总表
+            set_health(self.db, [
+                health_row(inst.id, checks[inst.id].status, checks[inst.id].last_check_at,
+                           checks[inst.id].response_time_ms)
+                for inst in due
+            ])
+
+        self.db.commit()
+        for inst in due:
+            self.publish(checks[inst.id], inst.base_url)
+
+        return {
+            'instances_count': len(instances),
+            'checked_count': len(due),
+            'results': [
+                {
+                    'instance_id': inst.id,
+                    'instance_name': inst.name,
+                    'status': checks[inst.id].status,
+                    'response_time_ms': checks[inst.id].response_time_ms,
+                    'p50_ms': checks[inst.id].p50_ms,
+                    'p95_ms': checks[inst.id].p95_ms,
+                    'consecutive_failures': checks[inst.id].consecutive_failures
+                }
+                for inst in due
+            ]
+        }
@@ -3,22 +3,55 @@
 实现双写策略：专门表 + 通用缓存
 """
 import json
+import time
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, text, update, values, column, func, String, Boolean, Float, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-from app.models.phone_enhanced import PhoneEnhanced
 from app.models.gateway import Gateway, FeeRateGroup, Suite
-from app.models.customer import Customer
 from app.models.vos_instance import VOSInstance
 from app.core.vos_client import VOSClient
 from app.core.vos_cache_service import VosCacheService
+from app.core.snapshot_diff import DeltaLog
+from app.core.redis_cache import RedisCache, CacheTags
 
 logger = logging.getLogger(__name__)
 
 
+# 网关批量写入每批的行数
+GATEWAY_CHUNK_SIZE = 500
+
+
+def _gateway_column_defaults() -> Dict[str, Any]:
+    """gateways 表各列的标量默认值（批量写入时补齐VOS未返回的字段）"""
+    defaults = {}
+    for col in Gateway.__table__.columns:
+        if col.primary_key or col.name in ('created_at', 'updated_at', 'synced_at'):
+            continue
+        default = col.default
+        defaults[col.name] = default.arg if default is not None and default.is_scalar else None
+    return defaults
+
+
+# sync_all 的同步步骤：步骤名 -> (方法名, 需要的VOS接口)
+SYNC_STEPS = {
+    'phones': ('sync_phones_online', ['/external/server/GetAllPhoneOnline']),
+    'gateways': ('sync_gateways', [
+        '/external/server/GetGatewayMapping',
+        '/external/server/GetGatewayMappingOnline',
+        '/external/server/GetGatewayRouting',
+        '/external/server/GetGatewayRoutingOnline',
+    ]),
+    'fee_rates': ('sync_fee_rate_groups', ['/external/server/GetFeeRateGroup']),
+    'suites': ('sync_suites', ['/external/server/GetSuite']),
+}
+
+
 class VosSyncEnhanced:
     """增强版 VOS 同步服务"""
     
@@ -29,6 +62,90 @@ class VosSyncEnhanced:
         self.cache_service = VosCacheService(db)
         # 获取VOS实例信息（用于获取vos_uuid）
         self.vos_instance = db.query(VOSInstance).filter(VOSInstance.id == vos_instance_id).first()
+        # 预取的VOS响应（api_path -> result）
+        self._prefetched: Dict[str, Dict[str, Any]] = {}
+    
+    # ==================== 并发预取 ====================
+    
+    def prefetch(self, api_paths: List[str], max_workers: int = 6) -> Dict[str, float]:
+        """
+        并发调用互不依赖的VOS接口（无参数），结果供随后的同步步骤使用
+        
+        数据库写入仍在当前线程顺序执行（Session 不能跨线程共享），只有网络等待是并发的。
+        
+        Returns:
+            各接口耗时（毫秒）
+        """
+        pending = [path for path in dict.fromkeys(api_paths) if path not in self._prefetched]
+        if not pending:
+            return {}
+        
+        def fetch(path: str):
+            start = time.perf_counter()
+            try:
+                result = self.client.call_api(path, {})
+            except Exception as e:
+                result = {'retCode': -99, 'exception': str(e)}
+            return path, result, round((time.perf_counter() - start) * 1000, 1)
+        
+        durations = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            for path, result, duration in executor.map(fetch, pending):
+                self._prefetched[path] = result
+                durations[path] = duration
+        return durations
+    
+    def _call_api(self, api_path: str, payload: Dict[str, Any] = None) -> Dict[str, Any]:
+        """调用VOS接口，优先使用预取的结果（只用一次）"""
+        if not payload and api_path in self._prefetched:
+            result = self._prefetched.pop(api_path)
+        else:
+            result = self.client.call_api(api_path, payload or {})
+        # 实时类接口的全量结果同时记录到差异引擎
+        if DeltaLog.supports(api_path, payload) and self.client.is_success(result):
+            DeltaLog(self.vos_instance_id, api_path).record(result)
+        return result
+    
+    def sync_all(self, steps: List[str] = None) -> Dict[str, Any]:
+        """
+        同步实例的全部核心数据：先并发预取所有步骤需要的VOS接口，再依次写入数据库
+        
+        Args:
+            steps: 同步步骤，默认 phones/gateways/fee_rates/suites
+            
+        Returns:
+            各步骤结果（含耗时），单个步骤失败不影响其他步骤
+        """
+        steps = steps or list(SYNC_STEPS.keys())
+        start = time.perf_counter()
+        fetch_ms = self.prefetch([path for step in steps for path in SYNC_STEPS[step][1]])
+        
+        results = {}
+        for step in steps:
+            step_start = time.perf_counter()
+            try:
+                result = getattr(self, SYNC_STEPS[step][0])()
+            except Exception as e:
+                logger.exception(f"同步步骤 {step} 失败 (instance={self.vos_instance_id}): {e}")
+                self.db.rollback()
+                result = {'success': False, 'error': str(e)}
+            result['duration_ms'] = round((time.perf_counter() - step_start) * 1000, 1)
+            results[step] = result
+        
+        return {
+            'success': all(r.get('success') for r in results.values()),
+            'results': results,
+            'fetch_ms': fetch_ms,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 1)
+        }
+    
+    def _record_sync_stats(self, kind: str, stats: Dict[str, Any]):
+        """记录本次同步的时间和写入行数（Redis，保留1天）"""
+        RedisCache.set(
+            f'vos_sync_stats:{self.vos_instance_id}:{kind}',
+            {**stats, 'synced_at': datetime.utcnow().isoformat()},
+            ttl=86400
+        )
     
     # ==================== 话机同步（增强版）====================
     
@@ -36,12 +153,16 @@ class VosSyncEnhanced:
         """
         同步在线话机
         双写：phones_enhanced + vos_data_cache
+        
+        集合式对账：在线号码列表以数组传入，两条语句完成（离线标记 + upsert），
+        只改写状态或信息有变化的行
         """
         logger.info(f"开始同步在线话机 (instance={self.vos_instance_id})")
+        start = time.perf_counter()
         
         try:
             # 调用 VOS API
-            result = self.client.call_api('/external/server/GetAllPhoneOnline', {})
+            result = self._call_api('/external/server/GetAllPhoneOnline', {})
             
             if not self.client.is_success(result):
                 error_msg = self.client.get_error_message(result)
@@ -53,55 +174,78 @@ class VosSyncEnhanced:
             if not isinstance(phones_data, list):
                 phones_data = []
             
-            # 1. 将所有话机标记为离线
-            self.db.query(PhoneEnhanced).filter(
-                PhoneEnhanced.vos_instance_id == self.vos_instance_id
-            ).update({'is_online': False})
-            
-            # 2. 更新在线话机到专门表
-            online_count = 0
+            # 以号码去重（ON CONFLICT 不允许同一语句内重复更新同一行）
+            online_phones: Dict[str, Dict[str, Any]] = {}
             for phone_data in phones_data:
                 e164 = phone_data.get('e164') or phone_data.get('E164')
-                if not e164:
-                    continue
+                if e164:
+                    online_phones[e164] = phone_data
+            online_count = len(online_phones)
+            
+            e164s = list(online_phones.keys())
+            
+            # 1. 不在在线列表中的在线话机标记为离线（last_seen 记为发现离线的时间）
+            went_offline = self.db.execute(text("""
+                UPDATE phones_enhanced
+                SET is_online = FALSE, last_seen = now(), updated_at = now()
+                WHERE vos_instance_id = :instance_id
+                  AND is_online = TRUE
+                  AND NOT (e164 = ANY(CAST(:e164s AS varchar[])))
+            """), {'instance_id': self.vos_instance_id, 'e164s': e164s}).rowcount
+            
+            # 2. 在线话机整体 upsert，只改写状态或信息有变化的行
+            upserted = 0
+            if e164s:
+                def to_port(value):
+                    try:
+                        return int(value) if value not in (None, '') else None
+                    except (ValueError, TypeError):
+                        return None
                 
-                # 查找或创建话机记录
-                phone = self.db.query(PhoneEnhanced).filter(
-                    and_(
-                        PhoneEnhanced.vos_instance_id == self.vos_instance_id,
-                        PhoneEnhanced.e164 == e164
-                    )
-                ).first()
-                
-                if phone:
-                    # 更新现有记录
-                    phone.is_online = True
-                    phone.last_seen = datetime.utcnow()
-                    phone.ip_address = phone_data.get('ipAddress') or phone_data.get('ip')
-                    phone.port = phone_data.get('port')
-                    phone.raw_data = phone_data
-                    phone.synced_at = datetime.utcnow()
-                else:
-                    # 创建新记录
-                    phone = PhoneEnhanced(
-                        vos_instance_id=self.vos_instance_id,
-                        e164=e164,
-                        account=phone_data.get('account'),
-                        is_online=True,
-                        register_time=datetime.utcnow(),
-                        last_seen=datetime.utcnow(),
-                        ip_address=phone_data.get('ipAddress') or phone_data.get('ip'),
-                        port=phone_data.get('port'),
-                        user_agent=phone_data.get('userAgent'),
-                        raw_data=phone_data
+                upserted = self.db.execute(text("""
+                    INSERT INTO phones_enhanced (
+                        vos_instance_id, e164, account, is_online, register_time, last_seen,
+                        ip_address, port, user_agent, raw_data, synced_at, created_at, updated_at
                     )
-                    self.db.add(phone)
-                
-                online_count += 1
+                    SELECT :instance_id, t.e164, t.account, TRUE, now(), now(),
+                           t.ip_address, t.port, t.user_agent, CAST(t.raw_data AS jsonb), now(), now(), now()
+                    FROM unnest(
+                        CAST(:e164s AS varchar[]),
+                        CAST(:accounts AS varchar[]),
+                        CAST(:ip_addresses AS varchar[]),
+                        CAST(:ports AS integer[]),
+                        CAST(:user_agents AS varchar[]),
+                        CAST(:raw_data AS text[])
+                    ) AS t(e164, account, ip_address, port, user_agent, raw_data)
+                    ON CONFLICT (vos_instance_id, e164) DO UPDATE SET
+                        is_online = TRUE,
+                        last_seen = now(),
+                        ip_address = EXCLUDED.ip_address,
+                        port = EXCLUDED.port,
+                        raw_data = EXCLUDED.raw_data,
+                        synced_at = now(),
+                        updated_at = now()
+                    WHERE phones_enhanced.is_online IS DISTINCT FROM TRUE
+                       OR phones_enhanced.ip_address IS DISTINCT FROM EXCLUDED.ip_address
+                       OR phones_enhanced.port IS DISTINCT FROM EXCLUDED.port
+                       OR phones_enhanced.raw_data IS DISTINCT FROM EXCLUDED.raw_data
+                """), {
+                    'instance_id': self.vos_instance_id,
+                    'e164s': e164s,
+                    'accounts': [p.get('account') for p in online_phones.values()],
+                    'ip_addresses': [p.get('ipAddress') or p.get('ip') for p in online_phones.values()],
+                    'ports': [to_port(p.get('port')) for p in online_phones.values()],
+                    'user_agents': [p.get('userAgent') for p in online_phones.values()],
+                    'raw_data': [json.dumps(p, ensure_ascii=False) for p in online_phones.values()],
+                }).rowcount
             
             self.db.commit()
             
-            # 3. 同时更新通用缓存
+            # 3. 有变化时失效该实例的话机相关缓存，并写回最新数据到通用缓存
+            if went_offline or upserted:
+                self.cache_service.invalidate_tags([
+                    CacheTags.instance_entity(self.vos_instance_id, CacheTags.PHONE),
+                ])
             self.cache_service._save_to_cache(
                 vos_instance_id=self.vos_instance_id,
                 api_path='/external/server/GetAllPhoneOnline',
@@ -113,10 +257,20 @@ class VosSyncEnhanced:
                 error_message=None
             )
             
-            logger.info(f"在线话机同步完成: {online_count} 部在线")
+            stats = {
+                'online_count': online_count,
+                'went_offline': went_offline,
+                'rows_written': went_offline + upserted,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 1),
+            }
+            self._record_sync_stats('phones_online', stats)
+            logger.info(
+                f"在线话机同步完成: {online_count} 部在线, 写入 {stats['rows_written']} 行 "
+                f"(离线: {went_offline}), 耗时 {stats['duration_ms']}ms"
+            )
             return {
                 'success': True,
-                'online_count': online_count,
+                **stats,
                 'total_phones': len(phones_data)
             }
             
@@ -134,6 +288,13 @@ class VosSyncEnhanced:
         """
         logger.info(f"开始同步网关 (instance={self.vos_instance_id}, type={gateway_type})")
         
+        # 配置与在线接口互不依赖，先并发获取
+        gw_types = ['mapping', 'routing'] if gateway_type == 'both' else [gateway_type]
+        self.prefetch([
+            path for gw_type in gw_types
+            for path in (self._gateway_api(gw_type)['config_path'], self._gateway_api(gw_type)['online_path'])
+        ])
+        
         results = {'mapping': None, 'routing': None}
         has_error = False
         error_messages = []
@@ -393,113 +554,293 @@ class VosSyncEnhanced:
         
         return result
     
+    @staticmethod
+    def _gateway_api(gw_type: str) -> Dict[str, str]:
+        """网关类型对应的API路径与响应字段"""
+        if gw_type == 'mapping':
+            return {
+                'config_path': '/external/server/GetGatewayMapping',
+                'online_path': '/external/server/GetGatewayMappingOnline',
+                'config_key': 'infoGatewayMappings',
+                'online_key': 'infoGatewayMappingsOnline',
+            }
+        return {
+            'config_path': '/external/server/GetGatewayRouting',
+            'online_path': '/external/server/GetGatewayRoutingOnline',
+            'config_key': 'infoGatewayRoutings',
+            'online_key': 'infoGatewayRoutingsOnline',
+        }
+    
+    @staticmethod
+    def _online_fields(online_info: Dict[str, Any]) -> Dict[str, Any]:
+        """在线状态与性能指标（不允许为NULL，保证批量UPDATE的VALUES列类型一致）"""
+        def to_float(value):
+            try:
+                return float(value or 0.0)
+            except (ValueError, TypeError):
+                return 0.0
+        
+        def to_int(value):
+            try:
+                return int(value or 0)
+            except (ValueError, TypeError):
+                return 0
+        
+        return {
+            'is_online': bool(online_info.get('isOnline', False) or online_info.get('online', False)),
+            'asr': to_float(online_info.get('asr')),
+            'acd': to_float(online_info.get('acd')),
+            'concurrent_calls': to_int(online_info.get('concurrentCalls')),
+        }
+    
+    @staticmethod
+    def _config_hash(gw_data: Dict[str, Any]) -> str:
+        """网关配置的内容哈希，用于判断配置是否变化"""
+        raw = json.dumps(gw_data, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+        return hashlib.md5(raw.encode('utf-8')).hexdigest()
+    
+    def _fetch_gateway_online(self, gw_type: str):
+        """获取在线网关，返回 (VOS响应, {网关名称: 在线信息})；接口失败时在线信息为None"""
+        api = self._gateway_api(gw_type)
+        online_result = self._call_api(api['online_path'], {})
+        if not self.client.is_success(online_result):
+            logger.warning(
+                f"获取{gw_type}在线网关失败 (instance={self.vos_instance_id}): "
+                f"{self.client.get_error_message(online_result)}"
+            )
+            return online_result, None
+        online_data = {}
+        for gw in online_result.get(api['online_key'], []) or []:
+            name = gw.get('name')
+            if name:
+                online_data[name] = gw
+        return online_result, online_data
+    
+    def _apply_online_delta(self, gw_type: str, online_data: Dict[str, Dict[str, Any]]) -> int:
+        """
+        按差异批量更新在线状态与性能指标：一次查询加载现状，
+        只对变化的网关执行 UPDATE ... FROM (VALUES ...)（调用方负责提交）
+        
+        Returns:
+            更新的网关数量
+        """
+        table = Gateway.__table__
+        current = self.db.query(
+            Gateway.gateway_name, Gateway.is_online, Gateway.asr, Gateway.acd, Gateway.concurrent_calls
+        ).filter(
+            Gateway.vos_instance_id == self.vos_instance_id,
+            Gateway.gateway_type == gw_type
+        ).all()
+        
+        changed = []
+        for row in current:
+            fields = self._online_fields(online_data.get(row.gateway_name, {}))
+            if (fields['is_online'] != bool(row.is_online)
+                    or fields['asr'] != (row.asr or 0.0)
+                    or fields['acd'] != (row.acd or 0.0)
+                    or fields['concurrent_calls'] != (row.concurrent_calls or 0)):
+                changed.append((row.gateway_name, fields['is_online'], fields['asr'],
+                                fields['acd'], fields['concurrent_calls']))
+        
+        for i in range(0, len(changed), GATEWAY_CHUNK_SIZE):
+            delta = values(
+                column('gateway_name', String),
+                column('is_online', Boolean),
+                column('asr', Float),
+                column('acd', Float),
+                column('concurrent_calls', Integer),
+                name='delta'
+            ).data(changed[i:i + GATEWAY_CHUNK_SIZE])
+            self.db.execute(
+                update(table).where(
+                    table.c.vos_instance_id == self.vos_instance_id,
+                    table.c.gateway_name == delta.c.gateway_name
+                ).values(
+                    is_online=delta.c.is_online,
+                    asr=delta.c.asr,
+                    acd=delta.c.acd,
+                    concurrent_calls=delta.c.concurrent_calls,
+                    updated_at=func.now()
+                )
+            )
+        return len(changed)
+    
+    def _save_gateway_cache(self, api_path: str, result: Dict[str, Any]):
+        self.cache_service._save_to_cache(
+            vos_instance_id=self.vos_instance_id,
+            api_path=api_path,
+            cache_key=VosCacheService.generate_cache_key(api_path, {}),
+            params={},
+            response_data=result,
+            is_valid=True,
+            ret_code=0,
+            error_message=None
+        )
+    
+    def sync_gateways_online(self, gateway_type: str = 'both') -> Dict[str, Any]:
+        """
+        同步网关在线状态（轻量、高频）
+        只调用 Online 接口，按差异批量更新 is_online 和性能指标，不触及网关配置
+        """
+        gw_types = ['mapping', 'routing'] if gateway_type == 'both' else [gateway_type]
+        self.prefetch([self._gateway_api(gw_type)['online_path'] for gw_type in gw_types])
+        results = {}
+        try:
+            for gw_type in gw_types:
+                api = self._gateway_api(gw_type)
+                online_result, online_data = self._fetch_gateway_online(gw_type)
+                if online_data is None:
+                    results[gw_type] = {'success': False, 'error': self.client.get_error_message(online_result)}
+                    continue
+                
+                updated = self._apply_online_delta(gw_type, online_data)
+                self.db.commit()
+                
+                if updated:
+                    self.cache_service.invalidate_tags([
+                        CacheTags.instance_api(self.vos_instance_id, VosCacheService.extract_api_name(api['online_path'])),
+                        CacheTags.summary(CacheTags.GATEWAY),
+                    ])
+                self._save_gateway_cache(api['online_path'], online_result)
+                results[gw_type] = {'success': True, 'online': len(online_data), 'updated': updated}
+            
+            return {
+                'success': all(r['success'] for r in results.values()),
+                'results': results,
+                'updated_count': sum(r.get('updated', 0) for r in results.values())
+            }
+        except Exception as e:
+            logger.exception(f"同步网关在线状态失败 (instance={self.vos_instance_id}): {e}")
+            self.db.rollback()
+            return {'success': False, 'error': str(e), 'results': results}
+    
     def _sync_gateway_type(self, gw_type: str) -> Dict[str, Any]:
-        """同步特定类型的网关"""
-        api_path = f'/external/server/GetGateway{"Mapping" if gw_type == "mapping" else "Routing"}'
-        api_path_online = f'{api_path}Online'
+        """
+        同步特定类型的网关（配置 + 在线状态）
+        
+        配置按内容哈希比对，只对新增/变化的网关分批 INSERT ... ON CONFLICT，
+        删除VOS中已不存在的网关；在线状态按差异批量更新。
+        raw_data 只保存网关配置，在线信息保存在对应字段中。
+        """
+        api = self._gateway_api(gw_type)
         
         # 1. 获取网关配置
-        config_result = self.client.call_api(api_path, {})
+        config_result = self._call_api(api['config_path'], {})
         if not self.client.is_success(config_result):
             return {'success': False, 'error': self.client.get_error_message(config_result)}
         
         # 2. 获取在线状态
-        online_result = self.client.call_api(api_path_online, {})
-        online_data = {}
-        if self.client.is_success(online_result):
-            online_list = online_result.get('infoGatewayMappingsOnline' if gw_type == 'mapping' else 'infoGatewayRoutingsOnline', [])
-            for gw in online_list:
-                name = gw.get('name')
-                if name:
-                    online_data[name] = gw
-        
-        # 3. 更新到专门表
-        gateways_list = config_result.get('infoGatewayMappings' if gw_type == 'mapping' else 'infoGatewayRoutings', [])
+        online_result, online_data = self._fetch_gateway_online(gw_type)
+        
+        gateways_list = config_result.get(api['config_key'], [])
         if not isinstance(gateways_list, list):
             logger.warning(f"网关列表格式异常 (type={gw_type}, instance={self.vos_instance_id}): {type(gateways_list)}")
             gateways_list = []
         
         logger.info(f"获取到 {len(gateways_list)} 个{gw_type}网关配置 (instance={self.vos_instance_id})")
-        synced_count = 0
         
         if len(gateways_list) == 0:
             logger.info(f"VOS实例 {self.vos_instance_id} 没有配置{gw_type}网关，跳过同步")
             # 即使没有网关，也返回成功（这是正常情况）
             return {'success': True, 'count': 0, 'message': f'没有配置{gw_type}网关'}
         
+        # 3. 按配置哈希比对（一次查询加载现有网关）
+        current = {
+            row.gateway_name: row
+            for row in self.db.query(Gateway.gateway_name, Gateway.gateway_type, Gateway.config_hash).filter(
+                Gateway.vos_instance_id == self.vos_instance_id
+            ).all()
+        }
+        vos_uuid = self.vos_instance.vos_uuid if self.vos_instance and self.vos_instance.vos_uuid else None
+        defaults = _gateway_column_defaults()
+        
+        incoming = set()
+        upserts = []
         for gw_data in gateways_list:
             gateway_name = gw_data.get('name')
-            if not gateway_name:
+            if not gateway_name or gateway_name in incoming:
                 continue
+            incoming.add(gateway_name)
             
-            # 获取在线状态和性能数据
-            online_info = online_data.get(gateway_name, {})
-            is_online = online_info.get('isOnline', False) or online_info.get('online', False)
-            
-            # 合并所有数据：优先使用在线数据，然后是配置数据
-            # 确保保存完整的网关配置信息
-            merged_data = gw_data.copy()  # 先复制配置数据
-            merged_data.update(online_info)  # 然后用在线信息覆盖（如果有）
-            # 添加一个标记，标识数据来源
-            merged_data['_data_sources'] = {
-                'config': gw_data,
-                'online': online_info
-            }
-            
-            # 查找或创建网关记录
-            gateway = self.db.query(Gateway).filter(
-                and_(
-                    Gateway.vos_instance_id == self.vos_instance_id,
-                    Gateway.gateway_name == gateway_name
-                )
-            ).first()
-            
-            # 将VOS API字段映射到Gateway模型字段
-            gateway_fields = self._map_gateway_fields(gw_data, online_info, is_online, gw_type)
-            
-            if gateway:
-                # 更新现有记录
-                for key, value in gateway_fields.items():
-                    if hasattr(gateway, key):
-                        setattr(gateway, key, value)
-                # 更新vos_uuid（如果VOS实例存在）
-                if self.vos_instance and self.vos_instance.vos_uuid:
-                    gateway.vos_uuid = self.vos_instance.vos_uuid
-                # 保存完整数据
-                gateway.raw_data = merged_data
-                gateway.synced_at = datetime.utcnow()
-            else:
-                # 创建新记录
-                gateway_fields['vos_instance_id'] = self.vos_instance_id
-                gateway_fields['vos_uuid'] = self.vos_instance.vos_uuid if self.vos_instance and self.vos_instance.vos_uuid else None
-                gateway_fields['raw_data'] = merged_data
-                gateway = Gateway(**gateway_fields)
-                self.db.add(gateway)
+            config_hash = self._config_hash(gw_data)
+            existing = current.get(gateway_name)
+            if existing and existing.config_hash == config_hash and existing.gateway_type == gw_type:
+                continue
             
-            synced_count += 1
+            online_info = online_data.get(gateway_name, {}) if online_data else {}
+            # 将VOS API字段映射到Gateway模型字段，未返回的字段使用列默认值（保证每行的列一致）
+            row = dict(defaults)
+            row.update(self._map_gateway_fields(gw_data, online_info, False, gw_type))
+            row.update(self._online_fields(online_info))
+            row.update({
+                'vos_instance_id': self.vos_instance_id,
+                'vos_uuid': vos_uuid,
+                'raw_data': gw_data,
+                'config_hash': config_hash,
+            })
+            upserts.append(row)
+        
+        update_columns = [key for key in upserts[0] if key not in ('vos_instance_id', 'gateway_name')] if upserts else []
+        for i in range(0, len(upserts), GATEWAY_CHUNK_SIZE):
+            stmt = pg_insert(Gateway.__table__).values(upserts[i:i + GATEWAY_CHUNK_SIZE])
+            set_ = {key: stmt.excluded[key] for key in update_columns}
+            set_['synced_at'] = func.now()
+            set_['updated_at'] = func.now()
+            stmt = stmt.on_conflict_do_update(index_elements=['vos_instance_id', 'gateway_name'], set_=set_)
+            self.db.execute(stmt)
+        
+        vanished = [
+            name for name, row in current.items()
+            if row.gateway_type == gw_type and name not in incoming
+        ]
+        deleted = 0
+        if vanished:
+            deleted = self.db.query(Gateway).filter(
+                Gateway.vos_instance_id == self.vos_instance_id,
+                Gateway.gateway_type == gw_type,
+                Gateway.gateway_name.in_(vanished)
+            ).delete(synchronize_session=False)
+        
+        # 4. 在线状态按差异更新（新写入的网关已带在线状态，不会重复更新）
+        online_updated = self._apply_online_delta(gw_type, online_data) if online_data is not None else 0
         
         try:
             self.db.commit()
-            logger.debug(f"{gw_type} 网关数据已提交到数据库 (instance={self.vos_instance_id}, count={synced_count})")
+            logger.debug(f"{gw_type} 网关数据已提交到数据库 (instance={self.vos_instance_id}, upserts={len(upserts)})")
         except Exception as e:
             logger.error(f"提交网关数据到数据库失败 (type={gw_type}, instance={self.vos_instance_id}): {e}")
             self.db.rollback()
             raise
         
-        # 4. 同时更新通用缓存
-        self.cache_service._save_to_cache(
-            vos_instance_id=self.vos_instance_id,
-            api_path=api_path,
-            cache_key=VosCacheService.generate_cache_key(api_path, {}),
-            params={},
-            response_data=config_result,
-            is_valid=True,
-            ret_code=0,
-            error_message=None
-        )
+        # 5. 有变化时失效该类型网关的缓存（含网关汇总），并写回最新数据到通用缓存
+        if upserts or deleted or online_updated:
+            self.cache_service.invalidate_tags([
+                CacheTags.instance_api(self.vos_instance_id, VosCacheService.extract_api_name(api['config_path'])),
+                CacheTags.instance_api(self.vos_instance_id, VosCacheService.extract_api_name(api['online_path'])),
+                CacheTags.summary(CacheTags.GATEWAY),
+            ])
+        self._save_gateway_cache(api['config_path'], config_result)
+        if online_data is not None:
+            self._save_gateway_cache(api['online_path'], online_result)
         
-        logger.info(f"{gw_type} 网关同步完成: {synced_count} 个")
-        return {'success': True, 'count': synced_count}
+        # 未变化的网关不逐行刷新 synced_at，本次同步时间按实例 + 类型记录一次
+        self._record_sync_stats(f'gateways_{gw_type}', {
+            'count': len(incoming),
+            'config_changed': len(upserts),
+            'deleted': deleted,
+            'online_updated': online_updated,
+        })
+        logger.info(
+            f"{gw_type} 网关同步完成: {len(incoming)} 个 (配置变化: {len(upserts)}, "
+            f"删除: {deleted}, 在线状态变化: {online_updated})"
+        )
+        return {
+            'success': True,
+            'count': len(incoming),
+            'config_changed': len(upserts),
+            'deleted': deleted,
+            'online_updated': online_updated
+        }
     
     # ==================== 费率组同步（新增）====================
     
@@ -509,7 +850,7 @@ class VosSyncEnhanced:
         
         try:
             # 调用 VOS API
-            result = self.client.call_api('/external/server/GetFeeRateGroup', {})
+            result = self._call_api('/external/server/GetFeeRateGroup', {})
             
             if not self.client.is_success(result):
                 error_msg = self.client.get_error_message(result)
@@ -580,7 +921,7 @@ class VosSyncEnhanced:
         
         try:
             # 调用 VOS API
-            result = self.client.call_api('/external/server/GetSuite', {})
+            result = self._call_api('/external/server/GetSuite', {})
             
             if not self.client.is_success(result):
                 error_msg = self.client.get_error_message(result)
@@ -0,0 +1,248 @@
+"""
+VOS 常用API同步调度器
+按 (实例, API) 维护到期时间优先队列，一次查询批量加载缓存新鲜度，
+到期任务并发拉取（每个节点限制并发数），跳过熔断中的节点
+"""
+import heapq
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.db import SessionLocal
+from app.core.redis_cache import get_redis_client
+from app.core.vos_cache_service import VosCacheService
+from app.core.vos_health_checker import is_instance_available
+from app.models.vos_instance import VOSInstance
+from app.models.vos_data_cache import VosDataCache
+
+logger = logging.getLogger(__name__)
+
+# 需要定期同步的API（同步间隔由 VosDataCache.get_cache_ttl 决定，到期即同步）
+COMMON_APIS: List[Tuple[str, Dict[str, Any]]] = [
+    # 实时数据
+    ('/external/server/GetAllPhoneOnline', {}),
+    ('/external/server/GetGatewayMappingOnline', {}),
+    ('/external/server/GetGatewayRoutingOnline', {}),
+    ('/external/server/GetPerformance', {}),
+    # 准实时数据
+    ('/external/server/GetAllCustomers', {'type': 1}),
+    # 配置数据
+    ('/external/server/GetGatewayMapping', {}),
+    ('/external/server/GetGatewayRouting', {}),
+    ('/external/server/GetFeeRateGroup', {}),
+    ('/external/server/GetSoftSwitch', {}),
+]
+
+# 全局并发数
+MAX_WORKERS = 8
+# 每个VOS节点的最大并发请求数（避免压垮单个节点）
+PER_INSTANCE_CONCURRENCY = 2
+# 提前量（秒）：即将在该时间内到期的缓存本轮一并刷新，避免刚过本轮就过期
+DUE_AHEAD_SECONDS = 5
+# 调度锁：上一轮未结束时跳过本轮，避免与下一次beat重叠
+LOCK_KEY = 'vos_sync_scheduler:lock'
+LOCK_TTL = 120
+
+
+@dataclass(order=True)
+class SyncJob:
+    """同步任务（按到期时间排序）"""
+    due_at: float
+    instance_id: int = field(compare=False)
+    instance_name: str = field(compare=False)
+    api_path: str = field(compare=False)
+    params: Dict[str, Any] = field(compare=False, default_factory=dict)
+    reason: str = field(compare=False, default='expired')
+
+
+class VosSyncScheduler:
+    """VOS常用API同步调度器"""
+
+    def __init__(self, db: Session, apis: Optional[List[Tuple[str, Dict[str, Any]]]] = None):
+        self.db = db
+        self.apis = apis or COMMON_APIS
+
+    # ==================== 构建队列 ====================
+
+    def _load_instances(self) -> List[VOSInstance]:
+        """加载启用的实例"""
+        return self.db.query(VOSInstance).filter(VOSInstance.enabled == True).all()
+
+    def _load_freshness(self, instance_ids: List[int]) -> Dict[Tuple[int, str], Tuple[Optional[datetime], bool]]:
+        """一次查询批量加载所有 (实例, API) 的缓存过期时间"""
+        cache_keys = [VosCacheService.generate_cache_key(api_path, params) for api_path, params in self.apis]
+        rows = self.db.query(
+            VosDataCache.vos_instance_id,
+            VosDataCache.cache_key,
+            VosDataCache.expires_at,
+            VosDataCache.is_valid
+        ).filter(
+            VosDataCache.vos_instance_id.in_(instance_ids),
+            VosDataCache.cache_key.in_(cache_keys)
+        ).all()
+        return {(row.vos_instance_id, row.cache_key): (row.expires_at, row.is_valid) for row in rows}
+
+    def build_queue(self) -> Tuple[List[SyncJob], Dict[str, Any]]:
+        """
+        构建到期时间优先队列
+
+        Returns:
+            (堆, 统计信息)，统计信息包含跳过的熔断中节点
+        """
+        instances = self._load_instances()
+        available = {inst.id: is_instance_available(inst.base_url) for inst in instances}
+        skipped = [
+            {'instance_id': inst.id, 'instance_name': inst.name}
+            for inst in instances if not available[inst.id]
+        ]
+        healthy = [inst for inst in instances if available[inst.id]]
+        freshness = self._load_freshness([inst.id for inst in healthy]) if healthy else {}
+
+        now = time.time()
+        heap: List[SyncJob] = []
+        for inst in healthy:
+            for api_path, params in self.apis:
+                cache_key = VosCacheService.generate_cache_key(api_path, params)
+                cached = freshness.get((inst.id, cache_key))
+                if cached is None:
+                    due_at, reason = now, 'missing'
+                elif not cached[1]:
+                    due_at, reason = now, 'invalid'
+                elif cached[0] is None:
+                    # 永不过期的缓存不参与调度
+                    continue
+                else:
+                    expires_at = cached[0]
+                    if expires_at.tzinfo is None:
+                        expires_at = expires_at.replace(tzinfo=timezone.utc)
+                    due_at, reason = expires_at.timestamp(), 'expired'
+                heapq.heappush(heap, SyncJob(due_at, inst.id, inst.name, api_path, params, reason))
+
+        return heap, {'instances_count': len(instances), 'skipped_instances': skipped}
+
+    @staticmethod
+    def pop_due(heap: List[SyncJob], now: Optional[float] = None) -> List[SyncJob]:
+        """弹出所有已到期（含即将到期）的任务，最早到期的排在前面"""
+        horizon = (now or time.time()) + DUE_AHEAD_SECONDS
+        due = []
+        while heap and heap[0].due_at <= horizon:
+            due.append(heapq.heappop(heap))
+        return due
+
+    # ==================== 执行 ====================
+
+    @staticmethod
+    def _run_job(job: SyncJob) -> Dict[str, Any]:
+        """在独立的数据库会话中强制刷新一个 (实例, API)"""
+        result = {
+            'instance_id': job.instance_id,
+            'instance_name': job.instance_name,
+            'api_path': job.api_path,
+            'reason': job.reason,
+        }
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            _, source = VosCacheService(db).get_cached_data(
+                vos_instance_id=job.instance_id,
+                api_path=job.api_path,
+                params=job.params,
+                force_refresh=True
+            )
+            result.update(success=source == 'vos_api', source=source)
+        except Exception as e:
+            logger.exception(f'同步失败: {job.api_path} (instance={job.instance_name}, error={e})')
+            result.update(success=False, error=str(e))
+        finally:
+            db.close()
+        result['duration_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    @classmethod
+    def _run_lane(cls, jobs: List[SyncJob]) -> List[Dict[str, Any]]:
+        """顺序执行同一节点的一条通道上的任务"""
+        return [cls._run_job(job) for job in jobs]
+
+    @staticmethod
+    def build_lanes(due_jobs: List[SyncJob]) -> List[List[SyncJob]]:
+        """
+        将到期任务按节点拆分为通道：每个节点最多 PER_INSTANCE_CONCURRENCY 条通道，
+        通道内顺序执行。慢节点最多占用这么多工作线程，不会拖住其他节点。
+        通道按节点交错排列，各节点都能尽早开始。
+        """
+        by_instance: Dict[int, List[List[SyncJob]]] = {}
+        for job in due_jobs:
+            lanes = by_instance.setdefault(job.instance_id, [])
+            if len(lanes) < PER_INSTANCE_CONCURRENCY:
+                lanes.append([job])
+            else:
+                min(lanes, key=len).append(job)
+        ordered = []
+        for i in range(PER_INSTANCE_CONCURRENCY):
+            ordered.extend(lanes[i] for lanes in by_instance.values() if i < len(lanes))
+        return ordered
+
+    def run(self) -> Dict[str, Any]:
+        """执行一轮调度：到期任务并发拉取，每个节点最多 PER_INSTANCE_CONCURRENCY 个并发"""
+        heap, summary = self.build_queue()
+        for item in summary['skipped_instances']:
+            logger.warning(f"VOS实例 {item['instance_name']} 熔断中，跳过本轮常用API同步")
+
+        due_jobs = self.pop_due(heap)
+        next_due_in = round(heap[0].due_at - time.time(), 1) if heap else None
+
+        results = []
+        if due_jobs:
+            lanes = self.build_lanes(due_jobs)
+            logger.info(
+                f'常用API同步: {len(due_jobs)} 个任务到期，'
+                f'涉及 {len({job.instance_id for job in due_jobs})} 个实例'
+            )
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(lanes))) as executor:
+                futures = [executor.submit(self._run_lane, lane) for lane in lanes]
+                for future in as_completed(futures):
+                    results.extend(future.result())
+
+        success_count = sum(1 for r in results if r.get('success'))
+        summary.update({
+            'total_synced': len(results),
+            'success_count': success_count,
+            'failed_count': len(results) - success_count,
+            'pending_count': len(heap),
+            'next_due_in_seconds': next_due_in,
+            'details': results,
+        })
+        return summary
+
+
+def acquire_scheduler_lock() -> Optional[str]:
+    """获取调度锁，返回锁令牌；已被占用时返回None（Redis不可用时不加锁）"""
+    client = get_redis_client()
+    if client is None:
+        return 'no-redis'
+    token = uuid.uuid4().hex
+    try:
+        if client.set(LOCK_KEY, token, nx=True, ex=LOCK_TTL):
+            return token
+        return None
+    except Exception as e:
+        logger.warning(f'获取调度锁失败，不加锁继续执行: {e}')
+        return 'no-redis'
+
+
+def release_scheduler_lock(token: str):
+    """释放调度锁（只释放自己持有的锁）"""
+    client = get_redis_client()
+    if client is None or token == 'no-redis':
+        return
+    try:
+        if client.get(LOCK_KEY) == token:
+            client.delete(LOCK_KEY)
+    except Exception as e:
+        logger.warning(f'释放调度锁失败: {e}')
@@ -1,16 +1,28 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.core.config import settings
-from app.routers import auth, vos, cdr, vos_api, sync_config, tasks, sync, account_detail_reports
+from app.core.cache_metrics import CacheMetrics
+from app.core.db import async_engine
+from app.core.http_cache import ConditionalGetMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.fast_json import FastJSONResponse
+from app.routers import auth, vos, cdr, vos_api, sync_config, tasks, sync, account_detail_reports, search
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f'{settings.API_V1_PREFIX}/openapi.json',
     docs_url='/docs',
-    redoc_url='/redoc'
+    redoc_url='/redoc',
+    default_response_class=FastJSONResponse
 )
 
+# ETag / If-None-Match（在CORS之内，304响应同样带CORS头）
+app.add_middleware(ConditionalGetMiddleware)
+# 响应压缩（在ETag之外：ETag按未压缩内容计算，压缩后改为弱ETag）
+app.add_middleware(CompressionMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -29,6 +41,12 @@ app.include_router(sync_config.router, prefix=settings.API_V1_PREFIX)
 app.include_router(sync.router, prefix=f'{settings.API_V1_PREFIX}/sync', tags=['同步管理'])
 app.include_router(tasks.router, prefix=settings.API_V1_PREFIX)
 app.include_router(account_detail_reports.router, prefix=settings.API_V1_PREFIX)
+app.include_router(search.router, prefix=settings.API_V1_PREFIX)
+
+@app.on_event('shutdown')
+async def dispose_async_engine():
+    """关闭异步连接池"""
+    await async_engine.dispose()
 
 @app.get('/')
 async def root():
@@ -38,3 +56,11 @@ async def root():
 async def health():
     return {'status': 'ok'}
 
+@app.get('/metrics', response_class=PlainTextResponse)
+def metrics():
+    """Prometheus 指标（缓存命中、延迟、响应体大小；不含热点键名）"""
+    return PlainTextResponse(
+        CacheMetrics.render_prometheus(),
+        media_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
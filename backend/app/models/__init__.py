@@ -6,10 +6,12 @@ from app.models.phone import Phone
 from app.models.cdr import CDR
 from app.models.customer import Customer
 from app.models.vos_data_cache import VosDataCache
+from app.models.vos_data_blob import VosDataBlob
 from app.models.phone_enhanced import PhoneEnhanced
 from app.models.gateway import Gateway, FeeRateGroup, Suite
 from app.models.sync_config import SyncConfig
 from app.models.vos_health import VOSHealthCheck
+from app.models.dashboard_statistics import DashboardStatistics
 
 __all__ = [
     'Base',
@@ -19,11 +21,13 @@ __all__ = [
     'CDR',
     'Customer',
     'VosDataCache',
+    'VosDataBlob',
     'PhoneEnhanced',
     'Gateway',
     'FeeRateGroup',
     'Suite',
     'SyncConfig',
     'VOSHealthCheck',
+    'DashboardStatistics',
 ]
 
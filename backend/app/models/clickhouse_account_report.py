@@ -0,0 +1,166 @@
+"""
+ClickHouse 账户明细报表数据操作
+与 PostgreSQL account_detail_reports 双写，长时间范围的聚合查询（按账户/天/月、费用Top N）在这里完成
+"""
+from typing import List, Optional, Dict, Any
+from datetime import datetime, date, timezone
+from app.core.clickhouse_db import get_clickhouse_db
+import logging
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'account_detail_reports'
+
+CREATE_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {TABLE}
+(
+    vos_id UInt32,
+    vos_uuid String,
+    account String,
+    account_name String,
+    begin_time UInt64,
+    end_time UInt64,
+    report_date Date,
+    cdr_count UInt64,
+    total_fee Decimal(15, 4),
+    total_time UInt64,
+    total_suite_fee Decimal(15, 4),
+    total_suite_fee_time UInt64,
+    net_fee Decimal(15, 4),
+    net_time UInt64,
+    net_count UInt64,
+    local_fee Decimal(15, 4),
+    local_time UInt64,
+    local_count UInt64,
+    domestic_fee Decimal(15, 4),
+    domestic_time UInt64,
+    domestic_count UInt64,
+    international_fee Decimal(15, 4),
+    international_time UInt64,
+    international_count UInt64,
+    updated_at DateTime DEFAULT now()
+)
+ENGINE = ReplacingMergeTree(updated_at)
+PARTITION BY toYYYYMM(report_date)
+ORDER BY (vos_uuid, account, begin_time)
+"""
+
+# 聚合时求和的统计列
+SUM_COLUMNS = [
+    'cdr_count', 'total_fee', 'total_time', 'total_suite_fee', 'total_suite_fee_time',
+    'net_fee', 'net_time', 'net_count', 'local_fee', 'local_time', 'local_count',
+    'domestic_fee', 'domestic_time', 'domestic_count',
+    'international_fee', 'international_time', 'international_count',
+]
+FEE_COLUMNS = {'total_fee', 'total_suite_fee', 'net_fee', 'local_fee', 'domestic_fee', 'international_fee'}
+INSERT_COLUMNS = ['vos_id', 'vos_uuid', 'account', 'account_name', 'begin_time', 'end_time',
+                  'report_date', *SUM_COLUMNS, 'updated_at']
+
+# 分组维度 -> (分组表达式, 附加列)
+GROUP_KEYS = {
+    'account': ('account', ', any(account_name) AS account_name'),
+    'day': ('report_date', ''),
+    'month': ('toStartOfMonth(report_date)', ''),
+}
+
+
+class ClickHouseAccountReport:
+    """ClickHouse 账户明细报表操作"""
+
+    _table_ready = False
+
+    @classmethod
+    def ensure_table(cls):
+        """首次写入前确保表存在（已有部署不会重新执行初始化脚本）"""
+        if not cls._table_ready:
+            get_clickhouse_db().execute(CREATE_TABLE_SQL)
+            cls._table_ready = True
+
+    @staticmethod
+    def report_date(begin_time_ms: int) -> date:
+        """报表日期：起始时间戳对应的UTC日期（与PostgreSQL查询的日期口径一致）"""
+        return datetime.fromtimestamp((begin_time_ms or 0) / 1000.0, tz=timezone.utc).date()
+
+    @classmethod
+    def insert_reports(cls, rows: List[Dict[str, Any]]) -> int:
+        """
+        写入报表（rows 为 account_detail_reports 表的行字典），相同 (vos_uuid, account, begin_time)
+        的旧版本在后台合并时被替换
+        """
+        if not rows:
+            return 0
+        cls.ensure_table()
+        now = datetime.utcnow().replace(microsecond=0)
+        data = []
+        for row in rows:
+            item = {
+                'vos_id': row['vos_instance_id'],
+                'vos_uuid': str(row['vos_uuid'] or ''),
+                'account': row['account'],
+                'account_name': row.get('account_name') or '',
+                'begin_time': row.get('begin_time') or 0,
+                'end_time': row.get('end_time') or 0,
+                'report_date': cls.report_date(row.get('begin_time')),
+                'updated_at': now,
+            }
+            for column in SUM_COLUMNS:
+                item[column] = row.get(column) or 0
+            data.append(item)
+        return get_clickhouse_db().insert(TABLE, data, columns=INSERT_COLUMNS)
+
+    @staticmethod
+    def aggregate(
+        vos_uuid: str,
+        group_by: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        account: Optional[str] = None,
+        top: Optional[int] = None,
+        limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """
+        服务端聚合
+
+        Args:
+            group_by: account / day / month
+            top: 按费用总计取前N（不传则按分组键升序）
+        """
+        key_expr, extra = GROUP_KEYS[group_by]
+        conditions = ['vos_uuid = %(vos_uuid)s']
+        params: Dict[str, Any] = {'vos_uuid': str(vos_uuid)}
+        if start_date:
+            conditions.append('report_date >= %(start_date)s')
+            params['start_date'] = start_date
+        if end_date:
+            conditions.append('report_date <= %(end_date)s')
+            params['end_date'] = end_date
+        if account:
+            conditions.append('account = %(account)s')
+            params['account'] = account
+
+        sums = ', '.join(f'sum({column}) AS {column}' for column in SUM_COLUMNS)
+        order = 'total_fee DESC' if top else 'group_key'
+        params['limit'] = top or limit
+        query = f"""
+            SELECT
+                {key_expr} AS group_key{extra},
+                count() AS report_count,
+                uniqExact(account) AS account_count,
+                {sums}
+            FROM {TABLE} FINAL
+            WHERE {' AND '.join(conditions)}
+            GROUP BY group_key
+            ORDER BY {order}
+            LIMIT %(limit)s
+        """
+        result, columns = get_clickhouse_db().execute(query, params, with_column_types=True)
+        names = [name for name, _ in columns]
+        rows = []
+        for values in result:
+            row = dict(zip(names, values))
+            for column in FEE_COLUMNS:
+                row[column] = float(row[column] or 0)
+            if isinstance(row['group_key'], date):
+                row['group_key'] = row['group_key'].isoformat()
+            rows.append(row)
+        return rows
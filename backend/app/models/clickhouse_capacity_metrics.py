@@ -0,0 +1,316 @@
+"""
+ClickHouse 容量时序数据操作
+采样任务写入原始表，物化视图同步汇总到 1分钟/1小时/1天 三个粒度；
+查询时按时间范围和分桶大小选择最粗的可用粒度，在ClickHouse端完成分桶聚合
+"""
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timedelta
+from app.core.clickhouse_db import get_clickhouse_db
+import logging
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'vos_capacity_samples'
+INSERT_COLUMNS = ['vos_id', 'metric', 'gateway', 'ts', 'value']
+
+# 指标名称
+METRIC_CURRENT_CALLS = 'current_calls'
+METRIC_CALLER_GATEWAY_CALLS = 'caller_gateway_calls'
+METRIC_CALLEE_GATEWAY_CALLS = 'callee_gateway_calls'
+# 按网关的呼叫数只在有通话时写入，没有写入的采样时刻视为0：
+# 以实例总并发（每次采样成功都会写入）的样本数作为时间网格补零
+ZERO_FILLED_METRICS = {METRIC_CALLER_GATEWAY_CALLS, METRIC_CALLEE_GATEWAY_CALLS}
+
+# 汇总粒度：(表名, 粒度秒数, 保留天数)，按粒度从细到粗
+ROLLUPS: List[Tuple[str, int, Optional[int]]] = [
+    ('vos_capacity_1m', 60, 30),
+    ('vos_capacity_1h', 3600, 730),
+    ('vos_capacity_1d', 86400, None),
+]
+
+# 未指定分桶大小时的候选值（秒），按返回点数不超过 max_points 选择
+BUCKET_STEPS = [60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400, 7 * 86400, 30 * 86400]
+
+_ROLLUP_COLUMNS = """
+    vos_id UInt32,
+    metric LowCardinality(String),
+    gateway String,
+    bucket DateTime,
+    value_min SimpleAggregateFunction(min, Float64),
+    value_max SimpleAggregateFunction(max, Float64),
+    value_sum SimpleAggregateFunction(sum, Float64),
+    samples SimpleAggregateFunction(sum, UInt64)
+"""
+
+_BUCKET_EXPR = {
+    'vos_capacity_1m': 'toStartOfMinute(ts)',
+    'vos_capacity_1h': 'toStartOfHour(ts)',
+    'vos_capacity_1d': 'toStartOfDay(ts)',
+}
+
+CREATE_TABLE_SQL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {TABLE}
+    (
+        vos_id UInt32,
+        metric LowCardinality(String),
+        gateway String,
+        ts DateTime,
+        value Float64
+    )
+    ENGINE = MergeTree
+    PARTITION BY toYYYYMMDD(ts)
+    ORDER BY (vos_id, metric, gateway, ts)
+    TTL ts + INTERVAL 2 DAY
+    """,
+]
+for _table, _seconds, _days in ROLLUPS:
+    CREATE_TABLE_SQL.append(f"""
+    CREATE TABLE IF NOT EXISTS {_table}
+    ({_ROLLUP_COLUMNS})
+    ENGINE = AggregatingMergeTree
+    PARTITION BY {'toYear(bucket)' if _days is None else 'toYYYYMM(bucket)'}
+    ORDER BY (vos_id, metric, gateway, bucket)
+    {f'TTL bucket + INTERVAL {_days} DAY' if _days else ''}
+    """)
+    CREATE_TABLE_SQL.append(f"""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {_table}_mv TO {_table} AS
+    SELECT vos_id, metric, gateway, {_BUCKET_EXPR[_table]} AS bucket,
+           min(value) AS value_min, max(value) AS value_max, sum(value) AS value_sum, count() AS samples
+    FROM {TABLE}
+    GROUP BY vos_id, metric, gateway, bucket
+    """)
+
+
+def _interval(seconds: int) -> str:
+    """分桶大小对应的 INTERVAL 表达式（按天/小时/分钟对齐）"""
+    for unit, size in (('DAY', 86400), ('HOUR', 3600), ('MINUTE', 60)):
+        if seconds % size == 0:
+            return f'INTERVAL {seconds // size} {unit}'
+    return f'INTERVAL {seconds} SECOND'
+
+
+def choose_bucket(start: datetime, end: datetime, max_points: int) -> int:
+    """按返回点数上限选择分桶大小"""
+    span = max((end - start).total_seconds(), 60)
+    for step in BUCKET_STEPS:
+        if span / step <= max_points:
+            return step
+    return BUCKET_STEPS[-1]
+
+
+def choose_rollup(start: datetime, bucket_seconds: int, now: Optional[datetime] = None) -> Tuple[str, int]:
+    """
+    选择汇总表：粒度不超过分桶大小、且保留期覆盖查询起点的最粗粒度
+
+    Returns:
+        (表名, 实际分桶秒数)，分桶小于可用粒度时按粒度放大
+    """
+    now = now or datetime.utcnow()
+    candidates = [
+        (table, seconds) for table, seconds, days in ROLLUPS
+        if days is None or start >= now - timedelta(days=days)
+    ]
+    fitting = [(table, seconds) for table, seconds in candidates if seconds <= bucket_seconds]
+    table, seconds = fitting[-1] if fitting else candidates[0]
+    if bucket_seconds < seconds:
+        bucket_seconds = seconds
+    # 分桶必须是粒度的整数倍，否则边界桶会混入相邻桶的数据
+    bucket_seconds = (bucket_seconds + seconds - 1) // seconds * seconds
+    return table, bucket_seconds
+
+
+def zero_filled(value_min: float, value_max: float, value_sum: float, samples: int,
+                grid_samples: int) -> Optional[Tuple[float, float, float]]:
+    """
+    按采样网格补零后的 (最小, 最大, 平均)：网关在 grid_samples 次采样中只有 samples 次有通话，
+    其余采样按0计入（平均值除以网格样本数，有未写入的采样时最小值为0）
+
+    Returns:
+        网格和样本都为空时返回None
+    """
+    grid = max(grid_samples or 0, samples or 0)
+    if not grid:
+        return None
+    if (samples or 0) < grid:
+        value_min = min(value_min, 0.0) if samples else 0.0
+        value_max = max(value_max, 0.0) if samples else 0.0
+    return value_min, value_max, (value_sum or 0.0) / grid
+
+
+class ClickHouseCapacityMetrics:
+    """ClickHouse 容量时序操作"""
+
+    _table_ready = False
+
+    @classmethod
+    def ensure_table(cls):
+        """首次写入前确保表和物化视图存在（已有部署不会重新执行初始化脚本）"""
+        if not cls._table_ready:
+            db = get_clickhouse_db()
+            for sql in CREATE_TABLE_SQL:
+                db.execute(sql)
+            cls._table_ready = True
+
+    @classmethod
+    def insert_samples(cls, samples: List[Dict[str, Any]]) -> int:
+        """写入采样 [{vos_id, metric, gateway, ts, value}]，汇总由物化视图完成"""
+        if not samples:
+            return 0
+        cls.ensure_table()
+        return get_clickhouse_db().insert(TABLE, samples, columns=INSERT_COLUMNS)
+
+    @staticmethod
+    def series(
+        vos_id: int,
+        metric: str,
+        start: datetime,
+        end: datetime,
+        gateway: str = '',
+        bucket_seconds: Optional[int] = None,
+        max_points: int = 500
+    ) -> Dict[str, Any]:
+        """
+        服务端分桶查询单条时序
+
+        Returns:
+            {bucket_seconds, source, points: [{ts, min, max, avg, samples}]}
+        """
+        bucket_seconds = bucket_seconds or choose_bucket(start, end, max_points)
+        table, bucket_seconds = choose_rollup(start, bucket_seconds)
+        interval = _interval(bucket_seconds)
+        params = {
+            'vos_id': vos_id, 'metric': metric, 'gateway': gateway or '',
+            'grid_metric': METRIC_CURRENT_CALLS, 'start': start, 'end': end,
+        }
+        series_query = f"""
+            SELECT
+                toStartOfInterval(bucket, {interval}) AS ts,
+                min(value_min) AS value_min,
+                max(value_max) AS value_max,
+                sum(value_sum) AS value_sum,
+                sum(samples) AS samples
+            FROM {table}
+            WHERE vos_id = %(vos_id)s
+              AND metric = %(metric)s
+              AND gateway = %(gateway)s
+              AND bucket >= %(start)s
+              AND bucket < %(end)s
+            GROUP BY ts
+        """
+        if metric in ZERO_FILLED_METRICS and gateway:
+            # 以实例总并发的采样时刻为网格，网关没有通话的桶同样返回（补0）
+            query = f"""
+                SELECT g.ts, s.value_min, s.value_max, s.value_sum, s.samples, g.grid_samples
+                FROM (
+                    SELECT toStartOfInterval(bucket, {interval}) AS ts, sum(samples) AS grid_samples
+                    FROM {table}
+                    WHERE vos_id = %(vos_id)s
+                      AND metric = %(grid_metric)s
+                      AND gateway = ''
+                      AND bucket >= %(start)s
+                      AND bucket < %(end)s
+                    GROUP BY ts
+                ) AS g
+                LEFT JOIN ({series_query}) AS s ON s.ts = g.ts
+                ORDER BY g.ts
+            """
+        else:
+            query = f"""
+                SELECT ts, value_min, value_max, value_sum, samples, samples AS grid_samples
+                FROM ({series_query})
+                ORDER BY ts
+            """
+        points = []
+        for ts, value_min, value_max, value_sum, samples, grid_samples in get_clickhouse_db().execute(query, params):
+            filled = zero_filled(value_min, value_max, value_sum, samples, grid_samples)
+            if filled is None:
+                continue
+            points.append({
+                'ts': ts.isoformat(),
+                'min': filled[0],
+                'max': filled[1],
+                'avg': round(filled[2], 3),
+                'samples': grid_samples,
+            })
+        return {
+            'bucket_seconds': bucket_seconds,
+            'source': table,
+            'points': points,
+        }
+
+    @staticmethod
+    def peaks(
+        vos_id: int,
+        metric: str,
+        start: datetime,
+        end: datetime,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """
+        各网关（含实例级）在时间范围内的峰值与均值，按峰值降序
+        按网关的呼叫数以采样网格补零后求均值（没有通话的采样计为0，而不是只对有通话的分钟求平均）
+        """
+        table, _ = choose_rollup(start, 3600)
+        query = f"""
+            SELECT
+                gateway,
+                min(value_min) AS value_min,
+                max(value_max) AS value_max,
+                sum(value_sum) AS value_sum,
+                sum(samples) AS samples,
+                argMax(bucket, value_max) AS peak_at
+            FROM {table}
+            WHERE vos_id = %(vos_id)s
+              AND metric = %(metric)s
+              AND bucket >= %(start)s
+              AND bucket < %(end)s
+            GROUP BY gateway
+            ORDER BY value_max DESC
+            LIMIT %(limit)s
+        """
+        db = get_clickhouse_db()
+        params = {
+            'vos_id': vos_id, 'metric': metric, 'grid_metric': METRIC_CURRENT_CALLS,
+            'start': start, 'end': end, 'limit': limit,
+        }
+        result = db.execute(query, params)
+        grid_samples = 0
+        if metric in ZERO_FILLED_METRICS:
+            grid_samples = db.execute(f"""
+                SELECT sum(samples)
+                FROM {table}
+                WHERE vos_id = %(vos_id)s
+                  AND metric = %(grid_metric)s
+                  AND gateway = ''
+                  AND bucket >= %(start)s
+                  AND bucket < %(end)s
+            """, params)[0][0] or 0
+        peaks = []
+        for gateway, value_min, value_max, value_sum, samples, peak_at in result:
+            _, _, value_avg = zero_filled(value_min, value_max, value_sum, samples,
+                                          grid_samples if gateway else samples)
+            peaks.append({
+                'gateway': gateway,
+                'max': value_max,
+                'avg': round(value_avg, 3),
+                'peak_at': peak_at.isoformat(),
+            })
+        return peaks
+
+    @staticmethod
+    def list_series(vos_id: int, days: int = 7) -> List[Dict[str, Any]]:
+        """最近 days 天有数据的 (指标, 网关) 组合"""
+        query = """
+            SELECT metric, gateway, max(bucket) AS last_seen
+            FROM vos_capacity_1h
+            WHERE vos_id = %(vos_id)s
+              AND bucket >= now() - toIntervalDay(%(days)s)
+            GROUP BY metric, gateway
+            ORDER BY metric, gateway
+        """
+        result = get_clickhouse_db().execute(query, {'vos_id': vos_id, 'days': days})
+        return [
+            {'metric': metric, 'gateway': gateway, 'last_seen': last_seen.isoformat()}
+            for metric, gateway, last_seen in result
+        ]
@@ -1,5 +1,5 @@
 """Customer model for storing VOS customer data"""
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, Text, false, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.models.base import Base
@@ -15,24 +15,34 @@ class Customer(Base):
     
     # 客户基本信息
     account = Column(String(255), nullable=False, index=True)  # 客户账号
-    money = Column(Float, default=0.0)  # 当前余额
+    money = Column(Float, nullable=False, default=0.0, server_default='0')  # 当前余额
     limit_money = Column(Float, default=0.0)  # 授信额度
     
     # 状态标记
-    is_in_debt = Column(Boolean, default=False, index=True)  # 是否欠费 (money < 0)
+    is_in_debt = Column(Boolean, nullable=False, default=False, server_default=false(), index=True)  # 是否欠费 (money < 0)
     
     # 存储VOS返回的完整原始数据（JSON格式）
     raw_data = Column(Text, nullable=True)  # VOS接口返回的完整客户数据
+    content_hash = Column(String(32), nullable=True)  # 原始数据的内容哈希，同步时用于判断是否变化
     
     # 时间戳
     synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())  # 最后同步时间
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
-    # 复合索引：快速查询某个VOS实例的客户
+    # 复合索引：快速查询某个VOS实例的客户（唯一索引，批量同步时用作 ON CONFLICT 目标）
+    # 欠费客户单独建部分索引；客户分页列表：按欠费状态 / 余额的键集分页（以 id 结尾），账号前缀过滤
     __table_args__ = (
-        Index('idx_vos_account', 'vos_instance_id', 'account'),
-        Index('idx_vos_debt', 'vos_instance_id', 'is_in_debt'),
+        Index('uq_customers_vos_account', 'vos_instance_id', 'account', unique=True),
+        Index('idx_customers_debt_money', 'vos_instance_id', 'money', 'id', postgresql_where=is_in_debt),
+        Index('idx_customers_vos_debt_money', 'vos_instance_id', 'is_in_debt', 'money', 'id'),
+        Index('idx_customers_vos_money', 'vos_instance_id', 'money', 'id'),
+        Index('idx_customers_vos_account_prefix', 'vos_instance_id', 'account',
+              postgresql_ops={'account': 'text_pattern_ops'}),
+        # 跨实例搜索：三元组KNN（pg_trgm）+ 短关键字前缀
+        Index('idx_customers_account_trgm', 'account',
+              postgresql_using='gist', postgresql_ops={'account': 'gist_trgm_ops'}),
+        Index('idx_customers_account_lower', text('lower(account) text_pattern_ops')),
     )
     
     def __repr__(self):
@@ -0,0 +1,32 @@
+"""Dashboard statistics summary table, maintained incrementally by the syncs"""
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+
+class DashboardStatistics(Base):
+    """
+    仪表盘统计汇总表（每个实例一行）
+    客户数与余额合计由客户批量同步写入，健康状态由健康检查写入；
+    refresh_dashboard_statistics() 只用于定期全量校准
+    """
+    __tablename__ = 'dashboard_statistics'
+    
+    instance_id = Column(Integer, ForeignKey('vos_instances.id', ondelete='CASCADE'), primary_key=True)
+    
+    # 客户统计
+    total_customers = Column(Integer, nullable=False, default=0)
+    debt_customers = Column(Integer, nullable=False, default=0)
+    money_total = Column(Float, nullable=False, default=0.0, server_default='0')  # 余额合计
+    debt_money_total = Column(Float, nullable=False, default=0.0, server_default='0')  # 欠费客户余额合计
+    customers_synced_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # 健康状态
+    health_status = Column(String(20), nullable=False, default='unknown')
+    health_last_check = Column(DateTime(timezone=True), nullable=True)
+    health_response_time = Column(Float, nullable=True)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<DashboardStatistics VOS#{self.instance_id} customers={self.total_customers}>"
@@ -1,5 +1,5 @@
 """Gateway models for VOS gateway data"""
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, Text, text
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.sql import func
 from app.models.base import Base
@@ -182,8 +182,9 @@ class Gateway(Base):
     dynamic_black_list_in_standalone = Column(Boolean, default=False)  # dynamicBlackListInStandalone
     media_record = Column(Boolean, default=False)  # mediaRecord
     
-    # 存储完整的VOS原始数据（包括codecs数组等复杂数据）
+    # 存储完整的VOS原始配置数据（包括codecs数组等复杂数据，在线信息保存在上面的字段中）
     raw_data = Column(JSONB, nullable=True)
+    config_hash = Column(String(32), nullable=True)  # 配置的内容哈希，同步时用于判断是否变化
     
     # 时间戳
     synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -196,6 +197,10 @@ class Gateway(Base):
         Index('idx_gateway_online', 'vos_instance_id', 'is_online'),
         Index('idx_gateway_type', 'vos_instance_id', 'gateway_type'),
         Index('idx_gateway_account', 'vos_instance_id', 'account'),
+        # 跨实例搜索：三元组KNN（pg_trgm）+ 短关键字前缀
+        Index('idx_gateways_name_trgm', 'gateway_name',
+              postgresql_using='gist', postgresql_ops={'gateway_name': 'gist_trgm_ops'}),
+        Index('idx_gateways_name_lower', text('lower(gateway_name) text_pattern_ops')),
     )
     
     def __repr__(self):
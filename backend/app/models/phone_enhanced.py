@@ -1,5 +1,5 @@
 """Enhanced Phone model with more fields"""
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, Float, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from app.models.base import Base
@@ -47,6 +47,10 @@ class PhoneEnhanced(Base):
         Index('idx_phone_vos_e164', 'vos_instance_id', 'e164', unique=True),
         Index('idx_phone_account', 'vos_instance_id', 'account'),
         Index('idx_phone_online', 'vos_instance_id', 'is_online'),
+        # 跨实例搜索：三元组KNN（pg_trgm）+ 短关键字前缀
+        Index('idx_phones_enhanced_e164_trgm', 'e164',
+              postgresql_using='gist', postgresql_ops={'e164': 'gist_trgm_ops'}),
+        Index('idx_phones_enhanced_e164_lower', text('lower(e164) text_pattern_ops')),
     )
     
     def __repr__(self):
@@ -0,0 +1,28 @@
+"""Content-addressed blob store for large VOS API responses"""
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+
+class VosDataBlob(Base):
+    """
+    VOS 响应内容存储表（按内容哈希寻址）
+    大体积的响应只压缩存储一次，vos_data_cache 通过 content_hash 引用
+    """
+    __tablename__ = 'vos_data_blobs'
+
+    # SHA-256(规范化JSON)，同一内容只存一份
+    content_hash = Column(String(64), primary_key=True)
+
+    # 压缩后的响应数据
+    compression = Column(String(16), nullable=False, default='zlib')  # 压缩算法
+    data = Column(LargeBinary, nullable=False)
+
+    # 体积信息（便于统计压缩效果）
+    size_bytes = Column(Integer, nullable=False)  # 原始JSON字节数
+    compressed_size = Column(Integer, nullable=False)  # 压缩后字节数
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<VosDataBlob {self.content_hash[:8]} ({self.size_bytes}B -> {self.compressed_size}B)>"
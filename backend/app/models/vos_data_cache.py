@@ -4,6 +4,7 @@ from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.sql import func
 from app.models.base import Base
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 
 
 class VosDataCache(Base):
@@ -28,7 +29,11 @@ class VosDataCache(Base):
     query_params = Column(JSONB, nullable=True)
     
     # 响应数据（完整的VOS API响应）
-    response_data = Column(JSONB, nullable=False)
+    # 小响应内联存储；大响应存入 vos_data_blobs，此列为空，通过 content_hash 引用
+    response_data = Column(JSONB, nullable=True)
+    
+    # 响应内容哈希（SHA-256，用于判断内容是否变化及引用 vos_data_blobs）
+    content_hash = Column(String(64), nullable=True, index=True)
     
     # 状态信息
     is_valid = Column(Boolean, default=True, index=True)  # 数据是否有效
@@ -119,4 +124,37 @@ class VosDataCache(Base):
             return 86400  # 24小时
         else:
             return 300  # 默认5分钟
-
+    
+    # 各业务实体对应的API路径（用于缓存标签和按实体失效）
+    ENTITY_API_PATHS = {
+        'customer': [
+            '/external/server/GetCustomer',
+            '/external/server/GetAllCustomers',
+        ],
+        'phone': [
+            '/external/server/GetPhone',
+            '/external/server/GetPhoneOnline',
+            '/external/server/GetAllPhoneOnline',
+        ],
+        'gateway': [
+            '/external/server/GetGatewayMapping',
+            '/external/server/GetGatewayMappingOnline',
+            '/external/server/GetGatewayRouting',
+            '/external/server/GetGatewayRoutingOnline',
+        ],
+        'fee_rate': [
+            '/external/server/GetFeeRateGroup',
+            '/external/server/GetFeeRate',
+        ],
+        'suite': [
+            '/external/server/GetSuite',
+        ],
+    }
+    
+    @classmethod
+    def get_cache_entity(cls, api_path: str) -> Optional[str]:
+        """根据API路径返回其所属的业务实体（customer/phone/gateway/fee_rate/suite），没有则返回None"""
+        for entity, apis in cls.ENTITY_API_PATHS.items():
+            if api_path in apis:
+                return entity
+        return None
@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from app.models.base import Base
 
@@ -30,6 +30,14 @@ class VOSHealthCheck(Base):
     # 连续失败次数
     consecutive_failures = Column(Integer, default=0)
     
+    # 最近成功探测的响应时间样本 (毫秒，滚动窗口) 及其百分位
+    latency_history = Column(JSONB, nullable=True)
+    p50_ms = Column(Float, nullable=True)
+    p95_ms = Column(Float, nullable=True)
+    
+    # 下次探测时间 (失败时按指数退避推迟)
+    next_check_at = Column(DateTime(timezone=True), nullable=True)
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
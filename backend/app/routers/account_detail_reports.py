@@ -2,16 +2,19 @@
 账户明细报表API路由
 """
 from typing import Annotated, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 import logging
-from datetime import datetime, timezone
+from datetime import datetime, timezone, date
 
 from app.core.db import get_db
-from app.core.redis_cache import RedisCache
+from app.core.redis_cache import CacheTags
+from app.core.http_cache import cached_response, cache_response
 from app.models.user import User
 from app.models.vos_instance import VOSInstance
 from app.models.account_detail_report import AccountDetailReport
+from app.models.clickhouse_account_report import ClickHouseAccountReport, SUM_COLUMNS, FEE_COLUMNS
 from app.routers.auth import get_current_user
 
 router = APIRouter(prefix='/vos', tags=['账户明细报表'])
@@ -20,10 +23,14 @@ logger = logging.getLogger(__name__)
 
 @router.get('/instances/{instance_id}/account-detail-reports')
 async def get_account_detail_reports(
+    request: Request,
     instance_id: int,
     start_date: Optional[str] = Query(None, description='开始日期 YYYY-MM-DD'),
     end_date: Optional[str] = Query(None, description='结束日期 YYYY-MM-DD'),
     account: Optional[str] = Query(None, description='账户号码（可选）'),
+    group_by: Optional[str] = Query(None, regex='^(account|day|month)$', description='服务端聚合：按账户/天/月'),
+    top: Optional[int] = Query(None, ge=1, le=1000, description='按费用总计取前N（默认按账户聚合）'),
+    limit: int = Query(1000, ge=1, le=10000, description='返回的最大行数'),
     current_user: Annotated[User, Depends(get_current_user)] = None,
     db: Session = Depends(get_db)
 ):
@@ -35,15 +42,23 @@ async def get_account_detail_reports(
         start_date: 开始日期（可选）
         end_date: 结束日期（可选）
         account: 账户号码（可选，留空查询所有账户）
+        group_by: 聚合维度（可选），聚合查询由ClickHouse完成，不受明细行数限制
+        top: 费用Top N（可选）
     """
+    if top and not group_by:
+        group_by = 'account'
+    
     # Redis缓存键
-    cache_key = f'account_detail_reports_{instance_id}_{start_date or "all"}_{end_date or "all"}_{account or "all"}'
+    cache_key = (
+        f'account_detail_reports_{instance_id}_{start_date or "all"}_{end_date or "all"}_{account or "all"}'
+        f'_{group_by or "rows"}_{top or limit}'
+    )
     
-    # 尝试从Redis缓存读取（缓存5分钟）
-    cached_data = RedisCache.get(cache_key)
-    if cached_data is not None:
+    # 尝试从Redis缓存读取
+    cached = cached_response(request, cache_key)
+    if cached is not None:
         logger.debug(f"从Redis缓存读取实例 {instance_id} 的账户明细报表")
-        return cached_data
+        return cached
     
     instance = db.query(VOSInstance).filter(VOSInstance.id == instance_id).first()
     if not instance:
@@ -54,6 +69,12 @@ async def get_account_detail_reports(
     
     vos_uuid = instance.vos_uuid
     
+    if group_by:
+        response = _aggregate_reports(db, instance, group_by, start_date, end_date, account, top, limit)
+        return cache_response(request, cache_key, response, ttl=3600,
+                              tags=[CacheTags.instance(instance_id),
+                                    CacheTags.instance_entity(instance_id, CacheTags.ACCOUNT_REPORT)])
+    
     # 构建查询条件
     query = db.query(AccountDetailReport).filter(
         AccountDetailReport.vos_instance_id == instance_id,
@@ -90,7 +111,7 @@ async def get_account_detail_reports(
             raise HTTPException(status_code=400, detail='Invalid end_date format, should be YYYY-MM-DD')
     
     # 查询数据，按时间倒序
-    reports = query.order_by(AccountDetailReport.begin_time.desc()).limit(1000).all()
+    reports = query.order_by(AccountDetailReport.begin_time.desc()).limit(limit).all()
     
     # 构建响应
     response = {
@@ -131,8 +152,117 @@ async def get_account_detail_reports(
         'total_count': len(reports)
     }
     
-    # 写入Redis缓存（5分钟）
-    RedisCache.set(cache_key, response, ttl=300)
+    # 写入Redis缓存（报表同步后按标签失效，TTL仅作兜底）
+    return cache_response(request, cache_key, response, ttl=3600,
+                          tags=[CacheTags.instance(instance_id),
+                                CacheTags.instance_entity(instance_id, CacheTags.ACCOUNT_REPORT)])
+
+
+
+def _parse_date(value: Optional[str], name: str) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f'Invalid {name} format, should be YYYY-MM-DD')
+
+
+def _aggregate_reports(
+    db: Session,
+    instance: VOSInstance,
+    group_by: str,
+    start_date: Optional[str],
+    end_date: Optional[str],
+    account: Optional[str],
+    top: Optional[int],
+    limit: int
+) -> dict:
+    """
+    服务端聚合：优先由ClickHouse完成（按月分区 + 按账户排序，长时间范围也很快），
+    ClickHouse不可用时退回PostgreSQL聚合
+    """
+    start = _parse_date(start_date, 'start_date')
+    end = _parse_date(end_date, 'end_date')
+    
+    try:
+        rows = ClickHouseAccountReport.aggregate(
+            vos_uuid=str(instance.vos_uuid),
+            group_by=group_by,
+            start_date=start,
+            end_date=end,
+            account=account,
+            top=top,
+            limit=limit
+        )
+        data_source = 'clickhouse'
+    except Exception as e:
+        logger.error(f'ClickHouse 聚合查询失败，退回 PostgreSQL: {e}')
+        rows = _aggregate_reports_pg(db, instance, group_by, start, end, account, top, limit)
+        data_source = 'postgresql'
     
-    return response
+    return {
+        'instance_id': instance.id,
+        'instance_name': instance.name,
+        'group_by': group_by,
+        'top': top,
+        'groups': rows,
+        'total_count': len(rows),
+        'data_source': data_source
+    }
+
 
+def _aggregate_reports_pg(
+    db: Session,
+    instance: VOSInstance,
+    group_by: str,
+    start: Optional[date],
+    end: Optional[date],
+    account: Optional[str],
+    top: Optional[int],
+    limit: int
+) -> list:
+    """PostgreSQL 聚合（与 ClickHouse 结果格式一致，日期口径为起始时间的UTC日期）"""
+    report_date = func.date(func.timezone('UTC', func.to_timestamp(AccountDetailReport.begin_time / 1000.0)))
+    if group_by == 'account':
+        group_key = AccountDetailReport.account
+    elif group_by == 'day':
+        group_key = report_date
+    else:
+        group_key = func.date(func.date_trunc('month', report_date))
+    
+    columns = [
+        group_key.label('group_key'),
+        func.count().label('report_count'),
+        func.count(func.distinct(AccountDetailReport.account)).label('account_count'),
+        *[func.sum(getattr(AccountDetailReport, column)).label(column) for column in SUM_COLUMNS],
+    ]
+    if group_by == 'account':
+        columns.append(func.max(AccountDetailReport.account_name).label('account_name'))
+    
+    query = db.query(*columns).filter(
+        AccountDetailReport.vos_instance_id == instance.id,
+        AccountDetailReport.vos_uuid == instance.vos_uuid
+    )
+    if account:
+        query = query.filter(AccountDetailReport.account == account)
+    if start:
+        query = query.filter(report_date >= start)
+    if end:
+        query = query.filter(report_date <= end)
+    
+    query = query.group_by(group_key)
+    if top:
+        query = query.order_by(func.sum(AccountDetailReport.total_fee).desc()).limit(top)
+    else:
+        query = query.order_by(group_key).limit(limit)
+    
+    rows = []
+    for row in query.all():
+        item = dict(row._mapping)
+        for column in SUM_COLUMNS:
+            item[column] = float(item[column] or 0) if column in FEE_COLUMNS else int(item[column] or 0)
+        if isinstance(item['group_key'], date):
+            item['group_key'] = item['group_key'].isoformat()
+        rows.append(item)
+    return rows
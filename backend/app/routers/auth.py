@@ -8,7 +8,8 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from app.core.config import settings
-from app.core.db import get_db
+from app.core.db import get_db, SessionLocal
+from app.core import principal_cache
 from app.models.user import User
 from app.schemas.auth import Token, TokenData, UserLogin
 
@@ -48,28 +49,59 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({'exp': expire})
+    to_encode.update({'exp': expire, 'iat': datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)):
+def _principal_from_user(user: User) -> dict:
+    """可缓存的用户信息（不包含密码哈希）"""
+    return {'id': user.id, 'username': user.username, 'is_active': user.is_active}
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+    """
+    解析当前用户：进程内缓存 → Redis缓存(sub, iat) → 数据库
+    返回的 User 不绑定会话，需要修改用户时请在自己的会话中重新查询
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail='Could not validate credentials',
         headers={'WWW-Authenticate': 'Bearer'},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get('sub')
-        if username is None:
+    principal = principal_cache.get_local(token)
+    if principal is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            username: str = payload.get('sub')
+            if username is None:
+                raise credentials_exception
+            token_data = TokenData(username=username)
+        except JWTError:
             raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
+        iat = payload.get('iat')
+        principal = principal_cache.get_principal(token_data.username, iat)
+        if principal is None:
+            db = SessionLocal()
+            try:
+                user = db.query(User).filter(User.username == token_data.username).first()
+            finally:
+                db.close()
+            if user is None:
+                raise credentials_exception
+            principal = _principal_from_user(user)
+            principal_cache.set_principal(token_data.username, iat, principal)
+        principal_cache.set_local(token, principal, payload.get('exp'))
+    if principal.get('is_active') is False:
         raise credentials_exception
-    user = db.query(User).filter(User.username == token_data.username).first()
-    if user is None:
-        raise credentials_exception
-    return user
+    return User(**principal)
+
+def is_admin(user: User) -> bool:
+    return user.username in {name.strip() for name in settings.ADMIN_USERNAMES.split(',') if name.strip()}
+
+async def get_current_admin(current_user: Annotated[User, Depends(get_current_user)]):
+    """当前用户必须是管理员（settings.ADMIN_USERNAMES）"""
+    if not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='需要管理员权限')
+    return current_user
 
 @router.post('/login', response_model=Token)
 async def login(user_login: UserLogin, db: Session = Depends(get_db)):
@@ -115,8 +147,12 @@ async def change_password(
     db: Session = Depends(get_db)
 ):
     """修改当前用户密码"""
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='用户不存在')
+    
     # 验证旧密码
-    if not verify_password(request.old_password, current_user.hashed_password):
+    if not verify_password(request.old_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='旧密码不正确'
@@ -132,9 +168,10 @@ async def change_password(
     # 更新密码（使用 SHA256，因为我们之前的临时解决方案）
     import hashlib
     new_hash = hashlib.sha256(request.new_password.encode()).hexdigest()
-    current_user.hashed_password = new_hash
+    user.hashed_password = new_hash
     
     db.commit()
+    principal_cache.invalidate_principal(user.username)
     
     return {'message': '密码修改成功'}
 
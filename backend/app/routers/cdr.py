@@ -14,7 +14,9 @@ from openpyxl.styles import Font, Alignment, PatternFill
 
 from app.core.db import get_db
 from app.core.vos_client import VOSClient
+from app.core.vos_circuit_breaker import CircuitBreaker
 from app.core.vos_cache_service import VosCacheService
+from app.core.fast_json import FastJSONResponse
 from app.models.user import User
 from app.models.cdr import CDR
 from app.models.vos_instance import VOSInstance
@@ -158,6 +160,12 @@ async def query_cdrs_from_vos(
     page_size = min(1000, max(1, query_params.page_size))  # 限制最大1000条（手动查询允许更多数据）
     offset = (page - 1) * page_size
     
+    # VOS节点熔断中：强制VOS查询降级为本地查询，不等待超时
+    circuit_open = force_vos and CircuitBreaker(instance.base_url).is_open()
+    if circuit_open:
+        logger.warning(f'VOS实例 {instance.name} 熔断中，话单查询降级为 ClickHouse')
+        force_vos = False
+    
     # 1. 如果不强制VOS，先查 ClickHouse
     if not force_vos:
         try:
@@ -178,7 +186,8 @@ async def query_cdrs_from_vos(
             # 如果用户需要从VOS API刷新数据，可以使用 force_vos=True
             query_time = time.time() - start_time
             
-            return {
+            # ClickHouse行中的 datetime/Decimal 由orjson直接编码，不经过 jsonable_encoder
+            return FastJSONResponse({
                 'success': True,
                 'cdrs': local_cdrs,
                 'count': len(local_cdrs),
@@ -189,9 +198,10 @@ async def query_cdrs_from_vos(
                 'instance_id': instance_id,
                 'instance_name': instance.name,
                 'data_source': 'clickhouse',
+                'circuit_open': circuit_open,
                 'query_time_ms': round(query_time * 1000, 2),
                 'message': f'从 ClickHouse 查询到 {total_count} 条记录（第{page}/{max(1, (total_count + page_size - 1) // page_size)}页，速度：{round(query_time * 1000, 2)}ms）'
-            }
+            })
         except Exception as e:
             logger.error(f'ClickHouse 查询失败，尝试从 VOS API 查询: {e}')
             # ClickHouse 查询失败，继续从 VOS API 查询
@@ -232,7 +242,7 @@ async def query_cdrs_from_vos(
             'cdrs': [],
             'count': 0,
             'instance_name': instance.name,
-            'data_source': 'vos_api_error',
+            'data_source': 'vos_circuit_open' if client.is_circuit_open(result) else 'vos_api_error',
             'query_time_ms': round(vos_time * 1000, 2)
         }
     
@@ -282,7 +292,7 @@ async def query_cdrs_from_vos(
         except Exception as e:
             logger.error(f'触发 ClickHouse 存储任务失败: {e}')
     
-    return {
+    return FastJSONResponse({
         'success': True,
         'cdrs': cdrs,
         'count': len(cdrs),
@@ -295,7 +305,7 @@ async def query_cdrs_from_vos(
         'data_source': 'vos_api',
         'query_time_ms': round(vos_time * 1000, 2),
         'message': f'从VOS API查询到 {len(cdrs)} 条记录（总记录数：{total_count}，耗时：{round(vos_time * 1000, 2)}ms）'
-    }
+    })
 
 @router.get('/query-all-instances')
 async def query_cdrs_from_all_instances(
@@ -378,7 +388,8 @@ async def query_cdrs_from_all_instances(
                 'error': str(e)
             })
     
-    return {
+    # 话单量大，直接用orjson编码返回，跳过 jsonable_encoder
+    return FastJSONResponse({
         'cdrs': all_cdrs,
         'total_count': len(all_cdrs),
         'instances': instance_results,
@@ -389,7 +400,7 @@ async def query_cdrs_from_all_instances(
             'caller': caller,
             'callee': callee
         }
-    }
+    })
 
 
 @router.post('/export/{instance_id}')
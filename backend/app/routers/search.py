@@ -0,0 +1,43 @@
+"""
+全局搜索API路由（客户账号 / 网关名称 / 话机号码，跨所有VOS实例）
+"""
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+import logging
+import time
+
+from app.core.db import AsyncSessionLocal
+from app.core.fast_json import FastJSONResponse
+from app.core.search import SEARCH_TYPES, search_all
+from app.models.user import User
+from app.routers.auth import get_current_user
+
+router = APIRouter(prefix='/search', tags=['搜索'])
+logger = logging.getLogger(__name__)
+
+
+@router.get('')
+async def search(
+    current_user: Annotated[User, Depends(get_current_user)],
+    q: str = Query(..., min_length=1, max_length=64, description='关键字（少于3个字符时只按前缀匹配）'),
+    types: str = Query('customer,gateway,phone', description='搜索类型，逗号分隔：customer/gateway/phone'),
+    instance_id: Optional[int] = Query(None, description='只搜索指定实例'),
+    limit: int = Query(20, ge=1, le=100, description='每类最多返回条数'),
+):
+    """按关键字搜索客户、网关和话机，每类返回最匹配的前 limit 条（各类并发，超时的类型列在 incomplete 中）"""
+    keyword = q.strip()
+    if not keyword:
+        raise HTTPException(status_code=400, detail='搜索关键字不能为空')
+    selected = [t.strip() for t in types.split(',') if t.strip()]
+    unknown = [t for t in selected if t not in SEARCH_TYPES]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f'不支持的搜索类型: {",".join(unknown)}')
+
+    start = time.perf_counter()
+    result = {'query': keyword}
+    result.update(await search_all(AsyncSessionLocal, keyword, selected, instance_id=instance_id, limit=limit))
+    took_ms = (time.perf_counter() - start) * 1000
+    result['took_ms'] = round(took_ms, 2)
+    if took_ms > 100:
+        logger.warning(f'搜索 "{keyword}" 耗时 {took_ms:.0f}ms (类型: {",".join(selected)}, 未完成: {",".join(result["incomplete"])})')
+    return FastJSONResponse(result)
@@ -2,13 +2,15 @@
 同步管理API接口
 支持配置同步任务时间、手动触发同步
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional, Annotated
 from pydantic import BaseModel
 import logging
 
 from app.core.db import get_db
+from app.core import sync_progress
 from app.routers.auth import get_current_user
 from app.models.user import User
 from app.models.vos_instance import VOSInstance
@@ -196,6 +198,7 @@ async def manual_cdr_sync(
             # 使用现有的sync_all_instances_cdrs，但只同步一个节点
             # 这里简化处理，直接调用按天同步
             today = datetime.now().date()
+            sync_progress.start_run(total_tasks=params.days, instances_count=1, days=params.days)
             tasks = []
             for i in range(params.days):
                 sync_date = today - timedelta(days=i)
@@ -245,6 +248,31 @@ async def manual_cdr_sync(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get('/manual/cdr/progress')
+async def manual_cdr_sync_progress(
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """话单同步进度（含吞吐量和预计剩余时间）"""
+    try:
+        return sync_progress.progress_response()
+    except Exception as e:
+        logger.exception(f'获取同步进度失败: {e}')
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get('/manual/cdr/progress/stream')
+async def stream_manual_cdr_sync_progress(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """话单同步进度（SSE推送），手动触发同步后订阅，替代轮询"""
+    return StreamingResponse(
+        sync_progress.event_stream(request),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @router.post('/manual/customer')
 async def manual_customer_sync(
     params: ManualCustomerSync,
@@ -406,9 +434,9 @@ async def manual_account_detail_report_sync(
             if not instance.enabled:
                 raise HTTPException(status_code=400, detail='VOS节点未启用')
         
-        # 计算需要同步的日期列表
+        # 计算需要同步的日期范围（每个节点一个任务，一次覆盖整个范围）
         today = date.today()
-        sync_dates = [today - timedelta(days=i) for i in range(params.days)]
+        begin_date = today - timedelta(days=params.days - 1)
         
         if params.instance_id is None:
             # 全部节点
@@ -419,48 +447,31 @@ async def manual_account_detail_report_sync(
                     'message': '没有启用的VOS节点'
                 }
             
-            # 为每个实例和每天创建任务
             tasks = []
-            task_count = 0
             for inst in instances:
-                for i, sync_date in enumerate(sync_dates):
-                    # 延迟执行，避免对VOS服务器造成压力
-                    countdown = task_count * 5  # 每5秒创建一个任务
-                    task = sync_single_instance_account_detail_reports.apply_async(
-                        args=[inst.id, sync_date],
-                        countdown=countdown
-                    )
-                    tasks.append(str(task.id))
-                    task_count += 1
+                task = sync_single_instance_account_detail_reports.apply_async(
+                    args=[inst.id, begin_date.isoformat(), today.isoformat()]
+                )
+                tasks.append(str(task.id))
             
-            logger.info(f'用户 {current_user.username} 触发全部节点账户明细报表同步，{params.days}天，共{len(instances)}个节点，将创建{len(tasks)}个任务')
+            logger.info(f'用户 {current_user.username} 触发全部节点账户明细报表同步，{params.days}天，共{len(instances)}个节点')
             return {
                 'success': True,
-                'message': f'已启动全部节点的账户明细报表同步（最近{params.days}天，共{len(instances)}个节点），系统将创建{len(tasks)}个任务按计划延迟执行',
+                'message': f'已启动全部节点的账户明细报表同步（最近{params.days}天，共{len(instances)}个节点）',
                 'task_ids': tasks,
                 'days': params.days,
                 'instances_count': len(instances),
                 'tasks_count': len(tasks),
-                'note': '此任务会创建多个子任务，每个实例每天一个任务，任务将按计划延迟执行以避免VOS卡死'
+                'note': '每个节点一个任务，节点内按批次限流并发获取'
             }
         
         else:
             # 指定节点
-            instance = db.query(VOSInstance).filter(
-                VOSInstance.id == params.instance_id
-            ).first()
-            
-            if not instance:
-                raise HTTPException(status_code=404, detail='VOS节点不存在')
-            
-            if not instance.enabled:
-                raise HTTPException(status_code=400, detail='VOS节点未启用')
-            
             if params.days == 1:
-                # 单天同步，直接执行
+                # 单天同步：昨天
                 sync_date = today - timedelta(days=1)
                 task = sync_single_instance_account_detail_reports.apply_async(
-                    args=[params.instance_id, sync_date]
+                    args=[params.instance_id, sync_date.isoformat()]
                 )
                 
                 logger.info(f'用户 {current_user.username} 触发节点 {params.instance_id} ({instance.name}) 账户明细报表同步，日期: {sync_date}')
@@ -471,25 +482,20 @@ async def manual_account_detail_report_sync(
                     'target_date': sync_date.isoformat()
                 }
             else:
-                # 多天同步，创建多个任务
-                tasks = []
-                for i, sync_date in enumerate(sync_dates):
-                    # 延迟执行，避免对VOS服务器造成压力
-                    countdown = i * 5  # 每5秒创建一个任务
-                    task = sync_single_instance_account_detail_reports.apply_async(
-                        args=[params.instance_id, sync_date],
-                        countdown=countdown
-                    )
-                    tasks.append(str(task.id))
+                task = sync_single_instance_account_detail_reports.apply_async(
+                    args=[params.instance_id, begin_date.isoformat(), today.isoformat()]
+                )
                 
-                logger.info(f'用户 {current_user.username} 触发节点 {params.instance_id} ({instance.name}) 账户明细报表同步，{params.days}天，将创建{len(tasks)}个任务')
+                logger.info(f'用户 {current_user.username} 触发节点 {params.instance_id} ({instance.name}) 账户明细报表同步，{params.days}天')
                 return {
                     'success': True,
-                    'message': f'已启动节点 {instance.name} 的账户明细报表同步（最近{params.days}天），系统将创建{len(tasks)}个任务按计划延迟执行',
-                    'task_ids': tasks,
+                    'message': f'已启动节点 {instance.name} 的账户明细报表同步（最近{params.days}天）',
+                    'task_id': str(task.id),
+                    'task_ids': [str(task.id)],
                     'days': params.days,
-                    'tasks_count': len(tasks),
-                    'note': f'多天同步时会创建{params.days}个任务，任务将按计划延迟执行以避免VOS卡死'
+                    'tasks_count': 1,
+                    'begin_date': begin_date.isoformat(),
+                    'end_date': today.isoformat()
                 }
     
     except HTTPException:
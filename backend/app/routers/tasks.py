@@ -3,7 +3,8 @@
 提供Celery任务队列和同步任务的状态查询
 """
 from typing import Annotated
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
 import logging
@@ -11,7 +12,7 @@ import logging
 from app.core.db import get_db
 from app.models.user import User
 from app.routers.auth import get_current_user
-from app.tasks.celery_app import celery
+from app.core import task_registry, sync_progress
 from celery.result import AsyncResult
 
 router = APIRouter(prefix='/tasks', tags=['tasks'])
@@ -33,51 +34,25 @@ async def get_task_status(
     - recent_tasks: 最近任务列表
     """
     try:
-        # 获取Celery检查对象
-        inspect = celery.control.inspect()
+        # 读取任务登记表（由Worker信号和心跳维护，不再使用 inspect() 广播）
+        registry = task_registry.snapshot()
         
-        # 获取活跃任务
-        active_tasks = inspect.active()
-        active_count = 0
-        active_list = []
-        if active_tasks:
-            for worker, tasks in active_tasks.items():
-                active_count += len(tasks)
-                for task in tasks:
-                    active_list.append({
-                        'name': task.get('name', '').split('.')[-1],
-                        'worker': worker,
-                        'id': task.get('id', '')[:8]
-                    })
-        
-        # 获取计划任务（scheduled）
-        scheduled_tasks = inspect.scheduled()
-        scheduled_count = 0
-        if scheduled_tasks:
-            for worker, tasks in scheduled_tasks.items():
-                scheduled_count += len(tasks)
-        
-        # 获取保留任务（reserved）
-        reserved_tasks = inspect.reserved()
-        reserved_count = 0
-        if reserved_tasks:
-            for worker, tasks in reserved_tasks.items():
-                reserved_count += len(tasks)
-        
-        # 获取Worker状态
-        stats = inspect.stats()
-        worker_count = len(stats) if stats else 0
+        active_count = len(registry['active'])
+        active_list = [
+            {
+                'name': task['name'].split('.')[-1],
+                'worker': task['worker'],
+                'id': task['id'][:8]
+            }
+            for task in registry['active']
+        ]
+        scheduled_count = len(registry['scheduled'])
+        reserved_count = len(registry['reserved'])
+        worker_count = len(registry['workers'])
         
-        # 获取注册的定时任务
-        registered_tasks = inspect.registered()
-        registered_count = 0
         task_types = set()
-        if registered_tasks:
-            for worker, tasks in registered_tasks.items():
-                registered_count = len(tasks)
-                for task in tasks:
-                    if 'sync' in task.lower():
-                        task_types.add(task.split('.')[-1])
+        for worker in registry['workers'].values():
+            task_types.update(worker.get('task_types', []))
         
         # 构建响应
         return {
@@ -91,7 +66,9 @@ async def get_task_status(
                 'active': active_count,
                 'scheduled': scheduled_count,
                 'reserved': reserved_count,
-                'active_list': active_list[:5]  # 最多显示5个
+                'active_list': active_list[:5],  # 最多显示5个
+                'succeeded': registry['succeeded'],
+                'failed': registry['failed']
             },
             'sync_tasks': {
                 'registered_count': len(task_types),
@@ -248,17 +225,12 @@ async def get_cdr_sync_status(
                     'error': str(e)
                 })
         
-        # 检查任务是否正在运行
-        inspect = celery.control.inspect()
-        active_tasks = inspect.active()
-        is_syncing = False
-        
-        if active_tasks:
-            for worker, tasks in active_tasks.items():
-                for task in tasks:
-                    if 'sync_all_instances_cdrs' in task.get('name', '') or 'sync_cdrs_for_single_day' in task.get('name', ''):
-                        is_syncing = True
-                        break
+        # 检查任务是否正在运行（读取任务登记表）
+        try:
+            is_syncing = task_registry.is_task_running('sync_all_instances_cdrs', 'sync_cdrs_for_single_day')
+        except Exception as e:
+            logger.warning(f'读取任务登记表失败: {e}')
+            is_syncing = False
         
         # 转换最后同步时间到东八区
         latest_sync_str = None
@@ -302,80 +274,27 @@ async def get_cdr_sync_progress(
     """
     获取当前话单同步进度（实时）
     
-    从 Redis 获取正在进行的同步任务的详细进度
+    汇总 Redis 中各同步任务的进度哈希，包含吞吐量（客户/秒、话单/秒）和预计剩余时间
     """
     try:
-        from app.core.config import settings
-        import redis
-        import json
-        
-        # 连接 Redis
-        r = redis.from_url(settings.REDIS_URL)
-        
-        # 获取同步进度
-        progress_data = r.get('cdr_sync_progress')
-        
-        if not progress_data:
-            return {
-                'success': True,
-                'is_syncing': False,
-                'message': '当前没有正在进行的同步任务'
-            }
-        
-        # 解析进度数据
-        progress = json.loads(progress_data)
-        
-        # 计算进度百分比
-        progress_percent = 0
-        status = progress.get('status', 'unknown')
-        
-        if status == 'task_created':
-            # 任务刚创建，还未开始执行
-            progress_percent = 0
-        elif status == 'completed':
-            # 所有任务已完成
-            progress_percent = 100
-        elif status == 'syncing':
-            # 正在同步中
-            total_tasks = progress.get('total_tasks')
-            completed_tasks = progress.get('completed_tasks', 0)
-            
-            if total_tasks and total_tasks > 0:
-                # 多任务模式：使用任务完成进度
-                # 计算已完成任务的进度 + 当前任务的进度
-                current_task_progress = 0
-                if progress.get('current_customer_index') and progress.get('total_customers'):
-                    # 当前任务的客户进度（按比例）
-                    current_task_progress = (progress.get('current_customer_index', 0) / progress.get('total_customers', 1)) * (1 / total_tasks)
-                
-                progress_percent = round((completed_tasks / total_tasks) * 100 + current_task_progress * 100, 1)
-                progress_percent = min(progress_percent, 100)  # 确保不超过100%
-            else:
-                # 单任务模式：使用客户进度
-                if progress.get('current_customer_index') and progress.get('total_customers'):
-                    progress_percent = round((progress.get('current_customer_index', 0) / progress.get('total_customers', 1)) * 100, 1)
-        
-        return {
-            'success': True,
-            'is_syncing': status != 'completed',
-            'status': status,
-            'current_instance': progress.get('current_instance'),
-            'current_instance_id': progress.get('current_instance_id'),
-            'current_customer': progress.get('current_customer'),
-            'current_customer_index': progress.get('current_customer_index'),
-            'total_customers': progress.get('total_customers'),
-            'synced_count': progress.get('synced_count', 0),
-            'start_time': progress.get('start_time'),
-            'progress_percent': progress_percent,
-            'total_tasks': progress.get('total_tasks'),
-            'completed_tasks': progress.get('completed_tasks', 0),
-            'message': progress.get('message')
-        }
-        
+        return sync_progress.progress_response()
     except Exception as e:
         logger.exception(f'获取同步进度失败: {e}')
         return {
             'success': False,
             'error': str(e),
             'is_syncing': False
-        }
\ No newline at end of file
+        }
+
+
+@router.get('/cdr-sync-progress/stream')
+async def stream_cdr_sync_progress(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """话单同步进度（SSE推送，进度变化时推送，同步结束后关闭连接）"""
+    return StreamingResponse(
+        sync_progress.event_stream(request),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
\ No newline at end of file
@@ -1,22 +1,39 @@
 from typing import Annotated, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 import json
 import logging
+import time
 import uuid
 
-from app.core.db import get_db
+from app.core.db import get_db, get_async_db, SessionLocal
+from app.core import realtime_hub
+from app.core.realtime_hub import REALTIME_FEEDS, load_snapshot
 from app.core.vos_client import VOSClient
+from app.core.vos_circuit_breaker import CircuitBreaker
+from app.core.redis_cache import CacheTags
+from app.core.http_cache import cached_response, cache_response
+from app.core.fast_json import FastJSONResponse
+from app.core.customer_sync import CustomerBulkSync
+from app.core.customer_page import (
+    counter_total, customer_page_after, customer_page_conditions, customer_page_ordering,
+    decode_cursor, encode_cursor,
+)
 from app.models.user import User
 from app.models.vos_instance import VOSInstance
 from app.models.phone import Phone
 from app.models.customer import Customer
+from app.models.dashboard_statistics import DashboardStatistics
 from app.models.vos_health import VOSHealthCheck
 from app.models.cdr_statistics import VOSCdrStatistics, AccountCdrStatistics, GatewayCdrStatistics
 from app.models.account_detail_report import AccountDetailReport
-from datetime import date, datetime
-from sqlalchemy import and_, func, Integer
+from app.models.clickhouse_capacity_metrics import ClickHouseCapacityMetrics
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import and_, func, select, Integer
 from app.routers.auth import get_current_user
 from app.tasks.sync_tasks import sync_customers_for_instance, check_vos_instances_health
 from app.tasks.initial_sync_tasks import initial_sync_for_new_instance
@@ -39,23 +56,23 @@ class VOSInstanceUpdate(BaseModel):
 
 @router.get('/instances')
 async def get_instances(
+    request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取所有VOS实例（包括停用的），使用视图优化，带Redis缓存和健康检查优化"""
-    from app.core.redis_cache import RedisCache
     
     # 尝试从Redis缓存读取
     cache_key = 'vos_instances_list'
-    cached_data = RedisCache.get(cache_key)
-    if cached_data is not None:
+    cached = cached_response(request, cache_key)
+    if cached is not None:
         logger.debug("从Redis缓存读取实例列表")
-        return cached_data
+        return cached
     
     try:
         # 使用视图查询，简化SQL并提高性能
         from sqlalchemy import text
-        result = db.execute(text("""
+        result = await db.execute(text("""
             SELECT 
                 instance_id AS id,
                 instance_name AS name,
@@ -89,21 +106,20 @@ async def get_instances(
                 'health_error': row.health_error
             })
         
-        # 写入Redis缓存（1分钟，因为健康状态变化较快）
-        RedisCache.set(cache_key, result_list, ttl=60)
-        
-        return result_list
+        # 写入Redis缓存（健康检查完成后按标签失效，TTL仅作兜底）
+        return cache_response(request, cache_key, result_list, ttl=600, tags=[CacheTags.summary(CacheTags.HEALTH)])
     except Exception as e:
         logger.warning(f'使用视图查询失败，降级到原始查询: {e}')
-        # 降级到原始查询方法
-        instances = db.query(VOSInstance).all()
+        # 降级到原始查询方法（先回滚失败的事务）
+        await db.rollback()
+        instances = (await db.execute(select(VOSInstance).order_by(VOSInstance.id))).scalars().all()
         
         instance_ids = [inst.id for inst in instances]
         health_checks = {}
         if instance_ids:
-            health_check_list = db.query(VOSHealthCheck).filter(
-                VOSHealthCheck.vos_instance_id.in_(instance_ids)
-            ).all()
+            health_check_list = (await db.execute(
+                select(VOSHealthCheck).where(VOSHealthCheck.vos_instance_id.in_(instance_ids))
+            )).scalars().all()
             health_checks = {hc.vos_instance_id: hc for hc in health_check_list}
         
         result_list = []
@@ -123,8 +139,7 @@ async def get_instances(
             }
             result_list.append(instance_data)
         
-        RedisCache.set(cache_key, result_list, ttl=60)
-        return result_list
+        return cache_response(request, cache_key, result_list, ttl=600, tags=[CacheTags.summary(CacheTags.HEALTH)])
 
 @router.get('/instances/{instance_id}')
 async def get_instance(
@@ -154,15 +169,21 @@ async def get_instance_online_phones(
     if not instance:
         raise HTTPException(status_code=404, detail='Instance not found')
     
+    # 有订阅者时实时轮询者维护着最新快照，足够新则直接返回，不再调用VOS
+    snapshot = load_snapshot(instance_id, 'phones_online')
+    if snapshot and time.time() - snapshot['ts'] <= REALTIME_FEEDS['phones_online']['interval'] * 2:
+        phones = list(snapshot['items'].values())
+        return {'infoPhoneOnlines': phones, 'count': len(phones)}
+    
     # 调用 VOS API 获取在线话机（使用 GetAllPhoneOnline，无需参数）
     client = VOSClient(instance.base_url)
     res = client.post('/external/server/GetAllPhoneOnline', payload={})
     
-    # 检查 API 调用是否成功
+    # 检查 API 调用是否成功（节点熔断中返回503）
     if not client.is_success(res):
         error_msg = client.get_error_message(res)
         raise HTTPException(
-            status_code=500,
+            status_code=503 if client.is_circuit_open(res) else 500,
             detail=f'Failed to get online phones from VOS: {error_msg}'
         )
     
@@ -176,6 +197,67 @@ async def get_instance_online_phones(
     
     return {'infoPhoneOnlines': phones, 'count': len(phones)}
 
+def _realtime_instance(db: Session, instance_id: int, feed: str) -> VOSInstance:
+    if feed not in REALTIME_FEEDS:
+        raise HTTPException(status_code=404, detail=f'不支持的实时数据: {feed}，可选: {", ".join(REALTIME_FEEDS)}')
+    instance = db.query(VOSInstance).filter(VOSInstance.id == instance_id).first()
+    if not instance:
+        raise HTTPException(status_code=404, detail='Instance not found')
+    return instance
+
+@router.get('/instances/{instance_id}/realtime/{feed}/stream')
+async def stream_instance_realtime(
+    instance_id: int,
+    feed: str,
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: Session = Depends(get_db)
+):
+    """
+    实时数据推送（SSE）：先推送完整快照（event: snapshot），之后只推送差异（event: diff，
+    包含 added/changed 实体和 removed 实体ID）
+    
+    feed: phones_online / current_calls / gateway_mapping_online / gateway_routing_online
+    """
+    instance = _realtime_instance(db, instance_id, feed)
+    base_url = instance.base_url
+    db.close()
+    return StreamingResponse(
+        realtime_hub.sse_stream(request, instance_id, base_url, feed),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@router.websocket('/instances/{instance_id}/realtime/{feed}/ws')
+async def websocket_instance_realtime(
+    websocket: WebSocket,
+    instance_id: int,
+    feed: str,
+    token: str = Query(..., description='访问令牌（WebSocket无法携带Authorization头）')
+):
+    """实时数据推送（WebSocket），消息格式与SSE相同"""
+    try:
+        await get_current_user(token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    db = SessionLocal()
+    try:
+        instance = _realtime_instance(db, instance_id, feed)
+        base_url = instance.base_url
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    finally:
+        db.close()
+    
+    await websocket.accept()
+    try:
+        async for message in realtime_hub.hub.subscribe(instance_id, base_url, feed):
+            await websocket.send_json(message)
+    except WebSocketDisconnect:
+        pass
+
 @router.get('/instances/{instance_id}/phones')
 async def get_instance_phones(
     instance_id: int,
@@ -261,7 +343,7 @@ async def update_instance(
     # 清除Redis缓存，确保下次查询获取最新数据
     from app.core.redis_cache import RedisCache
     RedisCache.delete('vos_instances_list')
-    RedisCache.delete(f'vos_instance_{instance_id}_customers')
+    RedisCache.invalidate_tags([CacheTags.instance(instance_id)])
     
     return {
         'id': instance.id,
@@ -327,30 +409,34 @@ async def delete_instance(
 
 @router.get('/customers/summary')
 async def get_all_customers_summary(
+    request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取所有启用的 VOS 实例的客户总数（使用视图优化，带Redis缓存）"""
-    from app.core.redis_cache import RedisCache
+    """获取所有启用的 VOS 实例的客户总数（读取增量维护的汇总表，带Redis缓存）"""
     
     # 尝试从Redis缓存读取
     cache_key = 'customers_summary'
-    cached_data = RedisCache.get(cache_key)
-    if cached_data is not None:
-        logger.info("从Redis缓存读取客户统计")
-        return cached_data
+    cached = cached_response(request, cache_key)
+    if cached is not None:
+        logger.debug("从Redis缓存读取客户统计")
+        return cached
     
     try:
-        # 使用视图查询，简化SQL并提高性能
+        # 读取汇总表（由客户同步增量维护），不再每次聚合整张客户表
         from sqlalchemy import text
-        result = db.execute(text("""
+        result = await db.execute(text("""
             SELECT 
-                instance_id,
-                instance_name,
-                total_customers,
-                debt_customers
-            FROM vw_customer_statistics
-            ORDER BY instance_id
+                vi.id AS instance_id,
+                vi.name AS instance_name,
+                COALESCE(ds.total_customers, 0) AS total_customers,
+                COALESCE(ds.debt_customers, 0) AS debt_customers,
+                COALESCE(ds.money_total, 0) AS money_total,
+                COALESCE(ds.debt_money_total, 0) AS debt_money_total
+            FROM vos_instances vi
+            LEFT JOIN dashboard_statistics ds ON ds.instance_id = vi.id
+            WHERE vi.enabled = TRUE
+            ORDER BY vi.id
         """))
         
         rows = result.fetchall()
@@ -362,8 +448,8 @@ async def get_all_customers_summary(
                 'instance_count': 0,
                 'from_cache': True
             }
-            RedisCache.set(cache_key, result_data, ttl=300)
-            return result_data
+            return cache_response(request, cache_key, result_data, ttl=3600,
+                                  tags=[CacheTags.summary(CacheTags.CUSTOMER)])
         
         total_customers = 0
         instance_summaries = []
@@ -374,7 +460,9 @@ async def get_all_customers_summary(
                 'instance_id': row.instance_id,
                 'instance_name': row.instance_name,
                 'customer_count': row.total_customers or 0,
-                'debt_customer_count': row.debt_customers or 0
+                'debt_customer_count': row.debt_customers or 0,
+                'money_total': row.money_total or 0.0,
+                'debt_money_total': row.debt_money_total or 0.0
             })
         
         result_data = {
@@ -384,10 +472,9 @@ async def get_all_customers_summary(
             'from_cache': True
         }
         
-        # 写入Redis缓存（5分钟）
-        RedisCache.set(cache_key, result_data, ttl=300)
-        
-        return result_data
+        # 写入Redis缓存（客户同步后按标签失效，TTL仅作兜底）
+        return cache_response(request, cache_key, result_data, ttl=3600,
+                              tags=[CacheTags.summary(CacheTags.CUSTOMER)])
     except Exception as e:
         logger.error(f'获取客户统计失败: {e}', exc_info=True)
         return {
@@ -401,6 +488,7 @@ async def get_all_customers_summary(
 
 @router.get('/gateways/summary')
 async def get_all_gateways_summary(
+    request: Request,
     current_user: Annotated[User, Depends(get_current_user)],
     db: Session = Depends(get_db)
 ):
@@ -409,16 +497,15 @@ async def get_all_gateways_summary(
     返回：对接网关总数、落地网关总数、在线网关数
     优化：直接从数据库查询（不再调用外部VOS API），使用Redis缓存
     """
-    from app.core.redis_cache import RedisCache
     from app.models.gateway import Gateway
     from sqlalchemy import func
     
     # 尝试从Redis缓存读取
     cache_key = 'gateways_summary'
-    cached_data = RedisCache.get(cache_key)
-    if cached_data is not None:
-        logger.info("从Redis缓存读取网关统计")
-        return cached_data
+    cached = cached_response(request, cache_key)
+    if cached is not None:
+        logger.debug("从Redis缓存读取网关统计")
+        return cached
     
     try:
         instances = db.query(VOSInstance).filter(VOSInstance.enabled == True).all()
@@ -432,8 +519,8 @@ async def get_all_gateways_summary(
                 'instance_count': 0,
                 'from_cache': True
             }
-            RedisCache.set(cache_key, result, ttl=300)  # 缓存5分钟
-            return result
+            return cache_response(request, cache_key, result, ttl=3600,
+                                  tags=[CacheTags.summary(CacheTags.GATEWAY)])
         
         instance_ids = [inst.id for inst in instances]
         
@@ -498,10 +585,9 @@ async def get_all_gateways_summary(
             'from_cache': True
         }
         
-        # 写入Redis缓存（5分钟）
-        RedisCache.set(cache_key, result, ttl=300)
-        
-        return result
+        # 写入Redis缓存（网关同步后按标签失效，TTL仅作兜底）
+        return cache_response(request, cache_key, result, ttl=3600,
+                              tags=[CacheTags.summary(CacheTags.GATEWAY)])
         
     except Exception as e:
         logger.error(f'获取网关统计失败: {e}', exc_info=True)
@@ -521,7 +607,7 @@ async def get_debt_customers_count(
     current_user: Annotated[User, Depends(get_current_user)],
     db: Session = Depends(get_db)
 ):
-    """获取欠费客户数量（带Redis缓存）"""
+    """获取欠费客户数量（读取汇总表，带Redis缓存）"""
     from app.core.redis_cache import RedisCache
     
     # 尝试从Redis缓存读取
@@ -532,18 +618,18 @@ async def get_debt_customers_count(
         return cached_data
     
     try:
-        # 从本地数据库统计欠费客户数量
-        debt_count = db.query(Customer).filter(
-            Customer.is_in_debt == True
-        ).count()
+        # 读取客户同步维护的欠费计数（汇总表每个实例一行），不扫描客户表
+        debt_count = db.query(
+            func.coalesce(func.sum(DashboardStatistics.debt_customers), 0)
+        ).scalar()
         
         result = {
             'debt_count': debt_count,
             'success': True
         }
         
-        # 写入Redis缓存（5分钟）
-        RedisCache.set(cache_key, result, ttl=300)
+        # 写入Redis缓存（客户同步后按标签失效，TTL仅作兜底）
+        RedisCache.set(cache_key, result, ttl=3600, tags=[CacheTags.summary(CacheTags.CUSTOMER)])
         
         return result
     except Exception as e:
@@ -585,6 +671,7 @@ async def get_customers_by_instance(
 
 @router.get('/instances/{instance_id}/customers')
 async def get_instance_customers(
+    request: Request,
     instance_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
     db: Session = Depends(get_db),
@@ -593,16 +680,21 @@ async def get_instance_customers(
     """
     获取指定 VOS 实例的所有客户（详细版）
     三级缓存策略：Redis → PostgreSQL → VOS API
+    客户数可达数万，响应直接返回编码好的JSON（Redis中的缓存原样返回，不解码再编码）
     """
     from app.core.redis_cache import RedisCache
     
+    # Redis缓存键
+    cache_key = f'vos_instance_{instance_id}_customers'
+    if not refresh:
+        cached = cached_response(request, cache_key)
+        if cached is not None:
+            return cached
+    
     instance = db.query(VOSInstance).filter(VOSInstance.id == instance_id).first()
     if not instance:
         raise HTTPException(status_code=404, detail='VOS实例未找到')
     
-    # Redis缓存键
-    cache_key = f'vos_instance_{instance_id}_customers'
-    
     # 如果强制刷新，清除缓存并触发同步
     if refresh:
         RedisCache.delete(cache_key)
@@ -615,7 +707,7 @@ async def get_instance_customers(
             if client.is_success(result):
                 customers = result.get('infoCustomerBriefs', [])
                 logger.info(f'从VOS {instance.name} 获取到 {len(customers)} 个客户')
-                return {
+                return FastJSONResponse({
                     'customers': customers,
                     'count': len(customers),
                     'instance_id': instance_id,
@@ -623,7 +715,7 @@ async def get_instance_customers(
                     'from_cache': False,
                     'data_source': 'vos_api',
                     'message': '数据已从VOS刷新，后台同步进行中'
-                }
+                })
         except Exception as e:
             logger.error(f'从VOS {instance.name} 刷新客户数据失败: {e}')
             pass  # 失败则继续从数据库读取
@@ -658,10 +750,10 @@ async def get_instance_customers(
             'last_synced_at': latest_sync.isoformat() if latest_sync else None
         }
         
-        # 写入Redis缓存（5分钟）
-        RedisCache.set(cache_key, response, ttl=300)
-        
-        return response
+        # 写入Redis缓存（客户同步后按标签失效，TTL仅作兜底）
+        return cache_response(request, cache_key, response, ttl=3600,
+                              tags=[CacheTags.instance(instance_id),
+                                    CacheTags.instance_entity(instance_id, CacheTags.CUSTOMER)])
     
     # 3️⃣ 数据库没有数据，直接调用VOS API
     logger.info(f'本地数据库无数据，从VOS {instance.name} 获取客户列表')
@@ -689,36 +781,15 @@ async def get_instance_customers(
         customers_data = result.get('infoCustomerBriefs', [])
         logger.info(f'从VOS {instance.name} 获取到 {len(customers_data)} 个客户，开始保存到数据库')
         
-        # 同步保存到数据库（同步执行，确保立即可用）
-        for cust_data in customers_data:
-            account = cust_data.get('account')
-            if not account:
-                continue
-            
-            money = float(cust_data.get('money', 0.0))
-            limit_money = float(cust_data.get('limitMoney', 0.0))
-            is_in_debt = money < 0
-            
-            # 将完整的VOS客户数据保存为JSON字符串
-            raw_data_json = json.dumps(cust_data, ensure_ascii=False)
-            
-            new_customer = Customer(
-                vos_instance_id=instance_id,
-                account=account,
-                money=money,
-                limit_money=limit_money,
-                is_in_debt=is_in_debt,
-                raw_data=raw_data_json
-            )
-            db.add(new_customer)
-        
+        # 同步保存到数据库（批量写入，确保立即可用）
+        CustomerBulkSync(db, instance).sync(customers_data)
         db.commit()
         logger.info(f'已将 {len(customers_data)} 个客户数据保存到数据库')
         
         # 触发后台同步任务，确保后续数据更新
         sync_customers_for_instance.delay(instance_id)
         
-        return {
+        return FastJSONResponse({
             'customers': customers_data,
             'count': len(customers_data),
             'instance_id': instance_id,
@@ -726,7 +797,7 @@ async def get_instance_customers(
             'from_cache': False,
             'data_source': 'vos_api',
             'message': '数据已从VOS获取并保存到数据库，后台同步已启动'
-        }
+        })
         
     except Exception as e:
         logger.error(f'从VOS {instance.name} 获取客户数据失败: {e}')
@@ -738,6 +809,86 @@ async def get_instance_customers(
         )
 
 
+@router.get('/instances/{instance_id}/customers/page')
+async def get_instance_customers_page(
+    instance_id: int,
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_async_db),
+    cursor: Optional[str] = Query(None, description='上一页返回的 next_cursor，为空时取第一页'),
+    page_size: int = Query(50, ge=1, le=500),
+    sort: str = Query('account', regex='^(account|money)$'),
+    order: str = Query('asc', regex='^(asc|desc)$'),
+    status: str = Query('all', regex='^(all|normal|debt)$', description='all/normal/debt（欠费）'),
+    account_prefix: Optional[str] = Query(None, max_length=255, description='账号前缀'),
+    min_money: Optional[float] = Query(None, description='最小余额'),
+    max_money: Optional[float] = Query(None, description='最大余额'),
+):
+    """
+    指定 VOS 实例的客户分页列表（服务端排序、过滤，键集分页）
+    只读取当前页；总数和余额合计优先取客户同步维护的汇总表，
+    只有带账号前缀或余额范围过滤时才按索引统计匹配行数
+    """
+    instance = await db.get(VOSInstance, instance_id)
+    if not instance:
+        raise HTTPException(status_code=404, detail='VOS实例未找到')
+
+    conditions = customer_page_conditions(instance_id, status, account_prefix, min_money, max_money)
+
+    counters = await db.get(DashboardStatistics, instance_id)
+    total_customers = counters.total_customers if counters else 0
+    debt_customers = counters.debt_customers if counters else 0
+
+    if account_prefix or min_money is not None or max_money is not None:
+        total = (await db.execute(
+            select(func.count()).select_from(Customer).where(*conditions)
+        )).scalar() or 0
+    else:
+        total = counter_total(status, total_customers, debt_customers)
+
+    page_conditions = list(conditions)
+    if cursor:
+        try:
+            page_conditions.append(customer_page_after(sort, order, decode_cursor(sort, cursor)))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    rows = (await db.execute(
+        select(Customer.id, Customer.account, Customer.money, Customer.limit_money, Customer.is_in_debt)
+        .where(*page_conditions)
+        .order_by(*customer_page_ordering(sort, order))
+        .limit(page_size + 1)
+    )).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    synced_at = counters.customers_synced_at if counters else None
+    return FastJSONResponse({
+        'customers': [
+            {
+                'account': row.account,
+                'money': row.money,
+                'limitMoney': row.limit_money,
+                'is_in_debt': row.is_in_debt
+            }
+            for row in rows
+        ],
+        'count': len(rows),
+        'total': total,
+        'page_size': page_size,
+        'total_pages': (total + page_size - 1) // page_size,
+        'next_cursor': encode_cursor(sort, rows[-1]) if has_more else None,
+        'summary': {
+            'total_customers': total_customers,
+            'debt_customers': debt_customers,
+            'money_total': counters.money_total if counters else 0.0,
+            'debt_money_total': counters.debt_money_total if counters else 0.0,
+        },
+        'instance_id': instance_id,
+        'instance_name': instance.name,
+        'data_source': 'database',
+        'last_synced_at': synced_at.isoformat() if synced_at else None
+    })
+
+
 @router.post('/instances/{instance_id}/sync-customers')
 async def manual_sync_customers(
     instance_id: int,
@@ -764,14 +915,21 @@ async def get_all_instances_health(
     current_user: Annotated[User, Depends(get_current_user)],
     db: Session = Depends(get_db)
 ):
-    """获取所有VOS实例的健康状态"""
+    """获取所有VOS实例的健康状态（含延迟百分位和下次检查时间）"""
     instances = db.query(VOSInstance).filter(VOSInstance.enabled == True).all()
     
+    # 一次查询加载所有实例的健康检查记录
+    health_checks = {}
+    if instances:
+        health_checks = {
+            hc.vos_instance_id: hc for hc in db.query(VOSHealthCheck).filter(
+                VOSHealthCheck.vos_instance_id.in_([inst.id for inst in instances])
+            ).all()
+        }
+    
     results = []
     for inst in instances:
-        health_check = db.query(VOSHealthCheck).filter(
-            VOSHealthCheck.vos_instance_id == inst.id
-        ).first()
+        health_check = health_checks.get(inst.id)
         
         results.append({
             'instance_id': inst.id,
@@ -779,6 +937,10 @@ async def get_all_instances_health(
             'status': health_check.status if health_check else 'unknown',
             'last_check_at': health_check.last_check_at.isoformat() if health_check and health_check.last_check_at else None,
             'response_time_ms': health_check.response_time_ms if health_check else None,
+            'p50_ms': health_check.p50_ms if health_check else None,
+            'p95_ms': health_check.p95_ms if health_check else None,
+            'next_check_at': health_check.next_check_at.isoformat() if health_check and health_check.next_check_at else None,
+            'circuit': CircuitBreaker(inst.base_url).snapshot(),
             'consecutive_failures': health_check.consecutive_failures if health_check else 0,
             'error_message': health_check.error_message if health_check else None
         })
@@ -792,8 +954,8 @@ async def trigger_health_check(
     db: Session = Depends(get_db)
 ):
     """手动触发VOS实例健康检查"""
-    # 触发异步健康检查任务
-    check_vos_instances_health.delay()
+    # 触发异步健康检查任务（忽略退避，立即检查所有节点）
+    check_vos_instances_health.delay(force=True)
     
     return {
         'message': 'VOS实例健康检查已触发',
@@ -803,12 +965,13 @@ async def trigger_health_check(
 
 @router.get('/instances/{instance_id}/statistics')
 async def get_instance_statistics(
+    request: Request,
     instance_id: int,
     period_type: str = Query('day', regex='^(day|month|quarter|year)$'),
     start_date: Optional[str] = Query(None, description='开始日期 YYYY-MM-DD'),
     end_date: Optional[str] = Query(None, description='结束日期 YYYY-MM-DD'),
     current_user: Annotated[User, Depends(get_current_user)] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取VOS实例的统计数据（带Redis缓存）
@@ -819,18 +982,17 @@ async def get_instance_statistics(
         start_date: 开始日期（可选）
         end_date: 结束日期（可选）
     """
-    from app.core.redis_cache import RedisCache
     
     # Redis缓存键（包含所有查询参数）
     cache_key = f'vos_instance_{instance_id}_statistics_{period_type}_{start_date or "all"}_{end_date or "all"}'
     
-    # 尝试从Redis缓存读取（缓存5分钟）
-    cached_data = RedisCache.get(cache_key)
-    if cached_data is not None:
+    # 尝试从Redis缓存读取（If-None-Match 匹配时直接304）
+    cached = cached_response(request, cache_key)
+    if cached is not None:
         logger.debug(f"从Redis缓存读取实例 {instance_id} 的统计数据")
-        return cached_data
+        return cached
     
-    instance = db.query(VOSInstance).filter(VOSInstance.id == instance_id).first()
+    instance = await db.get(VOSInstance, instance_id)
     if not instance:
         raise HTTPException(status_code=404, detail='Instance not found')
     
@@ -840,7 +1002,7 @@ async def get_instance_statistics(
     vos_uuid = instance.vos_uuid
     
     # 构建查询条件
-    query = db.query(VOSCdrStatistics).filter(
+    query = select(VOSCdrStatistics).where(
         VOSCdrStatistics.vos_id == instance_id,
         VOSCdrStatistics.vos_uuid == vos_uuid,
         VOSCdrStatistics.period_type == period_type
@@ -849,52 +1011,54 @@ async def get_instance_statistics(
     if start_date:
         try:
             start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
-            query = query.filter(VOSCdrStatistics.statistic_date >= start_dt)
+            query = query.where(VOSCdrStatistics.statistic_date >= start_dt)
         except ValueError:
             raise HTTPException(status_code=400, detail='Invalid start_date format, should be YYYY-MM-DD')
     
     if end_date:
         try:
             end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
-            query = query.filter(VOSCdrStatistics.statistic_date <= end_dt)
+            query = query.where(VOSCdrStatistics.statistic_date <= end_dt)
         except ValueError:
             raise HTTPException(status_code=400, detail='Invalid end_date format, should be YYYY-MM-DD')
     
-    vos_stats = query.order_by(VOSCdrStatistics.statistic_date.desc()).limit(365).all()
+    vos_stats = (await db.execute(
+        query.order_by(VOSCdrStatistics.statistic_date.desc()).limit(365)
+    )).scalars().all()
     
     # 获取账户统计
-    account_query = db.query(AccountCdrStatistics).filter(
+    account_query = select(AccountCdrStatistics).where(
         AccountCdrStatistics.vos_id == instance_id,
         AccountCdrStatistics.vos_uuid == vos_uuid,
         AccountCdrStatistics.period_type == period_type
     )
     
     if start_date:
-        account_query = account_query.filter(AccountCdrStatistics.statistic_date >= start_dt)
+        account_query = account_query.where(AccountCdrStatistics.statistic_date >= start_dt)
     if end_date:
-        account_query = account_query.filter(AccountCdrStatistics.statistic_date <= end_dt)
+        account_query = account_query.where(AccountCdrStatistics.statistic_date <= end_dt)
     
-    account_stats = account_query.order_by(
+    account_stats = (await db.execute(account_query.order_by(
         AccountCdrStatistics.statistic_date.desc(),
         AccountCdrStatistics.total_fee.desc()
-    ).limit(1000).all()
+    ).limit(1000))).scalars().all()
     
     # 获取网关统计
-    gateway_query = db.query(GatewayCdrStatistics).filter(
+    gateway_query = select(GatewayCdrStatistics).where(
         GatewayCdrStatistics.vos_id == instance_id,
         GatewayCdrStatistics.vos_uuid == vos_uuid,
         GatewayCdrStatistics.period_type == period_type
     )
     
     if start_date:
-        gateway_query = gateway_query.filter(GatewayCdrStatistics.statistic_date >= start_dt)
+        gateway_query = gateway_query.where(GatewayCdrStatistics.statistic_date >= start_dt)
     if end_date:
-        gateway_query = gateway_query.filter(GatewayCdrStatistics.statistic_date <= end_dt)
+        gateway_query = gateway_query.where(GatewayCdrStatistics.statistic_date <= end_dt)
     
-    gateway_stats = gateway_query.order_by(
+    gateway_stats = (await db.execute(gateway_query.order_by(
         GatewayCdrStatistics.statistic_date.desc(),
         GatewayCdrStatistics.total_fee.desc()
-    ).limit(1000).all()
+    ).limit(1000))).scalars().all()
     
     response = {
         'instance_id': instance_id,
@@ -939,10 +1103,120 @@ async def get_instance_statistics(
         ]
     }
     
-    # 写入Redis缓存（5分钟）
-    RedisCache.set(cache_key, response, ttl=300)
-    
-    return response
+    # 写入Redis缓存（统计计算完成后按标签失效，TTL仅作兜底）
+    return cache_response(request, cache_key, response, ttl=3600,
+                          tags=[CacheTags.instance(instance_id),
+                                CacheTags.instance_entity(instance_id, CacheTags.STATISTICS)])
+
+
+def _parse_capacity_range(start: Optional[str], end: Optional[str], hours: int):
+    """时间范围（ISO时间，带时区的转换为UTC；不传则取最近 hours 小时）"""
+    def parse(value: str, name: str) -> datetime:
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f'Invalid {name} format, should be ISO datetime')
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+
+    end_dt = parse(end, 'end') if end else datetime.utcnow()
+    start_dt = parse(start, 'start') if start else end_dt - timedelta(hours=hours)
+    if start_dt >= end_dt:
+        raise HTTPException(status_code=400, detail='start must be earlier than end')
+    return start_dt, end_dt
+
+
+async def _capacity_instance(db: AsyncSession, instance_id: int) -> VOSInstance:
+    instance = await db.get(VOSInstance, instance_id)
+    if not instance:
+        raise HTTPException(status_code=404, detail='Instance not found')
+    return instance
+
+
+@router.get('/instances/{instance_id}/capacity')
+async def get_instance_capacity(
+    instance_id: int,
+    metric: str = Query('current_calls', description='指标：current_calls / caller_gateway_calls / callee_gateway_calls / perf.*'),
+    gateway: str = Query('', description='网关名称（实例级指标留空）'),
+    start: Optional[str] = Query(None, description='开始时间（ISO格式）'),
+    end: Optional[str] = Query(None, description='结束时间（ISO格式，默认当前时间）'),
+    hours: int = Query(24, ge=1, le=24 * 3650, description='未指定开始时间时查询最近N小时'),
+    bucket: Optional[int] = Query(None, ge=60, description='分桶大小（秒），不传按 max_points 自动选择'),
+    max_points: int = Query(500, ge=10, le=5000, description='自动分桶时的最大点数'),
+    current_user: Annotated[User, Depends(get_current_user)] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    容量时序（并发呼叫数/性能指标）：在ClickHouse端按分桶聚合，
+    按时间范围自动选择 1分钟/1小时/1天 汇总表，每个点返回 最小/最大/平均 值
+    """
+    instance = await _capacity_instance(db, instance_id)
+    start_dt, end_dt = _parse_capacity_range(start, end, hours)
+    try:
+        series = await run_in_threadpool(
+            ClickHouseCapacityMetrics.series, instance.id, metric, start_dt, end_dt,
+            gateway, bucket, max_points
+        )
+    except Exception as e:
+        logger.error(f'查询容量时序失败: {e}')
+        raise HTTPException(status_code=503, detail=f'容量时序查询失败: {e}')
+    return {
+        'instance_id': instance.id,
+        'instance_name': instance.name,
+        'metric': metric,
+        'gateway': gateway,
+        'start': start_dt.isoformat(),
+        'end': end_dt.isoformat(),
+        **series,
+    }
+
+
+@router.get('/instances/{instance_id}/capacity/peaks')
+async def get_instance_capacity_peaks(
+    instance_id: int,
+    metric: str = Query('caller_gateway_calls', description='指标'),
+    start: Optional[str] = Query(None, description='开始时间（ISO格式）'),
+    end: Optional[str] = Query(None, description='结束时间（ISO格式，默认当前时间）'),
+    hours: int = Query(24 * 7, ge=1, le=24 * 3650, description='未指定开始时间时查询最近N小时'),
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: Annotated[User, Depends(get_current_user)] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """各网关在时间范围内的并发峰值（及出现时间）与均值，按峰值降序，用于容量规划"""
+    instance = await _capacity_instance(db, instance_id)
+    start_dt, end_dt = _parse_capacity_range(start, end, hours)
+    try:
+        peaks = await run_in_threadpool(
+            ClickHouseCapacityMetrics.peaks, instance.id, metric, start_dt, end_dt, limit
+        )
+    except Exception as e:
+        logger.error(f'查询容量峰值失败: {e}')
+        raise HTTPException(status_code=503, detail=f'容量峰值查询失败: {e}')
+    return {
+        'instance_id': instance.id,
+        'metric': metric,
+        'start': start_dt.isoformat(),
+        'end': end_dt.isoformat(),
+        'peaks': peaks,
+    }
+
+
+@router.get('/instances/{instance_id}/capacity/series')
+async def get_instance_capacity_series(
+    instance_id: int,
+    days: int = Query(7, ge=1, le=365),
+    current_user: Annotated[User, Depends(get_current_user)] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """最近有数据的 (指标, 网关) 组合"""
+    instance = await _capacity_instance(db, instance_id)
+    try:
+        series = await run_in_threadpool(ClickHouseCapacityMetrics.list_series, instance.id, days)
+    except Exception as e:
+        logger.error(f'查询容量指标列表失败: {e}')
+        raise HTTPException(status_code=503, detail=f'容量指标列表查询失败: {e}')
+    return {'instance_id': instance.id, 'series': series}
 
 
 @router.post('/instances/{instance_id}/statistics/calculate')
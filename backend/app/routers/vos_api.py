@@ -4,15 +4,24 @@ VOS API 通用路由处理器
 """
 from typing import Annotated, Optional, Dict, Any, List
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
+import json
 import logging
 
-from app.core.db import get_db
+from app.core.db import get_db, get_async_db, SessionLocal
 from app.core.vos_cache_service import VosCacheService
+from app.core.redis_cache import RedisCache
+from app.core.cache_metrics import CacheMetrics
+from app.core.fast_json import FastJSONResponse
+from app.core.snapshot_diff import DeltaLog
 from app.models.user import User
 from app.models.vos_instance import VOSInstance
-from app.routers.auth import get_current_user
+from app.routers.auth import get_current_user, get_current_admin
 
 router = APIRouter(prefix='/vos-api', tags=['vos-api'])
 logger = logging.getLogger(__name__)
@@ -189,47 +198,34 @@ class VosApiResponse(BaseModel):
 
 # ==================== 通用查询函数 ====================
 
-async def query_vos_api(
-    instance_id: int,
-    api_path: str,
-    params: Dict[str, Any],
-    db: Session,
-    refresh: bool = False
+# 对于网关、费率组等API，空数组参数需要发送空对象
+EMPTY_LIST_FILTERED_APIS = {
+    '/external/server/GetGatewayMapping',
+    '/external/server/GetGatewayMappingOnline',
+    '/external/server/GetGatewayRouting',
+    '/external/server/GetGatewayRoutingOnline',
+    '/external/server/GetFeeRateGroup',
+    '/external/server/GetSuite'
+}
+
+VOS_API_PREFIX = '/external/server/'
+
+
+def normalize_params(api_path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """规范化查询参数（保证相同语义的请求得到相同的缓存键）"""
+    if api_path in EMPTY_LIST_FILTERED_APIS:
+        # 过滤空数组参数，过滤后参数为空则传空字典
+        return {k: v for k, v in params.items() if not (isinstance(v, list) and len(v) == 0)}
+    return params
+
+
+def build_api_response(
+    data: Optional[Dict[str, Any]],
+    source: str,
+    synced_at: Optional[str],
+    instance_name: str
 ) -> Dict[str, Any]:
-    """
-    通用的VOS API查询函数
-    实现三级缓存：Redis → PostgreSQL → VOS API
-    """
-    # 特殊处理：对于网关、费率组等API，空数组参数需要发送空对象
-    special_apis = [
-        '/external/server/GetGatewayMapping',
-        '/external/server/GetGatewayMappingOnline',
-        '/external/server/GetGatewayRouting',
-        '/external/server/GetGatewayRoutingOnline',
-        '/external/server/GetFeeRateGroup',
-        '/external/server/GetSuite'
-    ]
-    
-    if api_path in special_apis:
-        # 过滤空数组参数
-        filtered_params = {k: v for k, v in params.items() if not (isinstance(v, list) and len(v) == 0)}
-        # 如果过滤后参数为空，传空字典
-        params = filtered_params if filtered_params else {}
-    
-    # 验证VOS实例
-    instance = db.query(VOSInstance).filter(VOSInstance.id == instance_id).first()
-    if not instance:
-        raise HTTPException(status_code=404, detail='VOS实例不存在')
-    
-    # 使用缓存服务查询数据
-    cache_service = VosCacheService(db)
-    data, source = cache_service.get_cached_data(
-        vos_instance_id=instance_id,
-        api_path=api_path,
-        params=params,
-        force_refresh=refresh
-    )
-    
+    """生成统一格式的响应"""
     # 如果获取数据失败，返回错误
     if source == 'error' or data is None:
         return {
@@ -238,45 +234,119 @@ async def query_vos_api(
             'error': '从VOS获取数据失败',
             'data_source': source,
             'synced_at': None,
-            'instance_name': instance.name
+            'instance_name': instance_name
         }
     
     # 检查VOS API返回的retCode（即使有数据，retCode非0也应该标记为失败）
     ret_code = data.get('retCode', -999)
-    is_success = ret_code == 0
-    
-    # 获取同步时间
-    from app.models.vos_data_cache import VosDataCache
-    cache_key = VosCacheService.generate_cache_key(api_path, params)
-    cached = db.query(VosDataCache).filter(
-        VosDataCache.vos_instance_id == instance_id,
-        VosDataCache.api_path == api_path,
-        VosDataCache.cache_key == cache_key
-    ).first()
-    
-    synced_at = cached.synced_at.isoformat() if cached and cached.synced_at else None
-    
-    # 返回统一格式的响应
-    if is_success:
+    if ret_code == 0:
         return {
             'success': True,
             'data': data,  # VOS原始数据
             'error': None,
             'data_source': source,
             'synced_at': synced_at,
-            'instance_name': instance.name
-        }
-    else:
-        # retCode非0，即使有数据也标记为失败
-        error_msg = data.get('exception', f'VOS API返回错误: retCode={ret_code}')
-        return {
-            'success': False,
-            'data': data,  # 仍然返回原始数据，前端可以选择性使用
-            'error': error_msg,
-            'data_source': source,
-            'synced_at': synced_at,
-            'instance_name': instance.name
+            'instance_name': instance_name
         }
+    
+    # retCode非0，即使有数据也标记为失败
+    error_msg = data.get('exception', f'VOS API返回错误: retCode={ret_code}')
+    return {
+        'success': False,
+        'data': data,  # 仍然返回原始数据，前端可以选择性使用
+        'error': error_msg,
+        'data_source': source,
+        'synced_at': synced_at,
+        'instance_name': instance_name
+    }
+
+
+def _get_delta(instance_id: int, api_path: str, data: Optional[Dict[str, Any]], since: int) -> Dict[str, Any]:
+    """
+    ?since=<version> 的响应：能从环形缓冲衔接时返回合并后的差异，否则返回完整快照（full=True）
+    差异引擎中还没有快照时用本次查询结果建立
+    """
+    log = DeltaLog(instance_id, api_path)
+    delta = log.since(since)
+    if delta is not None:
+        return {'full': False, **delta}
+    snapshot = log.snapshot()
+    if snapshot is None and data is not None:
+        log.record(data)
+        snapshot = log.snapshot()
+    if snapshot is None:
+        return {'full': True, 'version': 0, 'count': 0, 'items': {}}
+    return {
+        'full': True,
+        'version': snapshot['version'],
+        'count': len(snapshot['items']),
+        'items': snapshot['items'],
+    }
+
+
+def _get_cached_data(instance_id: int, api_path: str, params: Dict[str, Any], refresh: bool):
+    """在线程池中执行同步的三级缓存查询（可能调用VOS接口，使用独立的同步会话）"""
+    db = SessionLocal()
+    try:
+        return VosCacheService(db).get_cached_data(
+            vos_instance_id=instance_id,
+            api_path=api_path,
+            params=params,
+            force_refresh=refresh
+        )
+    finally:
+        db.close()
+
+
+async def query_vos_api(
+    instance_id: int,
+    api_path: str,
+    params: Dict[str, Any],
+    db: AsyncSession,
+    refresh: bool = False,
+    since: Optional[int] = None
+) -> FastJSONResponse:
+    """
+    通用的VOS API查询函数
+    实现三级缓存：Redis → PostgreSQL → VOS API
+    数据库查询走异步会话，同步的缓存服务（含VOS HTTP调用）放到线程池执行，不阻塞事件循环
+    
+    since: 实时类接口的全量查询可传入上次得到的版本号，只返回之后的差异（data 为空，delta 为差异；
+           首次传 0 得到完整快照和版本号）
+    
+    直接返回 FastJSONResponse：VOS原始数据（如 GetAllCustomers 的数万条客户）不经过 jsonable_encoder
+    """
+    params = normalize_params(api_path, params)
+    
+    # 验证VOS实例
+    instance = await db.get(VOSInstance, instance_id)
+    if not instance:
+        raise HTTPException(status_code=404, detail='VOS实例不存在')
+    
+    # 使用缓存服务查询数据
+    data, source = await run_in_threadpool(_get_cached_data, instance_id, api_path, params, refresh)
+    if source == 'error' or data is None:
+        return FastJSONResponse(build_api_response(None, source, None, instance.name))
+    
+    # 获取同步时间
+    from app.models.vos_data_cache import VosDataCache
+    cache_key = VosCacheService.generate_cache_key(api_path, params)
+    synced_at = (await db.execute(
+        select(VosDataCache.synced_at).where(
+            VosDataCache.vos_instance_id == instance_id,
+            VosDataCache.api_path == api_path,
+            VosDataCache.cache_key == cache_key
+        )
+    )).scalar()
+    
+    synced_at = synced_at.isoformat() if synced_at else None
+    if since is not None and DeltaLog.supports(api_path, params) and source != 'error':
+        response = build_api_response(data, source, synced_at, instance.name)
+        if response['success']:
+            response['data'] = None
+            response['delta'] = await run_in_threadpool(_get_delta, instance_id, api_path, data, since)
+        return FastJSONResponse(response)
+    return FastJSONResponse(build_api_response(data, source, synced_at, instance.name))
 
 
 # ==================== 路由处理器 ====================
@@ -286,7 +356,7 @@ async def get_customer(
     instance_id: int,
     request: GetCustomerRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False, description="强制刷新")
 ):
     """查询账户"""
@@ -304,7 +374,7 @@ async def get_all_customers(
     instance_id: int,
     request: GetAllCustomersRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """获取所有账户账号"""
@@ -322,7 +392,7 @@ async def get_pay_history(
     instance_id: int,
     request: GetPayHistoryRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询缴费记录"""
@@ -340,7 +410,7 @@ async def get_consumption(
     instance_id: int,
     request: GetConsumptionRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询其它收入记录"""
@@ -358,7 +428,7 @@ async def get_customer_phone_book(
     instance_id: int,
     request: GetCustomerPhoneBookRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询账户电话簿"""
@@ -376,7 +446,7 @@ async def get_phone(
     instance_id: int,
     request: GetPhoneRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询话机"""
@@ -394,7 +464,7 @@ async def get_phone_online(
     instance_id: int,
     request: GetPhoneOnlineRequest = Body(default=GetPhoneOnlineRequest()),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询在线话机"""
@@ -411,8 +481,9 @@ async def get_phone_online(
 async def get_all_phone_online(
     instance_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
-    refresh: bool = Query(False)
+    db: AsyncSession = Depends(get_async_db),
+    refresh: bool = Query(False),
+    since: Optional[int] = Query(None, description='上次得到的版本号，只返回之后的差异')
 ):
     """获取所有在线话机"""
     return await query_vos_api(
@@ -420,7 +491,8 @@ async def get_all_phone_online(
         api_path='/external/server/GetAllPhoneOnline',
         params={},
         db=db,
-        refresh=refresh
+        refresh=refresh,
+        since=since
     )
 
 
@@ -429,7 +501,7 @@ async def get_gateway_mapping(
     instance_id: int,
     request: GetGatewayMappingRequest = Body(default=GetGatewayMappingRequest()),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询对接网关"""
@@ -447,8 +519,9 @@ async def get_gateway_mapping_online(
     instance_id: int,
     request: GetGatewayMappingOnlineRequest = Body(default=GetGatewayMappingOnlineRequest()),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    refresh: bool = Query(False)
+    db: AsyncSession = Depends(get_async_db),
+    refresh: bool = Query(False),
+    since: Optional[int] = Query(None, description='上次得到的版本号，只返回之后的差异')
 ):
     """查询在线对接网关"""
     return await query_vos_api(
@@ -456,7 +529,8 @@ async def get_gateway_mapping_online(
         api_path='/external/server/GetGatewayMappingOnline',
         params=request.dict(),
         db=db,
-        refresh=refresh
+        refresh=refresh,
+        since=since
     )
 
 
@@ -465,7 +539,7 @@ async def get_gateway_routing(
     instance_id: int,
     request: GetGatewayRoutingRequest = Body(default=GetGatewayRoutingRequest()),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询落地网关"""
@@ -483,8 +557,9 @@ async def get_gateway_routing_online(
     instance_id: int,
     request: GetGatewayRoutingOnlineRequest = Body(default=GetGatewayRoutingOnlineRequest()),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    refresh: bool = Query(False)
+    db: AsyncSession = Depends(get_async_db),
+    refresh: bool = Query(False),
+    since: Optional[int] = Query(None, description='上次得到的版本号，只返回之后的差异')
 ):
     """查询在线落地网关"""
     return await query_vos_api(
@@ -492,7 +567,8 @@ async def get_gateway_routing_online(
         api_path='/external/server/GetGatewayRoutingOnline',
         params=request.dict(),
         db=db,
-        refresh=refresh
+        refresh=refresh,
+        since=since
     )
 
 
@@ -501,8 +577,9 @@ async def get_current_call(
     instance_id: int,
     request: GetCurrentCallRequest = Body(default=GetCurrentCallRequest()),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    refresh: bool = Query(False)
+    db: AsyncSession = Depends(get_async_db),
+    refresh: bool = Query(False),
+    since: Optional[int] = Query(None, description='上次得到的版本号，只返回之后的差异')
 ):
     """查询当前通话"""
     return await query_vos_api(
@@ -510,7 +587,8 @@ async def get_current_call(
         api_path='/external/server/GetCurrentCall',
         params=request.dict(),
         db=db,
-        refresh=refresh
+        refresh=refresh,
+        since=since
     )
 
 
@@ -519,7 +597,7 @@ async def get_cdr(
     instance_id: int,
     request: GetCdrRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询历史话单(CDR)"""
@@ -537,7 +615,7 @@ async def get_available_time(
     instance_id: int,
     request: GetAvailableTimeRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """获取可用通话时长"""
@@ -555,7 +633,7 @@ async def get_ivr_second_available_time(
     instance_id: int,
     request: GetIvrSecondAvailableTimeRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """获取IVR第二路可用通话时长"""
@@ -573,7 +651,7 @@ async def get_fee_rate_group(
     instance_id: int,
     request: GetFeeRateGroupRequest = Body(default=GetFeeRateGroupRequest()),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询费率组"""
@@ -591,7 +669,7 @@ async def get_fee_rate(
     instance_id: int,
     request: GetFeeRateRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询费率"""
@@ -609,7 +687,7 @@ async def get_suite(
     instance_id: int,
     request: GetSuiteRequest = Body(default=GetSuiteRequest()),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询套餐"""
@@ -627,7 +705,7 @@ async def get_suite_order(
     instance_id: int,
     request: GetSuiteOrderRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询套餐订单"""
@@ -645,7 +723,7 @@ async def get_current_suite(
     instance_id: int,
     request: GetCurrentSuiteRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询生效套餐"""
@@ -663,7 +741,7 @@ async def get_active_phone_card(
     instance_id: int,
     request: GetActivePhoneCardRequest = Body(default=GetActivePhoneCardRequest()),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询在用电话卡"""
@@ -681,7 +759,7 @@ async def get_binded_e164(
     instance_id: int,
     request: GetBindedE164Request,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询绑定号码"""
@@ -699,7 +777,7 @@ async def get_phone_card(
     instance_id: int,
     request: GetPhoneCardRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询电话卡"""
@@ -717,7 +795,7 @@ async def get_report_customer_fee(
     instance_id: int,
     request: GetReportCustomerFeeRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询账户明细报表"""
@@ -735,7 +813,7 @@ async def get_report_phone_fee(
     instance_id: int,
     request: GetReportPhoneFeeRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询话机明细报表"""
@@ -753,7 +831,7 @@ async def get_report_customer_location_fee(
     instance_id: int,
     request: GetReportCustomerLocationFeeRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询账户地区明细报表"""
@@ -771,7 +849,7 @@ async def get_e164_convert(
     instance_id: int,
     request: GetE164ConvertRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询号码变换表"""
@@ -788,7 +866,7 @@ async def get_e164_convert(
 async def get_soft_switch(
     instance_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询软交换"""
@@ -805,7 +883,7 @@ async def get_soft_switch(
 async def get_performance(
     instance_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """查询性能"""
@@ -822,7 +900,7 @@ async def get_performance(
 async def get_alarm_current(
     instance_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """获取当前告警"""
@@ -840,7 +918,7 @@ async def get_ivr_audio(
     instance_id: int,
     request: GetIvrAudioRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh: bool = Query(False)
 ):
     """获取IVR语音"""
@@ -853,6 +931,119 @@ async def get_ivr_audio(
     )
 
 
+# ==================== 批量查询接口 ====================
+
+# 单次批量查询的最大条目数
+BATCH_MAX_ITEMS = 50
+
+# 批量查询只允许本路由已开放的只读查询接口（不代理 Create*/Modify*/Delete* 等写操作）
+BATCH_ALLOWED_APIS = frozenset(f'{VOS_API_PREFIX}{name}' for name in (
+    'GetCustomer', 'GetAllCustomers', 'GetPayHistory', 'GetConsumption', 'GetCustomerPhoneBook',
+    'GetPhone', 'GetPhoneOnline', 'GetAllPhoneOnline',
+    'GetGatewayMapping', 'GetGatewayMappingOnline', 'GetGatewayRouting', 'GetGatewayRoutingOnline',
+    'GetCurrentCall', 'GetCdr', 'GetAvailableTime', 'GetIvrSecondAvailableTime',
+    'GetFeeRateGroup', 'GetFeeRate', 'GetSuite', 'GetSuiteOrder', 'GetCurrentSuite',
+    'GetActivePhoneCard', 'GetBindedE164', 'GetPhoneCard',
+    'GetReportCustomerFee', 'GetReportPhoneFee', 'GetReportCustomerLocationFee',
+    'GetE164Convert', 'GetSoftSwitch', 'GetPerformance', 'GetAlarmCurrent', 'GetIvrAudio',
+))
+
+
+def resolve_batch_api_path(api_path: str) -> Optional[str]:
+    """批量查询条目的API路径（接受完整路径或名称），不在允许列表中返回None"""
+    path = api_path if api_path.startswith('/') else f'{VOS_API_PREFIX}{api_path}'
+    return path if path in BATCH_ALLOWED_APIS else None
+
+
+class BatchQueryItem(BaseModel):
+    """批量查询条目"""
+    instance_id: int = Field(..., description="VOS实例ID")
+    api_path: str = Field(..., description="API路径或名称，如 /external/server/GetPerformance 或 GetPerformance")
+    params: Dict[str, Any] = Field(default_factory=dict, description="查询参数")
+
+
+class BatchQueryRequest(BaseModel):
+    """批量查询"""
+    items: List[BatchQueryItem] = Field(..., description="查询列表")
+    refresh: bool = Field(False, description="强制刷新")
+
+
+@router.post('/batch')
+def batch_query(
+    request: BatchQueryRequest,
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: Session = Depends(get_db),
+    stream: bool = Query(False, description="按完成顺序以 NDJSON 流式返回")
+):
+    """
+    批量查询VOS API（一次HTTP请求完成多个查询）
+    
+    所有缓存键一次Redis MGET + 一次PostgreSQL查询解析，未命中的并发从VOS获取。
+    默认按请求顺序返回 results；stream=true 时每完成一条输出一行 {"index": n, ...}
+    只允许只读的 Get* 查询接口（见 BATCH_ALLOWED_APIS）。
+    数据库和VOS调用都是阻塞的，定义为同步函数由线程池执行，不阻塞事件循环
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail='items 不能为空')
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f'单次最多查询 {BATCH_MAX_ITEMS} 条')
+    
+    items = []
+    for item in request.items:
+        api_path = resolve_batch_api_path(item.api_path)
+        if api_path is None:
+            raise HTTPException(status_code=400, detail=f'不支持的API路径: {item.api_path}')
+        items.append((item.instance_id, api_path, normalize_params(api_path, item.params)))
+    
+    # 一次查询验证所有实例
+    instance_ids = {instance_id for instance_id, _, _ in items}
+    instance_names = dict(
+        db.query(VOSInstance.id, VOSInstance.name).filter(VOSInstance.id.in_(instance_ids)).all()
+    )
+    
+    valid_indices = [i for i, (instance_id, _, _) in enumerate(items) if instance_id in instance_names]
+    valid_items = [items[i] for i in valid_indices]
+    
+    resolved, misses = VosCacheService(db).resolve_batch(valid_items, force_refresh=request.refresh)
+    
+    def item_response(index: int, result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        instance_id, api_path, _ = items[index]
+        if instance_id not in instance_names:
+            response = {
+                'success': False, 'data': None, 'error': 'VOS实例不存在',
+                'data_source': 'error', 'synced_at': None, 'instance_name': None
+            }
+        else:
+            response = build_api_response(
+                result['data'], result['source'], result['synced_at'], instance_names[instance_id]
+            )
+        return {'index': index, 'instance_id': instance_id, 'api_path': api_path, **response}
+    
+    def iter_results():
+        # 实例不存在的条目与缓存命中的条目立即返回，再按完成顺序返回从VOS获取的条目
+        for index, (instance_id, _, _) in enumerate(items):
+            if instance_id not in instance_names:
+                yield item_response(index, None)
+        for valid_index, result in resolved.items():
+            yield item_response(valid_indices[valid_index], result)
+        for valid_index, result in VosCacheService.fetch_batch_misses(valid_items, misses):
+            yield item_response(valid_indices[valid_index], result)
+    
+    if stream:
+        return StreamingResponse(
+            (json.dumps(line, ensure_ascii=False, default=str) + '\n' for line in iter_results()),
+            media_type='application/x-ndjson'
+        )
+    
+    results = sorted(iter_results(), key=lambda r: r['index'])
+    return {
+        'success': True,
+        'total': len(results),
+        'success_count': sum(1 for r in results if r['success']),
+        'results': results
+    }
+
+
 # ==================== 缓存管理接口 ====================
 
 @router.delete('/instances/{instance_id}/cache')
@@ -875,6 +1066,61 @@ async def clear_cache(
     }
 
 
+# 按前缀清除只允许VOS接口缓存的命名空间（同一Redis库还保存Celery队列、任务结果等）
+INVALIDATE_PREFIX_NAMESPACE = 'vos_cache:'
+
+
+def validate_invalidate_prefix(prefix: str) -> str:
+    """按前缀清除的前缀必须位于 vos_cache: 命名空间内，否则抛出400"""
+    if not prefix.startswith(INVALIDATE_PREFIX_NAMESPACE):
+        raise HTTPException(status_code=400, detail=f'prefix 必须以 {INVALIDATE_PREFIX_NAMESPACE} 开头')
+    return prefix
+
+
+class InvalidateCacheRequest(BaseModel):
+    """按标签/前缀清除缓存"""
+    tags: List[str] = Field(default_factory=list, description="缓存标签，如 instance:1:entity:customer、summary:gateway")
+    prefix: Optional[str] = Field(None, description="Redis键前缀，必须以 vos_cache: 开头，如 vos_cache:1:")
+
+
+@router.post('/cache/invalidate')
+def invalidate_cache_by_tags(
+    request: InvalidateCacheRequest,
+    current_user: Annotated[User, Depends(get_current_admin)],
+    db: Session = Depends(get_db)
+):
+    """按标签（Redis + PostgreSQL）或前缀（仅Redis，限 vos_cache: 命名空间）清除缓存，仅管理员"""
+    if not request.tags and not request.prefix:
+        raise HTTPException(status_code=400, detail='必须指定 tags 或 prefix')
+    prefix = validate_invalidate_prefix(request.prefix) if request.prefix else None
+    
+    result = {'redis': 0, 'database': 0}
+    if request.tags:
+        result = VosCacheService(db).invalidate_tags(request.tags)
+    if prefix:
+        result['redis'] += RedisCache.delete_prefix(prefix)
+    
+    return {
+        'success': True,
+        'invalidated': result,
+        'message': f'缓存已清除 (tags={request.tags}, prefix={request.prefix or "-"})'
+    }
+
+
+@router.get('/cache/metrics')
+async def get_cache_metrics(
+    current_user: Annotated[User, Depends(get_current_user)],
+    instance_id: Optional[int] = Query(None, description="VOS实例ID，不指定则返回所有实例"),
+    top_n: int = Query(20, ge=1, le=200, description="热点键数量")
+):
+    """获取缓存指标：各接口按层级的命中次数、未命中延迟、VOS调用延迟、响应体大小及热点键"""
+    return {
+        'success': True,
+        'instance_id': instance_id,
+        'metrics': await run_in_threadpool(CacheMetrics.snapshot, vos_instance_id=instance_id, top_n=top_n)
+    }
+
+
 @router.get('/instances/{instance_id}/cache/stats')
 async def get_cache_stats(
     instance_id: int,
@@ -1,17 +1,17 @@
 """
 账户明细报表同步任务
-每天定时从VOS API获取所有账户的前一天明细报表
+每天定时从VOS API获取所有账户的明细报表（每个实例一个任务，一次覆盖整个日期范围）
 """
 from app.tasks.celery_app import celery
 from app.core.db import SessionLocal
 from app.models.vos_instance import VOSInstance
 from app.models.customer import Customer
-from app.models.account_detail_report import AccountDetailReport
-from app.core.vos_client import VOSClient
+from app.core.account_report_sync import AccountReportSync
+from app.models.clickhouse_account_report import ClickHouseAccountReport
+from app.core.redis_cache import RedisCache, CacheTags
 from datetime import datetime, date, timedelta
+from typing import Optional, Union
 import logging
-from decimal import Decimal
-import time
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +27,13 @@ def convert_date_to_timestamp_ms(target_date: date) -> int:
     return int(dt.timestamp() * 1000)
 
 
+def _as_date(value: Union[date, str, None]) -> Optional[date]:
+    """任务参数经JSON序列化后日期可能变为字符串"""
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
 @celery.task(bind=True)
 def sync_account_detail_reports_daily(self, sync_days: int = None):
     """
@@ -63,41 +70,33 @@ def sync_account_detail_reports_daily(self, sync_days: int = None):
             logger.info('没有启用的VOS实例，跳过账户明细报表同步任务')
             return {'success': True, 'message': '没有VOS实例需要同步', 'instances_count': 0}
         
-        # 计算需要同步的日期列表
+        # 计算需要同步的日期范围
         today = date.today()
-        sync_dates = [today - timedelta(days=i) for i in range(sync_days)]
+        begin_date = today - timedelta(days=sync_days - 1)
         
-        logger.info(f"📊 开始同步账户明细报表，同步天数: {sync_days}，日期范围: {sync_dates[-1]} 至 {sync_dates[0]}")
+        logger.info(f"📊 开始同步账户明细报表，同步天数: {sync_days}，日期范围: {begin_date} 至 {today}")
         logger.info(f"   共 {len(instances)} 个VOS实例需要同步")
         
-        total_synced = 0
         total_errors = 0
         task_count = 0
         
-        # 为每个实例和每天创建任务
+        # 每个实例一个任务，一次同步整个日期范围（各实例是不同的VOS节点，无需错开执行）
         for instance in instances:
             if not instance.vos_uuid:
                 logger.warning(f"VOS实例 {instance.name} (ID={instance.id}) 没有UUID，跳过")
                 continue
             
-            for sync_date in sync_dates:
-                try:
-                    # 延迟执行，避免对VOS服务器造成压力
-                    countdown = task_count * 5  # 每5秒创建一个任务
-                    
-                    # 创建异步任务
-                    sync_single_instance_account_detail_reports.apply_async(
-                        args=[instance.id, sync_date],
-                        countdown=countdown
-                    )
-                    
-                    task_count += 1
-                    logger.info(f"🔄 创建任务：同步VOS实例 {instance.name} (ID={instance.id}) 的账户明细报表，日期: {sync_date}，延迟: {countdown}秒")
-                    
-                except Exception as e:
-                    logger.error(f"创建同步任务失败: {instance.name}, 日期: {sync_date}, error={e}")
-                    total_errors += 1
-                    continue
+            try:
+                sync_single_instance_account_detail_reports.apply_async(
+                    args=[instance.id, begin_date.isoformat(), today.isoformat()]
+                )
+                task_count += 1
+                logger.info(f"🔄 创建任务：同步VOS实例 {instance.name} (ID={instance.id}) 的账户明细报表，日期: {begin_date} 至 {today}")
+                
+            except Exception as e:
+                logger.error(f"创建同步任务失败: {instance.name}, error={e}")
+                total_errors += 1
+                continue
         
         logger.info(f"📊 账户明细报表同步任务创建完成")
         logger.info(f"   共创建 {task_count} 个任务")
@@ -124,13 +123,15 @@ def sync_account_detail_reports_daily(self, sync_days: int = None):
 
 
 @celery.task(bind=True)
-def sync_single_instance_account_detail_reports(self, instance_id: int, target_date: date = None):
+def sync_single_instance_account_detail_reports(self, instance_id: int, target_date: Union[date, str] = None,
+                                                end_date: Union[date, str] = None):
     """
     同步指定VOS实例的账户明细报表
     
     Args:
         instance_id: VOS实例ID
-        target_date: 目标日期（默认昨天）
+        target_date: 起始日期（默认昨天）
+        end_date: 结束日期（默认与起始日期相同，即单天）
     """
     db = SessionLocal()
     
@@ -146,184 +147,41 @@ def sync_single_instance_account_detail_reports(self, instance_id: int, target_d
             return {'success': False, 'message': 'VOS实例没有UUID'}
         
         # 默认统计昨天
-        if target_date is None:
-            target_date = date.today() - timedelta(days=1)
-        
-        begin_time_str = target_date.strftime('%Y%m%d')
-        end_time_str = target_date.strftime('%Y%m%d')
-        
-        logger.info(f"🔄 同步VOS实例 {instance.name} (ID={instance_id}) 的账户明细报表，日期: {target_date}")
-        
-        # 获取该实例的所有账户
-        customers = db.query(Customer).filter(
-            Customer.vos_instance_id == instance.id,
-            Customer.vos_uuid == instance.vos_uuid
-        ).all()
-        
-        if not customers:
+        begin_date = _as_date(target_date) or date.today() - timedelta(days=1)
+        end_date = _as_date(end_date) or begin_date
+        
+        logger.info(f"🔄 同步VOS实例 {instance.name} (ID={instance_id}) 的账户明细报表，日期: {begin_date} 至 {end_date}")
+        
+        # 获取该实例的所有账户（只取账号列）
+        account_list = [
+            account for (account,) in db.query(Customer.account).filter(
+                Customer.vos_instance_id == instance.id,
+                Customer.vos_uuid == instance.vos_uuid
+            ).all() if account
+        ]
+        if not account_list:
             logger.warning(f"VOS实例 {instance.name} 没有账户数据")
             return {'success': False, 'message': '没有账户数据'}
         
-        # 获取账户列表
-        account_list = [c.account for c in customers if c.account]
-        if not account_list:
-            logger.warning(f"VOS实例 {instance.name} 没有有效的账户号码")
-            return {'success': False, 'message': '没有有效的账户号码'}
-        
         logger.info(f"   共 {len(account_list)} 个账户需要同步")
         
-        # 创建VOS客户端
-        client = VOSClient(instance.base_url, timeout=60)  # 增加超时时间到60秒
-        
-        # 分批处理账户（每批50个账户，避免一次性发送太多导致超时）
-        batch_size = 50
-        all_reports = []
+        stats = AccountReportSync(db, instance).sync(account_list, begin_date, end_date)
         
-        for i in range(0, len(account_list), batch_size):
-            batch_accounts = account_list[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            total_batches = (len(account_list) + batch_size - 1) // batch_size
-            
-            logger.info(f"   处理第 {batch_num}/{total_batches} 批账户（{len(batch_accounts)} 个账户）")
-            
-            try:
-                # 调用VOS API获取账户明细报表
-                payload = {
-                    'accounts': batch_accounts,
-                    'period': 1,  # 1=天
-                    'beginTime': begin_time_str,
-                    'endTime': end_time_str
-                }
-                
-                result = client.post('/external/server/GetReportCustomerFee', payload)
-                
-                if not client.is_success(result):
-                    error_msg = client.get_error_message(result)
-                    logger.error(f"VOS API调用失败: {instance.name}, 批次 {batch_num}, {error_msg}")
-                    continue
-                
-                # 提取数据
-                batch_reports = result.get('infoReportCustomerFees', [])
-                if batch_reports:
-                    all_reports.extend(batch_reports)
-                    logger.info(f"   批次 {batch_num} 获取到 {len(batch_reports)} 条账户明细报表数据")
-                
-                # 延迟1秒，避免对VOS服务器造成压力
-                time.sleep(1)
-                
-            except Exception as e:
-                logger.error(f"处理账户批次失败: {instance.name}, 批次 {batch_num}, error={e}")
-                continue
+        logger.info(
+            f"✅ VOS实例 {instance.name} 同步完成，保存了 {stats['saved_count']} 条记录 "
+            f"({stats['batch_count']} 个批次，失败 {stats['failed_batches']} 个，{stats['duration_ms']}ms)"
+        )
         
-        if not all_reports:
-            logger.warning(f"VOS实例 {instance.name} 没有返回账户明细报表数据")
-            return {'success': True, 'message': '没有返回数据', 'reports_count': 0}
-        
-        logger.info(f"   共获取到 {len(all_reports)} 条账户明细报表数据")
-        
-        # 保存数据到数据库
-        saved_count = 0
-        for report_data in all_reports:
-            try:
-                # 提取字段
-                account = report_data.get('account', '')
-                if not account:
-                    continue
-                
-                account_name = report_data.get('accountName', '')
-                begin_time = report_data.get('beginTime', 0)
-                end_time = report_data.get('endTime', 0)
-                cdr_count = report_data.get('cdrCount', 0)
-                total_fee = report_data.get('totalFee', 0)
-                total_time = report_data.get('totalTime', 0)
-                total_suite_fee = report_data.get('totalSuiteFee', 0)
-                total_suite_fee_time = report_data.get('totalSuiteFeeTime', 0)
-                net_fee = report_data.get('netFee', 0)
-                net_time = report_data.get('netTime', 0)
-                net_count = report_data.get('netCount', 0)
-                local_fee = report_data.get('localFee', 0)
-                local_time = report_data.get('localTime', 0)
-                local_count = report_data.get('localCount', 0)
-                domestic_fee = report_data.get('domesticFee', 0)
-                domestic_time = report_data.get('domesticTime', 0)
-                domestic_count = report_data.get('domesticCount', 0)
-                international_fee = report_data.get('internationalFee', 0)
-                international_time = report_data.get('internationalTime', 0)
-                international_count = report_data.get('internationalCount', 0)
-                
-                # 检查是否已存在
-                existing = db.query(AccountDetailReport).filter(
-                    AccountDetailReport.vos_instance_id == instance.id,
-                    AccountDetailReport.vos_uuid == instance.vos_uuid,
-                    AccountDetailReport.account == account,
-                    AccountDetailReport.begin_time == begin_time,
-                    AccountDetailReport.end_time == end_time
-                ).first()
-                
-                if existing:
-                    # 更新现有记录
-                    existing.account_name = account_name
-                    existing.cdr_count = cdr_count
-                    existing.total_fee = Decimal(str(total_fee))
-                    existing.total_time = total_time
-                    existing.total_suite_fee = Decimal(str(total_suite_fee))
-                    existing.total_suite_fee_time = total_suite_fee_time
-                    existing.net_fee = Decimal(str(net_fee))
-                    existing.net_time = net_time
-                    existing.net_count = net_count
-                    existing.local_fee = Decimal(str(local_fee))
-                    existing.local_time = local_time
-                    existing.local_count = local_count
-                    existing.domestic_fee = Decimal(str(domestic_fee))
-                    existing.domestic_time = domestic_time
-                    existing.domestic_count = domestic_count
-                    existing.international_fee = Decimal(str(international_fee))
-                    existing.international_time = international_time
-                    existing.international_count = international_count
-                    existing.updated_at = datetime.utcnow()
-                else:
-                    # 创建新记录
-                    new_report = AccountDetailReport(
-                        vos_instance_id=instance.id,
-                        vos_uuid=instance.vos_uuid,
-                        account=account,
-                        account_name=account_name,
-                        begin_time=begin_time,
-                        end_time=end_time,
-                        cdr_count=cdr_count,
-                        total_fee=Decimal(str(total_fee)),
-                        total_time=total_time,
-                        total_suite_fee=Decimal(str(total_suite_fee)),
-                        total_suite_fee_time=total_suite_fee_time,
-                        net_fee=Decimal(str(net_fee)),
-                        net_time=net_time,
-                        net_count=net_count,
-                        local_fee=Decimal(str(local_fee)),
-                        local_time=local_time,
-                        local_count=local_count,
-                        domestic_fee=Decimal(str(domestic_fee)),
-                        domestic_time=domestic_time,
-                        domestic_count=domestic_count,
-                        international_fee=Decimal(str(international_fee)),
-                        international_time=international_time,
-                        international_count=international_count
-                    )
-                    db.add(new_report)
-                
-                saved_count += 1
-                
-            except Exception as e:
-                logger.error(f"保存账户明细报表数据失败: {instance.name}, account={account}, error={e}")
-                continue
-        
-        # 提交事务
-        db.commit()
-        logger.info(f"✅ VOS实例 {instance.name} 同步完成，保存了 {saved_count} 条记录")
+        if stats['saved_count']:
+            RedisCache.invalidate_tags([CacheTags.instance_entity(instance_id, CacheTags.ACCOUNT_REPORT)])
         
         return {
-            'success': True,
+            'success': stats['failed_batches'] == 0,
             'message': '账户明细报表同步完成',
-            'synced_count': saved_count,
+            'synced_count': stats['saved_count'],
+            **stats,
+            'begin_date': begin_date.isoformat(),
+            'end_date': end_date.isoformat(),
             'instance_id': instance_id,
             'instance_name': instance.name
         }
@@ -338,3 +196,42 @@ def sync_single_instance_account_detail_reports(self, instance_id: int, target_d
     finally:
         db.close()
 
+
+@celery.task(bind=True)
+def backfill_account_detail_reports_to_clickhouse(self, instance_id: int = None, chunk_size: int = 5000,
+                                                  days: int = None):
+    """
+    将PostgreSQL中已有的账户明细报表回填到ClickHouse（双写上线前的历史数据，或ClickHouse写入失败后补齐）
+    重复回填是安全的：ReplacingMergeTree 按 (vos_uuid, account, begin_time) 去重
+    
+    Args:
+        days: 只回填最近 days 天内写入/更新的报表（每日定时对账使用）；为None时回填全部
+    """
+    from app.models.account_detail_report import AccountDetailReport
+    
+    db = SessionLocal()
+    try:
+        query = db.query(AccountDetailReport.__table__)
+        if instance_id is not None:
+            query = query.filter(AccountDetailReport.vos_instance_id == instance_id)
+        if days is not None:
+            since = datetime.now().astimezone() - timedelta(days=days)
+            query = query.filter(AccountDetailReport.updated_at >= since)
+        
+        total = 0
+        chunk = []
+        for row in query.yield_per(chunk_size):
+            chunk.append(dict(row._mapping))
+            if len(chunk) >= chunk_size:
+                total += ClickHouseAccountReport.insert_reports(chunk)
+                chunk = []
+        if chunk:
+            total += ClickHouseAccountReport.insert_reports(chunk)
+        
+        logger.info(f"✅ 账户明细报表回填ClickHouse完成，共 {total} 条")
+        return {'success': True, 'backfilled_count': total}
+    except Exception as e:
+        logger.error(f"账户明细报表回填ClickHouse失败: {e}", exc_info=True)
+        return {'success': False, 'message': str(e)}
+    finally:
+        db.close()
@@ -7,6 +7,7 @@ from app.core.db import SessionLocal
 from app.models.vos_instance import VOSInstance
 from app.models.cdr_statistics import VOSCdrStatistics, AccountCdrStatistics, GatewayCdrStatistics
 from app.core.clickhouse_db import get_clickhouse_db
+from app.core.redis_cache import RedisCache, CacheTags
 from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta
 import logging
@@ -164,6 +165,8 @@ def calculate_cdr_statistics(vos_id: int, statistic_date: date = None, period_ty
         db.commit()
         logger.info(f"✅ VOS节点 {instance.name} 统计完成: {results}")
         
+        RedisCache.invalidate_tags([CacheTags.instance_entity(vos_id, CacheTags.STATISTICS)])
+        
         return {'success': True, 'results': results}
         
     except Exception as e:
@@ -242,6 +245,8 @@ def calculate_cdr_statistics_with_date_range(
         db.commit()
         logger.info(f"✅ VOS节点 {instance.name} 完整周期统计完成: {results}")
         
+        RedisCache.invalidate_tags([CacheTags.instance_entity(vos_id, CacheTags.STATISTICS)])
+        
         return {'success': True, 'results': results}
         
     except Exception as e:
@@ -14,7 +14,7 @@ celery.conf.beat_schedule = {
     # 通用VOS API数据同步任务
     'sync-all-vos-common-apis-every-1min': {
         'task': 'app.tasks.sync_tasks.sync_all_vos_common_apis',
-        'schedule': 60.0,  # 每1分钟检查一次（根据各API的TTL自动决定是否同步）
+        'schedule': 60.0,  # 每1分钟调度一次（按各API缓存到期时间并发同步）
     },
     
     # 增强版同步任务（专门表 + 通用缓存双写）
@@ -29,16 +29,34 @@ celery.conf.beat_schedule = {
         'schedule': 14400.0,  # 每4小时同步一次网关（对接+落地）
     },
     
+    # 网关在线状态（只按差异更新在线状态和性能指标，每2分钟）
+    'sync-gateway-online-every-2min': {
+        'task': 'app.tasks.sync_tasks.sync_all_instances_gateway_online',
+        'schedule': 120.0,
+    },
+    
     # 清理过期缓存（每天凌晨2点）
     'cleanup-expired-cache-daily': {
         'task': 'app.tasks.sync_tasks.cleanup_expired_cache',
         'schedule': crontab(minute=0, hour=2),
     },
     
-    # VOS实例健康检查（每5分钟）
-    'check-vos-health-every-5min': {
+    # 清理标签集合中已过期的缓存键（缓存键过期不会自动移出标签集合）
+    'prune-cache-tag-sets-hourly': {
+        'task': 'app.tasks.sync_tasks.prune_cache_tag_sets',
+        'schedule': crontab(minute=15),
+    },
+    
+    # VOS实例健康检查（每分钟调度，只探测到期节点）
+    'check-vos-health-every-1min': {
         'task': 'app.tasks.sync_tasks.check_vos_instances_health',
-        'schedule': 300.0,  # 每5分钟检查一次
+        'schedule': 60.0,  # 每分钟调度一次，只探测到期节点（失败节点按指数退避）
+    },
+    
+    # 容量采样（并发呼叫数与性能指标时序，每分钟）
+    'sample-vos-capacity-every-1min': {
+        'task': 'app.tasks.sync_tasks.sample_vos_capacity',
+        'schedule': 60.0,
     },
     
     # 话单费用统计（每天凌晨2点30分执行）
@@ -47,7 +65,7 @@ celery.conf.beat_schedule = {
         'schedule': crontab(minute=30, hour=2),  # 每天凌晨2点30分
     },
     
-    # 每小时刷新仪表盘统计物化视图
+    # 每小时全量校准仪表盘统计汇总表（平时由同步任务增量维护）
     'refresh-dashboard-statistics': {
         'task': 'app.tasks.sync_tasks.refresh_dashboard_statistics_view',
         'schedule': crontab(minute=0),  # 每小时的第0分钟执行
@@ -60,6 +78,13 @@ celery.conf.beat_schedule = {
         'schedule': crontab(minute=0, hour=3),  # 每天凌晨3点
         'args': [None],  # sync_days=None，从数据库读取配置
     },
+    
+    # 账户明细报表ClickHouse对账（每天凌晨4点，补齐双写时ClickHouse写入失败的报表，只回填最近2天写入的数据）
+    'backfill-account-detail-reports-clickhouse-daily': {
+        'task': 'app.tasks.account_detail_report_tasks.backfill_account_detail_reports_to_clickhouse',
+        'schedule': crontab(minute=0, hour=4),  # 每天凌晨4点
+        'kwargs': {'days': 2},
+    },
 }
 
 # 导入任务模块以注册任务
@@ -68,3 +93,4 @@ from app.tasks import initial_sync_tasks  # noqa: E402, F401
 from app.tasks import manual_sync_tasks  # noqa: E402, F401
 from app.tasks import cdr_statistics_tasks  # noqa: E402, F401
 from app.tasks import account_detail_report_tasks  # noqa: E402, F401
+from app.tasks import task_signals  # noqa: E402, F401
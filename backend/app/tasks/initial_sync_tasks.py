@@ -8,6 +8,8 @@ from app.models.vos_instance import VOSInstance
 from app.models.customer import Customer
 from app.models.cdr import CDR
 from app.core.vos_client import VOSClient
+from app.core.customer_sync import CustomerBulkSync
+from app.core.sync_progress import TaskProgress, start_run
 from datetime import datetime, timedelta
 import logging
 import hashlib
@@ -64,6 +66,7 @@ def initial_sync_for_new_instance(instance_id: int, sync_days: int = 7):
         
         # 创建N个异步任务，每个任务同步一天的数据
         today = datetime.now().date()
+        start_run(total_tasks=sync_days, instances_count=1, days=sync_days)
         for i in range(sync_days):
             sync_date = today - timedelta(days=i)
             # 延迟执行，避免并发过高
@@ -122,61 +125,17 @@ def sync_customers_for_new_instance(instance_id: int):
             logger.warning(f'VOS {inst.name} 返回的客户列表为空')
             return {'success': True, 'total': 0, 'new': 0, 'updated': 0}
         
-        total = len(customers)
-        synced_count = 0
-        updated_count = 0
-        
-        for customer_data in customers:
-            account = customer_data.get('account') or customer_data.get('Account')
-            if not account:
-                continue
-            
-            money = customer_data.get('money', 0.0) or customer_data.get('Money', 0.0)
-            limit_money = customer_data.get('limitMoney', 0.0) or customer_data.get('LimitMoney', 0.0)
-            
-            try:
-                money = float(money)
-                limit_money = float(limit_money)
-            except (ValueError, TypeError):
-                money = 0.0
-                limit_money = 0.0
-            
-            is_in_debt = money < 0
-            
-            existing = db.query(Customer).filter(
-                Customer.vos_instance_id == instance_id,
-                Customer.account == account
-            ).first()
-            
-            if existing:
-                existing.money = money
-                existing.limit_money = limit_money
-                existing.is_in_debt = is_in_debt
-                existing.raw_data = customer_data
-                existing.synced_at = datetime.utcnow()
-                updated_count += 1
-            else:
-                new_customer = Customer(
-                    vos_instance_id=instance_id,
-                    account=account,
-                    money=money,
-                    limit_money=limit_money,
-                    is_in_debt=is_in_debt,
-                    raw_data=customer_data,
-                    synced_at=datetime.utcnow()
-                )
-                db.add(new_customer)
-                synced_count += 1
-        
+        stats = CustomerBulkSync(db, inst).sync(customers)
         db.commit()
         
-        logger.info(f'✅ VOS {inst.name} 客户数据同步完成: 总数={total}, 新增={synced_count}, 更新={updated_count}')
+        logger.info(
+            f"✅ VOS {inst.name} 客户数据同步完成: 总数={stats['total']}, "
+            f"新增={stats['new']}, 更新={stats['updated']}, 删除={stats['deleted']}"
+        )
         
         return {
             'success': True,
-            'total': total,
-            'new': synced_count,
-            'updated': updated_count,
+            **stats,
             'instance_name': inst.name
         }
         
@@ -199,15 +158,7 @@ def sync_cdrs_for_single_day(instance_id: int, date_str: str):
     """
     db = SessionLocal()
     from app.models.clickhouse_cdr import ClickHouseCDR
-    import redis
-    from app.core.config import settings
-    
-    # 连接 Redis 用于存储同步进度
-    try:
-        r = redis.from_url(settings.REDIS_URL)
-    except Exception as e:
-        logger.error(f'连接 Redis 失败: {e}')
-        r = None
+    progress = None
     
     try:
         inst = db.query(VOSInstance).filter(VOSInstance.id == instance_id).first()
@@ -224,10 +175,14 @@ def sync_cdrs_for_single_day(instance_id: int, date_str: str):
         
         if not customers:
             logger.warning(f'VOS {inst.name} 没有客户数据，跳过话单同步')
+            TaskProgress(inst.id, inst.name, date_str, 0).finish()
             return {'success': True, 'total': 0, 'new': 0, 'date': date_str, 'message': '没有客户数据'}
         
         logger.info(f'  按客户同步 (共 {len(customers)} 个客户)...')
         
+        # 本任务的同步进度（独立的Redis哈希，原子计数，不与并行任务互相覆盖）
+        progress = TaskProgress(inst.id, inst.name, date_str, len(customers))
+        
         # 按客户循环同步
         total_synced = 0
         client = VOSClient(inst.base_url)
@@ -235,42 +190,7 @@ def sync_cdrs_for_single_day(instance_id: int, date_str: str):
         for idx, customer in enumerate(customers, 1):
             account = customer.account
             logger.info(f'    [{idx}/{len(customers)}] 同步客户: {account}')
-            
-            # 更新同步进度（保留总任务数信息）
-            if r:
-                progress_key = 'cdr_sync_progress'
-                # 先获取现有进度，保留总任务数等信息
-                existing_progress = r.get(progress_key)
-                base_progress = {}
-                if existing_progress:
-                    try:
-                        base_progress = json.loads(existing_progress)
-                    except:
-                        pass
-                
-                # 更新当前任务进度，但保留总任务数等信息
-                progress_data = {
-                    'status': 'syncing',
-                    'current_instance': inst.name,
-                    'current_instance_id': inst.id,
-                    'current_customer': account,
-                    'current_customer_index': idx,
-                    'total_customers': len(customers),
-                    'synced_count': total_synced,
-                    'start_time': base_progress.get('start_time', datetime.now().isoformat()),
-                    'sync_date': date_str,
-                    # 保留总任务数信息
-                    'total_tasks': base_progress.get('total_tasks', 1),
-                    'completed_tasks': base_progress.get('completed_tasks', 0),
-                    'instances_count': base_progress.get('instances_count', 1),
-                    'days': base_progress.get('days', 1)
-                }
-                
-                r.setex(
-                    progress_key,
-                    3600 * 2,  # 2小时过期
-                    json.dumps(progress_data, ensure_ascii=False)
-                )
+            progress.customer_started(idx, account)
             
             # 查询该客户的话单
             try:
@@ -286,6 +206,7 @@ def sync_cdrs_for_single_day(instance_id: int, date_str: str):
                 
                 if not isinstance(result, dict) or result.get('retCode') != 0:
                     logger.warning(f'      客户 {account} 话单查询失败')
+                    progress.customer_done()
                     # 即使失败也延迟，避免请求过快
                     if idx < len(customers):
                         time.sleep(2)
@@ -299,13 +220,16 @@ def sync_cdrs_for_single_day(instance_id: int, date_str: str):
                             cdrs = v
                             break
                 
+                inserted = 0
                 if cdrs:
                     inserted = ClickHouseCDR.insert_cdrs(cdrs, vos_id=inst.id, vos_uuid=str(inst.vos_uuid))
                     total_synced += inserted
                     logger.info(f'      ✅ 客户 {account}: 同步 {inserted} 条话单')
+                progress.customer_done(inserted)
                 
             except Exception as e:
                 logger.exception(f'      ❌ 客户 {account} 同步失败: {e}')
+                progress.customer_done()
                 # 即使失败也延迟，避免请求过快
                 if idx < len(customers):
                     time.sleep(2)
@@ -316,31 +240,8 @@ def sync_cdrs_for_single_day(instance_id: int, date_str: str):
             if idx < len(customers):
                 time.sleep(2)
         
-        # 更新已完成任务数（不删除进度，保留总进度信息）
-        if r:
-            progress_key = 'cdr_sync_progress'
-            completed_tasks_key = 'cdr_sync_completed_tasks'
-            
-            # 增加已完成任务数
-            completed_tasks = r.incr(completed_tasks_key)
-            
-            # 更新进度信息
-            existing_progress = r.get(progress_key)
-            if existing_progress:
-                try:
-                    progress_data = json.loads(existing_progress)
-                    progress_data['completed_tasks'] = completed_tasks
-                    progress_data['status'] = 'syncing'  # 保持syncing状态，直到所有任务完成
-                    
-                    # 如果所有任务都完成了，更新状态
-                    total_tasks = progress_data.get('total_tasks', 1)
-                    if completed_tasks >= total_tasks:
-                        progress_data['status'] = 'completed'
-                        progress_data['message'] = f'所有同步任务已完成（共{total_tasks}个任务）'
-                    
-                    r.setex(progress_key, 3600 * 2, json.dumps(progress_data, ensure_ascii=False))
-                except:
-                    pass
+        # 计入已完成任务数（所有任务完成后本轮状态变为completed）
+        progress.finish()
         
         logger.info(f'✅ VOS {inst.name} 在 {date_str} 话单同步完成: 共 {total_synced} 条')
         
@@ -356,9 +257,8 @@ def sync_cdrs_for_single_day(instance_id: int, date_str: str):
     except Exception as e:
         logger.exception(f'同步VOS实例 {instance_id} 在 {date_str} 的话单数据时发生错误: {e}')
         # 即使出错也增加已完成任务数（任务已结束）
-        if r:
-            completed_tasks_key = 'cdr_sync_completed_tasks'
-            r.incr(completed_tasks_key)
+        if progress:
+            progress.finish(status='failed')
         return {'success': False, 'message': str(e), 'date': date_str}
     finally:
         db.close()
@@ -7,6 +7,7 @@ from app.core.db import SessionLocal
 from app.models.vos_instance import VOSInstance
 from app.models.customer import Customer
 from app.core.vos_client import VOSClient
+from app.core.sync_progress import TaskProgress, start_run
 from datetime import datetime, timedelta
 import logging
 import json
@@ -27,15 +28,7 @@ def sync_single_customer_cdrs(instance_id: int, customer_id: int, days: int = 1)
     db = SessionLocal()
     from app.models.clickhouse_cdr import ClickHouseCDR
     from app.core.vos_client import VOSClient
-    import redis
-    from app.core.config import settings
-    
-    # 连接 Redis 用于存储同步进度
-    try:
-        r = redis.from_url(settings.REDIS_URL)
-    except Exception as e:
-        logger.error(f'连接 Redis 失败: {e}')
-        r = None
+    progress = None
     
     try:
         # 获取实例和客户信息
@@ -62,22 +55,9 @@ def sync_single_customer_cdrs(instance_id: int, customer_id: int, days: int = 1)
             client = VOSClient(inst.base_url)
             
             # 更新同步进度
-            if r:
-                r.setex(
-                    'cdr_sync_progress',
-                    3600,
-                    json.dumps({
-                        'status': 'syncing',
-                        'current_instance': inst.name,
-                        'current_instance_id': inst.id,
-                        'current_customer': customer.account,
-                        'current_customer_index': 1,
-                        'total_customers': 1,
-                        'synced_count': 0,
-                        'start_time': datetime.now().isoformat(),
-                        'sync_date': date_str
-                    }, ensure_ascii=False)
-                )
+            start_run(total_tasks=1)
+            progress = TaskProgress(inst.id, inst.name, date_str, 1)
+            progress.customer_started(1, customer.account)
             
             # 查询该客户当天的话单
             payload = {
@@ -96,8 +76,8 @@ def sync_single_customer_cdrs(instance_id: int, customer_id: int, days: int = 1)
                 if not isinstance(res, dict) or res.get('retCode') != 0:
                     error_msg = res.get('exception', 'Unknown error') if isinstance(res, dict) else 'Invalid response'
                     logger.warning(f'客户 {customer.account} 话单查询失败: {error_msg}')
-                    if r:
-                        r.delete('cdr_sync_progress')
+                    if progress:
+                        progress.finish(status='failed')
                     return {
                         'success': False,
                         'message': f'VOS API错误: {error_msg}',
@@ -120,8 +100,8 @@ def sync_single_customer_cdrs(instance_id: int, customer_id: int, days: int = 1)
                 else:
                     logger.info(f'客户 {customer.account} 没有话单数据')
                 
-                if r:
-                    r.delete('cdr_sync_progress')
+                progress.customer_done(total_synced)
+                progress.finish()
                 
                 return {
                     'success': True,
@@ -133,8 +113,8 @@ def sync_single_customer_cdrs(instance_id: int, customer_id: int, days: int = 1)
                 
             except Exception as e:
                 logger.exception(f'客户 {customer.account} 同步失败: {e}')
-                if r:
-                    r.delete('cdr_sync_progress')
+                if progress:
+                    progress.finish(status='failed')
                 return {
                     'success': False,
                     'message': f'同步失败: {str(e)}',
@@ -158,6 +138,7 @@ def sync_single_customer_cdrs(instance_id: int, customer_id: int, days: int = 1)
             task_ids = []
             
             logger.info(f'📅 为客户 {customer.account} 创建 {days} 天的同步任务（避免一次性查询导致VOS卡死）')
+            start_run(total_tasks=days, instances_count=1, days=days)
             
             for day_offset in range(days):
                 sync_date = today - timedelta(days=day_offset)
@@ -196,8 +177,8 @@ def sync_single_customer_cdrs(instance_id: int, customer_id: int, days: int = 1)
     
     except Exception as e:
         logger.exception(f'同步客户 {customer_id} 话单时发生错误: {e}')
-        if r:
-            r.delete('cdr_sync_progress')
+        if progress:
+            progress.finish(status='failed')
         return {'success': False, 'message': str(e)}
     finally:
         db.close()
@@ -216,15 +197,7 @@ def sync_single_customer_single_day(instance_id: int, customer_id: int, date_str
     db = SessionLocal()
     from app.models.clickhouse_cdr import ClickHouseCDR
     from app.core.vos_client import VOSClient
-    import redis
-    from app.core.config import settings
-    
-    # 连接 Redis 用于存储同步进度
-    try:
-        r = redis.from_url(settings.REDIS_URL)
-    except Exception as e:
-        logger.error(f'连接 Redis 失败: {e}')
-        r = None
+    progress = None
     
     try:
         # 获取实例和客户信息
@@ -245,23 +218,9 @@ def sync_single_customer_single_day(instance_id: int, customer_id: int, date_str
         
         client = VOSClient(inst.base_url)
         
-        # 更新同步进度
-        if r:
-            r.setex(
-                'cdr_sync_progress',
-                3600,
-                json.dumps({
-                    'status': 'syncing',
-                    'current_instance': inst.name,
-                    'current_instance_id': inst.id,
-                    'current_customer': customer.account,
-                    'current_customer_index': 1,
-                    'total_customers': 1,
-                    'synced_count': 0,
-                    'start_time': datetime.now().isoformat(),
-                    'sync_date': date_str
-                }, ensure_ascii=False)
-            )
+        # 更新同步进度（属于 sync_single_customer_cdrs 创建的本轮同步）
+        progress = TaskProgress(inst.id, inst.name, date_str, 1)
+        progress.customer_started(1, customer.account)
         
         # 查询该客户当天的话单
         payload = {
@@ -280,8 +239,8 @@ def sync_single_customer_single_day(instance_id: int, customer_id: int, date_str
             if not isinstance(res, dict) or res.get('retCode') != 0:
                 error_msg = res.get('exception', 'Unknown error') if isinstance(res, dict) else 'Invalid response'
                 logger.warning(f'客户 {customer.account} 话单查询失败: {error_msg}')
-                if r:
-                    r.delete('cdr_sync_progress')
+                if progress:
+                    progress.finish(status='failed')
                 return {
                     'success': False,
                     'message': f'VOS API错误: {error_msg}',
@@ -305,8 +264,8 @@ def sync_single_customer_single_day(instance_id: int, customer_id: int, date_str
             else:
                 logger.info(f'客户 {customer.account} ({date_str}) 没有话单数据')
             
-            if r:
-                r.delete('cdr_sync_progress')
+            progress.customer_done(total_synced)
+            progress.finish()
             
             return {
                 'success': True,
@@ -318,8 +277,8 @@ def sync_single_customer_single_day(instance_id: int, customer_id: int, date_str
             
         except Exception as e:
             logger.exception(f'客户 {customer.account} ({date_str}) 同步失败: {e}')
-            if r:
-                r.delete('cdr_sync_progress')
+            if progress:
+                progress.finish(status='failed')
             return {
                 'success': False,
                 'message': f'同步失败: {str(e)}',
@@ -329,8 +288,8 @@ def sync_single_customer_single_day(instance_id: int, customer_id: int, date_str
     
     except Exception as e:
         logger.exception(f'同步客户 {customer_id} 话单时发生错误: {e}')
-        if r:
-            r.delete('cdr_sync_progress')
+        if progress:
+            progress.finish(status='failed')
         return {'success': False, 'message': str(e)}
     finally:
         db.close()
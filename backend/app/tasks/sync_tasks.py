@@ -1,19 +1,26 @@
+from celery import group, chord
 from app.tasks.celery_app import celery
 from app.core.db import SessionLocal
 from app.models.vos_instance import VOSInstance
 from app.models.phone import Phone
 from app.models.cdr import CDR
-from app.models.customer import Customer
-from app.models.vos_data_cache import VosDataCache
-from app.models.vos_health import VOSHealthCheck
 from app.core.vos_client import VOSClient
 from app.core.vos_cache_service import VosCacheService
+from app.core.redis_cache import RedisCache, CacheTags
 from app.core.vos_sync_enhanced import VosSyncEnhanced
+from app.core.customer_sync import CustomerBulkSync
+from app.core.vos_sync_scheduler import VosSyncScheduler, acquire_scheduler_lock, release_scheduler_lock
+from app.core.vos_health_checker import VosHealthChecker, is_instance_available
+from app.core.capacity_sampler import CapacitySampler
 from datetime import datetime, timedelta
-import logging, json, hashlib, time
+import logging, hashlib, time
 from dateutil import parser as dateparser
 logger = logging.getLogger(__name__)
 
+# 仪表盘统计校准的防抖窗口（秒）：窗口内最多执行一次
+DASHBOARD_REFRESH_DEBOUNCE = 300
+DASHBOARD_REFRESH_LOCK_KEY = 'dashboard_stats:refresh_lock'
+
 def get_vos_uuid_by_instance_id(db, instance_id):
     """根据VOS实例ID获取对应的UUID"""
     instance = db.query(VOSInstance).filter(VOSInstance.id == instance_id).first()
@@ -71,8 +78,7 @@ def sync_all_instances_cdrs(days=None):
     db = SessionLocal()
     from app.tasks.initial_sync_tasks import sync_cdrs_for_single_day
     from app.models.app_config import AppConfig
-    from app.core.config import settings
-    import redis
+    from app.core.sync_progress import start_run, clear_run
     
     # 如果 days 为 None，从数据库读取配置
     if days is None:
@@ -85,13 +91,6 @@ def sync_all_instances_cdrs(days=None):
         else:
             days = 1
     
-    # 连接 Redis 用于存储同步进度
-    try:
-        r = redis.from_url(settings.REDIS_URL)
-    except Exception as e:
-        logger.error(f'连接 Redis 失败: {e}')
-        r = None
-    
     try:
         # 1. 检查是否有启用的VOS实例
         instances = db.query(VOSInstance).filter(VOSInstance.enabled == True).all()
@@ -117,6 +116,9 @@ def sync_all_instances_cdrs(days=None):
         
         logger.info(f'📞 步骤2: 创建按天同步任务（避免一次性查询所有天导致VOS卡死）...')
         
+        # 先初始化本轮同步进度（各任务执行时写入自己的进度哈希）
+        start_run(total_tasks=days * len(instances), instances_count=len(instances), days=days)
+        
         for day_offset in range(days):
             sync_date = today - timedelta(days=day_offset)
             date_str = sync_date.strftime('%Y%m%d')
@@ -137,32 +139,6 @@ def sync_all_instances_cdrs(days=None):
         
         logger.info(f'✅ 已创建 {task_count} 个同步任务（{len(instances)}个实例 × {days}天）')
         
-        # 更新同步进度：任务已创建
-        if r:
-            # 初始化总进度信息
-            progress_key = 'cdr_sync_progress'
-            completed_tasks_key = 'cdr_sync_completed_tasks'
-            
-            # 设置总任务数和总进度信息
-            r.setex(
-                progress_key,
-                3600 * 2,  # 2小时过期（多天同步可能需要更长时间）
-                json.dumps({
-                    'status': 'task_created',
-                    'total_tasks': task_count,
-                    'completed_tasks': 0,
-                    'instances_count': len(instances),
-                    'days': days,
-                    'task_ids': task_ids,
-                    'start_time': datetime.now().isoformat(),
-                    'message': f'已创建{task_count}个同步任务，正在按计划执行...'
-                }, ensure_ascii=False)
-            )
-            
-            # 初始化已完成任务计数器
-            r.set(completed_tasks_key, 0)
-            r.expire(completed_tasks_key, 3600 * 2)
-        
         return {
             'success': True,
             'instances_count': len(instances),
@@ -175,8 +151,7 @@ def sync_all_instances_cdrs(days=None):
     except Exception as e:
         logger.exception(f'创建同步任务失败: {e}')
         # 清除同步进度（错误）
-        if r:
-            r.delete('cdr_sync_progress')
+        clear_run()
         return {'success': False, 'message': str(e)}
     finally:
         db.close()
@@ -192,6 +167,10 @@ def sync_customers_for_instance(instance_id: int):
             logger.warning(f'VOS实例 {instance_id} 未找到或已禁用')
             return {'success': False, 'message': 'VOS实例未找到或已禁用'}
         
+        if not is_instance_available(inst.base_url):
+            logger.warning(f'VOS实例 {inst.name} 熔断中，跳过客户同步')
+            return {'success': False, 'message': 'VOS实例熔断中，跳过同步', 'skipped': True}
+        
         client = VOSClient(inst.base_url)
         
         # 调用VOS API获取客户列表
@@ -212,67 +191,33 @@ def sync_customers_for_instance(instance_id: int):
             logger.warning(f'VOS {inst.name} 返回的客户数据格式异常')
             return {'success': False, 'message': '客户数据格式无效'}
         
-        # 同步到数据库
-        synced_count = 0
-        updated_count = 0
-        
-        for cust_data in customers:
-            account = cust_data.get('account')
-            if not account:
-                continue
-            
-            money = float(cust_data.get('money', 0.0))
-            limit_money = float(cust_data.get('limitMoney', 0.0))
-            is_in_debt = money < 0
-            
-            # 将完整的VOS客户数据保存为JSON字符串
-            raw_data_json = json.dumps(cust_data, ensure_ascii=False)
-            
-            # 查找现有记录
-            existing = db.query(Customer).filter(
-                Customer.vos_instance_id == instance_id,
-                Customer.account == account
-            ).first()
-            
-            if existing:
-                # 更新现有记录（包括完整的原始数据）
-                existing.money = money
-                existing.limit_money = limit_money
-                existing.is_in_debt = is_in_debt
-                existing.raw_data = raw_data_json
-                existing.vos_uuid = inst.vos_uuid  # 更新UUID
-                existing.synced_at = datetime.utcnow()
-                updated_count += 1
-            else:
-                # 创建新记录（包括完整的原始数据）
-                new_customer = Customer(
-                    vos_instance_id=instance_id,
-                    vos_uuid=inst.vos_uuid,
-                    account=account,
-                    money=money,
-                    limit_money=limit_money,
-                    is_in_debt=is_in_debt,
-                    raw_data=raw_data_json
-                )
-                db.add(new_customer)
-                synced_count += 1
-        
+        # 批量比对并写入数据库（只写入新增/变化的客户，删除VOS中已不存在的客户）
+        stats = CustomerBulkSync(db, inst).sync(customers)
         db.commit()
         
-        total = synced_count + updated_count
-        logger.info(f'VOS {inst.name} 客户同步完成: 共 {total} 个客户 (新增: {synced_count}, 更新: {updated_count})')
-        
-        # 在客户数据同步完成后，刷新仪表盘统计视图
-        try:
-            refresh_dashboard_statistics_view.delay()
-        except Exception as e:
-            logger.warning(f'触发仪表盘统计视图刷新失败: {e}')
+        # 客户数据有变化时，按标签失效该实例的客户相关缓存（含仪表盘汇总）
+        changed = stats['new'] + stats['updated'] + stats['deleted'] > 0
+        cache_service = VosCacheService(db)
+        if changed:
+            cache_service.invalidate_tags([
+                CacheTags.instance_entity(instance_id, CacheTags.CUSTOMER),
+                CacheTags.summary(CacheTags.CUSTOMER),
+            ])
+        # 写回本次获取的最新数据
+        cache_service._save_to_cache(
+            vos_instance_id=instance_id,
+            api_path='/external/server/GetAllCustomers',
+            cache_key=VosCacheService.generate_cache_key('/external/server/GetAllCustomers', {'type': 1}),
+            params={'type': 1},
+            response_data=result,
+            is_valid=True,
+            ret_code=0,
+            error_message=None
+        )
         
         return {
             'success': True,
-            'total': total,
-            'new': synced_count,
-            'updated': updated_count,
+            **stats,
             'instance_name': inst.name
         }
         
@@ -360,134 +305,34 @@ def sync_all_vos_common_apis():
     """
     同步所有VOS实例的常用API数据（定时任务）
     包括：客户列表、在线话机、网关状态、性能指标等
+    
+    由 VosSyncScheduler 按缓存到期时间调度：一次查询加载所有缓存的新鲜度，
+    到期的 (实例, API) 并发拉取，每个节点限制并发，不健康节点跳过
     """
+    token = acquire_scheduler_lock()
+    if token is None:
+        logger.info('上一轮常用API同步尚未结束，跳过本轮')
+        return {'success': True, 'message': '上一轮同步尚未结束，跳过', 'skipped': True}
+    
     db = SessionLocal()
     try:
-        instances = db.query(VOSInstance).filter(VOSInstance.enabled == True).all()
-        if not instances:
+        result = VosSyncScheduler(db).run()
+        if not result['instances_count']:
             logger.info('没有启用的VOS实例，跳过同步常用API任务')
             return {'success': True, 'message': '没有VOS实例需要同步', 'instances_count': 0}
         
-        # 定义需要定期同步的API
-        apis_to_sync = [
-            # 实时数据（每30秒同步一次）
-            {
-                'api_path': '/external/server/GetAllPhoneOnline',
-                'params': {},
-                'interval': 30
-            },
-            {
-                'api_path': '/external/server/GetGatewayMappingOnline',
-                'params': {},
-                'interval': 30
-            },
-            {
-                'api_path': '/external/server/GetGatewayRoutingOnline',
-                'params': {},
-                'interval': 30
-            },
-            {
-                'api_path': '/external/server/GetPerformance',
-                'params': {},
-                'interval': 30
-            },
-            # 准实时数据（每5分钟同步一次）
-            {
-                'api_path': '/external/server/GetAllCustomers',
-                'params': {'type': 1},
-                'interval': 300
-            },
-            # 配置数据（每小时同步一次）
-            {
-                'api_path': '/external/server/GetGatewayMapping',
-                'params': {},
-                'interval': 3600
-            },
-            {
-                'api_path': '/external/server/GetGatewayRouting',
-                'params': {},
-                'interval': 3600
-            },
-            {
-                'api_path': '/external/server/GetFeeRateGroup',
-                'params': {},
-                'interval': 3600
-            },
-            {
-                'api_path': '/external/server/GetSoftSwitch',
-                'params': {},
-                'interval': 3600
-            },
-        ]
-        
-        results = []
-        for inst in instances:
-            logger.info(f'开始同步VOS实例常用API数据: {inst.name}')
-            
-            for api_config in apis_to_sync:
-                api_path = api_config['api_path']
-                params = api_config['params']
-                
-                # 检查缓存是否需要更新
-                cache_service = VosCacheService(db)
-                cache_key = VosCacheService.generate_cache_key(api_path, params)
-                
-                cached = db.query(VosDataCache).filter(
-                    VosDataCache.vos_instance_id == inst.id,
-                    VosDataCache.api_path == api_path,
-                    VosDataCache.cache_key == cache_key,
-                    VosDataCache.is_valid == True
-                ).first()
-                
-                # 如果缓存不存在或已过期，则同步
-                should_sync = False
-                if not cached:
-                    should_sync = True
-                    logger.info(f'缓存不存在，需要同步: {api_path}')
-                elif cached.is_expired():
-                    should_sync = True
-                    logger.info(f'缓存已过期，需要同步: {api_path}')
-                
-                if should_sync:
-                    try:
-                        data, source = cache_service.get_cached_data(
-                            vos_instance_id=inst.id,
-                            api_path=api_path,
-                            params=params,
-                            force_refresh=True
-                        )
-                        results.append({
-                            'instance_id': inst.id,
-                            'instance_name': inst.name,
-                            'api_path': api_path,
-                            'success': source == 'vos_api',
-                            'source': source
-                        })
-                    except Exception as e:
-                        logger.exception(f'同步失败: {api_path} (instance={inst.name}, error={e})')
-                        results.append({
-                            'instance_id': inst.id,
-                            'instance_name': inst.name,
-                            'api_path': api_path,
-                            'success': False,
-                            'error': str(e)
-                        })
-        
-        success_count = sum(1 for r in results if r.get('success'))
-        return {
-            'success': True,
-            'instances_count': len(instances),
-            'total_synced': len(results),
-            'success_count': success_count,
-            'failed_count': len(results) - success_count,
-            'details': results
-        }
+        logger.info(
+            f"常用API同步完成: 成功 {result['success_count']}, 失败 {result['failed_count']}, "
+            f"跳过不健康实例 {len(result['skipped_instances'])} 个"
+        )
+        return {'success': True, **result}
         
     except Exception as e:
         logger.exception(f'同步所有VOS实例常用API数据时发生错误: {e}')
         return {'success': False, 'message': str(e)}
     finally:
         db.close()
+        release_scheduler_lock(token)
 
 
 @celery.task
@@ -512,6 +357,14 @@ def cleanup_expired_cache():
         db.close()
 
 
+@celery.task
+def prune_cache_tag_sets():
+    """清理Redis标签集合中已过期的缓存键（定时任务）"""
+    removed = RedisCache.prune_tag_sets()
+    logger.info(f'清理缓存标签集合完成: 移除了 {removed} 个过期成员')
+    return {'success': True, 'removed': removed}
+
+
 # ==================== 增强版同步任务（双写策略）====================
 
 @celery.task
@@ -519,6 +372,8 @@ def sync_all_instances_enhanced():
     """
     增强版全量同步任务
     同步所有 VOS 实例的核心数据到专门表
+    
+    按实例分发为子任务并行执行（chord），汇总结果由 aggregate_instance_sync_results 记录
     """
     db = SessionLocal()
     try:
@@ -527,40 +382,15 @@ def sync_all_instances_enhanced():
             logger.info('没有启用的VOS实例，跳过增强版同步任务')
             return {'success': True, 'message': '没有VOS实例需要同步', 'instances_count': 0}
         
-        results = []
-        
-        for inst in instances:
-            logger.info(f'开始增强版同步: {inst.name}')
-            
-            sync_service = VosSyncEnhanced(db, inst.id, inst.base_url)
-            
-            # 1. 同步在线话机
-            phones_result = sync_service.sync_phones_online()
-            
-            # 2. 同步网关（对接+落地）
-            gateways_result = sync_service.sync_gateways('both')
-            
-            # 3. 同步费率组
-            fee_rates_result = sync_service.sync_fee_rate_groups()
-            
-            # 4. 同步套餐
-            suites_result = sync_service.sync_suites()
-            
-            results.append({
-                'instance_id': inst.id,
-                'instance_name': inst.name,
-                'phones': phones_result,
-                'gateways': gateways_result,
-                'fee_rates': fee_rates_result,
-                'suites': suites_result
-            })
-            
-            logger.info(f'增强版同步完成: {inst.name}')
+        header = group(sync_instance_enhanced.s(inst.id) for inst in instances)
+        chord_result = chord(header)(aggregate_instance_sync_results.s('enhanced'))
         
+        logger.info(f'增强版同步已分发: {len(instances)} 个实例')
         return {
             'success': True,
             'instances_count': len(instances),
-            'results': results
+            'chord_id': chord_result.id,
+            'message': f'已分发 {len(instances)} 个实例的增强版同步'
         }
         
     except Exception as e:
@@ -570,6 +400,82 @@ def sync_all_instances_enhanced():
         db.close()
 
 
+@celery.task
+def sync_instance_enhanced(instance_id: int):
+    """
+    单个实例的增强版同步（话机、网关、费率组、套餐）
+    实例内互不依赖的VOS接口并发获取；任何异常都转为失败结果，不影响其他实例
+    """
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        inst = db.query(VOSInstance).filter(VOSInstance.id == instance_id).first()
+        if not inst:
+            return {'instance_id': instance_id, 'success': False, 'message': 'VOS实例不存在'}
+        
+        if not is_instance_available(inst.base_url):
+            logger.warning(f'VOS实例 {inst.name} 熔断中，跳过增强版同步')
+            return {'instance_id': inst.id, 'instance_name': inst.name, 'success': False,
+                    'skipped': True, 'message': 'VOS实例熔断中，跳过同步'}
+        
+        logger.info(f'开始增强版同步: {inst.name}')
+        result = VosSyncEnhanced(db, inst.id, inst.base_url).sync_all()
+        logger.info(f"增强版同步完成: {inst.name} ({result['duration_ms']}ms)")
+        
+        return {
+            'instance_id': inst.id,
+            'instance_name': inst.name,
+            **result
+        }
+        
+    except Exception as e:
+        logger.exception(f'增强版同步失败 (instance={instance_id}): {e}')
+        return {
+            'instance_id': instance_id,
+            'success': False,
+            'error': str(e),
+            'duration_ms': round((time.perf_counter() - start) * 1000, 1)
+        }
+    finally:
+        db.close()
+
+
+@celery.task
+def aggregate_instance_sync_results(results: list, job: str):
+    """
+    汇总按实例分发的同步子任务结果，记录各节点耗时（Redis，保留1天）
+    
+    Args:
+        results: 各实例子任务的返回值
+        job: 同步类型（enhanced / gateways）
+    """
+    results = [r for r in results if isinstance(r, dict)]
+    success_count = sum(1 for r in results if r.get('success'))
+    durations = {
+        str(r.get('instance_id')): r.get('duration_ms') for r in results if r.get('duration_ms') is not None
+    }
+    summary = {
+        'job': job,
+        'instances_count': len(results),
+        'success_count': success_count,
+        'failed_count': len(results) - success_count,
+        'failed_instances': [
+            {'instance_id': r.get('instance_id'), 'instance_name': r.get('instance_name'),
+             'error': r.get('error') or r.get('message')}
+            for r in results if not r.get('success')
+        ],
+        'duration_ms_by_instance': durations,
+        'max_duration_ms': max(durations.values()) if durations else None,
+        'finished_at': datetime.utcnow().isoformat()
+    }
+    RedisCache.set(f'vos_sync_runs:{job}', summary, ttl=86400)
+    logger.info(
+        f"{job} 同步汇总: 成功 {success_count}/{len(results)}，"
+        f"最慢节点 {summary['max_duration_ms']}ms"
+    )
+    return summary
+
+
 @celery.task
 def sync_instance_phones_enhanced(instance_id: int):
     """同步单个实例的在线话机（增强版）"""
@@ -597,25 +503,38 @@ def sync_instance_phones_enhanced(instance_id: int):
 
 @celery.task
 def sync_instance_gateways_enhanced(instance_id: int):
-    """同步单个实例的网关（增强版）"""
+    """同步单个实例的网关（增强版），任何异常都转为失败结果"""
+    start = time.perf_counter()
     db = SessionLocal()
     try:
         inst = db.query(VOSInstance).filter(VOSInstance.id == instance_id).first()
         if not inst:
-            return {'success': False, 'message': 'VOS实例不存在'}
+            return {'instance_id': instance_id, 'success': False, 'message': 'VOS实例不存在'}
+        
+        if not is_instance_available(inst.base_url):
+            logger.warning(f'VOS实例 {inst.name} 熔断中，跳过网关同步')
+            return {'instance_id': inst.id, 'instance_name': inst.name, 'success': False,
+                    'skipped': True, 'message': 'VOS实例熔断中，跳过同步', 'duration_ms': 0}
         
         sync_service = VosSyncEnhanced(db, inst.id, inst.base_url)
         result = sync_service.sync_gateways('both')
         
         return {
-            'success': result['success'],
+            'instance_id': inst.id,
             'instance_name': inst.name,
-            **result
+            **result,
+            'success': result['success'],
+            'duration_ms': round((time.perf_counter() - start) * 1000, 1)
         }
         
     except Exception as e:
         logger.exception(f'同步网关失败: {e}')
-        return {'success': False, 'message': str(e)}
+        return {
+            'instance_id': instance_id,
+            'success': False,
+            'message': str(e),
+            'duration_ms': round((time.perf_counter() - start) * 1000, 1)
+        }
     finally:
         db.close()
 
@@ -624,7 +543,9 @@ def sync_instance_gateways_enhanced(instance_id: int):
 def sync_all_instances_gateways():
     """
     同步所有VOS实例的网关数据（定时任务）
-    每分钟运行一次，保持网关状态实时更新
+    同步网关配置与在线状态，在线状态的高频更新见 sync_all_instances_gateway_online
+    
+    按实例分发为子任务并行执行（chord），汇总结果由 aggregate_instance_sync_results 记录
     """
     db = SessionLocal()
     try:
@@ -633,24 +554,48 @@ def sync_all_instances_gateways():
             logger.info('没有启用的VOS实例，跳过网关同步任务')
             return {'success': True, 'message': '没有VOS实例需要同步', 'instances_count': 0}
         
+        header = group(sync_instance_gateways_enhanced.s(inst.id) for inst in instances)
+        chord_result = chord(header)(aggregate_instance_sync_results.s('gateways'))
+        
+        logger.info(f'网关同步已分发: {len(instances)} 个实例')
+        return {
+            'success': True,
+            'instances_count': len(instances),
+            'chord_id': chord_result.id,
+            'message': f'已分发 {len(instances)} 个实例的网关同步'
+        }
+        
+    except Exception as e:
+        logger.exception(f'同步所有实例网关失败: {e}')
+        return {'success': False, 'message': str(e)}
+    finally:
+        db.close()
+
+
+@celery.task
+def sync_all_instances_gateway_online():
+    """
+    同步所有VOS实例的网关在线状态（定时任务）
+    只调用 Online 接口并按差异批量更新，配置同步由 sync_all_instances_gateways 低频执行
+    """
+    db = SessionLocal()
+    try:
+        instances = db.query(VOSInstance).filter(VOSInstance.enabled == True).all()
+        if not instances:
+            return {'success': True, 'message': '没有VOS实例需要同步', 'instances_count': 0}
+        
         results = []
         for inst in instances:
-            logger.info(f'开始同步网关: {inst.name}')
-            
             try:
-                sync_service = VosSyncEnhanced(db, inst.id, inst.base_url)
-                
-                # 同步网关（对接+落地）
-                gateways_result = sync_service.sync_gateways('both')
-                
+                result = VosSyncEnhanced(db, inst.id, inst.base_url).sync_gateways_online('both')
                 results.append({
                     'instance_id': inst.id,
                     'instance_name': inst.name,
-                    'success': gateways_result.get('success', False),
-                    'result': gateways_result
+                    'success': result.get('success', False),
+                    'updated_count': result.get('updated_count', 0)
                 })
             except Exception as e:
-                logger.exception(f'同步网关失败 (instance={inst.name}): {e}')
+                logger.exception(f'同步网关在线状态失败 (instance={inst.name}): {e}')
                 results.append({
                     'instance_id': inst.id,
                     'instance_name': inst.name,
@@ -658,109 +603,47 @@ def sync_all_instances_gateways():
                     'error': str(e)
                 })
         
-        success_count = sum(1 for r in results if r.get('success'))
         return {
             'success': True,
             'instances_count': len(instances),
-            'success_count': success_count,
-            'failed_count': len(instances) - success_count,
+            'updated_count': sum(r.get('updated_count', 0) for r in results),
             'results': results
         }
         
     except Exception as e:
-        logger.exception(f'同步所有实例网关失败: {e}')
+        logger.exception(f'同步所有实例网关在线状态失败: {e}')
         return {'success': False, 'message': str(e)}
     finally:
         db.close()
 
 
 @celery.task
-def check_vos_instances_health():
+def check_vos_instances_health(force: bool = False):
     """
     定时检查所有VOS实例的健康状态
-    通过调用GetAllCustomers API来验证VOS接口是否畅通
+    并发调用轻量接口（GetPerformance，短超时）探测，只检查到期的节点，
+    失败节点按指数退避推迟下次检查；结果发布到Redis供其他VOS调用方快速失败
+    
+    Args:
+        force: 忽略退避立即检查所有节点（手动触发）
     """
     db = SessionLocal()
     try:
-        instances = db.query(VOSInstance).filter(VOSInstance.enabled == True).all()
-        if not instances:
+        result = VosHealthChecker(db).run(force=force)
+        if not result['instances_count']:
             logger.info('没有启用的VOS实例，跳过健康检查')
             return {'success': True, 'message': '没有VOS实例需要检查', 'instances_count': 0}
         
-        results = []
-        for inst in instances:
-            logger.info(f'检查VOS实例健康状态: {inst.name} ({inst.base_url})')
-            
-            # 获取或创建健康检查记录
-            health_check = db.query(VOSHealthCheck).filter(
-                VOSHealthCheck.vos_instance_id == inst.id
-            ).first()
-            
-            if not health_check:
-                health_check = VOSHealthCheck(vos_instance_id=inst.id, vos_uuid=inst.vos_uuid)
-                db.add(health_check)
-            else:
-                # 更新现有记录的UUID
-                health_check.vos_uuid = inst.vos_uuid
-            
-            # 执行健康检查 - 调用简单的API测试连通性
-            client = VOSClient(inst.base_url)
-            start_time = time.time()
-            
-            try:
-                # 使用GetAllCustomers API作为健康检查
-                result = client.post('/external/server/GetAllCustomers', payload={'type': 1})
-                response_time = (time.time() - start_time) * 1000  # 转换为毫秒
-                
-                if client.is_success(result):
-                    # API调用成功
-                    health_check.status = 'healthy'
-                    health_check.api_success = True
-                    health_check.response_time_ms = response_time
-                    health_check.error_message = None
-                    health_check.consecutive_failures = 0
-                    logger.info(f'✓ VOS实例 {inst.name} 健康 (响应时间: {response_time:.0f}ms)')
-                else:
-                    # API调用失败
-                    error_msg = client.get_error_message(result)
-                    health_check.status = 'unhealthy'
-                    health_check.api_success = False
-                    health_check.response_time_ms = response_time
-                    health_check.error_message = error_msg[:500] if error_msg else 'API返回错误'
-                    # 安全地增加失败次数
-                    health_check.consecutive_failures = (health_check.consecutive_failures or 0) + 1
-                    logger.warning(f'✗ VOS实例 {inst.name} 不健康: {error_msg}')
-                
-            except Exception as e:
-                # 网络或其他错误
-                response_time = (time.time() - start_time) * 1000
-                error_msg = str(e)
-                health_check.status = 'unhealthy'
-                health_check.api_success = False
-                health_check.response_time_ms = response_time
-                health_check.error_message = error_msg[:500]
-                # 安全地增加失败次数
-                health_check.consecutive_failures = (health_check.consecutive_failures or 0) + 1
-                logger.error(f'✗ VOS实例 {inst.name} 健康检查异常: {error_msg}')
-            
-            health_check.last_check_at = datetime.utcnow()
-            
-            results.append({
-                'instance_id': inst.id,
-                'instance_name': inst.name,
-                'status': health_check.status,
-                'response_time_ms': health_check.response_time_ms,
-                'consecutive_failures': health_check.consecutive_failures
-            })
+        logger.info(f"VOS健康检查完成，共 {result['instances_count']} 个实例，本轮检查 {result['checked_count']} 个")
         
-        db.commit()
-        logger.info(f'VOS健康检查完成，共检查 {len(instances)} 个实例')
+        # 健康状态已更新，失效实例列表等汇总缓存
+        if result['checked_count']:
+            RedisCache.invalidate_tags([CacheTags.summary(CacheTags.HEALTH)])
         
         return {
             'success': True,
             'message': f'健康检查完成',
-            'instances_count': len(instances),
-            'results': results
+            **result
         }
         
     except Exception as e:
@@ -770,23 +653,55 @@ def check_vos_instances_health():
         db.close()
 
 
+@celery.task
+def sample_vos_capacity():
+    """
+    容量采样：每分钟记录各实例的并发呼叫数（总数、按网关）和性能指标到ClickHouse时序表，
+    1分钟/1小时/1天汇总由物化视图在写入时完成
+    """
+    db = SessionLocal()
+    try:
+        result = CapacitySampler(db).run()
+        logger.debug(f"容量采样完成: {result}")
+        return {'success': True, **result}
+    except Exception as e:
+        logger.error(f'容量采样失败: {e}')
+        return {'success': False, 'message': str(e)}
+    finally:
+        db.close()
+
+
 @celery.task(bind=True)
 def refresh_dashboard_statistics_view(self):
     """
-    刷新仪表盘统计物化视图
-    在客户数据更新后调用，保持统计数据最新
+    全量校准仪表盘统计汇总表
+    汇总表由客户同步和健康检查增量维护，这里只做定期兜底校准；
+    DASHBOARD_REFRESH_DEBOUNCE 秒内重复触发的请求直接跳过
     """
     from app.core.db import SessionLocal
     from sqlalchemy import text
+    from app.core.redis_cache import get_redis_client
+    
+    client = get_redis_client()
+    if client is not None:
+        try:
+            if not client.set(DASHBOARD_REFRESH_LOCK_KEY, '1', nx=True, ex=DASHBOARD_REFRESH_DEBOUNCE):
+                logger.info("仪表盘统计最近已校准，跳过本次请求")
+                return {'success': True, 'skipped': True}
+        except Exception as e:
+            logger.warning(f'获取仪表盘校准锁失败，继续执行: {e}')
     
     db = SessionLocal()
     try:
-        logger.info("🔄 刷新仪表盘统计物化视图...")
+        logger.info("🔄 校准仪表盘统计汇总表...")
         db.execute(text("SELECT refresh_dashboard_statistics()"))
         db.commit()
-        logger.info("✅ 仪表盘统计物化视图刷新完成")
+        logger.info("✅ 仪表盘统计汇总表校准完成")
+        RedisCache.invalidate_tags([CacheTags.summary(CacheTags.CUSTOMER)])
+        return {'success': True}
     except Exception as e:
-        logger.error(f'❌ 刷新仪表盘统计物化视图失败: {e}', exc_info=True)
+        logger.error(f'❌ 校准仪表盘统计汇总表失败: {e}', exc_info=True)
         db.rollback()
+        return {'success': False, 'message': str(e)}
     finally:
         db.close()
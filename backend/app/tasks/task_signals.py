@@ -0,0 +1,75 @@
+"""
+Celery 信号处理：把任务和Worker状态写入任务登记表（app.core.task_registry）
+"""
+import os
+import socket
+import threading
+
+from celery.signals import (
+    worker_ready, worker_shutdown, task_received, task_prerun,
+    task_postrun, task_failure, task_revoked
+)
+
+from app.core import task_registry
+
+_heartbeat_stop = threading.Event()
+
+
+def _hostname(sender=None) -> str:
+    return getattr(sender, 'hostname', None) or f'celery@{socket.gethostname()}'
+
+
+def _heartbeat_loop(hostname: str):
+    while not _heartbeat_stop.wait(task_registry.HEARTBEAT_INTERVAL):
+        task_registry.record_worker(hostname, os.getpid())
+
+
+@worker_ready.connect
+def on_worker_ready(sender=None, **kwargs):
+    hostname = _hostname(sender)
+    task_types = sorted(
+        name.split('.')[-1] for name in sender.app.tasks
+        if not name.startswith('celery.') and 'sync' in name.lower()
+    )
+    task_registry.reset_worker(hostname)
+    task_registry.record_worker(hostname, os.getpid(), task_types)
+    threading.Thread(target=_heartbeat_loop, args=(hostname,), daemon=True,
+                     name='task-registry-heartbeat').start()
+
+
+@worker_shutdown.connect
+def on_worker_shutdown(sender=None, **kwargs):
+    _heartbeat_stop.set()
+    task_registry.remove_worker(_hostname(sender))
+
+
+@task_received.connect
+def on_task_received(sender=None, request=None, **kwargs):
+    if request is None:
+        return
+    eta = getattr(request, 'eta', None)
+    task_registry.record_received(
+        request.id, request.name, _hostname(getattr(sender, 'controller', None) or sender),
+        eta.isoformat() if hasattr(eta, 'isoformat') else eta
+    )
+
+
+@task_prerun.connect
+def on_task_prerun(task_id=None, task=None, **kwargs):
+    task_registry.record_started(task_id, task.name, task.request.hostname or _hostname())
+
+
+@task_postrun.connect
+def on_task_postrun(task_id=None, state=None, **kwargs):
+    task_registry.record_finished(task_id, state)
+
+
+@task_failure.connect
+def on_task_failure(sender=None, task_id=None, exception=None, **kwargs):
+    task_registry.record_failure(task_id, getattr(sender, 'name', ''), str(exception))
+
+
+@task_revoked.connect
+def on_task_revoked(request=None, **kwargs):
+    if request is not None:
+        task_registry.record_revoked(request.id)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+响应序列化基准测试
+按最大的几个接口的响应结构生成数据，对比 FastAPI 默认编码（jsonable_encoder + json.dumps）
+与 orjson（app.core.fast_json）的耗时，以及 GZip / Brotli 压缩后的大小和耗时
+
+用法（在后端容器中）：
+    python benchmark_serialization.py [--customers 20000] [--cdrs 50000] [--rounds 5]
+"""
+import sys
+sys.path.insert(0, '/srv')
+
+import argparse
+import gzip
+import json
+import random
+import time
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+from app.core.fast_json import dumps
+from app.core.compression import brotli
+
+
+def build_customers(count: int) -> dict:
+    """/vos/instances/{id}/customers"""
+    return {
+        'customers': [
+            {
+                'account': f'{100000 + i}',
+                'money': round(random.uniform(-500, 5000), 2),
+                'limitMoney': float(random.choice((0, 100, 500, 1000))),
+                'is_in_debt': random.random() < 0.1,
+            }
+            for i in range(count)
+        ],
+        'count': count,
+        'instance_id': 1,
+        'instance_name': '测试节点',
+        'from_cache': True,
+        'data_source': 'database',
+        'last_synced_at': datetime.now().isoformat(),
+    }
+
+
+def build_all_customers(count: int) -> dict:
+    """/vos-api/instances/{id}/GetAllCustomers（VOS原始数据）"""
+    return {
+        'success': True,
+        'data': {
+            'retCode': 0,
+            'infoCustomerBriefs': [
+                {
+                    'account': f'{100000 + i}',
+                    'name': f'客户{i}',
+                    'money': round(random.uniform(-500, 5000), 4),
+                    'limitMoney': 0.0,
+                    'feeRateGroup': 'default',
+                    'lockType': 0,
+                    'type': 1,
+                }
+                for i in range(count)
+            ],
+        },
+        'error': None,
+        'data_source': 'redis',
+        'synced_at': datetime.now().isoformat(),
+        'instance_name': '测试节点',
+    }
+
+
+def build_cdrs(count: int) -> dict:
+    """/cdr/query-from-vos（ClickHouse行：datetime 与 Decimal 费用）"""
+    start = datetime(2025, 1, 1)
+    return {
+        'success': True,
+        'cdrs': [
+            {
+                'flow_no': f'{1000000000 + i}',
+                'account': f'{100000 + i % 2000}',
+                'caller_e164': f'1380000{i % 10000:04d}',
+                'callee_e164': f'1390000{(i * 7) % 10000:04d}',
+                'start': start + timedelta(seconds=i * 3),
+                'stop': start + timedelta(seconds=i * 3 + 60),
+                'hold_time': 60,
+                'fee_time': 60,
+                'fee': Decimal('0.0350'),
+                'end_reason': 'Normal',
+                'caller_gateway': f'gw-in-{i % 20}',
+                'callee_gateway': f'gw-out-{i % 30}',
+                'report_date': date(2025, 1, 1),
+            }
+            for i in range(count)
+        ],
+        'count': count,
+        'total': count,
+        'data_source': 'clickhouse',
+    }
+
+
+def default_encode(payload) -> bytes:
+    """FastAPI 默认路径：jsonable_encoder + JSONResponse.render"""
+    return json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def measure(func, payload, rounds: int):
+    """返回 (最短耗时ms, 结果)"""
+    best, result = None, None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func(payload)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='响应序列化基准测试')
+    parser.add_argument('--customers', type=int, default=20000)
+    parser.add_argument('--cdrs', type=int, default=50000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(42)
+    payloads = [
+        ('instances/{id}/customers', build_customers(args.customers)),
+        ('vos-api GetAllCustomers', build_all_customers(args.customers)),
+        ('cdr query', build_cdrs(args.cdrs)),
+    ]
+
+    print('=' * 96)
+    print(f"{'接口':<28}{'默认编码':>12}{'orjson':>10}{'加速':>8}{'原始大小':>12}"
+          f"{'gzip':>18}{'brotli':>18}")
+    print('=' * 96)
+    for name, payload in payloads:
+        default_ms, default_body = measure(default_encode, payload, args.rounds)
+        fast_ms, body = measure(dumps, payload, args.rounds)
+        assert json.loads(body) == json.loads(default_body), f'{name}: 编码结果不一致'
+
+        gzip_ms, gzipped = measure(lambda b: gzip.compress(b, compresslevel=settings.GZIP_LEVEL), body, args.rounds)
+        gzip_text = f'{len(gzipped) / 1024:.0f}KB/{gzip_ms:.0f}ms'
+        if brotli is not None:
+            br_ms, br = measure(lambda b: brotli.compress(b, quality=settings.BROTLI_QUALITY), body, args.rounds)
+            br_text = f'{len(br) / 1024:.0f}KB/{br_ms:.0f}ms'
+        else:
+            br_text = '未安装'
+
+        print(f'{name:<28}{default_ms:>10.1f}ms{fast_ms:>8.1f}ms{default_ms / fast_ms:>7.1f}x'
+              f'{len(body) / 1024:>10.0f}KB{gzip_text:>18}{br_text:>18}')
+    print('=' * 96)
+
+
+if __name__ == '__main__':
+    main()
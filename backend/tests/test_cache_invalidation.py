@@ -0,0 +1,39 @@
+"""按前缀清除缓存只作用于 vos_cache: 命名空间"""
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('pydantic_settings')
+pytest.importorskip('redis')
+
+from fastapi import HTTPException
+
+from app.core import redis_cache
+from app.core.redis_cache import RedisCache, escape_glob
+from app.routers.vos_api import validate_invalidate_prefix
+
+
+@pytest.mark.parametrize('prefix', ['vos_cache:', 'vos_cache:1:', 'vos_cache:1:/external/server/GetPerformance:'])
+def test_accepts_vos_cache_namespace(prefix):
+    assert validate_invalidate_prefix(prefix) == prefix
+
+
+@pytest.mark.parametrize('prefix', ['', 'celery', '_kombu', 'cache_tag:', 'principal:', '*', 'vos_cache', 'xvos_cache:'])
+def test_rejects_other_prefixes(prefix):
+    with pytest.raises(HTTPException) as exc:
+        validate_invalidate_prefix(prefix)
+    assert exc.value.status_code == 400
+
+
+def test_delete_prefix_matches_literally(monkeypatch):
+    """前缀中的通配字符按字面匹配，不会扩大删除范围"""
+    patterns = []
+
+    class Client:
+        def scan_iter(self, match, count):
+            patterns.append(match)
+            return iter(())
+
+    monkeypatch.setattr(redis_cache, 'get_redis_client', lambda: Client())
+    RedisCache.delete_prefix('vos_cache:*')
+    assert patterns == ['vos_cache:\\**']
+    assert escape_glob('a?b[c]\\') == 'a\\?b\\[c\\]\\\\'
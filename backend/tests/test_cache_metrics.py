@@ -0,0 +1,31 @@
+"""Prometheus 导出格式"""
+from app.core.cache_metrics import CacheMetrics, LATENCY_BUCKETS, _field
+
+
+def _histogram_counters():
+    counters = {}
+    labels = {'op': 'get'}
+    for bound in LATENCY_BUCKETS:
+        counters[_field('redis_cache_latency_seconds_bucket', {**labels, 'le': bound})] = 1.0
+    counters[_field('redis_cache_latency_seconds_bucket', {**labels, 'le': '+Inf'})] = 1.0
+    counters[_field('redis_cache_latency_seconds_sum', labels)] = 0.5
+    counters[_field('redis_cache_latency_seconds_count', labels)] = 1.0
+    return counters
+
+
+def test_histogram_buckets_in_numeric_order():
+    text = CacheMetrics.format_prometheus(_histogram_counters())
+    bounds = [
+        line.split('le="', 1)[1].split('"', 1)[0]
+        for line in text.splitlines()
+        if line.startswith('redis_cache_latency_seconds_bucket')
+    ]
+    assert bounds[-1] == '+Inf'
+    numeric = [float(b) for b in bounds[:-1]]
+    assert numeric == sorted(numeric) == list(LATENCY_BUCKETS)
+
+
+def test_single_type_line_per_family():
+    text = CacheMetrics.format_prometheus(_histogram_counters())
+    assert text.count('# TYPE redis_cache_latency_seconds histogram') == 1
+    assert 'vos_cache_hot_key_hits' not in text
@@ -0,0 +1,61 @@
+"""容量时序的分桶、粒度选择与补零平均"""
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('clickhouse_driver')
+
+from app.models.clickhouse_capacity_metrics import _interval, choose_bucket, choose_rollup, zero_filled
+
+NOW = datetime(2026, 10, 19, 12, 0, 0)
+
+
+def test_zero_filled_average_counts_idle_samples():
+    # 60次采样中网关只在10次有通话（合计 10 * 6 = 60 路），均值应为 1 而不是 6
+    assert zero_filled(4.0, 8.0, 60.0, 10, 60) == (0.0, 8.0, 1.0)
+
+
+def test_zero_filled_busy_every_sample_keeps_min():
+    assert zero_filled(2.0, 5.0, 210.0, 60, 60) == (2.0, 5.0, 3.5)
+
+
+def test_zero_filled_idle_bucket():
+    assert zero_filled(0.0, 0.0, 0.0, 0, 60) == (0.0, 0.0, 0.0)
+    assert zero_filled(0.0, 0.0, 0.0, 0, 0) is None
+
+
+def test_zero_filled_without_grid_uses_own_samples():
+    assert zero_filled(1.0, 3.0, 8.0, 4, 0) == (1.0, 3.0, 2.0)
+
+
+def test_rollup_averages_are_exact_across_granularities():
+    """合计/样本数在各粒度下再汇总，结果与直接对原始样本求平均一致"""
+    values = [float(i % 7) for i in range(180)]
+    minutes = [values[i:i + 60] for i in range(0, 180, 60)]
+    value_sum = sum(sum(m) for m in minutes)
+    samples = sum(len(m) for m in minutes)
+    _, _, avg = zero_filled(min(values), max(values), value_sum, samples, samples)
+    assert avg == pytest.approx(sum(values) / len(values))
+
+
+def test_choose_bucket_limits_points():
+    start = NOW - timedelta(days=7)
+    step = choose_bucket(start, NOW, 500)
+    assert (NOW - start).total_seconds() / step <= 500
+    assert choose_bucket(NOW - timedelta(hours=1), NOW, 500) == 60
+
+
+def test_choose_rollup_respects_retention_and_granularity():
+    assert choose_rollup(NOW - timedelta(hours=6), 300, now=NOW) == ('vos_capacity_1m', 300)
+    assert choose_rollup(NOW - timedelta(days=7), 3 * 3600, now=NOW) == ('vos_capacity_1h', 3 * 3600)
+    # 1分钟汇总只保留30天，更早的起点改用1小时汇总，分桶放大到粒度
+    assert choose_rollup(NOW - timedelta(days=60), 300, now=NOW) == ('vos_capacity_1h', 3600)
+    # 分桶向上取整到粒度的整数倍
+    assert choose_rollup(NOW - timedelta(days=7), 5400, now=NOW) == ('vos_capacity_1h', 7200)
+
+
+def test_interval_alignment():
+    assert _interval(60) == 'INTERVAL 1 MINUTE'
+    assert _interval(7200) == 'INTERVAL 2 HOUR'
+    assert _interval(86400) == 'INTERVAL 1 DAY'
+    assert _interval(90) == 'INTERVAL 90 SECOND'
@@ -0,0 +1,83 @@
+"""客户分页列表：汇总表总数与键集分页逐页读取的行数一致"""
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('greenlet')
+
+from sqlalchemy import MetaData, create_engine, select
+
+from app.core.customer_page import (
+    counter_total, customer_page_after, customer_page_conditions, customer_page_ordering,
+    decode_cursor, encode_cursor,
+)
+from app.models.customer import Customer
+from app.models.vos_instance import VOSInstance
+
+CUSTOMERS = Customer.__table__
+MONEY = [5.0, -1.0, 0.0, 5.0, -3.5, 12.0, 0.0, -1.0, 7.25, 5.0, -0.5]
+
+
+@pytest.fixture
+def conn():
+    # 只建 vos_instances 与 customers 表（索引使用 PostgreSQL 的操作符类，SQLite 下不建）
+    metadata = MetaData()
+    VOSInstance.__table__.to_metadata(metadata)
+    CUSTOMERS.to_metadata(metadata).indexes.clear()
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    with engine.connect() as connection:
+        rows = [
+            {'vos_instance_id': 1, 'account': f'acc{i:02d}', 'money': money, 'limit_money': 0.0,
+             'is_in_debt': money < 0}
+            for i, money in enumerate(MONEY)
+        ]
+        rows.append({'vos_instance_id': 2, 'account': 'other', 'money': -9.0, 'limit_money': 0.0,
+                     'is_in_debt': True})
+        connection.execute(CUSTOMERS.insert(), rows)
+        yield connection
+
+
+def _walk(conn, status, sort, order, page_size=3):
+    conditions = customer_page_conditions(1, status)
+    seen, cursor = [], None
+    while True:
+        page_conditions = list(conditions)
+        if cursor:
+            page_conditions.append(customer_page_after(sort, order, decode_cursor(sort, cursor)))
+        rows = conn.execute(
+            select(Customer.id, Customer.account, Customer.money, Customer.is_in_debt)
+            .where(*page_conditions)
+            .order_by(*customer_page_ordering(sort, order))
+            .limit(page_size + 1)
+        ).all()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        seen.extend(rows)
+        if not has_more:
+            return seen
+        cursor = encode_cursor(sort, rows[-1])
+
+
+@pytest.mark.parametrize('status', ['all', 'normal', 'debt'])
+@pytest.mark.parametrize('sort', ['account', 'money'])
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_counter_total_matches_paged_rows(conn, status, sort, order):
+    # 与客户同步维护的汇总表口径相同
+    total_customers = len(MONEY)
+    debt_customers = sum(1 for money in MONEY if money < 0)
+
+    rows = _walk(conn, status, sort, order)
+
+    assert len(rows) == counter_total(status, total_customers, debt_customers)
+    assert len({row.id for row in rows}) == len(rows)
+    keys = [(row.account,) if sort == 'account' else (row.money, row.id) for row in rows]
+    assert keys == sorted(keys, reverse=(order == 'desc'))
+
+
+def test_decode_cursor_rejects_mismatched_sort():
+    cursor = encode_cursor('account', type('Row', (), {'account': 'acc01'})())
+    assert decode_cursor('account', cursor) == ('acc01',)
+    with pytest.raises(ValueError):
+        decode_cursor('money', cursor)
+    with pytest.raises(ValueError):
+        decode_cursor('account', 'not-a-cursor')
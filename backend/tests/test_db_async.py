@@ -0,0 +1,41 @@
+"""异步引擎（asyncpg + greenlet）与连接池等待指标"""
+import os
+
+import pytest
+
+from app.core import cache_metrics
+from app.core.cache_metrics import CacheMetrics
+
+
+def test_async_engine_imports():
+    pytest.importorskip('pydantic_settings')
+    pytest.importorskip('asyncpg')
+    pytest.importorskip('greenlet')
+    from sqlalchemy.ext.asyncio import AsyncEngine
+    from app.core import db
+
+    assert isinstance(db.async_engine, AsyncEngine)
+    assert db.async_engine.url.drivername == 'postgresql+asyncpg'
+
+
+def test_async_database_url():
+    pytest.importorskip('pydantic_settings')
+    from app.core.db import async_database_url
+
+    assert async_database_url('postgresql://u:p@h:5432/db') == 'postgresql+asyncpg://u:p@h:5432/db'
+    assert async_database_url('sqlite:///x.db') == 'sqlite:///x.db'
+
+
+def test_pool_wait_is_buffered_without_redis_io(monkeypatch):
+    """连接池回调中只写进程内计数器，不访问Redis"""
+    def fail_flush():
+        raise AssertionError('采集路径不应刷新到Redis')
+
+    monkeypatch.setattr(CacheMetrics, 'flush', classmethod(lambda cls: fail_flush()))
+    monkeypatch.setattr(CacheMetrics, '_flusher_pid', os.getpid())
+    monkeypatch.setattr(CacheMetrics, '_counters', cache_metrics.defaultdict(float))
+
+    CacheMetrics.record_db_pool_wait('async', 0.003)
+
+    assert CacheMetrics._counters['db_pool_wait_seconds_count{pool="async"}'] == 1
+    assert CacheMetrics._counters['db_pool_wait_seconds_bucket{le="0.005",pool="async"}'] == 1
@@ -0,0 +1,15 @@
+"""健康检查退避间隔"""
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('pydantic_settings')
+pytest.importorskip('redis')
+
+from app.core.vos_health_checker import BACKOFF_MAX, CHECK_INTERVAL, backoff_seconds
+
+
+def test_backoff_is_capped():
+    assert backoff_seconds(0) == CHECK_INTERVAL
+    assert backoff_seconds(1) == 60
+    assert backoff_seconds(2) == 120
+    assert max(backoff_seconds(n) for n in range(1, 50)) == BACKOFF_MAX <= 120
@@ -0,0 +1,46 @@
+"""节点是否可调用以熔断器为准：熔断到期（可半开探测）即视为可用"""
+import time
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('pydantic_settings')
+pytest.importorskip('redis')
+
+from app.core import vos_circuit_breaker
+from app.core.vos_health_checker import is_instance_available
+
+BASE_URL = 'http://vos.example:8080'
+
+
+class FakeRedis:
+    def __init__(self, circuit):
+        self.circuit = circuit
+
+    def hgetall(self, key):
+        return self.circuit
+
+    def get(self, key):
+        return None
+
+
+@pytest.fixture
+def breaker_state(monkeypatch):
+    def set_state(circuit):
+        monkeypatch.setattr(vos_circuit_breaker, 'get_redis_client', lambda: FakeRedis(circuit))
+    return set_state
+
+
+def test_closed_breaker_is_available(breaker_state):
+    breaker_state({})
+    assert is_instance_available(BASE_URL)
+
+
+def test_open_breaker_is_unavailable(breaker_state):
+    breaker_state({'state': 'open', 'open_until': str(time.time() + 60)})
+    assert not is_instance_available(BASE_URL)
+
+
+def test_expired_open_breaker_allows_half_open_probe(breaker_state):
+    breaker_state({'state': 'open', 'open_until': str(time.time() - 1)})
+    assert is_instance_available(BASE_URL)
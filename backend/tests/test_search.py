@@ -0,0 +1,103 @@
+"""全局搜索：排序、短关键字走前缀区间、并发与时间预算"""
+import asyncio
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('greenlet')
+
+from sqlalchemy.dialects import postgresql
+
+from app.core import search
+from app.core.search import (
+    build_search_stmt, prefix_upper_bound, rank_key, rank_rows, search_all,
+)
+from app.models.customer import Customer
+
+
+def _compile(stmt):
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_rank_exact_then_prefix_then_distance_then_length():
+    rows = [
+        {'value': 'x138', 'distance': 0.2},
+        {'value': '13800', 'distance': 0.5},
+        {'value': '138', 'distance': 0.0},
+        {'value': '1380', 'distance': 0.4},
+        {'value': 'y138', 'distance': 0.1},
+    ]
+    ranked = [r['value'] for r in rank_rows(rows, '138')]
+    assert ranked == ['138', '1380', '13800', 'y138', 'x138']
+    assert all('distance' not in r for r in rows)
+
+
+def test_rank_is_case_insensitive():
+    assert rank_key('ABC', 'abc')[0] == 0
+    assert rank_key('ABCd', 'abc')[0] == 1
+
+
+def test_prefix_upper_bound():
+    assert prefix_upper_bound('ab') == 'ac'
+    assert prefix_upper_bound('1') == '2'
+    assert 'ab￿' < prefix_upper_bound('ab')
+
+
+def test_short_keyword_uses_prefix_range_not_substring():
+    sql = _compile(build_search_stmt(Customer.account, [], 'Ab', None, 20))
+    assert '~>=~' in sql and '~<~' in sql
+    assert 'ILIKE' not in sql and '<->' not in sql
+    assert 'ORDER BY lower(customers.account)' in sql
+
+
+def test_long_keyword_uses_knn_order():
+    sql = _compile(build_search_stmt(Customer.account, [], '138', 3, 20))
+    assert 'ILIKE' in sql
+    assert 'ORDER BY customers.account <->' in sql
+    assert 'LIMIT' in sql
+
+
+class _FakeSession:
+    def __init__(self):
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        self.statements.append(str(stmt))
+
+
+def test_search_all_runs_concurrently_and_reports_timeouts(monkeypatch):
+    sessions = []
+
+    def factory():
+        session = _FakeSession()
+        sessions.append(session)
+        return session
+
+    async def fast(db, keyword, instance_id=None, limit=20):
+        await asyncio.sleep(0.01)
+        return [{'value': keyword}]
+
+    async def slow(db, keyword, instance_id=None, limit=20):
+        await asyncio.sleep(5)
+        return []
+
+    monkeypatch.setattr(search, 'SEARCHERS', {
+        'customer': ('customers', fast),
+        'gateway': ('gateways', slow),
+        'phone': ('phones', fast),
+    })
+    result = asyncio.run(search_all(factory, 'abc', ['customer', 'gateway', 'phone'], budget_ms=200))
+
+    assert result['customers'] == [{'value': 'abc'}]
+    assert result['phones'] == [{'value': 'abc'}]
+    assert result['gateways'] == []
+    assert result['incomplete'] == ['gateway']
+    # 每类使用独立会话，并设置语句超时
+    assert len(sessions) == 3
+    assert all('statement_timeout = 200' in s.statements[0] for s in sessions)
@@ -0,0 +1,38 @@
+"""批量查询只允许只读的 Get* 接口"""
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('pydantic_settings')
+pytest.importorskip('redis')
+
+from app.routers import vos_api
+from app.routers.vos_api import BATCH_ALLOWED_APIS, resolve_batch_api_path
+
+
+def test_accepts_exposed_get_endpoints():
+    assert resolve_batch_api_path('GetPerformance') == '/external/server/GetPerformance'
+    assert resolve_batch_api_path('/external/server/GetAllCustomers') == '/external/server/GetAllCustomers'
+
+
+@pytest.mark.parametrize('api_path', [
+    'CreateCustomer',
+    'ModifyCustomer',
+    '/external/server/DeleteGatewayRouting',
+    '/external/server/Pay',
+    '/external/other/GetPerformance',
+    'GetPerformance/../ModifyCustomer',
+    '',
+])
+def test_rejects_everything_else(api_path):
+    assert resolve_batch_api_path(api_path) is None
+
+
+def test_allowlist_matches_exposed_routes():
+    """允许列表中的每个接口都有对应的单接口路由，且都是只读查询"""
+    exposed = {
+        f'{vos_api.VOS_API_PREFIX}{route.path.rsplit("/", 1)[-1]}'
+        for route in vos_api.router.routes
+        if route.path.startswith('/vos-api/instances/{instance_id}/Get')
+    }
+    assert BATCH_ALLOWED_APIS <= exposed
+    assert all(path.rsplit('/', 1)[-1].startswith('Get') for path in BATCH_ALLOWED_APIS)
@@ -0,0 +1,44 @@
+-- ClickHouse 账户明细报表表
+-- 与 PostgreSQL account_detail_reports 双写，用于长时间范围的聚合分析
+-- 已有数据库也可直接执行（IF NOT EXISTS），后端首次写入时也会自动创建
+
+USE vos_cdrs;
+
+CREATE TABLE IF NOT EXISTS account_detail_reports
+(
+    vos_id UInt32 COMMENT 'VOS实例ID',
+    vos_uuid String COMMENT 'VOS节点唯一标识',
+    account String COMMENT '账户号码',
+    account_name String COMMENT '账户名称',
+
+    -- 时间信息（UTC时间戳，毫秒）及对应的UTC日期（分区键）
+    begin_time UInt64 COMMENT '起始时间（毫秒）',
+    end_time UInt64 COMMENT '终止时间（毫秒）',
+    report_date Date COMMENT '报表日期（UTC）',
+
+    -- 统计数据
+    cdr_count UInt64 COMMENT '话单总计',
+    total_fee Decimal(15, 4) COMMENT '费用总计',
+    total_time UInt64 COMMENT '计费时长总计（秒）',
+    total_suite_fee Decimal(15, 4) COMMENT '套餐费用总计',
+    total_suite_fee_time UInt64 COMMENT '套餐费用时长',
+    net_fee Decimal(15, 4) COMMENT '网络费用',
+    net_time UInt64 COMMENT '网络时长',
+    net_count UInt64 COMMENT '网络数量',
+    local_fee Decimal(15, 4) COMMENT '本地费用',
+    local_time UInt64 COMMENT '本地时长',
+    local_count UInt64 COMMENT '本地数量',
+    domestic_fee Decimal(15, 4) COMMENT '国内通话费用',
+    domestic_time UInt64 COMMENT '国内通话计费时长（秒）',
+    domestic_count UInt64 COMMENT '国内通话数量',
+    international_fee Decimal(15, 4) COMMENT '国际费用',
+    international_time UInt64 COMMENT '国际时长',
+    international_count UInt64 COMMENT '国际数量',
+
+    updated_at DateTime DEFAULT now() COMMENT '更新时间（去重版本）'
+)
+ENGINE = ReplacingMergeTree(updated_at)
+PARTITION BY toYYYYMM(report_date)
+ORDER BY (vos_uuid, account, begin_time)
+SETTINGS index_granularity = 8192
+COMMENT '账户明细报表 - 按月分区，同一账户同一时段自动去重';
@@ -0,0 +1,90 @@
+-- ClickHouse 容量时序表
+-- 采样任务每分钟写入一次各实例的并发呼叫数（总数、按网关）和 GetPerformance 性能指标，
+-- 物化视图在写入时同步汇总到 1分钟/1小时/1天 三个粒度，查询按时间范围选择合适的粒度
+-- 已有数据库也可直接执行（IF NOT EXISTS），后端首次写入时也会自动创建
+
+USE vos_cdrs;
+
+-- 原始采样（保留2天）
+CREATE TABLE IF NOT EXISTS vos_capacity_samples
+(
+    vos_id UInt32 COMMENT 'VOS实例ID',
+    metric LowCardinality(String) COMMENT '指标名称',
+    gateway String COMMENT '网关名称（实例级指标为空）',
+    ts DateTime COMMENT '采样时间',
+    value Float64 COMMENT '指标值'
+)
+ENGINE = MergeTree
+PARTITION BY toYYYYMMDD(ts)
+ORDER BY (vos_id, metric, gateway, ts)
+TTL ts + INTERVAL 2 DAY
+COMMENT '容量原始采样 - 按天分区，保留2天';
+
+-- 汇总表：最小/最大/合计/样本数（平均值 = 合计 / 样本数，跨粒度再汇总仍然正确）
+CREATE TABLE IF NOT EXISTS vos_capacity_1m
+(
+    vos_id UInt32,
+    metric LowCardinality(String),
+    gateway String,
+    bucket DateTime,
+    value_min SimpleAggregateFunction(min, Float64),
+    value_max SimpleAggregateFunction(max, Float64),
+    value_sum SimpleAggregateFunction(sum, Float64),
+    samples SimpleAggregateFunction(sum, UInt64)
+)
+ENGINE = AggregatingMergeTree
+PARTITION BY toYYYYMM(bucket)
+ORDER BY (vos_id, metric, gateway, bucket)
+TTL bucket + INTERVAL 30 DAY
+COMMENT '容量1分钟汇总 - 保留30天';
+
+CREATE TABLE IF NOT EXISTS vos_capacity_1h
+(
+    vos_id UInt32,
+    metric LowCardinality(String),
+    gateway String,
+    bucket DateTime,
+    value_min SimpleAggregateFunction(min, Float64),
+    value_max SimpleAggregateFunction(max, Float64),
+    value_sum SimpleAggregateFunction(sum, Float64),
+    samples SimpleAggregateFunction(sum, UInt64)
+)
+ENGINE = AggregatingMergeTree
+PARTITION BY toYYYYMM(bucket)
+ORDER BY (vos_id, metric, gateway, bucket)
+TTL bucket + INTERVAL 730 DAY
+COMMENT '容量1小时汇总 - 保留2年';
+
+CREATE TABLE IF NOT EXISTS vos_capacity_1d
+(
+    vos_id UInt32,
+    metric LowCardinality(String),
+    gateway String,
+    bucket DateTime,
+    value_min SimpleAggregateFunction(min, Float64),
+    value_max SimpleAggregateFunction(max, Float64),
+    value_sum SimpleAggregateFunction(sum, Float64),
+    samples SimpleAggregateFunction(sum, UInt64)
+)
+ENGINE = AggregatingMergeTree
+PARTITION BY toYear(bucket)
+ORDER BY (vos_id, metric, gateway, bucket)
+COMMENT '容量1天汇总 - 永久保留';
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS vos_capacity_1m_mv TO vos_capacity_1m AS
+SELECT vos_id, metric, gateway, toStartOfMinute(ts) AS bucket,
+       min(value) AS value_min, max(value) AS value_max, sum(value) AS value_sum, count() AS samples
+FROM vos_capacity_samples
+GROUP BY vos_id, metric, gateway, bucket;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS vos_capacity_1h_mv TO vos_capacity_1h AS
+SELECT vos_id, metric, gateway, toStartOfHour(ts) AS bucket,
+       min(value) AS value_min, max(value) AS value_max, sum(value) AS value_sum, count() AS samples
+FROM vos_capacity_samples
+GROUP BY vos_id, metric, gateway, bucket;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS vos_capacity_1d_mv TO vos_capacity_1d AS
+SELECT vos_id, metric, gateway, toStartOfDay(ts) AS bucket,
+       min(value) AS value_min, max(value) AS value_max, sum(value) AS value_sum, count() AS samples
+FROM vos_capacity_samples
+GROUP BY vos_id, metric, gateway, bucket;
@@ -2,6 +2,7 @@
 import React from 'react'
 import { useVOS } from '../../contexts/VOSContext'
 import CacheManagement from '../../components/CacheManagement'
+import CacheMetricsPanel from '../../components/CacheMetricsPanel'
 
 export default function CachePage() {
   const { currentVOS } = useVOS()
@@ -42,6 +43,8 @@ export default function CachePage() {
         instanceName={currentVOS.name} 
       />
 
+      <CacheMetricsPanel instanceId={currentVOS.id} />
+
       {/* 使用说明 */}
       <div className='mt-6 bg-blue-50 border border-blue-200 rounded-xl p-6'>
         <h3 className='text-lg font-semibold text-blue-900 mb-3'>💡 缓存说明</h3>
@@ -0,0 +1,161 @@
+'use client'
+import React, { useState, useEffect } from 'react'
+import api from '../lib/api'
+
+interface ApiMetric {
+  api: string
+  instance: string
+  hits: Record<string, number>
+  total: number
+  hit_rate: number
+  miss_latency_avg_ms: number | null
+  fetch_count: number
+  fetch_latency_avg_ms: number | null
+  fetch_latency_p95_ms: number | null
+  payload_avg_bytes: number | null
+}
+
+interface CacheMetrics {
+  by_api: ApiMetric[]
+  redis: Record<string, number>
+  hot_keys: Array<{ key: string; hits: number }>
+}
+
+interface Props {
+  instanceId: number
+}
+
+function formatBytes(bytes: number | null) {
+  if (bytes === null || bytes === undefined) return '-'
+  if (bytes < 1024) return `${bytes.toFixed(0)} B`
+  if (bytes < 1024 * 1024) return `${(bytes / 1024).toFixed(1)} KB`
+  return `${(bytes / 1024 / 1024).toFixed(2)} MB`
+}
+
+function formatMs(ms: number | null) {
+  return ms === null || ms === undefined ? '-' : `${ms.toFixed(1)} ms`
+}
+
+export default function CacheMetricsPanel({ instanceId }: Props) {
+  const [metrics, setMetrics] = useState<CacheMetrics | null>(null)
+  const [loading, setLoading] = useState(false)
+
+  useEffect(() => {
+    fetchMetrics()
+  }, [instanceId])
+
+  const fetchMetrics = async () => {
+    setLoading(true)
+    try {
+      const res = await api.get('/vos-api/cache/metrics', { params: { instance_id: instanceId } })
+      setMetrics(res.data?.metrics)
+    } catch (e) {
+      console.error('获取缓存指标失败:', e)
+    } finally {
+      setLoading(false)
+    }
+  }
+
+  if (!metrics) return null
+
+  const redisGets = (metrics.redis['get_hit'] || 0) + (metrics.redis['get_miss'] || 0)
+  const redisHitRate = redisGets > 0 ? (((metrics.redis['get_hit'] || 0) / redisGets) * 100).toFixed(1) : '0'
+
+  return (
+    <div className='mt-6 bg-white rounded-xl shadow-lg p-6'>
+      <div className='flex items-center justify-between mb-6'>
+        <div>
+          <h2 className='text-2xl font-bold text-gray-800'>缓存指标</h2>
+          <p className='text-sm text-gray-600 mt-1'>各API命中层级、未命中耗时与响应体大小（所有进程汇总）</p>
+        </div>
+        <button
+          onClick={fetchMetrics}
+          disabled={loading}
+          className='px-4 py-2 bg-blue-500 text-white rounded-lg hover:bg-blue-600 transition disabled:opacity-50'
+        >
+          刷新
+        </button>
+      </div>
+
+      {/* Redis 操作统计 */}
+      <div className='grid grid-cols-2 md:grid-cols-4 gap-4 mb-6'>
+        <div className='bg-gradient-to-br from-blue-50 to-blue-100 rounded-lg p-4 border border-blue-200'>
+          <p className='text-sm text-blue-700 font-medium mb-1'>Redis 读取</p>
+          <p className='text-3xl font-bold text-blue-900'>{redisGets}</p>
+          <p className='text-xs text-blue-600 mt-1'>命中率: {redisHitRate}%</p>
+        </div>
+        <div className='bg-gradient-to-br from-green-50 to-green-100 rounded-lg p-4 border border-green-200'>
+          <p className='text-sm text-green-700 font-medium mb-1'>Redis 写入</p>
+          <p className='text-3xl font-bold text-green-900'>{metrics.redis['set_ok'] || 0}</p>
+        </div>
+        <div className='bg-gradient-to-br from-red-50 to-red-100 rounded-lg p-4 border border-red-200'>
+          <p className='text-sm text-red-700 font-medium mb-1'>Redis 错误</p>
+          <p className='text-3xl font-bold text-red-900'>
+            {(metrics.redis['get_error'] || 0) + (metrics.redis['set_error'] || 0)}
+          </p>
+        </div>
+        <div className='bg-gradient-to-br from-purple-50 to-purple-100 rounded-lg p-4 border border-purple-200'>
+          <p className='text-sm text-purple-700 font-medium mb-1'>VOS API 调用</p>
+          <p className='text-3xl font-bold text-purple-900'>
+            {metrics.by_api.reduce((sum, item) => sum + item.fetch_count, 0)}
+          </p>
+        </div>
+      </div>
+
+      {/* 各API指标 */}
+      {metrics.by_api.length > 0 ? (
+        <div className='overflow-x-auto mb-6'>
+          <table className='min-w-full text-sm'>
+            <thead>
+              <tr className='bg-gray-50 text-gray-600'>
+                <th className='px-3 py-2 text-left'>API</th>
+                <th className='px-3 py-2 text-right'>Redis</th>
+                <th className='px-3 py-2 text-right'>数据库</th>
+                <th className='px-3 py-2 text-right'>VOS</th>
+                <th className='px-3 py-2 text-right'>失败</th>
+                <th className='px-3 py-2 text-right'>命中率</th>
+                <th className='px-3 py-2 text-right'>未命中耗时</th>
+                <th className='px-3 py-2 text-right'>VOS耗时(平均/P95)</th>
+                <th className='px-3 py-2 text-right'>平均响应体</th>
+              </tr>
+            </thead>
+            <tbody>
+              {metrics.by_api.map((item) => (
+                <tr key={`${item.instance}-${item.api}`} className='border-t border-gray-100 hover:bg-gray-50'>
+                  <td className='px-3 py-2 font-medium text-gray-800'>{item.api}</td>
+                  <td className='px-3 py-2 text-right'>{item.hits['redis'] || 0}</td>
+                  <td className='px-3 py-2 text-right'>{item.hits['database'] || 0}</td>
+                  <td className='px-3 py-2 text-right'>{item.hits['vos_api'] || 0}</td>
+                  <td className='px-3 py-2 text-right text-red-600'>{item.hits['error'] || 0}</td>
+                  <td className='px-3 py-2 text-right'>{item.hit_rate.toFixed(1)}%</td>
+                  <td className='px-3 py-2 text-right'>{formatMs(item.miss_latency_avg_ms)}</td>
+                  <td className='px-3 py-2 text-right'>
+                    {formatMs(item.fetch_latency_avg_ms)} / {formatMs(item.fetch_latency_p95_ms)}
+                  </td>
+                  <td className='px-3 py-2 text-right'>{formatBytes(item.payload_avg_bytes)}</td>
+                </tr>
+              ))}
+            </tbody>
+          </table>
+        </div>
+      ) : (
+        <div className='text-center py-8 text-gray-500 text-sm'>暂无指标数据</div>
+      )}
+
+      {/* 热点键 */}
+      {metrics.hot_keys.length > 0 && (
+        <div>
+          <h3 className='text-lg font-semibold text-gray-800 mb-3'>热点缓存键</h3>
+          <div className='space-y-1 max-h-64 overflow-y-auto'>
+            {metrics.hot_keys.map((item) => (
+              <div key={item.key} className='flex items-center justify-between px-3 py-2 bg-gray-50 rounded-lg text-sm'>
+                <span className='font-mono text-gray-700 truncate mr-4'>{item.key}</span>
+                <span className='text-gray-600 whitespace-nowrap'>{item.hits} 次</span>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+    </div>
+  )
+}